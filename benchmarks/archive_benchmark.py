@@ -0,0 +1,95 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Measures duration of recursiveUnzip and archive on a synthetic nested
+# archive (zip of .fastq.gz files, similar to sequencing datasets)
+#
+# Usage: python benchmarks/archive_benchmark.py [--files 32] [--size 8] [--workers 1 4]
+
+from typing import List, Callable
+from pathlib import Path
+from zipfile import ZipFile
+
+import gzip
+import time
+import random
+import shutil
+import argparse
+import tempfile
+
+from coretex.utils.file import recursiveUnzip, archive
+
+
+def fastqRecord(index: int) -> bytes:
+    sequence = "".join(random.choices("ACGT", k = 150))
+    quality = "".join(random.choices("FFFF:,", k = 150))
+
+    return f"@read-{index}\n{sequence}\n+\n{quality}\n".encode()
+
+
+def createNestedArchive(root: Path, fileCount: int, fileSize: int) -> Path:
+    sourceDir = root / "source"
+    sourceDir.mkdir()
+
+    records = b"".join(fastqRecord(index) for index in range(1000))
+
+    for index in range(fileCount):
+        with gzip.open(sourceDir / f"sample_{index}_R1_001.fastq.gz", "wb", compresslevel = 1) as file:
+            for _ in range(max(1, fileSize * 1024 * 1024 // len(records))):
+                file.write(records)
+
+    archivePath = root / "dataset.zip"
+    with ZipFile(archivePath, "w") as zipFile:
+        for path in sorted(sourceDir.iterdir()):
+            zipFile.write(path, path.name)
+
+    shutil.rmtree(sourceDir)
+    return archivePath
+
+
+def measure(name: str, function: Callable[[], None]) -> None:
+    start = time.perf_counter()
+    function()
+
+    print(f"{name:<45} {time.perf_counter() - start:8.3f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type = int, default = 32)
+    parser.add_argument("--size", type = int, default = 8, help = "uncompressed size of a single file in MB")
+    parser.add_argument("--workers", type = int, nargs = "+", default = [1, 4])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        root = Path(directory)
+        archivePath = createNestedArchive(root, args.files, args.size)
+
+        workerCounts: List[int] = args.workers
+        for workerCount in workerCounts:
+            destination = root / f"extracted-{workerCount}"
+            measure(f"recursiveUnzip (workers = {workerCount})", lambda: recursiveUnzip(archivePath, destination, workerCount = workerCount))
+
+        source = root / f"extracted-{workerCounts[0]}"
+        for workerCount in workerCounts:
+            for level in [1, 6]:
+                destination = root / f"archive-{workerCount}-{level}.zip"
+                measure(f"archive (workers = {workerCount}, level = {level})", lambda: archive(source, destination, level, workerCount))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Measures throughput of Codable decoding/encoding for large lists of entities
+#
+# Usage: python benchmarks/codable_benchmark.py [--count 100000]
+
+from typing import Any, Dict, List, Callable
+from uuid import uuid4
+
+import time
+import argparse
+
+from coretex import ImageSample, CoretexImageAnnotation
+
+
+def sampleJson(index: int) -> Dict[str, Any]:
+    return {
+        "id": index,
+        "name": f"sample-{index}",
+        "is_deleted": False,
+        "is_locked": False,
+        "project_id": 1,
+        "project_task": 1,
+        "storage_last_modified": "2024-01-01T12:00:00.000000Z",
+        "is_encrypted": False
+    }
+
+
+def annotationJson(index: int) -> Dict[str, Any]:
+    return {
+        "name": f"sample-{index}",
+        "width": 1920,
+        "height": 1080,
+        "instances": [
+            {
+                "class_id": str(uuid4()),
+                "bbox": {
+                    "top_left_x": 10 * instance,
+                    "top_left_y": 20 * instance,
+                    "width": 100,
+                    "height": 200
+                },
+                "annotations": [[10, 20, 110, 20, 110, 220, 10, 220]]
+            }
+            for instance in range(3)
+        ]
+    }
+
+
+def measure(name: str, count: int, function: Callable[[], Any]) -> None:
+    start = time.perf_counter()
+    function()
+    duration = time.perf_counter() - start
+
+    print(f"{name:<40} {duration:8.3f}s {count / duration:12,.0f} objects/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type = int, default = 100_000)
+    args = parser.parse_args()
+
+    samples = [sampleJson(index) for index in range(args.count)]
+    annotations = [annotationJson(index) for index in range(args.count)]
+
+    decodedSamples: List[ImageSample] = []
+    decodedAnnotations: List[CoretexImageAnnotation] = []
+
+    measure("ImageSample.decode", args.count, lambda: decodedSamples.extend(ImageSample.decode(obj) for obj in samples))
+    measure("CoretexImageAnnotation.decode", args.count, lambda: decodedAnnotations.extend(CoretexImageAnnotation.decode(obj) for obj in annotations))
+    measure("ImageSample.encode", args.count, lambda: [sample.encode() for sample in decodedSamples])
+    measure("CoretexImageAnnotation.encode", args.count, lambda: [annotation.encode() for annotation in decodedAnnotations])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Measures throughput of LocalImageSample.load for the first and the following
+# epochs, with and without the decoded-pixel cache
+#
+# Usage: python benchmarks/image_load_benchmark.py [--count 200] [--width 1280] [--height 720] [--epochs 3]
+
+from typing import List
+from pathlib import Path
+from zipfile import ZipFile
+
+import io
+import time
+import argparse
+import tempfile
+
+from PIL import Image
+
+import numpy as np
+
+from coretex import LocalImageSample
+
+
+def createSamples(root: Path, count: int, width: int, height: int, format: str) -> List[LocalImageSample]:
+    samples: List[LocalImageSample] = []
+    extension = "jpeg" if format == "JPEG" else "png"
+
+    for index in range(count):
+        # Noise is hard to compress, gradient is closer to a real photo
+        gradient = np.linspace(0, 255, width, dtype = np.uint8)[None, :, None]
+        noise = np.random.randint(0, 32, (height, width, 3), dtype = np.uint8)
+        pixels = np.broadcast_to(gradient, (height, width, 3)) + noise
+
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).save(buffer, format)
+
+        zipPath = root / f"{format.lower()}-{index}.zip"
+        with ZipFile(zipPath, "w") as zipFile:
+            zipFile.writestr(f"image.{extension}", buffer.getvalue())
+
+        sample = LocalImageSample(zipPath)
+        sample.unzip()
+
+        samples.append(sample)
+
+    return samples
+
+
+def runEpoch(samples: List[LocalImageSample], cacheImage: bool) -> float:
+    start = time.perf_counter()
+
+    for sample in samples:
+        # Touch the pixels so lazily mapped data is actually read
+        int(sample.load(cacheImage).image[::64, ::64].sum())
+
+    return len(samples) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type = int, default = 200)
+    parser.add_argument("--width", type = int, default = 1280)
+    parser.add_argument("--height", type = int, default = 720)
+    parser.add_argument("--epochs", type = int, default = 3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for format in ["JPEG", "PNG"]:
+            samples = createSamples(Path(directory), args.count, args.width, args.height, format)
+
+            for cacheImage in [False, True]:
+                throughputs = [runEpoch(samples, cacheImage) for _ in range(args.epochs)]
+                later = sum(throughputs[1:]) / max(1, len(throughputs) - 1)
+
+                print(
+                    f"{format:<5} cacheImage = {str(cacheImage):<5} "
+                    f"epoch 1: {throughputs[0]:10,.1f} samples/s    "
+                    f"epoch 2+: {later:10,.1f} samples/s"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -47,6 +47,8 @@ class FolderManager:
             folder where node and run logs are stored
         environments : Path
             folder where node stores python environments
+        uploadsFolder : Path
+            folder where state of resumable chunk uploads is stored
     """
 
     def __init__(self, storagePath: Union[Path, str]):
@@ -62,6 +64,7 @@ class FolderManager:
         self.logs = self._createFolder("logs")
         self.environments = self._createFolder("environments")
         self.temp = self._createFolder("temp")
+        self.uploadsFolder = self._createFolder("uploads")
         self._artifactsFolder = self._createFolder("artifacts")
 
         self.runsLogDirectory = self.logs / "runs"
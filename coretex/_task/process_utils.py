@@ -3,10 +3,9 @@ from pathlib import Path
 
 import subprocess
 
-from threading import Thread
-
 from .run_logger import runLogger
 from ..logging import LogSeverity
+from ..utils import OutputBuffer, drainStreams, captureProcessOutput
 
 
 def captureRunStdout(process: subprocess.Popen) -> None:
@@ -14,24 +13,12 @@ def captureRunStdout(process: subprocess.Popen) -> None:
     if stdout is None:
         raise ValueError("stdout is None for subprocess")
 
-    while process.poll() is None:
-        line: str = stdout.readline().decode("UTF-8")
-        runLogger.logProcessOutput(line)
-
-
-def captureRunStderr(process: subprocess.Popen, isEnabled: bool) -> None:
-    stderr = process.stderr
-    if stderr is None:
-        raise ValueError("stderr is None for subprocess")
+    drainStreams({ stdout: runLogger.logProcessOutput })
 
-    lines: List[str] = []
-    while process.poll() is None:
-        line: str = stderr.readline().decode("UTF-8")
-        lines.append(line)
 
-    # Dump stderr output at the end to perserve stdout order
+def _logRunStderr(lines: List[str], returnCode: int, isEnabled: bool) -> None:
     for line in lines:
-        if isEnabled and process.returncode == 0:
+        if isEnabled and returnCode == 0:
             severity = LogSeverity.warning
         elif isEnabled:
             severity = LogSeverity.fatal
@@ -42,6 +29,18 @@ def captureRunStderr(process: subprocess.Popen, isEnabled: bool) -> None:
         runLogger.logProcessOutput(line, severity)
 
 
+def captureRunStderr(process: subprocess.Popen, isEnabled: bool) -> None:
+    stderr = process.stderr
+    if stderr is None:
+        raise ValueError("stderr is None for subprocess")
+
+    output = OutputBuffer()
+    drainStreams({ stderr: output.append })
+
+    # Dump stderr output at the end to perserve stdout order
+    _logRunStderr(output.lines(), process.wait(), isEnabled)
+
+
 def executeRunLocally(
     args: List[str],
     captureErr: bool,
@@ -56,19 +55,12 @@ def executeRunLocally(
         stderr = subprocess.PIPE
     )
 
-    # Run a thread which captures process stdout and prints it out to Coretex.ai console
-    Thread(
-        target = captureRunStdout,
-        args = (process,),
-        name = "Process stdout reader"
-    ).start()
-
-    if captureErr:
-        # Run a thread which captures process stderr and dumps it out node log file
-        Thread(
-            target = captureRunStderr,
-            args = (process, captureErr),
-            name = "Process stderr reader"
-        ).start()
-
-    return process.wait()
+    # Process stdout is printed out to Coretex.ai console as it arrives, stderr
+    # is always drained so the process never blocks on a full pipe
+    stderr = OutputBuffer()
+    returnCode = captureProcessOutput(process, runLogger.logProcessOutput, stderr.append if captureErr else None)
+
+    # Dump stderr output at the end to perserve stdout order
+    _logRunStderr(stderr.lines(), returnCode, captureErr)
+
+    return returnCode
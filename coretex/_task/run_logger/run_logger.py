@@ -15,15 +15,24 @@
 #     You should have received a copy of the GNU Affero General Public License
 #     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
+from http import HTTPStatus
 
 import logging
 import traceback
 import functools
 
-from .upload_worker import LoggerUploadWorker
+from .upload_worker import LoggerUploadWorker, LogOverflowPolicy
 from ...logging import Log, LogSeverity
-from ...networking import networkManager, RequestFailedError
+from ...networking import networkManager, RequestFailedError, RequestType
+from ..._folder_manager import folder_manager
+
+
+# Batches larger than this (in bytes) are sent gzip compressed
+COMPRESSION_THRESHOLD = 64 * 1024
+
+# Disabled if the backend rejects a compressed request
+_compressionSupported = True
 
 
 def exceptionToString(exception: BaseException) -> str:
@@ -32,13 +41,26 @@ def exceptionToString(exception: BaseException) -> str:
     return "".join(tb)
 
 
-def uploadTaskRunLogs(taskRunId: int, logs: List[Log]) -> bool:
+def uploadTaskRunLogs(taskRunId: int, logs: List[Dict[str, Any]]) -> bool:
+    global _compressionSupported
+
     try:
         params = {
             "model_queue_id": taskRunId,
-            "logs": [log.encode() for log in logs]
+            "logs": logs
         }
 
+        if _compressionSupported and sum(len(log["content"]) for log in logs) >= COMPRESSION_THRESHOLD:
+            headers = networkManager._headers()
+            headers["Content-Encoding"] = "gzip"
+
+            response = networkManager.request("model-queue/add-console-log", RequestType.post, headers, body = params)
+            if response.statusCode not in [HTTPStatus.BAD_REQUEST, HTTPStatus.UNSUPPORTED_MEDIA_TYPE]:
+                return not response.hasFailed()
+
+            logging.getLogger("coretexpylib").debug(">> [Coretex] Compressed console logs were rejected, falling back to uncompressed upload")
+            _compressionSupported = False
+
         response = networkManager.post("model-queue/add-console-log", params)
         return not response.hasFailed()
     except RequestFailedError as ex:
@@ -60,7 +82,11 @@ class RunLogger:
         if self._uploadWorker is not None:
             raise ValueError("TaskRun is already attached to logger")
 
-        self._uploadWorker = LoggerUploadWorker(functools.partial(uploadTaskRunLogs, taskRunId))
+        self._uploadWorker = LoggerUploadWorker(
+            functools.partial(uploadTaskRunLogs, taskRunId),
+            LogOverflowPolicy.spill,
+            folder_manager.getRunLogsDir(taskRunId) / "pending_logs.jsonl"
+        )
         self._uploadWorker.start()
 
     def reset(self) -> None:
@@ -15,17 +15,60 @@
 #     You should have received a copy of the GNU Affero General Public License
 #     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from typing import List, Callable
-from threading import Thread, Event, RLock
+from typing import Any, Deque, Dict, List, Callable, Optional, Tuple
+from enum import Enum
+from pathlib import Path
+from collections import deque
+from threading import Thread, Event, Lock
 
+import json
 import time
 import logging
 
-from ...logging import Log
+from ...logging import Log, LogSeverity
 
 
 MAX_WAIT_TIME_BEFORE_UPDATE = 5
-UploadFunction = Callable[[List[Log]], bool]
+MAX_BACKOFF_TIME = 60
+
+# Limits of the in-memory log buffer, once exceeded the overflow policy is applied
+MAX_PENDING_LOG_COUNT = 100_000
+MAX_PENDING_LOG_BYTES = 32 * 1024 * 1024
+
+# Upload is triggered before the wait time expires once this many bytes are pending
+FLUSH_BATCH_BYTES = 256 * 1024
+
+# Limits of a single upload request
+MAX_BATCH_COUNT = 5000
+MAX_BATCH_BYTES = 1024 * 1024
+
+MAX_SPILL_FILE_BYTES = 256 * 1024 * 1024
+
+# Approximation of the encoded log size which is not part of the message
+LOG_SIZE_OVERHEAD = 64
+
+UploadFunction = Callable[[List[Dict[str, Any]]], bool]
+
+
+class LogOverflowPolicy(Enum):
+
+    """
+        Defines what happens with pending logs once the
+        in-memory log buffer is full
+
+        drop - oldest logs are discarded
+        spill - buffered logs are appended to a file on disk by
+        the uploader thread and uploaded once the backend is reachable
+        again, if the previous overflow was not written yet the oldest
+        logs are discarded
+    """
+
+    drop = "drop"
+    spill = "spill"
+
+
+def _logSize(log: Log) -> int:
+    return len(log.message) + LOG_SIZE_OVERHEAD
 
 
 class LoggerUploadWorker(Thread):
@@ -34,58 +77,276 @@ class LoggerUploadWorker(Thread):
         Not intended for outside use
 
         A worker thread which is constantly running and
-        uploading logs to Coretex backend every 5 seconds
+        uploading logs to Coretex backend every 5 seconds, or
+        sooner if enough logs are pending
+
+        Producers only append to an in-memory buffer which is
+        swapped out by the uploader, so adding a log never waits
+        for an upload request or a disk write to finish
 
         If the upload request fails the wait time is doubled
     """
 
-    def __init__(self, uploadFunction: UploadFunction) -> None:
+    def __init__(
+        self,
+        uploadFunction: UploadFunction,
+        overflowPolicy: LogOverflowPolicy = LogOverflowPolicy.drop,
+        spillPath: Optional[Path] = None
+    ) -> None:
+
         super().__init__()
 
+        if overflowPolicy == LogOverflowPolicy.spill and spillPath is None:
+            raise ValueError(">> [Coretex] \"spillPath\" is required when overflow policy is \"spill\"")
+
         self.setDaemon(True)
         self.setName("LoggerUploadWorker")
 
         self.__uploadFunction = uploadFunction
+        self.__overflowPolicy = overflowPolicy
+        self.__spillPath = spillPath
+
         self.__stopped = Event()
-        self.__lock = RLock()
+        self.__flushRequested = Event()
+
+        # Wakes the uploader thread on flush, spill and stop requests
+        self.__wakeup = Event()
         self.__waitTime = MAX_WAIT_TIME_BEFORE_UPDATE
-        self.__pendingLogs: List[Log] = []
+
+        # Guards the buffer, held only while appending or swapping
+        self.__bufferLock = Lock()
+        self.__buffer: Deque[Log] = deque()
+        self.__bufferBytes = 0
+        self.__droppedCount = 0
+
+        # Overflowed logs handed over to the uploader thread which writes them to the spill file
+        self.__overflow: Optional[List[Log]] = None
+
+        # Serializes uploads, never acquired by producers
+        self.__uploadLock = Lock()
+
+        # Guards the spill file and the offset of already uploaded spilled logs
+        self.__spillLock = Lock()
+        self.__spillOffset = 0
 
     @property
     def isStopped(self) -> bool:
         return self.__stopped.is_set()
 
     def stop(self) -> None:
-        with self.__lock:
-            self.__stopped.set()
+        self.__stopped.set()
+        self.__flushRequested.set()
+        self.__wakeup.set()
 
     def add(self, log: Log) -> None:
-        with self.__lock:
+        with self.__bufferLock:
             if self.isStopped:
                 return
 
-            self.__pendingLogs.append(log)
+            self.__buffer.append(log)
+            self.__bufferBytes += _logSize(log)
+
+            shouldSpill = self.__handleOverflow()
+            shouldFlush = self.__bufferBytes >= FLUSH_BATCH_BYTES
+
+        if shouldFlush:
+            self.__flushRequested.set()
+
+        if shouldSpill or shouldFlush:
+            self.__wakeup.set()
+
+    def __handleOverflow(self) -> bool:
+        # Must be called while holding the buffer lock, returns True if logs should be spilled
+        if len(self.__buffer) <= MAX_PENDING_LOG_COUNT and self.__bufferBytes <= MAX_PENDING_LOG_BYTES:
+            return False
+
+        if self.__overflowPolicy == LogOverflowPolicy.spill and self.__overflow is None:
+            self.__overflow = list(self.__buffer)
+
+            self.__buffer.clear()
+            self.__bufferBytes = 0
+
+            return True
+
+        while len(self.__buffer) > 0 and (len(self.__buffer) > MAX_PENDING_LOG_COUNT or self.__bufferBytes > MAX_PENDING_LOG_BYTES):
+            self.__bufferBytes -= _logSize(self.__buffer.popleft())
+            self.__droppedCount += 1
+
+        return False
+
+    def __spillOverflow(self) -> None:
+        with self.__bufferLock:
+            logs = self.__overflow
+            self.__overflow = None
+
+        if logs is None:
+            return
+
+        assert self.__spillPath is not None
+
+        lines = "".join(json.dumps(log.encode()) + "\n" for log in logs)
+
+        with self.__spillLock:
+            try:
+                spillSize = self.__spillPath.stat().st_size if self.__spillPath.exists() else 0
+                if spillSize + len(lines) > MAX_SPILL_FILE_BYTES:
+                    raise OSError(f"Spill file \"{self.__spillPath}\" is full")
+
+                with self.__spillPath.open("a", encoding = "utf-8") as file:
+                    file.write(lines)
+
+                return
+            except OSError as exception:
+                logging.getLogger("coretexpylib").debug(">> [Coretex] Failed to spill logs to disk", exc_info = exception)
+
+        with self.__bufferLock:
+            self.__droppedCount += len(logs)
+
+    def __readSpilledLogs(self) -> Tuple[List[Dict[str, Any]], int]:
+        # Returns the next batch of spilled logs and the spill file offset after it
+        batch: List[Dict[str, Any]] = []
+
+        with self.__spillLock:
+            if self.__spillPath is None or not self.__spillPath.exists():
+                return batch, 0
+
+            with self.__spillPath.open("r", encoding = "utf-8") as file:
+                file.seek(self.__spillOffset)
+
+                batchBytes = 0
+                offset = self.__spillOffset
+
+                while len(batch) < MAX_BATCH_COUNT and batchBytes < MAX_BATCH_BYTES:
+                    line = file.readline()
+
+                    # Skip partially written lines, they are completed by the next spill
+                    if not line.endswith("\n"):
+                        break
+
+                    offset += len(line.encode("utf-8"))
+                    batchBytes += len(line)
+
+                    try:
+                        batch.append(json.loads(line))
+                    except ValueError:
+                        continue
+
+        return batch, offset
+
+    def __uploadSpilledLogs(self) -> bool:
+        while True:
+            batch, offset = self.__readSpilledLogs()
+
+            if len(batch) > 0 and not self.__uploadFunction(batch):
+                return False
+
+            with self.__spillLock:
+                if self.__spillPath is None or not self.__spillPath.exists():
+                    return True
+
+                self.__spillOffset = offset
+
+                if self.__spillOffset >= self.__spillPath.stat().st_size:
+                    self.__spillPath.unlink()
+                    self.__spillOffset = 0
+
+                    return True
+
+                if len(batch) == 0:
+                    # Only a partially written line is left
+                    return True
+
+    def __swapBuffer(self) -> List[Log]:
+        with self.__bufferLock:
+            logs = list(self.__buffer)
+            droppedCount = self.__droppedCount
+
+            self.__buffer.clear()
+            self.__bufferBytes = 0
+            self.__droppedCount = 0
+
+        if droppedCount > 0:
+            logs.insert(0, Log(LogSeverity.warning, f">> [Coretex] {droppedCount} log(s) were dropped because the log buffer was full"))
+
+        return logs
+
+    def __requeue(self, logs: List[Log]) -> None:
+        with self.__bufferLock:
+            if self.__overflow is not None:
+                # Logs handed over for spilling are newer than the requeued ones
+                self.__buffer.extendleft(reversed(self.__overflow))
+                self.__bufferBytes += sum(_logSize(log) for log in self.__overflow)
+                self.__overflow = None
+
+            self.__buffer.extendleft(reversed(logs))
+            self.__bufferBytes += sum(_logSize(log) for log in logs)
+
+            shouldSpill = self.__handleOverflow()
+
+        if shouldSpill:
+            self.__spillOverflow()
 
     def uploadLogs(self) -> bool:
-        with self.__lock:
+        with self.__uploadLock:
             if self.isStopped:
                 return False
 
-            if len(self.__pendingLogs) == 0:
-                return True
+            # Spilled logs are older than the buffered ones
+            self.__spillOverflow()
+            if not self.__uploadSpilledLogs():
+                return False
+
+            logs = self.__swapBuffer()
+
+            start = 0
+            while start < len(logs):
+                end = start
+                batchBytes = 0
 
-            # Uploads logs to Coretex using the provided function
-            result = self.__uploadFunction(self.__pendingLogs)
+                while end < len(logs) and end - start < MAX_BATCH_COUNT and (end == start or batchBytes + _logSize(logs[end]) <= MAX_BATCH_BYTES):
+                    batchBytes += _logSize(logs[end])
+                    end += 1
 
-            # Only clear logs if they were successfully uploaded to coretex
-            if result:
-                self.__pendingLogs.clear()
+                # Uploads logs to Coretex using the provided function
+                try:
+                    success = self.__uploadFunction([log.encode() for log in logs[start:end]])
+                except BaseException:
+                    self.__requeue(logs[start:])
+                    raise
 
-            return result
+                # Only drop logs if they were successfully uploaded to coretex
+                if not success:
+                    self.__requeue(logs[start:])
+                    return False
+
+                start = end
+
+            return True
+
+    def __waitForUpload(self) -> None:
+        # Overflowed logs are spilled as soon as they are handed over,
+        # even while the upload is postponed
+        deadline = time.monotonic() + self.__waitTime
+
+        while not self.isStopped:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            self.__wakeup.wait(remaining)
+            self.__wakeup.clear()
+
+            self.__spillOverflow()
+
+            # Previous upload failed, size based flushing is suspended until the backoff expires
+            if self.__flushRequested.is_set() and self.__waitTime <= MAX_WAIT_TIME_BEFORE_UPDATE:
+                break
+
+        self.__flushRequested.clear()
 
     def run(self) -> None:
         while not self.isStopped:
-            time.sleep(self.__waitTime)
+            self.__waitForUpload()
 
             try:
                 success = self.uploadLogs()
@@ -98,4 +359,7 @@ class LoggerUploadWorker(Thread):
                 self.__waitTime = MAX_WAIT_TIME_BEFORE_UPDATE
             else:
                 # If upload of logs failed, double the wait time
-                self.__waitTime *= 2
+                self.__waitTime = min(self.__waitTime * 2, MAX_BACKOFF_TIME)
+
+        # Logs handed over right before the worker was stopped are kept on disk
+        self.__spillOverflow()
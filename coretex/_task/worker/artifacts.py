@@ -16,10 +16,15 @@
 #     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 
-from typing import List, Iterator
+from typing import Dict, Iterator, List, Set, Tuple, Union
 from pathlib import Path
 from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from threading import Thread, Event, Lock
 
+import os
+import time
+import hashlib
 import logging
 
 from watchdog.events import FileSystemEventHandler, FileSystemEvent
@@ -30,35 +35,301 @@ from ...entities import TaskRun
 
 IGNORED_FILES = ["_coretex.py"]
 
+# Number of seconds without new events after which a file is considered finished
+DEBOUNCE_TIME = 2.0
+
+# Shorter delay used after a file was closed for writing
+CLOSE_DEBOUNCE_TIME = 0.5
+
+# Minimum number of seconds between two uploads of the same file, files which
+# are appended to all the time (e.g. logs) would be uploaded after every write otherwise
+MIN_REUPLOAD_INTERVAL = 30.0
+
+UPLOAD_WORKER_COUNT = 4
+MAX_UPLOAD_ATTEMPTS = 3
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def _eventPath(path: Union[str, bytes]) -> Path:
+    return Path(os.fsdecode(path))
+
+
+def _hashFile(path: Path) -> str:
+    sha256 = hashlib.sha256()
+
+    with path.open("rb") as file:
+        while chunk := file.read(HASH_CHUNK_SIZE):
+            sha256.update(chunk)
+
+    return sha256.hexdigest()
+
 
 class FileEventHandler(FileSystemEventHandler):
 
+    """
+        Tracks files created inside the task directory and the time
+        at which each of them is considered finished and ready for upload.
+        Every new write event postpones the upload of the file
+    """
+
     def __init__(self) -> None:
         super().__init__()
 
-        self.artifactPaths: List[Path] = []
+        self.__lock = Lock()
+
+        # Files created during the run, only these are uploaded as artifacts
+        self.__createdPaths: Set[Path] = set()
+
+        # Files waiting for upload mapped to the time at which they are ready
+        self.__pendingPaths: Dict[Path, float] = {}
+
+        # Number of file system events received for each file, used to detect
+        # if the file changed since its upload was last attempted
+        self.__versions: Dict[Path, int] = {}
+
+    def __shouldTrack(self, filePath: Path) -> bool:
+        if filePath.name in IGNORED_FILES:
+            return False
+
+        return not filePath.parent.joinpath(".coretexignore").exists()
+
+    def __schedule(self, filePath: Path, delay: float, isEvent: bool = True) -> None:
+        with self.__lock:
+            if filePath in self.__createdPaths:
+                self.__pendingPaths[filePath] = time.monotonic() + delay
+
+                if isEvent:
+                    self.__versions[filePath] = self.__versions.get(filePath, 0) + 1
 
     def on_created(self, event: FileSystemEvent) -> None:
         if event.is_directory:
             return
 
-        filePath = Path(event.src_path)
-
-        if filePath.parent.joinpath(".coretexignore").exists():
+        filePath = _eventPath(event.src_path)
+        if not self.__shouldTrack(filePath):
             return
 
-        if filePath.name in IGNORED_FILES:
+        logging.getLogger("coretexpylib").debug(f">> [Coretex] File created at path \"{filePath}\", adding to artifacts list")
+
+        with self.__lock:
+            self.__createdPaths.add(filePath)
+
+        self.__schedule(filePath, DEBOUNCE_TIME)
+
+    def on_modified(self, event: FileSystemEvent) -> None:
+        if not event.is_directory:
+            self.__schedule(_eventPath(event.src_path), DEBOUNCE_TIME)
+
+    def on_closed(self, event: FileSystemEvent) -> None:
+        if not event.is_directory:
+            self.__schedule(_eventPath(event.src_path), CLOSE_DEBOUNCE_TIME)
+
+    def on_moved(self, event: FileSystemEvent) -> None:
+        if event.is_directory:
             return
 
-        logging.getLogger("coretexpylib").debug(f">> [Coretex] File created at path \"{filePath}\", adding to artifacts list")
-        self.artifactPaths.append(filePath)
+        sourcePath = _eventPath(event.src_path)
+        destinationPath = _eventPath(event.dest_path)
+
+        with self.__lock:
+            if sourcePath not in self.__createdPaths:
+                return
+
+            self.__createdPaths.discard(sourcePath)
+            self.__pendingPaths.pop(sourcePath, None)
+            self.__versions.pop(sourcePath, None)
+
+        if self.__shouldTrack(destinationPath):
+            with self.__lock:
+                self.__createdPaths.add(destinationPath)
+
+            self.__schedule(destinationPath, DEBOUNCE_TIME)
 
     def on_deleted(self, event: FileSystemEvent) -> None:
-        filePath = Path(event.src_path)
+        filePath = _eventPath(event.src_path)
+
+        with self.__lock:
+            if filePath in self.__createdPaths:
+                logging.getLogger("coretexpylib").debug(f">> [Coretex] Deleted file at path \"{filePath}\", removing from artifacts list")
+
+                self.__createdPaths.discard(filePath)
+                self.__pendingPaths.pop(filePath, None)
+                self.__versions.pop(filePath, None)
+
+    def reschedule(self, filePath: Path, delay: float) -> None:
+        # Rescheduling is not a file system event, so the version is not changed
+        self.__schedule(filePath, delay, isEvent = False)
+
+    def version(self, filePath: Path) -> int:
+        with self.__lock:
+            return self.__versions.get(filePath, 0)
+
+    def takeReady(self, exclude: Set[Path], force: bool = False) -> List[Path]:
+        """
+            Returns files which are ready for upload and removes them
+            from the pending files. Files from "exclude" are left pending
+
+            Parameters
+            ----------
+            exclude : Set[Path]
+                files which should not be returned
+            force : bool
+                if True files are returned regardless of the debounce time
+        """
+
+        now = time.monotonic()
+
+        with self.__lock:
+            ready = [
+                path for path, readyAt in self.__pendingPaths.items()
+                if (force or readyAt <= now) and path not in exclude
+            ]
 
-        if filePath in self.artifactPaths:
-            logging.getLogger("coretexpylib").debug(f">> [Coretex] Deleted file at path \"{filePath}\", removing from artifacts list")
-            self.artifactPaths.remove(filePath)
+            for path in ready:
+                del self.__pendingPaths[path]
+
+        return ready
+
+    @property
+    def hasPending(self) -> bool:
+        with self.__lock:
+            return len(self.__pendingPaths) > 0
+
+
+class ArtifactUploader:
+
+    """
+        Uploads finished files as TaskRun artifacts in the background
+        while the task is running. A file is uploaded again only if its
+        content changed since the last upload, and at most once every
+        "MIN_REUPLOAD_INTERVAL" seconds until the task finishes
+    """
+
+    def __init__(self, taskRun: TaskRun, root: Path, eventHandler: FileEventHandler) -> None:
+        self.taskRun = taskRun
+        self.root = root
+        self.eventHandler = eventHandler
+
+        self.__lock = Lock()
+        self.__inFlight: Set[Path] = set()
+        self.__uploadedHashes: Dict[Path, str] = {}
+        self.__uploadedAt: Dict[Path, float] = {}
+
+        # Failed attempts mapped by file, together with the version of
+        # the file for which they were counted
+        self.__attempts: Dict[Path, Tuple[int, int]] = {}
+        self.__futures: Set[Future] = set()
+
+        self.__executor = ThreadPoolExecutor(max_workers = UPLOAD_WORKER_COUNT, thread_name_prefix = "ArtifactUploader")
+        self.__stopped = Event()
+        self.__thread = Thread(target = self.__run, name = "ArtifactSync", daemon = True)
+
+    def start(self) -> None:
+        self.__thread.start()
+
+    def __upload(self, artifactPath: Path) -> None:
+        try:
+            if not artifactPath.exists():
+                return
+
+            contentHash = _hashFile(artifactPath)
+            if self.__uploadedHashes.get(artifactPath) == contentHash:
+                logging.getLogger("coretexpylib").debug(f">> [Coretex] Artifact \"{artifactPath}\" is unchanged, skipping upload")
+                return
+
+            logging.getLogger("coretexpylib").debug(f">> [Coretex] Uploading \"{artifactPath}\"")
+            artifact = self.taskRun.createArtifact(artifactPath, str(artifactPath.relative_to(self.root)))
+
+            if artifact is not None:
+                logging.getLogger("coretexpylib").debug(f"\tSuccessfully uploaded artifact \"{artifactPath}\"")
+
+                with self.__lock:
+                    self.__uploadedHashes[artifactPath] = contentHash
+                    self.__uploadedAt[artifactPath] = time.monotonic()
+                    self.__attempts.pop(artifactPath, None)
+
+                return
+
+            logging.getLogger("coretexpylib").debug(f"\tFailed to upload artifact \"{artifactPath}\"")
+        except Exception as e:
+            logging.getLogger("coretexpylib").error(f"\tError while creating artifact: {e}")
+            logging.getLogger("coretexpylib").debug(f"\tError while creating artifact: {e}", exc_info = e)
+        finally:
+            with self.__lock:
+                self.__inFlight.discard(artifactPath)
+
+        self.__retry(artifactPath)
+
+    def __retry(self, artifactPath: Path) -> None:
+        version = self.eventHandler.version(artifactPath)
+
+        with self.__lock:
+            # File changed since the previous failure, so it gets all attempts again
+            previousVersion, attempts = self.__attempts.get(artifactPath, (version, 0))
+            if previousVersion != version:
+                attempts = 0
+
+            attempts += 1
+            self.__attempts[artifactPath] = (version, attempts)
+
+        if attempts < MAX_UPLOAD_ATTEMPTS:
+            self.eventHandler.reschedule(artifactPath, DEBOUNCE_TIME * 2 ** attempts)
+
+    def __submitReady(self, force: bool) -> None:
+        with self.__lock:
+            inFlight = set(self.__inFlight)
+
+        now = time.monotonic()
+
+        for artifactPath in self.eventHandler.takeReady(inFlight, force):
+            with self.__lock:
+                uploadedAt = self.__uploadedAt.get(artifactPath)
+
+            # Remaining files are uploaded when the task finishes regardless of the interval
+            if not force and uploadedAt is not None and now - uploadedAt < MIN_REUPLOAD_INTERVAL:
+                self.eventHandler.reschedule(artifactPath, uploadedAt + MIN_REUPLOAD_INTERVAL - now)
+                continue
+
+            with self.__lock:
+                self.__inFlight.add(artifactPath)
+
+            future = self.__executor.submit(self.__upload, artifactPath)
+
+            with self.__lock:
+                self.__futures.add(future)
+
+            future.add_done_callback(self.__onDone)
+
+    def __onDone(self, future: Future) -> None:
+        with self.__lock:
+            self.__futures.discard(future)
+
+    def __run(self) -> None:
+        while not self.__stopped.wait(CLOSE_DEBOUNCE_TIME):
+            self.__submitReady(force = False)
+
+    def finish(self) -> None:
+        """
+            Stops background syncing and uploads all remaining files
+        """
+
+        self.__stopped.set()
+        self.__thread.join()
+
+        # Upload everything which is still pending, including files whose
+        # upload failed and were rescheduled while the flush was running
+        while True:
+            self.__submitReady(force = True)
+
+            with self.__lock:
+                futures = set(self.__futures)
+
+            if len(futures) == 0 and not self.eventHandler.hasPending:
+                break
+
+            wait(futures)
+
+        self.__executor.shutdown()
 
 
 @contextmanager
@@ -66,13 +337,16 @@ def track(taskRun: TaskRun) -> Iterator[FileEventHandler]:
     # If local use current working dir, else use task path
     root = Path.cwd() if taskRun.isLocal else taskRun.taskPath
 
+    eventHandler = FileEventHandler()
+    uploader = ArtifactUploader(taskRun, root, eventHandler)
+    uploader.start()
+
     try:
         observer = Observer()
         observer.setName("ArtifactTracker")
 
         logging.getLogger("coretexpylib").debug(f">> [Coretex] Tracking files created inside \"{root}\"")
 
-        eventHandler = FileEventHandler()
         observer.schedule(eventHandler, root, recursive = True)  # type: ignore[no-untyped-call]
         try:
             observer.start()  # type: ignore[no-untyped-call]
@@ -90,15 +364,5 @@ def track(taskRun: TaskRun) -> Iterator[FileEventHandler]:
         observer.stop()  # type: ignore[no-untyped-call]
         observer.join()
 
-        for index, artifactPath in enumerate(eventHandler.artifactPaths):
-            logging.getLogger("coretexpylib").debug(f">> [Coretex] Uploading {index + 1}/{len(eventHandler.artifactPaths)} - \"{artifactPath}\"")
-
-            try:
-                artifact = taskRun.createArtifact(artifactPath, str(artifactPath.relative_to(root)))
-                if artifact is not None:
-                    logging.getLogger("coretexpylib").debug(f"\tSuccessfully uploaded artifact")
-                else:
-                    logging.getLogger("coretexpylib").debug(f"\tFailed to upload artifact")
-            except Exception as e:
-                logging.getLogger("coretexpylib").error(f"\tError while creating artifact: {e}")
-                logging.getLogger("coretexpylib").debug(f"\tError while creating artifact: {e}", exc_info = e)
+        logging.getLogger("coretexpylib").debug(">> [Coretex] Uploading remaining artifacts")
+        uploader.finish()
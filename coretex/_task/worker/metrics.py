@@ -15,13 +15,15 @@
 #     You should have received a copy of the GNU Affero General Public License
 #     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from typing import Tuple, Dict, List
+from typing import Deque, List
+from collections import deque
+from threading import Thread, Event, Lock
 
 import time
 import logging
 
 from ...entities import MetricType, TaskRun, Metric
-from ...entities.task_run.metrics import metric_factory
+from ...entities.task_run.metrics import MetricPoint, metric_factory
 
 
 def _getMetrics() -> List[Metric]:
@@ -59,14 +61,72 @@ def create(taskRun: TaskRun) -> None:
     taskRun.createMetrics(_getMetrics())
 
 
-def upload(taskRun: TaskRun) -> None:
+def sample(taskRun: TaskRun) -> List[MetricPoint]:
     x = time.time()
-    metricValues: Dict[str, Tuple[float, float]] = {}
+    points: List[MetricPoint] = []
 
     for metric in taskRun.metrics:
         metricValue = metric.extract()
 
         if metricValue is not None:
-            metricValues[metric.name] = x, metricValue
+            points.append((metric.name, x, metricValue, x))
 
-    taskRun.submitMetrics(metricValues)
+    return points
+
+
+class MetricSampler:
+
+    """
+        Samples system metrics of the TaskRun in a background thread
+        every "sampleInterval" seconds and keeps them in a ring buffer
+        until they are shipped with the next heartbeat. Once the buffer
+        is full the oldest samples are discarded
+    """
+
+    def __init__(self, taskRun: TaskRun, sampleInterval: float, capacity: int) -> None:
+        self.taskRun = taskRun
+        self.sampleInterval = sampleInterval
+        self.capacity = capacity
+
+        self.__lock = Lock()
+        self.__points: Deque[MetricPoint] = deque(maxlen = capacity * max(len(taskRun.metrics), 1))
+        self.__stopped = Event()
+        self.__thread = Thread(target = self.__run, name = "MetricSampler", daemon = True)
+
+    def start(self) -> None:
+        self.__thread.start()
+
+    def stop(self) -> None:
+        self.__stopped.set()
+        self.__thread.join()
+
+    def drain(self) -> List[MetricPoint]:
+        with self.__lock:
+            points = list(self.__points)
+            self.__points.clear()
+
+        return points
+
+    def requeue(self, points: List[MetricPoint]) -> None:
+        # Points which failed to upload are older than the buffered ones
+        with self.__lock:
+            newer = list(self.__points)
+
+            self.__points.clear()
+            self.__points.extend(points)
+            self.__points.extend(newer)
+
+    def __run(self) -> None:
+        while not self.__stopped.is_set():
+            start = time.monotonic()
+
+            try:
+                points = sample(self.taskRun)
+            except BaseException as exception:
+                logging.getLogger("coretexpylib").debug(">> [Coretex] Failed to sample metrics", exc_info = exception)
+                points = []
+
+            with self.__lock:
+                self.__points.extend(points)
+
+            self.__stopped.wait(max(self.sampleInterval - (time.monotonic() - start), 0))
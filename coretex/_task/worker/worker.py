@@ -31,18 +31,52 @@ import psutil
 
 from . import utils, metrics, artifacts
 from ...entities import TaskRun
-from ...networking import networkManager, NetworkRequestError
+from ...networking import networkManager, NetworkRequestError, RequestFailedError
 
 
-def _update(taskRun: TaskRun) -> None:
+# Heartbeat interval, increased up to MAX_UPDATE_INTERVAL while the backend is slow or unreachable
+UPDATE_INTERVAL = 5
+MAX_UPDATE_INTERVAL = 30
+
+# Update is considered slow if it takes longer than this fraction of the current interval
+SLOW_UPDATE_RATIO = 0.5
+
+DEFAULT_SAMPLE_INTERVAL = 1.0
+
+# Number of seconds of samples kept while the backend is unreachable
+SAMPLE_BUFFER_DURATION = 600
+
+
+def _update(taskRun: TaskRun, sampler: metrics.MetricSampler) -> bool:
     logging.getLogger("coretexpylib").debug(">> [Coretex] Heartbeat")
-    taskRun.updateStatus()  # updateStatus without params is considered heartbeat
+    points = sampler.drain()
+
+    try:
+        success = taskRun.updateStatus()  # updateStatus without params is considered heartbeat
+
+        if len(points) > 0:
+            logging.getLogger("coretexpylib").debug(f">> [Coretex] Uploading {len(points)} metric values")
+
+            if not taskRun._submitMetricPoints(points):
+                sampler.requeue(points)
+                success = False
+    except RequestFailedError as ex:
+        logging.getLogger("coretexpylib").debug(">> [Coretex] Heartbeat failed", exc_info = ex)
+
+        sampler.requeue(points)
+        success = False
 
-    logging.getLogger("coretexpylib").debug(">> [Coretex] Uploading metrics")
-    metrics.upload(taskRun)
+    return success
 
 
-def _taskRunWorker(output: Connection, refreshToken: str, taskRunId: int, parentId: int) -> None:
+def _nextUpdateInterval(interval: float, elapsed: float, success: bool) -> float:
+    if not success or elapsed > interval * SLOW_UPDATE_RATIO:
+        return min(interval * 2, MAX_UPDATE_INTERVAL)
+
+    return max(interval / 2, UPDATE_INTERVAL)
+
+
+def _taskRunWorker(output: Connection, refreshToken: str, taskRunId: int, parentId: int, sampleInterval: float) -> None:
     isStopped = False
 
     def handleTerminateSignal(signum: int, frame: Optional[FrameType]) -> None:
@@ -79,6 +113,11 @@ def _taskRunWorker(output: Connection, refreshToken: str, taskRunId: int, parent
     parent = psutil.Process(parentId)
     current = psutil.Process(os.getpid())
 
+    sampler = metrics.MetricSampler(taskRun, sampleInterval, int(SAMPLE_BUFFER_DURATION / sampleInterval))
+    sampler.start()
+
+    updateInterval: float = UPDATE_INTERVAL
+
     # Start tracking files which are created inside current working directory
     with artifacts.track(taskRun):
         while parent.is_running() and not isStopped:
@@ -86,21 +125,31 @@ def _taskRunWorker(output: Connection, refreshToken: str, taskRunId: int, parent
 
             # Measure elapsed time to calculate for how long should the process sleep
             start = timeit.default_timer()
-            _update(taskRun)
+            success = _update(taskRun, sampler)
             diff = timeit.default_timer() - start
 
-            # Make sure that metrics and heartbeat are sent every 5 seconds
-            if diff < 5:
-                sleepTime = 5 - diff
-                logging.getLogger("coretexpylib").debug(f">> [Coretex] Sleeping for {sleepTime}s")
-                time.sleep(sleepTime)
+            updateInterval = _nextUpdateInterval(updateInterval, diff, success)
+
+            # Make sure that metrics and heartbeat are sent every "updateInterval" seconds
+            sleepTime = updateInterval - diff
+            logging.getLogger("coretexpylib").debug(f">> [Coretex] Sleeping for {max(sleepTime, 0)}s")
+
+            # Sleep in short steps so termination is not delayed by a long interval
+            while sleepTime > 0 and not isStopped:
+                time.sleep(min(sleepTime, 1))
+                sleepTime -= 1
+
+    sampler.stop()
 
     logging.getLogger("coretexpylib").debug(">> [Coretex] Finished")
 
 
 class TaskRunWorker:
 
-    def __init__(self, refreshToken: str, taskRunId: int) -> None:
+    def __init__(self, refreshToken: str, taskRunId: int, sampleInterval: float = DEFAULT_SAMPLE_INTERVAL) -> None:
+        if sampleInterval <= 0:
+            raise ValueError(">> [Coretex] \"sampleInterval\" must be greater than 0")
+
         self._refreshToken = refreshToken
 
         output, input = multiprocessing.Pipe()
@@ -109,7 +158,7 @@ class TaskRunWorker:
         self.__process = multiprocessing.Process(
             name = f"TaskRun {taskRunId} worker process",
             target = _taskRunWorker,
-            args = (output, refreshToken, taskRunId, os.getpid()),
+            args = (output, refreshToken, taskRunId, os.getpid(), sampleInterval),
             daemon = True
         )
 
@@ -21,7 +21,7 @@ from pathlib import Path
 import subprocess
 import os
 
-from ...utils import command, logProcessOutput, CommandException
+from ...utils import command, logProcessOutput, CommandException, OutputBuffer, captureProcessOutput
 from ...entities import CustomDataset
 from ...logging import LogSeverity
 
@@ -198,6 +198,15 @@ def extractData(samtoolsPath: Path, file: Path) -> Tuple[List[int], List[int], L
         str(file.absolute())
     ]
 
+    def onStdout(line: str) -> None:
+        if len(line.strip()) == 0:
+            return
+
+        fields = line.strip().split("\t")
+        scores.append(int(fields[4]))
+        positions.append(int(fields[3]))
+        sequenceLengths.append(len(fields[9]))
+
     process = subprocess.Popen(
         args,
         shell = False,
@@ -206,29 +215,14 @@ def extractData(samtoolsPath: Path, file: Path) -> Tuple[List[int], List[int], L
         stderr = subprocess.PIPE
     )
 
-    while process.poll() is None:
-        if process.stdout is None:
-            continue
-
-        stdout = process.stdout.readlines()
-
-        for line in stdout:
-            if len(line) > 0:
-                fields = line.decode("UTF-8").strip().split("\t")
-                scores.append(int(fields[4]))
-                positions.append(int(fields[3]))
-                sequenceLengths.append(len(fields[9]))
-
-    if process.stderr is not None:
-        for stderr in process.stderr:
-            if len(stderr) > 0:
-                if process.returncode == 0:
-                    logProcessOutput(stderr, LogSeverity.warning)
-                else:
-                    logProcessOutput(stderr, LogSeverity.fatal)
-
-    if process.returncode != 0:
-        raise CommandException(f">> [Coretex] Falied to execute command. Returncode: {process.returncode}")
+    # Reads are parsed as they are streamed, stderr is dumped once the process exits
+    stderr = OutputBuffer()
+    returnCode = captureProcessOutput(process, onStdout, stderr.append)
+
+    logProcessOutput(stderr.text(), LogSeverity.warning.getLevel() if returnCode == 0 else LogSeverity.fatal.getLevel())
+
+    if returnCode != 0:
+        raise CommandException(f">> [Coretex] Falied to execute command. Returncode: {returnCode}")
 
     return scores, positions, sequenceLengths
 
@@ -15,17 +15,51 @@
 #     You should have received a copy of the GNU Affero General Public License
 #     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from typing import Any, Union
+from typing import Any, Union, Optional, Dict, Iterator
 from pathlib import Path
+from contextlib import contextmanager
+from uuid import uuid4
+from threading import Lock
 
 import os
+import json
+import time
 import shutil
 import pickle
 import hashlib
+import atexit
+import logging
 
 import requests
+import requests.adapters
 
 from ._folder_manager import folder_manager
+from .utils import FileLock
+
+
+INDEX_FILE_NAME      = ".index.json"
+INDEX_LOCK_FILE_NAME = ".index.lock"
+SIZE_LIMIT_ENV_KEY   = "CTX_CACHE_SIZE_LIMIT"
+
+MAX_RETRY_COUNT     = 3
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # 8 MB
+DOWNLOAD_TIMEOUT    = (5, 60)          # Connection = 5 seconds, Read = 1 minute
+
+ACCESS_FLUSH_INTERVAL = 10  # seconds
+
+# Value set with setSizeLimit, takes precedence over the environment variable
+_sizeLimit: Optional[int] = None
+
+# Accesses are recorded in memory and written to the index at most once
+# every ACCESS_FLUSH_INTERVAL seconds, or with the next index update
+_accessLock = Lock()
+_pendingAccesses: Dict[str, Dict[str, Any]] = {}
+_lastAccessFlush = 0.0
+
+# Connections are reused between downloads
+_session = requests.Session()
+_session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize = 16))
+_session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize = 16))
 
 
 class CacheException(Exception):
@@ -37,32 +71,371 @@ class CacheException(Exception):
     pass
 
 
+class ChecksumMismatchError(CacheException):
+
+    """
+        Exception which is raised if the checksum of the downloaded
+        file does not match the expected checksum
+    """
+
+    def __init__(self, url: str, expected: str, actual: str) -> None:
+        super().__init__(f">> [Coretex] Checksum of \"{url}\" does not match. Expected \"{expected}\", got \"{actual}\"")
+
+
 def _hashCacheKey(key: str) -> str:
     return hashlib.sha256(key.encode("UTF-8")).hexdigest()
 
 
-MAX_RETRY_COUNT = 3
+def _cachePath(key: str) -> Path:
+    return folder_manager.cache / _hashCacheKey(key)
+
+
+def _lockPath(hashedKey: str) -> Path:
+    return folder_manager.cache / f".{hashedKey}.lock"
+
+
+def _removeLock(hashedKey: str) -> None:
+    # Lock is removed only if nobody is holding it, otherwise it is
+    # removed by its holder once the download finishes
+    lock = FileLock(_lockPath(hashedKey))
+
+    if lock.acquire(blocking = False):
+        lock.release(remove = True)
+
 
+def _fileChecksum(path: Path) -> str:
+    sha256 = hashlib.sha256()
 
-def _download(source: str, destination: Path, retryCount: int = 0) -> Path:
-    if destination.exists():
-        raise FileExistsError(destination)
+    with path.open("rb") as file:
+        while (chunk := file.read(DOWNLOAD_CHUNK_SIZE)):
+            sha256.update(chunk)
+
+    return sha256.hexdigest()
+
+
+def _isEntry(path: Path) -> bool:
+    # Index, lock and temporary files all start with "."
+    return path.is_file() and not path.name.startswith(".")
+
+
+def _isSameFile(first: os.stat_result, second: os.stat_result) -> bool:
+    return first.st_ino == second.st_ino and first.st_size == second.st_size and first.st_mtime_ns == second.st_mtime_ns
+
+
+def _rebuildIndex() -> Dict[str, Dict[str, Any]]:
+    # Index is rebuilt from the files if it is missing or corrupted,
+    # keys are unknown for such entries since only their hash is stored
+    index: Dict[str, Dict[str, Any]] = {}
+
+    for path in folder_manager.cache.iterdir():
+        if not _isEntry(path):
+            continue
+
+        stat = path.stat()
+        index[path.name] = {
+            "key": None,
+            "size": stat.st_size,
+            "lastAccess": stat.st_atime,
+            "hitCount": 0
+        }
+
+    return index
+
+
+def _loadIndex() -> Dict[str, Dict[str, Any]]:
+    indexPath = folder_manager.cache / INDEX_FILE_NAME
+    if not indexPath.exists():
+        return _rebuildIndex()
 
     try:
-        with requests.get(source, stream = True) as r:
-            r.raise_for_status()
+        with indexPath.open("r") as file:
+            index = json.load(file)
+
+        if not isinstance(index, dict):
+            raise ValueError("Invalid cache index")
+
+        return index
+    except (ValueError, OSError) as ex:
+        logging.getLogger("coretexpylib").debug(">> [Coretex] Failed to load cache index, rebuilding it", exc_info = ex)
+        return _rebuildIndex()
+
+
+def _saveIndex(index: Dict[str, Dict[str, Any]]) -> None:
+    indexPath = folder_manager.cache / INDEX_FILE_NAME
+    tmpPath = indexPath.with_name(f"{indexPath.name}.{uuid4().hex}.tmp")
+
+    with tmpPath.open("w") as file:
+        json.dump(index, file)
+
+    os.replace(tmpPath, indexPath)
+
+
+@contextmanager
+def _updateIndex() -> Iterator[Dict[str, Dict[str, Any]]]:
+    # Index is shared by all processes which are using the same storage path,
+    # so it is modified only while the index lock is held
+    with FileLock(folder_manager.cache / INDEX_LOCK_FILE_NAME):
+        index = _loadIndex()
+        _applyAccesses(index)
+
+        yield index
+        _saveIndex(index)
+
+
+@contextmanager
+def _tempPath(key: str) -> Iterator[Path]:
+    # Entries are written to a temporary file which is then renamed to the entry path,
+    # so other processes never see partially written entries
+    path = folder_manager.cache / f".{_hashCacheKey(key)}.{uuid4().hex}.tmp"
+
+    try:
+        yield path
+    finally:
+        path.unlink(missing_ok = True)
+
+
+def _evict(index: Dict[str, Dict[str, Any]], keep: Optional[str] = None) -> None:
+    sizeLimit = getSizeLimit()
+    if sizeLimit is None:
+        return
+
+    totalSize = sum(entry["size"] for entry in index.values())
+
+    # Least recently used entries are evicted first
+    for hashedKey, entry in sorted(index.items(), key = lambda item: item[1]["lastAccess"]):
+        if totalSize <= sizeLimit:
+            break
+
+        if hashedKey == keep:
+            continue
+
+        (folder_manager.cache / hashedKey).unlink(missing_ok = True)
+        _removeLock(hashedKey)
+        del index[hashedKey]
+
+        totalSize -= entry["size"]
+        logging.getLogger("coretexpylib").debug(f">> [Coretex] Evicted cache entry \"{hashedKey}\" ({entry['size']} bytes)")
+
+    if totalSize > sizeLimit:
+        logging.getLogger("coretexpylib").warning(f">> [Coretex] Cache size ({totalSize} bytes) exceeds the size limit ({sizeLimit} bytes)")
+
+
+def _commit(key: str, source: Path, override: bool, checksum: Optional[str] = None) -> None:
+    cachePath = _cachePath(key)
+
+    with _updateIndex() as index:
+        # Other process could have stored the same key in the meantime
+        if not override and cachePath.exists():
+            raise CacheException(">> [Coretex] Cache with given key already exists. Set \"override\" to \"True\" if you want to override existing cache.")
+
+        os.replace(source, cachePath)
+
+        index[cachePath.name] = {
+            "key": key,
+            "size": cachePath.stat().st_size,
+            "lastAccess": time.time(),
+            "hitCount": 0,
+            "checksum": checksum
+        }
+
+        _evict(index, keep = cachePath.name)
+
+
+def _applyAccesses(index: Dict[str, Dict[str, Any]]) -> None:
+    with _accessLock:
+        accesses = dict(_pendingAccesses)
+        _pendingAccesses.clear()
+
+    for hashedKey, access in accesses.items():
+        entry = index.get(hashedKey)
+        if entry is None:
+            cachePath = folder_manager.cache / hashedKey
+
+            # Entry was removed since it was accessed
+            if not cachePath.exists():
+                continue
+
+            entry = {
+                "key": access["key"],
+                "size": cachePath.stat().st_size,
+                "lastAccess": 0,
+                "hitCount": 0
+            }
+
+            index[hashedKey] = entry
+
+        entry["lastAccess"] = max(entry["lastAccess"], access["lastAccess"])
+        entry["hitCount"] += access["hitCount"]
+
+
+def _flushAccesses() -> None:
+    global _lastAccessFlush
+
+    with _accessLock:
+        if len(_pendingAccesses) == 0:
+            return
+
+        _lastAccessFlush = time.monotonic()
+
+    # Pending accesses are applied to the index by _updateIndex
+    with _updateIndex():
+        pass
+
+
+def _recordAccess(key: str) -> None:
+    hashedKey = _hashCacheKey(key)
+
+    with _accessLock:
+        access = _pendingAccesses.setdefault(hashedKey, {
+            "key": key,
+            "hitCount": 0
+        })
+
+        access["lastAccess"] = time.time()
+        access["hitCount"] += 1
+
+        shouldFlush = time.monotonic() - _lastAccessFlush >= ACCESS_FLUSH_INTERVAL
+
+    if shouldFlush:
+        _flushAccesses()
 
-            with destination.open("wb") as destinationFile:
-                for chunk in r.iter_content(chunk_size = 8192):
-                    destinationFile.write(chunk)
-    except:
-        if retryCount >= MAX_RETRY_COUNT:
-            raise
 
-        destination.unlink(missing_ok = True)
-        return _download(source, destination, retryCount + 1)
+def _isEntryValid(key: str, checksum: str) -> bool:
+    # Checksum is stored in the index when the entry is created, so most
+    # of the time the entry is validated without reading the file
+    cachePath = _cachePath(key)
 
-    return destination
+    entry = _loadIndex().get(cachePath.name)
+    if entry is None or not cachePath.exists():
+        return False
+
+    entryChecksum = entry.get("checksum")
+    if entryChecksum is None:
+        # File is hashed without holding the index lock so other processes
+        # are not blocked, checksum is stored only if the file did not change
+        stat = cachePath.stat()
+        entryChecksum = _fileChecksum(cachePath)
+
+        with _updateIndex() as index:
+            entry = index.get(cachePath.name)
+            if entry is not None and cachePath.exists() and _isSameFile(cachePath.stat(), stat):
+                entry["checksum"] = entryChecksum
+
+    if entryChecksum != checksum.lower():
+        return False
+
+    _recordAccess(key)
+    return True
+
+
+def _downloadFile(source: str, destination: Path) -> str:
+    # Downloads the file and returns its SHA-256 checksum
+    sha256 = hashlib.sha256()
+
+    with _session.get(source, stream = True, timeout = DOWNLOAD_TIMEOUT) as response:
+        response.raise_for_status()
+
+        with destination.open("wb") as destinationFile:
+            for chunk in response.iter_content(chunk_size = DOWNLOAD_CHUNK_SIZE):
+                destinationFile.write(chunk)
+                sha256.update(chunk)
+
+    return sha256.hexdigest()
+
+
+def _download(source: str, destination: Path, checksum: Optional[str] = None) -> str:
+    # Import is here to avoid loading networking module while coretex is initialized
+    from .networking import networkManager
+
+    retryPolicy = networkManager.retryPolicy
+    retryCount = 0
+    delay = 0.0
+
+    while True:
+        try:
+            actualChecksum = _downloadFile(source, destination)
+        except requests.exceptions.RequestException as ex:
+            destination.unlink(missing_ok = True)
+
+            if retryCount >= MAX_RETRY_COUNT:
+                raise
+
+            logging.getLogger("coretexpylib").debug(f">> [Coretex] Failed to download \"{source}\". Reason: \"{ex}\"", exc_info = ex)
+
+            delay = retryPolicy.getDelay(delay, None)
+            retryPolicy.sleep(delay, source)
+
+            retryCount += 1
+            continue
+
+        # Checksum mismatch is not retried since the same file would be downloaded again
+        if checksum is not None and actualChecksum != checksum.lower():
+            destination.unlink(missing_ok = True)
+            raise ChecksumMismatchError(source, checksum, actualChecksum)
+
+        return actualChecksum
+
+
+def getSizeLimit() -> Optional[int]:
+    """
+        Retrieves the maximum size of the cache in bytes. Limit is set either with
+        setSizeLimit or with "CTX_CACHE_SIZE_LIMIT" environment variable.
+
+        Returns
+        -------
+        Optional[int] -> size limit in bytes, None if the cache size is not limited
+    """
+
+    if _sizeLimit is not None:
+        return _sizeLimit
+
+    value = os.environ.get(SIZE_LIMIT_ENV_KEY)
+    if value is None or value == "":
+        return None
+
+    try:
+        return int(value)
+    except ValueError:
+        raise CacheException(f">> [Coretex] Invalid value for \"{SIZE_LIMIT_ENV_KEY}\": \"{value}\"")
+
+
+def setSizeLimit(limit: Optional[int]) -> None:
+    """
+        Sets the maximum size of the cache in bytes. If storing an item
+        exceeds the limit least recently used items are evicted.
+
+        Parameters
+        ----------
+        limit : Optional[int]
+            size limit in bytes, if None "CTX_CACHE_SIZE_LIMIT" environment
+            variable is used, or the size is not limited if it is not set
+
+        Example
+        -------
+        >>> from coretex import cache
+        \b
+        >>> cache.setSizeLimit(10 * 1024 * 1024 * 1024)  # 10 GiB
+    """
+
+    global _sizeLimit
+
+    if limit is not None and limit < 0:
+        raise ValueError(">> [Coretex] Cache size limit must be a positive number")
+
+    _sizeLimit = limit
+
+    with _updateIndex() as index:
+        _evict(index)
+
+
+def getSize() -> int:
+    """
+        Returns
+        -------
+        int -> total size of all cached items in bytes
+    """
+
+    return sum(entry["size"] for entry in _loadIndex().values())
 
 
 def getPath(key: str) -> Path:
@@ -94,7 +467,8 @@ def getPath(key: str) -> Path:
     if not exists(key):
         raise CacheException(">> [Coretex] Cache with given key doesn't exist.")
 
-    return folder_manager.cache / _hashCacheKey(key)
+    _recordAccess(key)
+    return _cachePath(key)
 
 
 def exists(key: str) -> bool:
@@ -119,7 +493,7 @@ def exists(key: str) -> bool:
         True
     """
 
-    return folder_manager.cache.joinpath(_hashCacheKey(key)).exists()
+    return _cachePath(key).exists()
 
 
 def remove(key: str) -> None:
@@ -144,7 +518,12 @@ def remove(key: str) -> None:
     if not exists(key):
         raise CacheException(">> [Coretex] Cache with given key doesn't exist.")
 
-    getPath(key).unlink()
+    cachePath = _cachePath(key)
+
+    with _updateIndex() as index:
+        cachePath.unlink(missing_ok = True)
+        _removeLock(cachePath.name)
+        index.pop(cachePath.name, None)
 
 
 def clear() -> None:
@@ -158,7 +537,23 @@ def clear() -> None:
         >>> cache.clear()
     """
 
-    shutil.rmtree(folder_manager.cache)
+    with _accessLock:
+        _pendingAccesses.clear()
+
+    with FileLock(folder_manager.cache / INDEX_LOCK_FILE_NAME):
+        for path in folder_manager.cache.iterdir():
+            if path.name == INDEX_LOCK_FILE_NAME:
+                continue
+
+            # Lock files held by other processes are removed by their holders
+            if path.suffix == ".lock":
+                _removeLock(path.name[1:-len(path.suffix)])
+                continue
+
+            if path.is_dir():
+                shutil.rmtree(path)
+            else:
+                path.unlink()
 
 
 def storeObject(key: str, object: Any, override: bool = False) -> None:
@@ -189,12 +584,11 @@ def storeObject(key: str, object: Any, override: bool = False) -> None:
     if not override and exists(key):
         raise CacheException(">> [Coretex] Cache with given key already exists. Set \"override\" to \"True\" if you want to override existing cache.")
 
-    if override and exists(key):
-        getPath(key).unlink()
+    with _tempPath(key) as tmpPath:
+        with tmpPath.open("wb") as cacheFile:
+            pickle.dump(object, cacheFile)
 
-    cachePath = folder_manager.cache / _hashCacheKey(key)
-    with cachePath.open("wb") as cacheFile:
-        pickle.dump(object, cacheFile)
+        _commit(key, tmpPath, override)
 
 
 def storeFile(key: str, source: Union[Path, str], override: bool = False) -> None:
@@ -228,51 +622,77 @@ def storeFile(key: str, source: Union[Path, str], override: bool = False) -> Non
     if not override and exists(key):
         raise CacheException(">> [Coretex] Cache with given key already exists. Set \"override\" to \"True\" if you want to override existing cache.")
 
-    if override and exists(key):
-        getPath(key).unlink()
-
-    cachePath = folder_manager.cache / _hashCacheKey(key)
-
-    # Hardlink the file to the cache directory
-    os.link(source, cachePath)
+    with _tempPath(key) as tmpPath:
+        # Hardlink the file to the cache directory
+        os.link(source, tmpPath)
+        _commit(key, tmpPath, override)
 
 
-def storeUrl(key: str, url: str, override: bool = False) -> None:
+def storeUrl(key: str, url: str, override: bool = False, checksum: Optional[str] = None) -> None:
     """
         Downloads and caches file from the specified URL
 
+        If multiple threads or processes store the same key at the same
+        time, the file is downloaded only once while the others wait
+        for the download to finish and then use the downloaded file.
+
         Parameters
         ----------
+        key : str
+            key to which the cached file will be linked
         url : str
             URL of the file which is downloaded
-        fileName : str
-            Name of the downloaded file with extension - used as a key for cache
-
-        Returns
-        -------
-        Tuple[Path, str] -> Path of the cached file and the name of the cached file
+        override : bool
+            should the cache be overriden if it exists or not
+        checksum : Optional[str]
+            expected SHA-256 checksum of the file (hex encoded), if
+            provided downloaded file is validated against it and
+            download is skipped if the cached file matches it
 
         Raises
         ------
         CacheException -> if something went wrong
+        ChecksumMismatchError -> if the downloaded file does not match the checksum
 
         Example
         -------
         >>> from coretex import cache
         \b
         >>> url = "https://dummy_url.com/download"
-        >>> fileName = "dummyFile.ext"
-        >>> cache.storeUrl(url, fileName)
+        >>> cache.storeUrl("dummyFile", url)
     """
 
+    if checksum is not None and exists(key) and _isEntryValid(key, checksum):
+        return
+
     if not override and exists(key):
         raise CacheException(">> [Coretex] Cache with given key already exists. Set \"override\" to \"True\" if you want to override existing cache.")
 
-    if override and exists(key):
-        getPath(key).unlink()
+    lock = FileLock(_lockPath(_hashCacheKey(key)))
+
+    # If the lock is held by someone else the same key is being downloaded
+    waited = not lock.acquire(blocking = False)
+    if waited:
+        logging.getLogger("coretexpylib").debug(f">> [Coretex] Waiting for the download of \"{url}\" to finish")
+        lock.acquire()
+
+    try:
+        if exists(key):
+            if checksum is not None and _isEntryValid(key, checksum):
+                return
 
-    cachePath = folder_manager.cache / _hashCacheKey(key)
-    _download(url, cachePath)
+            # Reuse the file downloaded while this call was waiting
+            if waited and checksum is None:
+                return
+
+            if not override:
+                raise CacheException(">> [Coretex] Cache with given key already exists. Set \"override\" to \"True\" if you want to override existing cache.")
+
+        with _tempPath(key) as tmpPath:
+            actualChecksum = _download(url, tmpPath, checksum)
+            _commit(key, tmpPath, override, actualChecksum)
+    finally:
+        lock.release(remove = True)
 
 
 def loadObject(key: str) -> Any:
@@ -306,3 +726,6 @@ def loadObject(key: str) -> Any:
 
     with getPath(key).open("rb") as pickleFile:
         return pickle.load(pickleFile)
+
+
+atexit.register(_flushAccesses)
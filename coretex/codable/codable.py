@@ -15,7 +15,7 @@
 #     You should have received a copy of the GNU Affero General Public License
 #     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from typing import Any, Optional, Type, Dict, Tuple
+from typing import Any, Optional, Type, Dict, Tuple, Callable
 from typing_extensions import Self
 from datetime import datetime
 from enum import Enum
@@ -27,6 +27,134 @@ from .descriptor import KeyDescriptor
 from ..utils.date import DATE_FORMAT, decodeDate
 
 
+ValueCoder = Callable[[Any], Any]
+
+# (name of the field, function which converts the value - None if value is not converted)
+# Name of the field is None if the field is skipped
+FieldCoder = Tuple[Optional[str], Optional[ValueCoder]]
+
+
+def _encodeDate(value: datetime) -> str:
+    return value.strftime(DATE_FORMAT)
+
+
+def _elementEncoder(pythonType: Type) -> Optional[ValueCoder]:
+    if issubclass(pythonType, Enum):
+        return lambda element: element.value
+
+    if issubclass(pythonType, UUID):
+        return str
+
+    if issubclass(pythonType, Codable):
+        return pythonType.encode
+
+    if issubclass(pythonType, datetime):
+        return _encodeDate
+
+    return None
+
+
+def _elementDecoder(pythonType: Type) -> Optional[ValueCoder]:
+    if issubclass(pythonType, (Enum, UUID)):
+        return pythonType
+
+    if issubclass(pythonType, Codable):
+        return pythonType.decode
+
+    if issubclass(pythonType, datetime):
+        return decodeDate
+
+    return None
+
+
+def _valueEncoder(descriptor: Optional[KeyDescriptor]) -> Optional[ValueCoder]:
+    if descriptor is None or descriptor.pythonType is None:
+        return None
+
+    elementEncoder = _elementEncoder(descriptor.pythonType)
+    if elementEncoder is None or not descriptor.isList():
+        return elementEncoder
+
+    return lambda value: [elementEncoder(element) for element in value]
+
+
+def _valueDecoder(descriptor: Optional[KeyDescriptor]) -> Optional[ValueCoder]:
+    if descriptor is None or descriptor.pythonType is None:
+        return None
+
+    elementDecoder = _elementDecoder(descriptor.pythonType)
+    collectionType = descriptor.collectionType
+
+    if elementDecoder is None or collectionType is None or not descriptor.isList():
+        return elementDecoder
+
+    return lambda value: collectionType([elementDecoder(element) for element in value])
+
+
+class _Codec:
+
+    """
+        Lookup tables and value converters of a single Codable class.
+        Built once per class, so key descriptors are not rebuilt and
+        scanned for every field of every encoded/decoded object.
+    """
+
+    def __init__(self, cls: Type["Codable"]) -> None:
+        self.descriptors = cls._keyDescriptors()
+
+        # If multiple fields have the same json name the first one is used
+        self.descriptorsByJsonName: Dict[str, Tuple[str, KeyDescriptor]] = {}
+        for key, descriptor in self.descriptors.items():
+            if descriptor.jsonName is not None:
+                self.descriptorsByJsonName.setdefault(descriptor.jsonName, (key, descriptor))
+
+        # Hooks are called for every field only if a subclass customized them
+        self.hasCustomEncodeValue = getattr(cls._encodeValue, "__func__", cls._encodeValue) is not Codable._encodeValue
+        self.hasCustomDecodeValue = getattr(cls._decodeValue, "__func__", None) is not Codable._decodeValue.__func__  # type: ignore[attr-defined]
+
+        # Filled lazily since fields which are not described
+        # by descriptors are only known once they are encountered
+        self.__encoders: Dict[str, FieldCoder] = {}
+        self.__decoders: Dict[str, FieldCoder] = {}
+
+    def encoder(self, key: str) -> FieldCoder:
+        encoder = self.__encoders.get(key)
+        if encoder is not None:
+            return encoder
+
+        descriptor = self.descriptors.get(key)
+
+        if descriptor is not None and not descriptor.isEncodable:
+            encoder = (None, None)
+        elif descriptor is None or descriptor.jsonName is None:
+            encoder = (inflection.underscore(key), _valueEncoder(descriptor))
+        else:
+            encoder = (descriptor.jsonName, _valueEncoder(descriptor))
+
+        self.__encoders[key] = encoder
+        return encoder
+
+    def decoder(self, key: str) -> FieldCoder:
+        decoder = self.__decoders.get(key)
+        if decoder is not None:
+            return decoder
+
+        descriptorKey, descriptor = self.descriptorsByJsonName.get(key, (None, None))
+
+        if descriptor is not None and not descriptor.isDecodable:
+            decoder = (None, None)
+        elif descriptorKey is None:
+            decoder = (inflection.camelize(key, False), None)
+        else:
+            decoder = (descriptorKey, _valueDecoder(descriptor))
+
+        self.__decoders[key] = decoder
+        return decoder
+
+
+_codecs: Dict[type, _Codec] = {}
+
+
 class Codable:
 
     """
@@ -48,30 +176,18 @@ class Codable:
         return {}
 
     @classmethod
-    def __keyDescriptorByJsonName(cls, jsonName: str) -> Tuple[Optional[str], Optional[KeyDescriptor]]:
-        for key, value in cls._keyDescriptors().items():
-            if value.jsonName == jsonName:
-                return key, value
-
-        return None, None
-
-    @classmethod
-    def __keyDescriptorByPythonName(cls, pythonName: str) -> Optional[KeyDescriptor]:
-        if not pythonName in cls._keyDescriptors().keys():
-            return None
+    def _codec(cls) -> _Codec:
+        # Looked up in the dictionary instead of stored as a class
+        # attribute so subclasses do not inherit codec of the parent
+        codec = _codecs.get(cls)
+        if codec is None:
+            codec = _Codec(cls)
+            _codecs[cls] = codec
 
-        return cls._keyDescriptors()[pythonName]
+        return codec
 
     # - Encoding
 
-    def __encodeKey(self, key: str) -> str:
-        descriptor = self.__class__.__keyDescriptorByPythonName(key)
-
-        if descriptor is None or descriptor.jsonName is None:
-            return inflection.underscore(key)
-
-        return descriptor.jsonName
-
     def _encodeValue(self, key: str, value: Any) -> Any:
         """
             Encodes python value into a json property
@@ -89,36 +205,12 @@ class Codable:
             Any -> encoded value of the object
         """
 
-        descriptor = self.__class__.__keyDescriptorByPythonName(key)
+        _, encoder = self.__class__._codec().encoder(key)
 
-        if descriptor is None or descriptor.pythonType is None:
+        if encoder is None:
             return value
 
-        if issubclass(descriptor.pythonType, Enum):
-            if descriptor.isList():
-                return [element.value for element in value]
-
-            return value.value
-
-        if issubclass(descriptor.pythonType, UUID):
-            if descriptor.isList():
-                return [str(element) for element in value]
-
-            return str(value)
-
-        if issubclass(descriptor.pythonType, Codable):
-            if descriptor.isList():
-                return [descriptor.pythonType.encode(element) for element in value]
-
-            return descriptor.pythonType.encode(value)
-
-        if issubclass(descriptor.pythonType, datetime):
-            if descriptor.isList():
-                return [element.strftime(DATE_FORMAT) for element in value]
-
-            return value.strftime(DATE_FORMAT)
-
-        return value
+        return encoder(value)
 
     def encode(self) -> Dict[str, Any]:
         """
@@ -130,34 +222,27 @@ class Codable:
             Dict[str, Any] -> encoded object which can be serialized into json string
         """
 
+        codec = self.__class__._codec()
         encodedObject: Dict[str, Any] = {}
 
         for key, value in self.__dict__.items():
-            descriptor = self.__class__.__keyDescriptorByPythonName(key)
+            encodedKey, encoder = codec.encoder(key)
 
             # skip ignored fields for encoding
-            if descriptor is not None and not descriptor.isEncodable:
-                # print(f">> [Coretex] Skipping encoding for field: {key}")
+            if encodedKey is None:
                 continue
 
-            encodedKey = self.__encodeKey(key)
-            encodedValue = self._encodeValue(key, value)
-
-            encodedObject[encodedKey] = encodedValue
+            if codec.hasCustomEncodeValue:
+                encodedObject[encodedKey] = self._encodeValue(key, value)
+            elif encoder is None:
+                encodedObject[encodedKey] = value
+            else:
+                encodedObject[encodedKey] = encoder(value)
 
         return encodedObject
 
     # - Decoding
 
-    @classmethod
-    def __decodeKey(cls, key: str) -> str:
-        descriptorKey, _ = cls.__keyDescriptorByJsonName(key)
-
-        if descriptorKey is None:
-            return inflection.camelize(key, False)
-
-        return descriptorKey
-
     @classmethod
     def _decodeValue(cls, key: str, value: Any) -> Any:
         """
@@ -176,36 +261,12 @@ class Codable:
             Any -> decoded value of the json field
         """
 
-        _, descriptor = cls.__keyDescriptorByJsonName(key)
+        _, decoder = cls._codec().decoder(key)
 
-        if descriptor is None or descriptor.pythonType is None:
+        if decoder is None:
             return value
 
-        if issubclass(descriptor.pythonType, Enum):
-            if descriptor.isList() and descriptor.collectionType is not None:
-                return descriptor.collectionType([descriptor.pythonType(element) for element in value])
-
-            return descriptor.pythonType(value)
-
-        if issubclass(descriptor.pythonType, UUID):
-            if descriptor.isList() and descriptor.collectionType is not None:
-                return descriptor.collectionType([descriptor.pythonType(element) for element in value])
-
-            return descriptor.pythonType(value)
-
-        if issubclass(descriptor.pythonType, Codable):
-            if descriptor.isList() and descriptor.collectionType is not None:
-                return descriptor.collectionType([descriptor.pythonType.decode(element) for element in value])
-
-            return descriptor.pythonType.decode(value)
-
-        if issubclass(descriptor.pythonType, datetime):
-            if descriptor.isList() and descriptor.collectionType is not None:
-                return descriptor.collectionType([decodeDate(element) for element in value])
-
-            return decodeDate(value)
-
-        return value
+        return decoder(value)
 
     def _updateFields(self, encodedObject: Dict[str, Any]) -> None:
         """
@@ -217,16 +278,22 @@ class Codable:
                 json encoded object
         """
 
+        codec = self.__class__._codec()
+        fields = self.__dict__
+
         for key, value in encodedObject.items():
-            _, descriptor = self.__class__.__keyDescriptorByJsonName(key)
+            decodedKey, decoder = codec.decoder(key)
 
             # skip ignored fields for deserialization
-            if descriptor is not None and not descriptor.isDecodable:
-                # print(f">> [Coretex] Skipping decoding for field: {key}")
+            if decodedKey is None:
                 continue
 
-            decodedKey = self.__decodeKey(key)
-            self.__dict__[decodedKey] = self._decodeValue(key, value)
+            if codec.hasCustomDecodeValue:
+                fields[decodedKey] = self._decodeValue(key, value)
+            elif decoder is None:
+                fields[decodedKey] = value
+            else:
+                fields[decodedKey] = decoder(value)
 
     def onDecode(self) -> None:
         """
@@ -17,6 +17,9 @@
 
 DEFAULT_CHUNK_SIZE = 64 * 1024 ** 2  # 64 MB
 
+DECRYPTION_BUFFER_SIZE            = 8 * 1024 ** 2   # 8 MB
+PARALLEL_DECRYPTION_MIN_PART_SIZE = 64 * 1024 ** 2  # Files are split into parts of at least 64 MB
+
 AES_KEY_SIZE   = 32  # bytes
 IV_SIZE        = 16  # bytes
 AES_BLOCK_SIZE = 16  # bytes
@@ -15,13 +15,17 @@
 #     You should have received a copy of the GNU Affero General Public License
 #     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from typing import Generator
+from typing import Generator, Optional, List, Tuple
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import os
 
 from cryptography.hazmat.primitives import padding
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 
-from .constants import DEFAULT_CHUNK_SIZE, AES_KEY_SIZE, IV_SIZE, AES_BLOCK_SIZE
+from .constants import DEFAULT_CHUNK_SIZE, AES_KEY_SIZE, IV_SIZE, AES_BLOCK_SIZE, \
+    DECRYPTION_BUFFER_SIZE, PARALLEL_DECRYPTION_MIN_PART_SIZE
 from .utils import DataBuffer
 
 
@@ -62,7 +66,9 @@ class StreamDecryptor:
 
         self._buffer.append(data)
 
-        while self._buffer.remaining >= self.chunkSize:
+        # At least one block is always kept in the buffer so the
+        # padding can be removed from it when "flush" is called
+        while self._buffer.remaining > self.chunkSize:
             chunk = self._buffer.getBytes(self.chunkSize)
             yield self._decryptor.update(chunk)
 
@@ -91,10 +97,92 @@ class StreamDecryptor:
             return chunk
 
 
-def decryptFile(key: bytes, sourcePath: Path, destinationPath: Path) -> None:
+def _decryptRange(key: bytes, iv: bytes, sourcePath: Path, destinationPath: Path, start: int, end: int) -> None:
+    # Decrypts ciphertext located at [start, end) in the source file and writes it to the
+    # same position in the destination file (shifted by the size of IV). Data is passed
+    # through two preallocated buffers, so memory usage does not depend on the file size.
+
+    decryptor = Cipher(algorithms.AES256(key), modes.CBC(iv)).decryptor()
+
+    inputBuffer = bytearray(DECRYPTION_BUFFER_SIZE)
+    outputBuffer = bytearray(DECRYPTION_BUFFER_SIZE + AES_BLOCK_SIZE - 1)
+
+    with sourcePath.open("rb") as source, destinationPath.open("r+b") as destination:
+        source.seek(start)
+        destination.seek(start - IV_SIZE)
+
+        remaining = end - start
+
+        while remaining > 0:
+            view = memoryview(inputBuffer)[:min(DECRYPTION_BUFFER_SIZE, remaining)]
+
+            count = source.readinto(view)
+            if count == 0:
+                raise RuntimeError(f"Unexpected end of file \"{sourcePath}\"")
+
+            decryptedCount = decryptor.update_into(view[:count], outputBuffer)
+            destination.write(memoryview(outputBuffer)[:decryptedCount])
+
+            remaining -= count
+
+        destination.write(decryptor.finalize())
+
+
+def _splitCiphertext(source: Path, ciphertextSize: int, partCount: int) -> List[Tuple[bytes, int, int]]:
+    # CBC decryption of a block depends only on the previous ciphertext block,
+    # so every part can be decrypted independently using the last block
+    # of the previous part as its IV
+
+    blockCount = ciphertextSize // AES_BLOCK_SIZE
+    partBlockCount = -(-blockCount // partCount)  # ceil
+
+    parts: List[Tuple[bytes, int, int]] = []
+
+    with source.open("rb") as file:
+        for index in range(partCount):
+            start = IV_SIZE + index * partBlockCount * AES_BLOCK_SIZE
+            end = min(IV_SIZE + ciphertextSize, start + partBlockCount * AES_BLOCK_SIZE)
+
+            if start >= end:
+                break
+
+            # IV of the file is stored right before the first ciphertext block
+            file.seek(start - AES_BLOCK_SIZE)
+            parts.append((file.read(AES_BLOCK_SIZE), start, end))
+
+    return parts
+
+
+def _unpadFile(path: Path) -> None:
+    size = path.stat().st_size
+    if size < AES_BLOCK_SIZE:
+        return
+
+    with path.open("r+b") as file:
+        file.seek(size - AES_BLOCK_SIZE)
+        lastBlock = file.read(AES_BLOCK_SIZE)
+
+        try:
+            unpadder = padding.PKCS7(AES_BLOCK_SIZE * 8).unpadder()
+            unpadded = unpadder.update(lastBlock) + unpadder.finalize()
+        except ValueError:
+            # If unpadding failed either the key is wrong or
+            # the padding was not performed during encryption
+            # because ciphertext bytes were divisible by AES
+            # block size so there was no need for padding
+            return
+
+        file.truncate(size - AES_BLOCK_SIZE + len(unpadded))
+
+
+def decryptFile(key: bytes, sourcePath: Path, destinationPath: Path, workerCount: Optional[int] = None) -> None:
     """
         Decrypts a file using AES 256.
 
+        Memory usage is constant regardless of the file size. Large files are
+        split into parts which are decrypted in parallel, each using a separate
+        thread.
+
         Parameters
         ----------
         key : bytes
@@ -103,14 +191,52 @@ def decryptFile(key: bytes, sourcePath: Path, destinationPath: Path) -> None:
             path to the file which will be decrypted
         destinationPath : Path
             path to the decrypted file
+        workerCount : Optional[int]
+            maximum number of threads used for decrypting the file, if None
+            it is based on the number of CPU cores and the size of the file
+
+        Raises
+        ------
+        ValueError -> if the key or the file are not valid
     """
 
-    with sourcePath.open("rb") as source, destinationPath.open("wb") as destination:
-        iv = source.read(IV_SIZE)
-        decryptor = StreamDecryptor(key, iv)
+    if len(key) != AES_KEY_SIZE:
+        raise ValueError(f"AES key size: {len(key)}, but {AES_KEY_SIZE} expected")
+
+    size = sourcePath.stat().st_size
+    if size < IV_SIZE:
+        raise ValueError(f"IV size: {size}, but {IV_SIZE} expected")
+
+    ciphertextSize = size - IV_SIZE
+    if ciphertextSize % AES_BLOCK_SIZE != 0:
+        raise ValueError("The length of the provided data is not a multiple of the block length.")
+
+    if workerCount is None:
+        workerCount = os.cpu_count() or 1
+
+    partCount = max(1, min(workerCount, ciphertextSize // PARALLEL_DECRYPTION_MIN_PART_SIZE))
+
+    # Destination is preallocated so parts can be written to it independently
+    with destinationPath.open("wb") as destination:
+        destination.truncate(ciphertextSize)
+
+    if ciphertextSize == 0:
+        return
+
+    parts = _splitCiphertext(sourcePath, ciphertextSize, partCount)
+
+    if len(parts) == 1:
+        iv, start, end = parts[0]
+        _decryptRange(key, iv, sourcePath, destinationPath, start, end)
+    else:
+        # AES is implemented in native code which releases the GIL, so threads run in parallel
+        with ThreadPoolExecutor(max_workers = len(parts)) as executor:
+            futures = [
+                executor.submit(_decryptRange, key, iv, sourcePath, destinationPath, start, end)
+                for iv, start, end in parts
+            ]
 
-        while (chunk := source.read(DEFAULT_CHUNK_SIZE)):
-            for decryptedData in decryptor.feed(chunk):
-                destination.write(decryptedData)
+            for future in futures:
+                future.result()
 
-        destination.write(decryptor.flush())
+    _unpadFile(destinationPath)
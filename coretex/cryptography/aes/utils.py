@@ -25,6 +25,13 @@ class DataBuffer:
     def remaining(self) -> int:
         return len(self.data) - self.position
 
+    def __compact(self) -> None:
+        # Drop bytes which were already read once they take up at least half of the buffer,
+        # so the size of the buffer does not grow with the amount of data passed through it
+        if self.position > 0 and self.position * 2 >= len(self.data):
+            del self.data[:self.position]
+            self.position = 0
+
     def append(self, data: bytes) -> None:
         """
             Appends new data to the end of the buffer
@@ -57,6 +64,7 @@ class DataBuffer:
         value = self.data[self.position]
         self.position += 1
 
+        self.__compact()
         return value
 
     def getBytes(self, count: int) -> bytes:
@@ -81,9 +89,10 @@ class DataBuffer:
         if len(self.data) < (self.position + count):
             raise OverflowError("Tried to extract more than than what the buffer has")
 
-        values = self.data[self.position:self.position + count]
+        values = bytes(self.data[self.position:self.position + count])
         self.position += count
 
+        self.__compact()
         return values
 
     def getRemaining(self) -> bytes:
@@ -18,3 +18,4 @@
 from .bbox import BBox
 from .classes_format import ImageDatasetClass, ImageDatasetClasses
 from .coretex_format import CoretexImageAnnotation, CoretexSegmentationInstance
+from .segmentation_mask import extractSegmentationMasks
@@ -222,6 +222,38 @@ class ImageDatasetClasses(List[ImageDatasetClass]):
         except ValueError:
             return None
 
+    def labelIdTable(self) -> Dict[UUID, int]:
+        """
+            Maps every class ID to its label ID, used to avoid searching
+            through the classes when label IDs are retrieved for a lot
+            of class IDs (e.g. while generating segmentation masks)
+
+            Returns
+            -------
+            Dict[UUID, int] -> label ID for each of the class IDs, equal to
+            the value returned by "labelIdForClassId"
+
+            Example
+            -------
+            >>> from coretex import ImageDataset
+            \b
+            >>> dataset = ImageDataset.fetchById(1023)
+            >>> labelIds = dataset.classes.labelIdTable()
+            >>> print(labelIds.get(UUID("d710019b-f28f-40ab-aa65-e13df949beff")))
+            1
+        """
+
+        labels = self.labels
+        table: Dict[UUID, int] = {}
+
+        for element in self:
+            for classId in element.classIds:
+                # "classById" returns the first class which contains the ID
+                if classId not in table:
+                    table[classId] = labels.index(element.label)
+
+        return table
+
     def labelIdForClass(self, clazz: ImageDatasetClass) -> Optional[int]:
         """
             Retrieves a label ID based on provided ImageDatasetClass object
@@ -309,7 +309,12 @@ class CoretexImageAnnotation(Codable):
 
         return obj
 
-    def extractSegmentationMask(self, classes: ImageDatasetClasses) -> np.ndarray:
+    def extractSegmentationMask(
+        self,
+        classes: ImageDatasetClasses,
+        labelIds: Optional[Dict[UUID, int]] = None
+    ) -> np.ndarray:
+
         """
             Generates segmentation mask of provided ImageDatasetClasses object
 
@@ -317,16 +322,30 @@ class CoretexImageAnnotation(Codable):
             ----------
             classes : ImageDatasetClasses
                 list of dataset classes
+            labelIds : Optional[Dict[UUID, int]]
+                table returned by "classes.labelIdTable()", if None it is built
+                from the classes - pass it when generating masks for a lot of
+                annotations so the table is built only once
 
             Returns
             -------
             np.ndarray -> segmentation mask represented as np.ndarray
         """
 
+        if labelIds is None:
+            labelIds = classes.labelIdTable()
+
+        return self._rasterizeSegmentationMask(labelIds)
+
+    def _rasterizeSegmentationMask(self, labelIds: Dict[UUID, int]) -> np.ndarray:
+        # All polygons are drawn into the same image using a single
+        # drawing context, coordinates are passed as a flat sequence
+        # which PIL accepts without converting them to points first
         image = Image.new("L", (self.width, self.height))
+        draw = ImageDraw.Draw(image)
 
         for instance in self.instances:
-            labelId = classes.labelIdForClassId(instance.classId)
+            labelId = labelIds.get(instance.classId)
             if labelId is None:
                 continue
 
@@ -334,7 +353,6 @@ class CoretexImageAnnotation(Codable):
                 if len(segmentation) < 4:
                     raise ValueError(f">> [Coretex] Segmentation has too few values ({len(segmentation)}. Minimum: 4)")
 
-                draw = ImageDraw.Draw(image)
-                draw.polygon(toPoly(segmentation), fill = labelId + 1)
+                draw.polygon(segmentation if len(segmentation) % 2 == 0 else segmentation[:-1], fill = labelId + 1)
 
         return np.asarray(image)
@@ -0,0 +1,96 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Dict, List, Iterable, Optional
+from uuid import UUID
+from concurrent.futures import ProcessPoolExecutor
+
+import os
+
+import numpy as np
+
+from .classes_format import ImageDatasetClasses
+from .coretex_format import CoretexImageAnnotation
+
+
+# Annotations are sent to worker processes in chunks to reduce the
+# overhead of inter-process communication for small masks
+PROCESS_CHUNK_SIZE = 32
+
+_workerLabelIds: Dict[UUID, int] = {}
+
+
+def _initializeWorker(labelIds: Dict[UUID, int]) -> None:
+    # Label table is sent to each worker process only once
+    global _workerLabelIds
+    _workerLabelIds = labelIds
+
+
+def _rasterizeInWorker(annotation: CoretexImageAnnotation) -> np.ndarray:
+    return annotation._rasterizeSegmentationMask(_workerLabelIds)
+
+
+def extractSegmentationMasks(
+    annotations: Iterable[CoretexImageAnnotation],
+    classes: ImageDatasetClasses,
+    processCount: Optional[int] = 1
+) -> List[np.ndarray]:
+
+    """
+        Generates segmentation masks for multiple annotations. Masks are
+        equal to the ones generated by "CoretexImageAnnotation.extractSegmentationMask",
+        but the mapping of class IDs to label IDs is built only once for all
+        of the annotations.
+
+        Parameters
+        ----------
+        annotations : Iterable[CoretexImageAnnotation]
+            annotations for which the masks are generated
+        classes : ImageDatasetClasses
+            list of dataset classes
+        processCount : Optional[int]
+            number of processes used for generating the masks, if None number
+            of CPU cores is used, if 1 masks are generated in the current process
+
+        Returns
+        -------
+        List[np.ndarray] -> segmentation masks in the same order as the annotations
+
+        Raises
+        ------
+        ValueError -> if a segmentation has less than 4 values
+
+        Example
+        -------
+        >>> from coretex import ImageDataset, extractSegmentationMasks
+        \b
+        >>> dataset = ImageDataset.fetchById(1023)
+        >>> dataset.download()
+        >>> annotations = [sample.load().annotation for sample in dataset.samples]
+        >>> masks = extractSegmentationMasks(annotations, dataset.classes, processCount = None)
+    """
+
+    labelIds = classes.labelIdTable()
+
+    if processCount is None:
+        processCount = os.cpu_count() or 1
+
+    if processCount <= 1:
+        return [annotation._rasterizeSegmentationMask(labelIds) for annotation in annotations]
+
+    with ProcessPoolExecutor(processCount, initializer = _initializeWorker, initargs = (labelIds, )) as executor:
+        return list(executor.map(_rasterizeInWorker, annotations, chunksize = PROCESS_CHUNK_SIZE))
@@ -21,4 +21,5 @@ from .dataset import Dataset
 from .utils import createDataset
 from .local_dataset import LocalDataset
 from .network_dataset import NetworkDataset, DatasetState
+from .dataset_downloader import DatasetDownloader, DownloadProgress, DatasetDownloadError
 from .sequence_dataset import SequenceDataset, LocalSequenceDataset
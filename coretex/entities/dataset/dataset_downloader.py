@@ -0,0 +1,479 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Generic, TypeVar, List, Dict, Tuple, Optional, Callable
+from threading import Thread, Condition, Lock
+from queue import PriorityQueue
+
+import os
+import sys
+import time
+import logging
+
+from ..sample import NetworkSample
+from ...utils import formatBytes
+
+
+SampleType = TypeVar("SampleType", bound = "NetworkSample")
+
+DEFAULT_NETWORK_WORKER_COUNT = 16
+DEFAULT_RETRY_COUNT          = 2
+PROGRESS_LOG_INTERVAL        = 5  # seconds
+
+
+class DownloadProgress:
+
+    """
+        Snapshot of the dataset download progress
+
+        Properties
+        ----------
+        totalCount : int
+            number of samples which are being downloaded
+        completedCount : int
+            number of successfully downloaded samples
+        failedCount : int
+            number of samples which failed to download
+        downloadedBytes : int
+            number of downloaded bytes
+        elapsed : float
+            time in seconds since the download started
+    """
+
+    def __init__(self, totalCount: int, completedCount: int, failedCount: int, downloadedBytes: int, elapsed: float) -> None:
+        self.totalCount = totalCount
+        self.completedCount = completedCount
+        self.failedCount = failedCount
+        self.downloadedBytes = downloadedBytes
+        self.elapsed = elapsed
+
+    @property
+    def finishedCount(self) -> int:
+        return self.completedCount + self.failedCount
+
+    @property
+    def bytesPerSecond(self) -> float:
+        if self.elapsed <= 0:
+            return 0
+
+        return self.downloadedBytes / self.elapsed
+
+    @property
+    def samplesPerSecond(self) -> float:
+        if self.elapsed <= 0:
+            return 0
+
+        return self.finishedCount / self.elapsed
+
+    @property
+    def eta(self) -> Optional[float]:
+        """
+            Returns
+            -------
+            Optional[float] -> estimated number of seconds until the download
+            is finished, None if no samples were downloaded yet
+        """
+
+        if self.finishedCount == 0:
+            return None
+
+        return (self.totalCount - self.finishedCount) / self.samplesPerSecond
+
+    def __str__(self) -> str:
+        eta = "unknown" if self.eta is None else f"{self.eta:.0f}s"
+
+        return (
+            f"{self.finishedCount}/{self.totalCount} samples ({self.failedCount} failed), "
+            f"{formatBytes(int(self.bytesPerSecond))}/s, {self.samplesPerSecond:.1f} samples/s, ETA {eta}"
+        )
+
+
+class DatasetDownloadError(Exception):
+
+    """
+        Exception raised if some of the dataset samples failed to
+        download after all retries were used
+
+        Properties
+        ----------
+        failures : Dict[int, BaseException]
+            errors which caused the failure, mapped by sample id
+    """
+
+    def __init__(self, failures: Dict[int, BaseException]) -> None:
+        super().__init__(f">> [Coretex] Failed to download {len(failures)} sample(s): {sorted(failures)}")
+
+        self.failures = failures
+
+
+class _Task(Generic[SampleType]):
+
+    def __init__(self, sample: SampleType, index: int, priority: int, ignoreCache: bool) -> None:
+        self.sample = sample
+        self.index = index
+        self.priority = priority
+        self.ignoreCache = ignoreCache
+        self.attempt = 0
+
+
+_QueueItem = Tuple[int, int, Optional[_Task]]
+
+
+class _Stage(Generic[SampleType]):
+
+    # Pool of workers processing tasks from a shared priority queue. Tasks
+    # with lower priority value are processed first, tasks with the same
+    # priority are processed in the order of samples in the dataset.
+
+    def __init__(
+        self,
+        name: str,
+        workerCount: int,
+        process: Callable[[_Task[SampleType]], None],
+        onError: Callable[[_Task[SampleType], BaseException], None]
+    ) -> None:
+
+        if workerCount < 1:
+            raise ValueError(f">> [Coretex] Worker count of \"{name}\" stage must be greater than 0")
+
+        self.name = name
+        self.workerCount = workerCount
+
+        self._process = process
+        self._onError = onError
+        self._queue: "PriorityQueue[_QueueItem]" = PriorityQueue()
+        self._threads: List[Thread] = []
+
+    def start(self) -> None:
+        for index in range(self.workerCount):
+            thread = Thread(target = self._work, name = f"coretex-dataset-{self.name}-{index}", daemon = True)
+            thread.start()
+
+            self._threads.append(thread)
+
+    def put(self, task: _Task[SampleType]) -> None:
+        self._queue.put((task.priority, task.index, task))
+
+    def stop(self) -> None:
+        # Workers stop after all of the queued tasks are processed
+        for _ in self._threads:
+            self._queue.put((sys.maxsize, sys.maxsize, None))
+
+        for thread in self._threads:
+            thread.join()
+
+        self._threads.clear()
+
+    def _work(self) -> None:
+        while True:
+            _, _, task = self._queue.get()
+            if task is None:
+                return
+
+            try:
+                self._process(task)
+            except BaseException as ex:
+                self._onError(task, ex)
+
+
+class DatasetDownloader(Generic[SampleType]):
+
+    """
+        Downloads samples of a dataset using a separate pool of workers
+        for each of the download stages: network transfer, decryption
+        and unzipping. Each sample goes to the next stage as soon as it
+        leaves the previous one, so the stages run concurrently.
+
+        Failed samples are retried, and errors of samples which failed
+        after all retries are collected and raised once all other samples
+        are downloaded.
+
+        Parameters
+        ----------
+        samples : List[SampleType]
+            samples which will be downloaded
+        decrypt : bool
+            if True encrypted samples will be decrypted after download
+        ignoreCache : bool
+            if True samples are downloaded even if they are already cached
+        unzip : bool
+            if True samples will be unzipped after download
+        networkWorkerCount : int
+            number of samples which are downloaded at the same time
+        decryptWorkerCount : Optional[int]
+            number of samples which are decrypted at the same time,
+            if None number of CPU cores is used
+        unzipWorkerCount : Optional[int]
+            number of samples which are unzipped at the same time,
+            if None number of CPU cores is used
+        retryCount : int
+            number of times a failed sample is downloaded again
+        priorityCount : int
+            number of samples from the start of the list which are downloaded
+            before all other samples, once they are downloaded "waitForPriority"
+            returns so they can be used while the rest of the dataset is downloading
+        linkSample : Optional[Callable[[SampleType], None]]
+            called from the worker thread after the sample is downloaded and decrypted
+            to link it to the dataset, exceptions raised by it fail the sample so
+            it is downloaded again
+        onSampleDownloaded : Optional[Callable[[SampleType], None]]
+            called from the worker thread after the sample is downloaded and decrypted,
+            exceptions raised by it are logged and do not fail the sample
+        onProgress : Optional[Callable[[DownloadProgress], None]]
+            called from the worker thread every time a sample is finished
+
+        Example
+        -------
+        >>> from coretex import ImageDataset
+        \b
+        >>> dataset = ImageDataset.fetchById(1023)
+        >>> downloader = dataset.createDownloader(unzip = True, priorityCount = 1000)
+        >>> downloader.start()
+        >>> downloader.waitForPriority()
+        >>> for sample in dataset.samples[:1000]:
+                print(sample.load())
+        >>> downloader.wait()
+    """
+
+    def __init__(
+        self,
+        samples: List[SampleType],
+        decrypt: bool = True,
+        ignoreCache: bool = False,
+        unzip: bool = False,
+        networkWorkerCount: int = DEFAULT_NETWORK_WORKER_COUNT,
+        decryptWorkerCount: Optional[int] = None,
+        unzipWorkerCount: Optional[int] = None,
+        retryCount: int = DEFAULT_RETRY_COUNT,
+        priorityCount: int = 0,
+        linkSample: Optional[Callable[[SampleType], None]] = None,
+        onSampleDownloaded: Optional[Callable[[SampleType], None]] = None,
+        onProgress: Optional[Callable[[DownloadProgress], None]] = None
+    ) -> None:
+
+        cpuCount = os.cpu_count() or 1
+
+        self.samples = samples
+        self.decrypt = decrypt
+        self.ignoreCache = ignoreCache
+        self.unzip = unzip
+        self.retryCount = retryCount
+        self.priorityCount = min(priorityCount, len(samples))
+        self.linkSample = linkSample
+        self.onSampleDownloaded = onSampleDownloaded
+        self.onProgress = onProgress
+
+        self.failures: Dict[int, BaseException] = {}
+
+        self._networkStage = _Stage("network", networkWorkerCount, self._downloadSample, self._onError)
+        self._decryptStage = _Stage("decrypt", decryptWorkerCount or cpuCount, self._decryptSample, self._onError)
+        self._unzipStage = _Stage("unzip", unzipWorkerCount or cpuCount, self._unzipSample, self._onError)
+
+        self._lock = Lock()
+        self._finished = Condition(self._lock)
+        self._completedCount = 0
+        self._finishedPriorityCount = 0
+        self._downloadedBytes = 0
+        self._startTime: Optional[float] = None
+        self._lastLogTime = 0.0
+
+    @property
+    def isStarted(self) -> bool:
+        return self._startTime is not None
+
+    @property
+    def progress(self) -> DownloadProgress:
+        """
+            Returns
+            -------
+            DownloadProgress -> current progress of the download
+        """
+
+        with self._lock:
+            elapsed = 0.0 if self._startTime is None else time.monotonic() - self._startTime
+            return DownloadProgress(len(self.samples), self._completedCount, len(self.failures), self._downloadedBytes, elapsed)
+
+    def start(self) -> None:
+        """
+            Starts downloading the samples in the background
+        """
+
+        if self.isStarted:
+            raise RuntimeError(">> [Coretex] Download has already been started")
+
+        self._startTime = time.monotonic()
+        self._lastLogTime = self._startTime
+
+        logging.getLogger("coretexpylib").info(
+            f"\tUsing {self._networkStage.workerCount} network, {self._decryptStage.workerCount} decrypt "
+            f"and {self._unzipStage.workerCount} unzip workers"
+        )
+
+        for stage in (self._networkStage, self._decryptStage, self._unzipStage):
+            stage.start()
+
+        for index, sample in enumerate(self.samples):
+            priority = 0 if index < self.priorityCount else 1
+            self._networkStage.put(_Task(sample, index, priority, self.ignoreCache))
+
+    def waitForPriority(self, timeout: Optional[float] = None) -> bool:
+        """
+            Waits until the first "priorityCount" samples are downloaded
+
+            Parameters
+            ----------
+            timeout : Optional[float]
+                maximum number of seconds to wait, if None waits without a limit
+
+            Returns
+            -------
+            bool -> True if all priority samples were downloaded (or failed),
+            False if the timeout has expired
+        """
+
+        with self._finished:
+            return self._finished.wait_for(lambda: self._finishedPriorityCount >= self.priorityCount, timeout)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+            Waits until all samples are downloaded and stops the workers
+
+            Parameters
+            ----------
+            timeout : Optional[float]
+                maximum number of seconds to wait, if None waits without a limit
+
+            Returns
+            -------
+            bool -> True if all samples were downloaded (or failed),
+            False if the timeout has expired
+
+            Raises
+            ------
+            DatasetDownloadError -> if some of the samples failed to download
+        """
+
+        if not self.isStarted:
+            raise RuntimeError(">> [Coretex] Download has not been started")
+
+        with self._finished:
+            isFinished = self._finished.wait_for(lambda: self._completedCount + len(self.failures) >= len(self.samples), timeout)
+
+        if not isFinished:
+            return False
+
+        for stage in (self._networkStage, self._decryptStage, self._unzipStage):
+            stage.stop()
+
+        logging.getLogger("coretexpylib").info(f"\tFinished: {self.progress}")
+
+        if len(self.failures) > 0:
+            raise DatasetDownloadError(self.failures)
+
+        return True
+
+    def run(self) -> None:
+        """
+            Downloads all samples and waits for the download to finish
+
+            Raises
+            ------
+            DatasetDownloadError -> if some of the samples failed to download
+        """
+
+        self.start()
+        self.wait()
+
+    def _downloadSample(self, task: _Task[SampleType]) -> None:
+        # Cached samples are not counted since their bytes were not fetched
+        if task.sample._download(task.ignoreCache):
+            size = task.sample.downloadPath.stat().st_size
+
+            with self._lock:
+                self._downloadedBytes += size
+
+        self._decryptStage.put(task)
+
+    def _decryptSample(self, task: _Task[SampleType]) -> None:
+        task.sample._finalizeDownload(self.decrypt and task.sample.isEncrypted, task.ignoreCache)
+
+        # Sample which is not linked to the dataset is not downloaded, so
+        # failure is handled in the same way as a failed download
+        if self.linkSample is not None:
+            self.linkSample(task.sample)
+
+        if self.onSampleDownloaded is not None:
+            # Errors raised by the callback are not caused by the download,
+            # so they must not trigger downloading the sample again
+            try:
+                self.onSampleDownloaded(task.sample)
+            except Exception as ex:
+                logging.getLogger("coretexpylib").warning(f">> [Coretex] Sample downloaded callback failed for \"{task.sample.name}\": {ex}")
+
+        if self.unzip:
+            self._unzipStage.put(task)
+        else:
+            self._onFinished(task, None)
+
+    def _unzipSample(self, task: _Task[SampleType]) -> None:
+        task.sample.unzip(task.ignoreCache)
+        self._onFinished(task, None)
+
+    def _onError(self, task: _Task[SampleType], error: BaseException) -> None:
+        if task.attempt < self.retryCount and isinstance(error, Exception):
+            task.attempt += 1
+
+            # Cached files of the sample could be the cause of the failure
+            task.ignoreCache = True
+
+            logging.getLogger("coretexpylib").warning(
+                f">> [Coretex] Failed to download sample \"{task.sample.name}\" ({error}), retrying {task.attempt}/{self.retryCount}"
+            )
+
+            self._networkStage.put(task)
+            return
+
+        logging.getLogger("coretexpylib").error(f">> [Coretex] Failed to download sample \"{task.sample.name}\": {error}")
+        self._onFinished(task, error)
+
+    def _onFinished(self, task: _Task[SampleType], error: Optional[BaseException]) -> None:
+        with self._finished:
+            if error is None:
+                self._completedCount += 1
+            else:
+                self.failures[task.sample.id] = error
+
+            if task.index < self.priorityCount:
+                self._finishedPriorityCount += 1
+
+            self._finished.notify_all()
+
+        if error is None:
+            logging.getLogger("coretexpylib").debug(f"\tDownloaded \"{task.sample.name}\"")
+
+        progress = self.progress
+
+        now = time.monotonic()
+        if now - self._lastLogTime >= PROGRESS_LOG_INTERVAL:
+            self._lastLogTime = now
+            logging.getLogger("coretexpylib").info(f"\t{progress}")
+
+        if self.onProgress is not None:
+            try:
+                self.onProgress(progress)
+            except Exception as ex:
+                logging.getLogger("coretexpylib").warning(f">> [Coretex] Download progress callback failed: {ex}")
@@ -15,9 +15,12 @@
 #     You should have received a copy of the GNU Affero General Public License
 #     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from typing import TypeVar, Generic, Type, Generator, Optional, Union, Any
+from typing import TypeVar, Generic, Type, Generator, Optional, Union, Any, Dict, List
 from pathlib import Path
+from uuid import uuid4
 
+import os
+import json
 import logging
 import zipfile
 
@@ -29,11 +32,88 @@ SampleType = TypeVar("SampleType", bound = "LocalSample")
 SampleGenerator = Generator[SampleType, None, None]
 
 
-def _generateZippedSamples(path: Path, sampleClass: Type[SampleType]) -> Generator[SampleType, None, None]:
-    for samplePath in path.glob("*"):
-        if not zipfile.is_zipfile(samplePath):
-            continue
+MANIFEST_FILE_NAME = ".dataset_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def _loadManifest(path: Path) -> Dict[str, Any]:
+    try:
+        with (path / MANIFEST_FILE_NAME).open("r") as file:
+            manifest = json.load(file)
+
+        if isinstance(manifest, dict) and manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as ex:
+        logging.getLogger("coretexpylib").debug(f">> [Coretex] Invalid dataset manifest \"{path / MANIFEST_FILE_NAME}\": {ex}")
+
+    return { "version": MANIFEST_VERSION, "files": {} }
+
+
+def _saveManifest(path: Path, manifest: Dict[str, Any]) -> None:
+    manifestPath = path / MANIFEST_FILE_NAME
+    temporaryPath = manifestPath.with_name(f"{MANIFEST_FILE_NAME}.{uuid4().hex}.tmp")
+
+    try:
+        with temporaryPath.open("w") as file:
+            json.dump(manifest, file)
+
+        os.replace(temporaryPath, manifestPath)
+    except OSError as ex:
+        # Dataset can be stored in a read-only location, manifest is only an optimization
+        logging.getLogger("coretexpylib").debug(f">> [Coretex] Failed to save dataset manifest \"{manifestPath}\": {ex}")
+        temporaryPath.unlink(missing_ok = True)
+
+
+def _zippedSamplePaths(path: Path, sampleClass: Type[SampleType]) -> List[Path]:
+    # Checking if a file is a zip archive requires reading its end, so
+    # the results are stored in the dataset manifest and only files whose
+    # size or modification time changed since the last check are read again
+    if not path.is_dir():
+        return []
+
+    manifest = _loadManifest(path)
+    files: Dict[str, Dict[str, Any]] = manifest["files"]
 
+    sampleType = f"{sampleClass.__module__}.{sampleClass.__qualname__}"
+    isChanged = manifest.get("sampleType") != sampleType
+
+    manifest["sampleType"] = sampleType
+
+    updatedFiles: Dict[str, Dict[str, Any]] = {}
+    samplePaths: List[Path] = []
+
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.name == MANIFEST_FILE_NAME or entry.name.startswith(f"{MANIFEST_FILE_NAME}."):
+                continue
+
+            stat = entry.stat()
+            record = files.get(entry.name)
+
+            if record is None or record["size"] != stat.st_size or record["mtime"] != stat.st_mtime_ns:
+                isChanged = True
+                record = {
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime_ns,
+                    "isZip": zipfile.is_zipfile(entry.path)
+                }
+
+            updatedFiles[entry.name] = record
+
+            if record["isZip"]:
+                samplePaths.append(path / entry.name)
+
+    if isChanged or len(updatedFiles) != len(files):
+        manifest["files"] = updatedFiles
+        _saveManifest(path, manifest)
+
+    return samplePaths
+
+
+def _generateZippedSamples(path: Path, sampleClass: Type[SampleType]) -> Generator[SampleType, None, None]:
+    for samplePath in _zippedSamplePaths(path, sampleClass):
         yield sampleClass(samplePath)
 
 
@@ -15,27 +15,31 @@
 #     You should have received a copy of the GNU Affero General Public License
 #     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from typing import Optional, TypeVar, Generic, List, Dict, Any, Type, Union
+from typing import Optional, TypeVar, Generic, List, Dict, Any, Type, Union, Callable, Iterator, Tuple, Deque
 from typing_extensions import Self
 from datetime import datetime
 from pathlib import Path
 from abc import ABC, abstractmethod
 from contextlib import ExitStack
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
 
+import asyncio
 import hashlib
 import base64
 import logging
 
 from .dataset import Dataset
+from .dataset_downloader import DatasetDownloader, DownloadProgress, DEFAULT_NETWORK_WORKER_COUNT, DEFAULT_RETRY_COUNT
 from .state import DatasetState
 from ..tag import EntityTagType, Taggable
 from ..sample import NetworkSample
+from ..sample.sample_store import sampleStore
 from ..utils import isEntityNameValid
 from ..._folder_manager import folder_manager
 from ...codable import KeyDescriptor
 from ...networking import NetworkObject, \
     fileChunkUpload, networkManager, NetworkRequestError
-from ...threading import MultithreadedDataProcessor
 from ...cryptography import aes, getProjectKey
 from ...utils.file import isArchive, archive
 
@@ -43,6 +47,8 @@ from ...utils.file import isArchive, archive
 SampleType = TypeVar("SampleType", bound = "NetworkSample")
 NAME_VALIDATION_MESSAGE = ">> [Coretex] Entity name is invalid. Requirements: alphanumeric characters (\"a-z\", and \"0-9\") and dash (\"-\") with length between 3 to 50"
 MAX_DATASET_NAME_LENGTH = 50
+DEFAULT_STREAM_PREFETCH = 16
+DEFAULT_STREAM_WORKER_COUNT = 4
 
 
 def _hashDependencies(dependencies: List[str]) -> str:
@@ -165,6 +171,20 @@ class NetworkDataset(Generic[SampleType], Dataset[SampleType], NetworkObject, Ta
 
         return super().fetchAll(**kwargs)
 
+    @classmethod
+    async def fetchByIdAsync(cls, objectId: int, **kwargs: Any) -> Self:
+        if "include_sessions" not in kwargs:
+            kwargs["include_sessions"] = 1
+
+        return await super().fetchByIdAsync(objectId, **kwargs)
+
+    @classmethod
+    async def fetchAllAsync(cls, **kwargs: Any) -> List[Self]:
+        if "include_sessions" not in kwargs:
+            kwargs["include_sessions"] = 1
+
+        return await super().fetchAllAsync(**kwargs)
+
     @classmethod
     def fetchCachedDataset(cls, dependencies: List[str]) -> Self:
         """
@@ -323,6 +343,90 @@ class NetworkDataset(Generic[SampleType], Dataset[SampleType], NetworkObject, Ta
 
         samplePath.link_to(linkPath)
 
+    def _linkSample(self, sample: SampleType) -> None:
+        # Store the link so sample can be relinked to this dataset when it changes
+        sampleStore.addLink(sample.id, self.path)
+
+        if sample.downloadPath.exists():
+            self._linkSamplePath(sample.downloadPath)
+
+        if sample.zipPath.exists():
+            self._linkSamplePath(sample.zipPath)
+
+    def createDownloader(
+        self,
+        decrypt: bool = True,
+        ignoreCache: bool = False,
+        unzip: bool = False,
+        networkWorkerCount: int = DEFAULT_NETWORK_WORKER_COUNT,
+        decryptWorkerCount: Optional[int] = None,
+        unzipWorkerCount: Optional[int] = None,
+        retryCount: int = DEFAULT_RETRY_COUNT,
+        priorityCount: int = 0,
+        onProgress: Optional[Callable[[DownloadProgress], None]] = None
+    ) -> DatasetDownloader[SampleType]:
+
+        """
+            Creates a downloader for the samples of this dataset. Download
+            is started by calling "start" (non-blocking) or "run" (blocking)
+            on the returned downloader.
+
+            Parameters
+            ----------
+            decrypt : bool
+                if True encrypted samples will be decrypted after download
+            ignoreCache : bool
+                if True samples are downloaded even if they are already cached
+            unzip : bool
+                if True samples will be unzipped after download
+            networkWorkerCount : int
+                number of samples which are downloaded at the same time
+            decryptWorkerCount : Optional[int]
+                number of samples which are decrypted at the same time,
+                if None number of CPU cores is used
+            unzipWorkerCount : Optional[int]
+                number of samples which are unzipped at the same time,
+                if None number of CPU cores is used
+            retryCount : int
+                number of times a failed sample is downloaded again
+            priorityCount : int
+                number of samples from the start of "samples" which
+                are downloaded before all other samples
+            onProgress : Optional[Callable[[DownloadProgress], None]]
+                called every time a sample is finished
+
+            Returns
+            -------
+            DatasetDownloader[SampleType] -> downloader for the samples of this dataset
+
+            Example
+            -------
+            >>> from coretex import NetworkDataset
+            \b
+            >>> dummyDataset = NetworkDataset.fetchById(1023)
+            >>> downloader = dummyDataset.createDownloader(priorityCount = 100)
+            >>> downloader.start()
+            >>> downloader.waitForPriority()
+            >>> print(downloader.progress)
+            >>> downloader.wait()
+        """
+
+        self.path.mkdir(exist_ok = True)
+
+        return DatasetDownloader(
+            self.samples,
+            decrypt = decrypt,
+            ignoreCache = ignoreCache,
+            unzip = unzip,
+            networkWorkerCount = networkWorkerCount,
+            decryptWorkerCount = decryptWorkerCount,
+            unzipWorkerCount = unzipWorkerCount,
+            retryCount = retryCount,
+            priorityCount = priorityCount,
+            linkSample = self._linkSample,
+            onProgress = onProgress
+        )
+
     def download(self, decrypt: bool = True, ignoreCache: bool = False) -> None:
         """
             Downloads dataset from Coretex
@@ -333,6 +437,10 @@ class NetworkDataset(Generic[SampleType], Dataset[SampleType], NetworkObject, Ta
                 if dataset is already downloaded and ignoreCache
                 is True it will be downloaded again (not required)
 
+            Raises
+            ------
+            DatasetDownloadError -> if some of the samples failed to download
+
             Example
             -------
             >>> from coretex import NetworkDataset
@@ -341,26 +449,142 @@ class NetworkDataset(Generic[SampleType], Dataset[SampleType], NetworkObject, Ta
             >>> dummyDataset.download()
         """
 
+        logging.getLogger("coretexpylib").info(f">> [Coretex] Downloading dataset \"{self.name}\"...")
+        self.createDownloader(decrypt, ignoreCache).run()
+
+    async def downloadAsync(self, decrypt: bool = True, ignoreCache: bool = False, maxConcurrency: int = 64) -> None:
+        """
+            Asynchronous variant of "download" which downloads all samples
+            of the dataset concurrently on the running event loop
+
+            Parameters
+            ----------
+            decrypt : bool
+                if True encrypted samples will be decrypted after download
+            ignoreCache : bool
+                if dataset is already downloaded and ignoreCache
+                is True it will be downloaded again (not required)
+            maxConcurrency : int
+                maximum number of samples which are downloaded at the same time
+
+            Raises
+            ------
+            NetworkRequestError -> if some kind of error happened during
+            the download process
+
+            Example
+            -------
+            >>> import asyncio
+            >>> from coretex import NetworkDataset
+            \b
+            >>> dummyDataset = NetworkDataset.fetchById(1023)
+            >>> asyncio.run(dummyDataset.downloadAsync())
+        """
+
         self.path.mkdir(exist_ok = True)
 
-        def sampleDownloader(sample: SampleType) -> None:
-            sample.download(decrypt, ignoreCache)
+        logging.getLogger("coretexpylib").info(f">> [Coretex] Downloading dataset \"{self.name}\"...")
+        semaphore = asyncio.Semaphore(maxConcurrency)
 
-            if sample.downloadPath.exists():
-                self._linkSamplePath(sample.downloadPath)
+        async def sampleDownloader(sample: SampleType) -> None:
+            async with semaphore:
+                await sample.downloadAsync(decrypt, ignoreCache)
 
-            if sample.zipPath.exists():
-                self._linkSamplePath(sample.zipPath)
+            self._linkSample(sample)
 
             logging.getLogger("coretexpylib").info(f"\tDownloaded \"{sample.name}\"")
 
-        processor = MultithreadedDataProcessor(
-            self.samples,
-            sampleDownloader,
-            message = f"Downloading dataset \"{self.name}\"..."
-        )
+        await asyncio.gather(*[sampleDownloader(sample) for sample in self.samples])
+
+    def stream(
+        self,
+        prefetch: int = DEFAULT_STREAM_PREFETCH,
+        workers: int = DEFAULT_STREAM_WORKER_COUNT,
+        ignoreCache: bool = False,
+        removeConsumed: bool = False
+    ) -> Iterator[Tuple[SampleType, Any]]:
+
+        """
+            Iterates over the samples of the dataset while they are being
+            downloaded. Samples are downloaded, decrypted, unzipped and loaded
+            ahead of the consumer by background workers, so the first sample is
+            available as soon as it is downloaded instead of after the whole
+            dataset is downloaded. Samples are returned in the same order as
+            they are stored in "samples".
+
+            Parameters
+            ----------
+            prefetch : int
+                maximum number of samples which are prepared ahead of the consumer
+            workers : int
+                number of samples which are prepared at the same time
+            ignoreCache : bool
+                if True samples are downloaded even if they are already cached
+            removeConsumed : bool
+                if True files of a sample which were fetched by this call are
+                deleted once the consumer requests the next sample, this limits
+                disk usage to approximately "prefetch" samples. Files which were
+                cached before the iteration started are kept.
+
+            Returns
+            -------
+            Iterator[Tuple[SampleType, Any]] -> sample and its data returned by "sample.load()"
+
+            Raises
+            ------
+            NetworkRequestError -> if some kind of error happened during
+            the download process
+
+            Example
+            -------
+            >>> from coretex import ImageDataset
+            \b
+            >>> dataset = ImageDataset.fetchById(1023)
+            >>> for sample, data in dataset.stream(prefetch = 64, workers = 8):
+                    print(sample.name, data.image.shape)
+        """
+
+        if prefetch < 1:
+            raise ValueError(">> [Coretex] \"prefetch\" must be greater than 0")
+
+        def prepare(sample: SampleType) -> Tuple[Dict[Path, Tuple[int, int, int]], Any]:
+            # Files which existed before the sample was prepared are not removed once
+            # it is consumed, since they can be cached for or linked to other datasets
+            previousFiles = sample._localFiles()
+
+            # Archive is not stored if it would be deleted after the sample is consumed
+            sample.downloadAndUnzip(ignoreCache, keepArchive = not removeConsumed)
+            return previousFiles, sample.load()
+
+        pending: Deque[Tuple[SampleType, Future]] = deque()
+        samples = iter(self.samples)
+
+        def submitNext() -> None:
+            sample = next(samples, None)
+            if sample is not None:
+                pending.append((sample, executor.submit(prepare, sample)))
+
+        executor = ThreadPoolExecutor(max_workers = workers)
+
+        try:
+            for _ in range(prefetch):
+                submitNext()
+
+            while len(pending) > 0:
+                sample, future = pending.popleft()
+                previousFiles, data = future.result()
+
+                submitNext()
+                yield sample, data
+
+                if removeConsumed:
+                    sample._removeFetchedFiles(previousFiles)
+        finally:
+            # Stop preparing samples if the iteration was stopped early
+            for _, future in pending:
+                future.cancel()
 
-        processor.process()
+            executor.shutdown(wait = False)
 
     def rename(self, name: str) -> bool:
         if not isEntityNameValid(name):
@@ -0,0 +1,231 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Optional, Dict, Tuple, Any
+from pathlib import Path
+from threading import Lock
+from uuid import uuid4
+
+import os
+import json
+import logging
+
+from .image_format import ImageFormat
+
+
+MANIFEST_FILE_NAME = ".manifest.json"
+MANIFEST_VERSION = 1
+
+ANNOTATION_FILE_NAME = "annotations.json"
+METADATA_FILE_NAME = "metadata.json"
+
+
+class ImageSampleManifest:
+
+    """
+        Paths of the files contained in an image sample. Manifest is built
+        once by scanning the sample folder and stored inside of it, so the
+        folder does not have to be scanned every time the sample is loaded.
+
+        Properties
+        ----------
+        imagePath : Optional[Path]
+            path to the image of the sample
+        annotationPath : Optional[Path]
+            path to the annotation of the sample, if the sample has it
+        metadataPath : Optional[Path]
+            path to the metadata of the sample, if the sample has it
+    """
+
+    def __init__(self, imagePath: Optional[Path], annotationPath: Optional[Path], metadataPath: Optional[Path]) -> None:
+        self.imagePath = imagePath
+        self.annotationPath = annotationPath
+        self.metadataPath = metadataPath
+
+    @classmethod
+    def build(cls, samplePath: Path) -> "ImageSampleManifest":
+        """
+            Builds the manifest by scanning the sample folder once
+
+            Parameters
+            ----------
+            samplePath : Path
+                path to the unzipped sample
+
+            Returns
+            -------
+            ImageSampleManifest -> manifest of the sample
+        """
+
+        imagePaths: Dict[str, Path] = {}
+        annotationPath: Optional[Path] = None
+        metadataPath: Optional[Path] = None
+
+        extensions = [format.extension for format in ImageFormat]
+
+        with os.scandir(samplePath) as entries:
+            for entry in sorted(entries, key = lambda entry: entry.name):
+                if not entry.is_file():
+                    continue
+
+                path = samplePath / entry.name
+                extension = path.suffix.lstrip(".")
+
+                if entry.name == ANNOTATION_FILE_NAME:
+                    annotationPath = path
+                elif entry.name == METADATA_FILE_NAME:
+                    metadataPath = path
+                elif extension in extensions and not "thumb" in entry.name and extension not in imagePaths:
+                    imagePaths[extension] = path
+
+        # Image formats are checked in the order of their definition
+        imagePath = next((imagePaths[extension] for extension in extensions if extension in imagePaths), None)
+        return cls(imagePath, annotationPath, metadataPath)
+
+    @classmethod
+    def decode(cls, samplePath: Path, value: Dict[str, Any]) -> "ImageSampleManifest":
+        def decodePath(name: Optional[str]) -> Optional[Path]:
+            return None if name is None else samplePath / name
+
+        return cls(decodePath(value["image"]), decodePath(value["annotation"]), decodePath(value["metadata"]))
+
+    def encode(self) -> Dict[str, Any]:
+        def encodePath(path: Optional[Path]) -> Optional[str]:
+            return None if path is None else path.name
+
+        return {
+            "version": MANIFEST_VERSION,
+            "image": encodePath(self.imagePath),
+            "annotation": encodePath(self.annotationPath),
+            "metadata": encodePath(self.metadataPath)
+        }
+
+
+# Manifests which were already read, mapped by the sample path.
+# Modification time of the manifest file is used to detect if it was rebuilt.
+_manifests: Dict[Path, Tuple[int, ImageSampleManifest]] = {}
+_manifestsLock = Lock()
+
+
+def _readManifest(manifestPath: Path) -> Optional[ImageSampleManifest]:
+    try:
+        modifiedTime = manifestPath.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    with _manifestsLock:
+        cached = _manifests.get(manifestPath.parent)
+
+    if cached is not None and cached[0] == modifiedTime:
+        return cached[1]
+
+    try:
+        with manifestPath.open("r") as file:
+            value = json.load(file)
+
+        if value.get("version") != MANIFEST_VERSION:
+            return None
+
+        manifest = ImageSampleManifest.decode(manifestPath.parent, value)
+    except (OSError, ValueError, KeyError) as ex:
+        logging.getLogger("coretexpylib").debug(f">> [Coretex] Invalid sample manifest \"{manifestPath}\": {ex}")
+        return None
+
+    with _manifestsLock:
+        _manifests[manifestPath.parent] = (modifiedTime, manifest)
+
+    return manifest
+
+
+def buildManifest(samplePath: Path) -> ImageSampleManifest:
+    """
+        Builds the manifest of the sample and stores it inside the sample folder.
+        If the sample folder is not writable manifest is only returned.
+
+        Parameters
+        ----------
+        samplePath : Path
+            path to the unzipped sample
+
+        Returns
+        -------
+        ImageSampleManifest -> manifest of the sample
+    """
+
+    manifest = ImageSampleManifest.build(samplePath)
+    manifestPath = samplePath / MANIFEST_FILE_NAME
+
+    # Written to a temporary file first so other threads and processes never read
+    # a partial manifest, name is unique since they can build the manifest at the same time
+    temporaryPath = manifestPath.with_name(f"{MANIFEST_FILE_NAME}.{uuid4().hex}.tmp")
+
+    try:
+        with temporaryPath.open("w") as file:
+            json.dump(manifest.encode(), file)
+
+        os.replace(temporaryPath, manifestPath)
+        modifiedTime = manifestPath.stat().st_mtime_ns
+    except OSError as ex:
+        # Sample can be stored in a read-only location, manifest is only an optimization
+        logging.getLogger("coretexpylib").debug(f">> [Coretex] Failed to save sample manifest \"{manifestPath}\": {ex}")
+        temporaryPath.unlink(missing_ok = True)
+
+        return manifest
+
+    with _manifestsLock:
+        _manifests[samplePath] = (modifiedTime, manifest)
+
+    return manifest
+
+
+def getManifest(samplePath: Path) -> ImageSampleManifest:
+    """
+        Returns the manifest of the sample, manifest is built
+        if the sample does not have it
+
+        Parameters
+        ----------
+        samplePath : Path
+            path to the unzipped sample
+
+        Returns
+        -------
+        ImageSampleManifest -> manifest of the sample
+    """
+
+    manifest = _readManifest(samplePath / MANIFEST_FILE_NAME)
+    if manifest is not None:
+        return manifest
+
+    return buildManifest(samplePath)
+
+
+def invalidateManifest(samplePath: Path) -> None:
+    """
+        Deletes the manifest of the sample, it is built again
+        the next time it is requested
+
+        Parameters
+        ----------
+        samplePath : Path
+            path to the unzipped sample
+    """
+
+    (samplePath / MANIFEST_FILE_NAME).unlink(missing_ok = True)
+
+    with _manifestsLock:
+        _manifests.pop(samplePath, None)
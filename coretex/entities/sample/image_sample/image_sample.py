@@ -36,6 +36,24 @@ class ImageSample(NetworkSample[AnnotatedImageSampleData], LocalImageSample):
     def __init__(self) -> None:
         NetworkSample.__init__(self)
 
+    def load(self, cacheImage: bool = False) -> AnnotatedImageSampleData:
+        """
+            Loads image and its annotation if it exists
+
+            Parameters
+            ----------
+            cacheImage : bool
+                if True decoded pixels of the image are stored in the sample
+                folder once, and every following load maps them into memory
+                (read-only) instead of decoding the image again
+
+            Returns
+            -------
+            AnnotatedImageSampleData -> image data and annotation in Coretex.ai format
+        """
+
+        return LocalImageSample.load(self, cacheImage)
+
     def saveAnnotation(self, coretexAnnotation: CoretexImageAnnotation) -> bool:
         # Encrypted sample must be downloaded for annotation to be updated
         if self.isEncrypted:
@@ -15,29 +15,25 @@
 #     You should have received a copy of the GNU Affero General Public License
 #     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from typing import Final, Optional
+from typing import Final, Optional, Dict
 from pathlib import Path
+from uuid import UUID
 
+import os
 import json
+import logging
+import threading
 
 from PIL import Image, ImageOps
 from PIL.Image import Image as PILImage
 
 import numpy as np
 
-from .image_format import ImageFormat
+from .image_manifest import ImageSampleManifest, getManifest, buildManifest
 from ...annotation import CoretexImageAnnotation, ImageDatasetClasses
 
 
-def _findImage(path: Path) -> Path:
-    for format in ImageFormat:
-        imagePaths = list(path.glob(f"*.{format.extension}"))
-        imagePaths = [path for path in imagePaths if not "thumb" in str(path)]
-
-        if len(imagePaths) > 0:
-            return Path(imagePaths[0])
-
-    raise RuntimeError
+IMAGE_CACHE_SUFFIX = ".npy"
 
 
 def _readImageData(path: Path) -> np.ndarray:
@@ -48,8 +44,55 @@ def _readImageData(path: Path) -> np.ndarray:
     if image.mode != "RGB":
         image = image.convert("RGB")
 
-    imageData = np.frombuffer(image.tobytes(), dtype = np.uint8)
-    imageData = imageData.reshape((image.size[1], image.size[0], 3))
+    # Decoded image is writable, same as the copy-on-write mapping of the cached image
+    return np.array(image)
+
+
+def imageCachePath(imagePath: Path) -> Path:
+    """
+        Returns
+        -------
+        Path -> path to the decoded pixels of the image
+    """
+
+    return imagePath.with_name(f".{imagePath.name}{IMAGE_CACHE_SUFFIX}")
+
+
+def isImageCache(path: Path) -> bool:
+    return path.name.startswith(".") and path.name.endswith(IMAGE_CACHE_SUFFIX)
+
+
+def _readCachedImageData(path: Path) -> np.ndarray:
+    # Decoded pixels are stored next to the image the first time it is read,
+    # and every following read maps them into memory instead of decoding the image
+    cachePath = imageCachePath(path)
+
+    try:
+        if cachePath.stat().st_mtime_ns >= path.stat().st_mtime_ns:
+            # Copy-on-write mapping is writable like the decoded image,
+            # changes stay in memory and are never written to the cache file
+            cachedImageData: np.ndarray = np.load(cachePath, mmap_mode = "c")
+            return cachedImageData
+    except FileNotFoundError:
+        pass
+    except ValueError:
+        # Cache file is corrupted, it will be overwritten
+        pass
+
+    imageData = _readImageData(path)
+
+    # Written to a temporary file first so other readers never map a partial file
+    temporaryPath = cachePath.with_name(f"{cachePath.name}.{os.getpid()}-{threading.get_ident()}")
+
+    try:
+        with temporaryPath.open("wb") as file:
+            np.save(file, imageData)
+
+        os.replace(temporaryPath, cachePath)
+    except OSError as ex:
+        # Sample can be stored in a read-only location, image is decoded on every read then
+        logging.getLogger("coretexpylib").debug(f">> [Coretex] Failed to cache image data \"{cachePath}\": {ex}")
+        temporaryPath.unlink(missing_ok = True)
 
     return imageData
 
@@ -66,17 +109,44 @@ class AnnotatedImageSampleData:
     """
         Contains image data as well as its annotation\n
         Annotation is expected to be in Coretex.ai format
+
+        Parameters
+        ----------
+        path : Path
+            path to the unzipped sample
+        manifest : Optional[ImageSampleManifest]
+            manifest of the sample, if None it is read from the sample folder
+        cacheImage : bool
+            if True decoded pixels of the image are stored in the sample folder
+            the first time the image is read, and every following read maps them
+            into memory (copy-on-write) instead of decoding the image again
     """
 
-    def __init__(self, path: Path) -> None:
-        self.image: Final = _readImageData(_findImage(path))
+    def __init__(self, path: Path, manifest: Optional[ImageSampleManifest] = None, cacheImage: bool = False) -> None:
+        if manifest is None:
+            manifest = getManifest(path)
+
+        if manifest.imagePath is None or not manifest.imagePath.exists():
+            # Manifest is outdated if sample files were changed without rebuilding it
+            manifest = buildManifest(path)
+
+        if manifest.imagePath is None:
+            raise FileNotFoundError(f">> [Coretex] Sample \"{path}\" does not contain an image")
+
+        readImageData = _readCachedImageData if cacheImage else _readImageData
+
+        self.image: Final = readImageData(manifest.imagePath)
         self.annotation: Optional[CoretexImageAnnotation] = None
 
-        annotationPath = path / "annotations.json"
-        if annotationPath.exists():
-            self.annotation = _readAnnotationData(annotationPath)
+        if manifest.annotationPath is not None and manifest.annotationPath.exists():
+            self.annotation = _readAnnotationData(manifest.annotationPath)
+
+    def extractSegmentationMask(
+        self,
+        classes: ImageDatasetClasses,
+        labelIds: Optional[Dict[UUID, int]] = None
+    ) -> np.ndarray:
 
-    def extractSegmentationMask(self, classes: ImageDatasetClasses) -> np.ndarray:
         """
             Generates segmentation mask for the provided classes
 
@@ -84,6 +154,9 @@ class AnnotatedImageSampleData:
             ----------
             classes : ImageDatasetClasses
                 list of dataset classes
+            labelIds : Optional[Dict[UUID, int]]
+                table returned by "classes.labelIdTable()", if None it is built
+                from the classes
 
             Returns
             -------
@@ -93,4 +166,4 @@ class AnnotatedImageSampleData:
         if self.annotation is None:
             raise ValueError
 
-        return self.annotation.extractSegmentationMask(classes)
+        return self.annotation.extractSegmentationMask(classes, labelIds)
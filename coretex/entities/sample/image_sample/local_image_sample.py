@@ -15,13 +15,14 @@
 #     You should have received a copy of the GNU Affero General Public License
 #     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from typing import Dict, Any
+from typing import Dict, Any, Optional, List
 from pathlib import Path
 
 import json
 
-from .image_sample_data import AnnotatedImageSampleData
-from .image_format import ImageFormat
+from .image_sample_data import AnnotatedImageSampleData, isImageCache
+from .image_manifest import MANIFEST_FILE_NAME, ANNOTATION_FILE_NAME, METADATA_FILE_NAME, \
+    getManifest, buildManifest, invalidateManifest
 from ..local_sample import LocalSample
 from ...annotation import CoretexImageAnnotation
 
@@ -37,33 +38,48 @@ class LocalImageSample(LocalSample[AnnotatedImageSampleData]):
 
     @property
     def imagePath(self) -> Path:
-        for format in ImageFormat:
-            imagePaths = list(self.path.glob(f"*.{format.extension}"))
-            imagePaths = [path for path in imagePaths if not "thumbnail" in str(path)]
+        imagePath = getManifest(self.path).imagePath
 
-            if len(imagePaths) > 0:
-                return Path(imagePaths[0])
+        if imagePath is None or not imagePath.exists():
+            # Manifest is outdated if sample files were changed without rebuilding it
+            imagePath = buildManifest(self.path).imagePath
 
-        raise FileNotFoundError
+        if imagePath is None:
+            raise FileNotFoundError
+
+        return imagePath
 
     @property
     def annotationPath(self) -> Path:
-        return self.path / "annotations.json"
+        return self.path / ANNOTATION_FILE_NAME
 
     @property
     def metadataPath(self) -> Path:
-        return self.path / "metadata.json"
+        return self.path / METADATA_FILE_NAME
+
+    def unzip(self, ignoreCache: bool = False) -> None:
+        super().unzip(ignoreCache)
+
+        # Build the manifest while the sample folder is in the page cache
+        getManifest(self.path)
 
-    def load(self) -> AnnotatedImageSampleData:
+    def load(self, cacheImage: bool = False) -> AnnotatedImageSampleData:
         """
             Loads image and its annotation if it exists
 
+            Parameters
+            ----------
+            cacheImage : bool
+                if True decoded pixels of the image are stored in the sample
+                folder once, and every following load maps them into memory
+                (copy-on-write) instead of decoding the image again
+
             Returns
             -------
             AnnotatedImageSampleData -> image data and annotation in Coretex.ai format
         """
 
-        return AnnotatedImageSampleData(self.path)
+        return AnnotatedImageSampleData(self.path, getManifest(self.path), cacheImage)
 
     def loadMetadata(self) -> Dict[str, Any]:
         """
@@ -101,7 +117,7 @@ class LocalImageSample(LocalSample[AnnotatedImageSampleData]):
         with self.annotationPath.open("w") as file:
             json.dump(coretexAnnotation.encode(), file)
 
-        self._updateArchive()
+        self._updateArchive([self.annotationPath])
         return True
 
     def saveMetadata(self, metadata: Dict[str, Any]) -> None:
@@ -117,4 +133,13 @@ class LocalImageSample(LocalSample[AnnotatedImageSampleData]):
         with self.metadataPath.open("w") as file:
             json.dump(metadata, file)
 
-        self._updateArchive()
+        self._updateArchive([self.metadataPath])
+
+    def _shouldArchive(self, path: Path) -> bool:
+        return super()._shouldArchive(path) and path.name != MANIFEST_FILE_NAME and not isImageCache(path)
+
+    def _updateArchive(self, changedPaths: Optional[List[Path]] = None) -> None:
+        super()._updateArchive(changedPaths)
+
+        # Sample files were changed so the manifest has to be rebuilt
+        invalidateManifest(self.path)
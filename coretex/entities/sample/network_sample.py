@@ -15,32 +15,41 @@
 #     You should have received a copy of the GNU Affero General Public License
 #     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from typing import TypeVar, Generic, Dict, Any, List
+from typing import TypeVar, Generic, Dict, Any, List, Optional, BinaryIO, Tuple
 from typing_extensions import override
 from datetime import datetime
 from pathlib import Path
+from contextlib import ExitStack
 
 import os
-import time
 import shutil
+import asyncio
+import logging
+
+import requests
 
 from .sample import Sample
+from .sample_store import sampleStore
 from ..project import ProjectType
 from ..._folder_manager import folder_manager
 from ...codable import KeyDescriptor
-from ...networking import NetworkObject, networkManager, NetworkRequestError, \
-    fileChunkUpload, MAX_CHUNK_SIZE, FileData
+from ...networking import NetworkObject, networkManager, asyncNetworkManager, NetworkRequestError, \
+    NetworkResponse, fileChunkUpload, MAX_CHUNK_SIZE, FileData
 from ...utils import TIME_ZONE
+from ...utils.zip_stream import ZipStreamExtractor, ZipStreamError
 from ...cryptography import getProjectKey, aes
+from ...cryptography.aes.constants import IV_SIZE
 
 
 SampleDataType = TypeVar("SampleDataType")
 
+STREAM_CHUNK_SIZE = 1024 * 1024  # 1 MB
+
 
-def _relinkSample(samplePath: Path) -> None:
-    for datasetPath in folder_manager.datasetsFolder.iterdir():
+def _relinkSample(sampleId: int, samplePath: Path) -> None:
+    for datasetPath in sampleStore.linkedDatasets(sampleId):
         linkPath = datasetPath / samplePath.name
-        if not linkPath.exists():
+        if not linkPath.exists() or os.path.samefile(samplePath, linkPath):
             continue
 
         linkPath.unlink()
@@ -123,7 +132,12 @@ class NetworkSample(Generic[SampleDataType], Sample[SampleDataType], NetworkObje
                 "Cannot check if file has been modified since last download"
             )
 
-        lastModified = datetime.fromtimestamp(self.downloadPath.stat().st_mtime).astimezone(TIME_ZONE)
+        downloadTime = sampleStore.downloadTime(self.downloadPath)
+        if downloadTime is None:
+            # Sample was downloaded before download times were stored in the index
+            downloadTime = self.downloadPath.stat().st_mtime
+
+        lastModified = datetime.fromtimestamp(downloadTime).astimezone(TIME_ZONE)
         return self.lastModified > lastModified
 
     def decrypt(self, ignoreCache: bool = False) -> None:
@@ -149,11 +163,14 @@ class NetworkSample(Generic[SampleDataType], Sample[SampleDataType], NetworkObje
 
         # Decrypt sample
         aes.decryptFile(getProjectKey(self.projectId), self.downloadPath, self.zipPath)
+        sampleStore.deduplicate(self.zipPath)
 
         # Relink sample to all datasets to which it belongs
-        _relinkSample(self.zipPath)
+        _relinkSample(self.id, self.zipPath)
+
+    def _prepareDownload(self, ignoreCache: bool) -> bool:
+        # Returns True if the sample has to be downloaded
 
-    def _download(self, ignoreCache: bool = False) -> None:
         if self.downloadPath.exists() and self.modifiedSinceLastDownload():
             ignoreCache = True
 
@@ -162,14 +179,9 @@ class NetworkSample(Generic[SampleDataType], Sample[SampleDataType], NetworkObje
             self.downloadPath.unlink(missing_ok = True)
 
         # If the downloadPath exists at this point do not redownload
-        if self.downloadPath.exists():
-            return
-
-        params = {
-            "id": self.id
-        }
+        return not self.downloadPath.exists()
 
-        response = networkManager.download(f"{self._endpoint()}/export", self.downloadPath, params)
+    def _onDownloadResponse(self, response: NetworkResponse) -> None:
         if response.hasFailed():
             raise NetworkRequestError(response, f"Failed to download Sample \"{self.name}\"")
 
@@ -183,6 +195,50 @@ class NetworkSample(Generic[SampleDataType], Sample[SampleDataType], NetworkObje
                 # Delete the unzipped folder
                 shutil.rmtree(self.path)
 
+    def _download(self, ignoreCache: bool = False) -> bool:
+        # Returns True if the sample was fetched, False if the cached file was used
+
+        if not self._prepareDownload(ignoreCache):
+            return False
+
+        params = {
+            "id": self.id
+        }
+
+        response = networkManager.download(f"{self._endpoint()}/export", self.downloadPath, params)
+        self._onDownloadResponse(response)
+
+        return True
+
+    async def _downloadAsync(self, ignoreCache: bool = False) -> bool:
+        # Returns True if the sample was fetched, False if the cached file was used
+
+        if not self._prepareDownload(ignoreCache):
+            return False
+
+        params = {
+            "id": self.id
+        }
+
+        response = await asyncNetworkManager.download(f"{self._endpoint()}/export", self.downloadPath, params)
+        self._onDownloadResponse(response)
+
+        return True
+
+    def _finalizeDownload(self, decrypt: bool, ignoreCache: bool) -> None:
+        if decrypt:
+            # Decrypt the sample
+            self.decrypt(ignoreCache)
+
+        # Store only a single copy of samples with identical content
+        sampleStore.deduplicate(self.downloadPath)
+
+        # Update sample download time to now
+        sampleStore.markDownloaded(self.downloadPath)
+
+        # If sample was downloaded succesfully relink it to datasets to which it is linked
+        _relinkSample(self.id, self.downloadPath)
+
     @override
     def download(self, decrypt: bool = True, ignoreCache: bool = False) -> None:
         """
@@ -200,19 +256,244 @@ class NetworkSample(Generic[SampleDataType], Sample[SampleDataType], NetworkObje
 
         # Download the sample
         self._download(ignoreCache)
+        self._finalizeDownload(decrypt, ignoreCache)
 
-        if decrypt:
-            # Decrypt the sample
-            self.decrypt(ignoreCache)
+    async def downloadAsync(self, decrypt: bool = True, ignoreCache: bool = False) -> None:
+        """
+            Asynchronous variant of "download" which downloads the sample
+            using "asyncNetworkManager". Decryption is executed in the
+            default executor of the event loop so it does not block other
+            transfers running in the same event loop.
 
-        # Update sample download time to now
-        os.utime(self.downloadPath, (os.stat(self.downloadPath).st_atime, time.time()))
+            Raises
+            ------
+            NetworkRequestError -> if some kind of error happened during
+            the download process
+        """
 
-        # If sample was downloaded succesfully relink it to datasets to which it is linked
-        _relinkSample(self.downloadPath)
+        if decrypt and not self.isEncrypted:
+            # Change to false if sample is not encrypted
+            decrypt = False
+
+        # Download the sample
+        await self._downloadAsync(ignoreCache)
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._finalizeDownload, decrypt, ignoreCache)
+
+    def _isUnzippedSampleValid(self) -> bool:
+        if not self.path.exists():
+            return False
+
+        downloadTime = sampleStore.downloadTime(self.path)
+        if downloadTime is None:
+            # Sample was unzipped from a downloaded archive
+            return self.downloadPath.exists() and not self.modifiedSinceLastDownload()
+
+        return self.lastModified <= datetime.fromtimestamp(downloadTime).astimezone(TIME_ZONE)
+
+    def _streamToFolder(self, keepArchive: bool) -> None:
+        params = {
+            "id": self.id
+        }
+
+        response = networkManager.streamDownload(f"{self._endpoint()}/export", params)
+        if response.hasFailed():
+            raise NetworkRequestError(response, f"Failed to download Sample \"{self.name}\"")
+
+        extractor = ZipStreamExtractor(self.path)
+
+        with ExitStack() as stack:
+            stack.callback(response.close)
+            stack.callback(extractor.abort)
+
+            downloadFile: Optional[BinaryIO] = None
+            zipFile: Optional[BinaryIO] = None
+
+            if keepArchive:
+                downloadFile = stack.enter_context(self.downloadPath.open("wb"))
+
+                if self.isEncrypted:
+                    zipFile = stack.enter_context(self.zipPath.open("wb"))
+
+            def onDecryptedChunk(chunk: bytes) -> None:
+                if zipFile is not None:
+                    zipFile.write(chunk)
+
+                extractor.feed(chunk)
+
+            decryptor: Optional[aes.StreamDecryptor] = None
+            iv = bytearray()
+
+            for chunk in response.stream(chunkSize = STREAM_CHUNK_SIZE):
+                if downloadFile is not None:
+                    downloadFile.write(chunk)
+
+                if not self.isEncrypted:
+                    onDecryptedChunk(chunk)
+                    continue
+
+                if decryptor is None:
+                    # IV is stored in the first bytes of the encrypted sample
+                    iv.extend(chunk)
+                    if len(iv) < IV_SIZE:
+                        continue
+
+                    decryptor = aes.StreamDecryptor(getProjectKey(self.projectId), bytes(iv[:IV_SIZE]), STREAM_CHUNK_SIZE)
+                    chunk = bytes(iv[IV_SIZE:])
+
+                for decryptedChunk in decryptor.feed(chunk):
+                    onDecryptedChunk(decryptedChunk)
+
+            if decryptor is not None:
+                onDecryptedChunk(decryptor.flush())
+
+            extractor.close()
+
+    def _streamToFolderWithRetry(self, keepArchive: bool) -> None:
+        # Connection can drop while the response body is being read, in which
+        # case the sample is streamed again as defined by the "retryPolicy"
+        retryPolicy = networkManager.retryPolicy
+        retryCount = 0
+        delay = 0.0
+
+        while True:
+            try:
+                self._streamToFolder(keepArchive)
+                return
+            except requests.exceptions.RequestException as ex:
+                self._removeLocalFiles()
+
+                retryPolicy.onFailure()
+                if not retryPolicy.acquire(retryCount):
+                    raise
+
+                logging.getLogger("coretexpylib").debug(f">> [Coretex] Failed to stream Sample \"{self.name}\". Reason: \"{ex}\"", exc_info = ex)
+
+                delay = retryPolicy.getDelay(delay, None)
+                retryPolicy.sleep(delay, f"{self._endpoint()}/export")
+
+                retryCount += 1
+
+    def _localFiles(self) -> Dict[Path, Tuple[int, int, int]]:
+        # Identifies local files of the sample, so files which were
+        # replaced can be distinguished from the files which were kept
+        files: Dict[Path, Tuple[int, int, int]] = {}
+
+        for path in (self.path, self.downloadPath, self.zipPath):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+
+            files[path] = (stat.st_dev, stat.st_ino, stat.st_mtime_ns)
+
+        return files
+
+    def _removeFetchedFiles(self, previousFiles: Dict[Path, Tuple[int, int, int]]) -> None:
+        # Removes local files which were created since "previousFiles" were recorded,
+        # files which existed before can be linked to datasets so they are kept
+        for path, identity in self._localFiles().items():
+            if previousFiles.get(path) == identity:
+                continue
+
+            if path.is_dir():
+                shutil.rmtree(path)
+            else:
+                path.unlink()
+
+            sampleStore.removeFile(path)
+
+    def _removeLocalFiles(self) -> None:
+        if self.path.exists():
+            shutil.rmtree(self.path)
+
+        self.downloadPath.unlink(missing_ok = True)
+        self.zipPath.unlink(missing_ok = True)
+
+    def downloadAndUnzip(self, ignoreCache: bool = False, keepArchive: bool = True) -> None:
+        """
+            Downloads, decrypts and unzips the sample in a single pass. Response
+            body is decrypted and archive members are extracted while they are
+            being downloaded, so the sample is never read back from the disk.
+
+            Archives which cannot be extracted while streaming are downloaded,
+            decrypted and unzipped using "download" and "unzip". If the archive
+            was already downloaded and it is up to date it is unzipped instead.
+
+            Parameters
+            ----------
+            ignoreCache : bool
+                if True sample is downloaded again even if it is already unzipped
+            keepArchive : bool
+                if True downloaded (and decrypted) archive is also stored,
+                otherwise only the unzipped sample is kept. Archives which
+                were downloaded before are always kept.
+
+            Raises
+            ------
+            NetworkRequestError -> if some kind of error happened during
+            the download process
+
+            Example
+            -------
+            >>> from coretex import ImageSample
+            \b
+            >>> sample = ImageSample.fetchById(1023)
+            >>> sample.downloadAndUnzip(keepArchive = False)
+            >>> print(list(sample.path.iterdir()))
+        """
+
+        if not ignoreCache and self._isUnzippedSampleValid():
+            return
+
+        if not ignoreCache and self.downloadPath.exists() and not self.modifiedSinceLastDownload():
+            # Archive is already downloaded, it can be shared with datasets
+            # so it is kept even if "keepArchive" is False
+            self.decrypt()
+            self.unzip(ignoreCache = True)
+
+            return
+
+        self._removeLocalFiles()
+
+        try:
+            self._streamToFolderWithRetry(keepArchive)
+        except ZipStreamError as ex:
+            logging.getLogger("coretexpylib").debug(f">> [Coretex] Failed to unzip Sample \"{self.name}\" while downloading it: {ex}")
+            self._removeLocalFiles()
+
+            self.download(decrypt = True, ignoreCache = True)
+            self.unzip(ignoreCache = True)
+
+            if not keepArchive:
+                self.downloadPath.unlink(missing_ok = True)
+                self.zipPath.unlink(missing_ok = True)
+        except BaseException:
+            # Do not leave partially extracted sample behind
+            self._removeLocalFiles()
+            raise
+
+        sampleStore.markDownloaded(self.path)
+
+        if not keepArchive:
+            return
+
+        for path in {self.downloadPath, self.zipPath}:
+            if not path.exists():
+                continue
+
+            sampleStore.deduplicate(path)
+            sampleStore.markDownloaded(path)
+            _relinkSample(self.id, path)
 
     @override
     def unzip(self, ignoreCache: bool = False) -> None:
+        if self.path.exists() and not ignoreCache:
+            # Sample could be unzipped while it was downloaded, in which case
+            # its archive does not have to be stored
+            return
+
         if not self.downloadPath.exists():
             raise RuntimeError("You must first download the Sample before you can unzip it")
 
@@ -226,12 +507,21 @@ class NetworkSample(Generic[SampleDataType], Sample[SampleDataType], NetworkObje
         return super().load()  # type: ignore
 
     @override
-    def _updateArchive(self) -> None:
-        super()._updateArchive()
+    def _updateArchive(self, changedPaths: Optional[List[Path]] = None) -> None:
+        super()._updateArchive(changedPaths)
 
         if self.isEncrypted:
+            # File can be shared with other samples which have the same content,
+            # so a new file is created instead of overwriting the existing one
+            self.downloadPath.unlink(missing_ok = True)
             aes.encryptFile(getProjectKey(self.projectId), self.zipPath, self.downloadPath)
 
+        # Archive was recreated so datasets are linked to the old file
+        _relinkSample(self.id, self.zipPath)
+
+        if self.isEncrypted:
+            _relinkSample(self.id, self.downloadPath)
+
     def _overwriteSample(self, samplePath: Path) -> None:
         if not self.isEncrypted:
             raise RuntimeError("Only encrypted samples can be overwriten.")
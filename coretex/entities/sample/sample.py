@@ -15,16 +15,54 @@
 #     You should have received a copy of the GNU Affero General Public License
 #     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from typing import TypeVar, Generic, Union
+from typing import TypeVar, Generic, Union, Optional, List, Dict, Set
 from abc import ABC, abstractmethod
-from zipfile import BadZipFile, ZipFile
+from zipfile import BadZipFile, ZipFile, ZipInfo, ZIP64_LIMIT
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
+import os
+import copy
 import shutil
+import struct
+import zlib
+
+from ...utils.file import writeRawZipMember
 
 
 SampleDataType = TypeVar("SampleDataType")
 
+ARCHIVE_COPY_CHUNK_SIZE = 1024 * 1024  # 1 MB
+ARCHIVE_CHECKSUM_WORKER_COUNT = 4
+
+_LOCAL_FILE_HEADER_SIZE = 30
+
+
+def _fileCrc(path: Path) -> int:
+    crc = 0
+
+    with path.open("rb") as file:
+        while True:
+            chunk = file.read(ARCHIVE_COPY_CHUNK_SIZE)
+            if not chunk:
+                return crc
+
+            crc = zlib.crc32(chunk, crc)
+
+
+def _copyRawMember(source: ZipFile, destination: ZipFile, info: ZipInfo) -> None:
+    # Copies the compressed bytes of the member without decompressing
+    # and compressing them again
+    if source.fp is None:
+        raise ValueError(">> [Coretex] Zip archive is closed")
+
+    source.fp.seek(info.header_offset)
+    header = source.fp.read(_LOCAL_FILE_HEADER_SIZE)
+    nameLength, extraLength = struct.unpack("<HH", header[26:30])
+    source.fp.seek(info.header_offset + _LOCAL_FILE_HEADER_SIZE + nameLength + extraLength)
+
+    writeRawZipMember(destination, copy.copy(info), source.fp)
+
 
 class Sample(ABC, Generic[SampleDataType]):
 
@@ -119,15 +157,70 @@ class Sample(ABC, Generic[SampleDataType]):
 
         return self.path / other
 
-    def _updateArchive(self) -> None:
-        oldZipPath = self.zipPath.parent / f"{self.zipPath.stem}-old.zip"
-        self.zipPath.rename(oldZipPath)
+    def _shouldArchive(self, path: Path) -> bool:
+        # Files which are stored only locally (indexes, caches...)
+        # are excluded by overriding this method
+        return path.is_file()
+
+    def _isArchiveMemberUnchanged(self, path: Path, info: Optional[ZipInfo], changedPaths: Optional[Set[Path]]) -> bool:
+        if info is None or info.is_dir() or info.file_size != path.stat().st_size:
+            return False
+
+        # Raw copy of large members would require ZIP64 extra fields to be rewritten
+        if info.file_size >= ZIP64_LIMIT or info.compress_size >= ZIP64_LIMIT:
+            return False
+
+        if changedPaths is not None:
+            return path.absolute() not in changedPaths
+
+        return _fileCrc(path) == info.CRC
+
+    def _updateArchive(self, changedPaths: Optional[List[Path]] = None) -> None:
+        """
+            Updates the sample archive with the contents of the sample folder.
+            Members which have not changed are copied from the old archive as
+            they are (without recompressing them), only changed and new files
+            are written.
+
+            Parameters
+            ----------
+            changedPaths : Optional[List[Path]]
+                files which were changed, if None changed files are detected
+                by comparing the size and the checksum of every file with the
+                matching archive member
+        """
+
+        samplePaths = [path for path in self.path.rglob("*") if self._shouldArchive(path)]
+        temporaryPath = self.zipPath.parent / f"{self.zipPath.stem}-new.zip"
+
+        changedPathsSet = None if changedPaths is None else { path.absolute() for path in changedPaths }
+
+        with ZipFile(temporaryPath, "w") as zipFile:
+            if self.zipPath.exists():
+                with ZipFile(self.zipPath) as oldZipFile:
+                    members: Dict[str, ZipInfo] = { info.filename: info for info in oldZipFile.infolist() }
+
+                    def isUnchanged(path: Path) -> bool:
+                        info = members.get(path.relative_to(self.path).as_posix())
+                        return self._isArchiveMemberUnchanged(path, info, changedPathsSet)
+
+                    # Checksums are calculated in parallel since most of
+                    # the sample files do not change between updates
+                    with ThreadPoolExecutor(ARCHIVE_CHECKSUM_WORKER_COUNT) as executor:
+                        unchangedFlags = list(executor.map(isUnchanged, samplePaths))
 
-        with ZipFile(self.zipPath, "w") as zipFile:
-            for value in self.path.rglob("*"):
-                if not value.is_file():
-                    continue
+                    for path, unchanged in zip(samplePaths, unchangedFlags):
+                        name = path.relative_to(self.path).as_posix()
 
-                zipFile.write(value, value.relative_to(self.path))
+                        if unchanged:
+                            _copyRawMember(oldZipFile, zipFile, members[name])
+                        else:
+                            compressType = members[name].compress_type if name in members else zipFile.compression
+                            zipFile.write(path, name, compressType)
+            else:
+                for path in samplePaths:
+                    zipFile.write(path, path.relative_to(self.path))
 
-        oldZipPath.unlink()
+        # Archive file can be shared with other samples which have the same
+        # content, so it is replaced instead of being overwritten
+        os.replace(temporaryPath, self.zipPath)
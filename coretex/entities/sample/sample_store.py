@@ -0,0 +1,314 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Optional, List, Iterator
+from pathlib import Path
+from contextlib import contextmanager
+from threading import Lock
+from uuid import uuid4
+
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+
+from ..._folder_manager import folder_manager
+
+
+HASH_CHUNK_SIZE = 8 * 1024 * 1024  # 8 MB
+
+_SCHEMA = [
+    """
+        CREATE TABLE IF NOT EXISTS links (
+            sample_id INTEGER NOT NULL,
+            dataset TEXT NOT NULL,
+            PRIMARY KEY (sample_id, dataset)
+        )
+    """,
+    """
+        CREATE TABLE IF NOT EXISTS files (
+            name TEXT PRIMARY KEY,
+            digest TEXT,
+            downloaded_at REAL
+        )
+    """,
+    """
+        CREATE TABLE IF NOT EXISTS migrations (
+            name TEXT PRIMARY KEY
+        )
+    """
+]
+
+LEGACY_LINKS_MIGRATION = "legacy_links"
+SAMPLE_FILE_SUFFIXES   = [".zip", ".bin"]
+
+
+def _fileDigest(path: Path) -> str:
+    sha256 = hashlib.sha256()
+
+    with path.open("rb") as file:
+        while (chunk := file.read(HASH_CHUNK_SIZE)):
+            sha256.update(chunk)
+
+    return sha256.hexdigest()
+
+
+def _migrateLegacyLinks(connection: sqlite3.Connection) -> None:
+    # Datasets downloaded before the index existed are not recorded in it, so they
+    # are found by scanning the datasets folder once per storage path. Migration is
+    # recorded in the same transaction so only a single process performs it.
+
+    with connection:
+        cursor = connection.execute("INSERT OR IGNORE INTO migrations (name) VALUES (?)", (LEGACY_LINKS_MIGRATION, ))
+        if cursor.rowcount == 0:
+            return
+
+        if not folder_manager.datasetsFolder.exists():
+            return
+
+        links = [
+            (int(path.stem), datasetPath.name)
+            for datasetPath in folder_manager.datasetsFolder.iterdir() if datasetPath.is_dir()
+            for path in datasetPath.iterdir() if path.suffix in SAMPLE_FILE_SUFFIXES and path.stem.isdigit()
+        ]
+
+        connection.executemany("INSERT OR IGNORE INTO links (sample_id, dataset) VALUES (?, ?)", links)
+        logging.getLogger("coretexpylib").debug(f">> [Coretex] Added {len(links)} existing dataset links to the sample index")
+
+
+class SampleStore:
+
+    """
+        Content-addressed storage for downloaded sample files
+
+        Sample files with identical content are stored only once in
+        the "objects" folder and hard-linked to the sample paths.
+        Persistent index stores to which datasets each sample is linked,
+        so the links can be updated without scanning all datasets.
+        Index is an SQLite database, so it can be safely shared between
+        multiple processes using the same storage path.
+
+        Properties
+        ----------
+        root : Path
+            folder in which the samples are stored
+        objectsFolder : Path
+            folder in which the unique sample files are stored
+        indexPath : Path
+            path to the index database
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self.objectsFolder = root / "objects"
+        self.indexPath = root / "index.db"
+
+        self.__connection: Optional[sqlite3.Connection] = None
+        self.__lock = Lock()
+
+    @contextmanager
+    def _index(self) -> Iterator[sqlite3.Connection]:
+        with self.__lock:
+            if self.__connection is None:
+                connection = sqlite3.connect(self.indexPath, timeout = 60, check_same_thread = False)
+                connection.execute("PRAGMA journal_mode=WAL")
+
+                for statement in _SCHEMA:
+                    connection.execute(statement)
+
+                connection.commit()
+
+                _migrateLegacyLinks(connection)
+                self.__connection = connection
+
+            with self.__connection:
+                yield self.__connection
+
+    def addLink(self, sampleId: int, datasetPath: Path) -> None:
+        """
+            Records that the sample is linked to the dataset
+
+            Parameters
+            ----------
+            sampleId : int
+                id of the sample
+            datasetPath : Path
+                folder of the dataset to which the sample is linked
+        """
+
+        with self._index() as index:
+            index.execute("INSERT OR IGNORE INTO links (sample_id, dataset) VALUES (?, ?)", (sampleId, datasetPath.name))
+
+    def linkedDatasets(self, sampleId: int) -> List[Path]:
+        """
+            Parameters
+            ----------
+            sampleId : int
+                id of the sample
+
+            Returns
+            -------
+            List[Path] -> folders of the datasets to which the sample is linked
+        """
+
+        with self._index() as index:
+            rows = index.execute("SELECT dataset FROM links WHERE sample_id = ?", (sampleId, )).fetchall()
+
+        return [folder_manager.datasetsFolder / dataset for dataset, in rows]
+
+    def markDownloaded(self, path: Path) -> None:
+        """
+            Records the current time as the time when the sample file was
+            last downloaded. File modification time cannot be used for this
+            since files with identical content share the same inode.
+
+            Parameters
+            ----------
+            path : Path
+                path to the sample file
+        """
+
+        with self._index() as index:
+            index.execute(
+                "INSERT INTO files (name, downloaded_at) VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET downloaded_at = excluded.downloaded_at",
+                (path.name, time.time())
+            )
+
+    def downloadTime(self, path: Path) -> Optional[float]:
+        """
+            Parameters
+            ----------
+            path : Path
+                path to the sample file
+
+            Returns
+            -------
+            Optional[float] -> timestamp of the last download of the sample
+            file, None if it is not recorded
+        """
+
+        with self._index() as index:
+            row = index.execute("SELECT downloaded_at FROM files WHERE name = ?", (path.name, )).fetchone()
+
+        if row is None or row[0] is None:
+            return None
+
+        return float(row[0])
+
+    def deduplicate(self, path: Path) -> None:
+        """
+            Replaces the sample file with a hard link to the stored
+            file with the same content, or stores the sample file
+            if its content is not stored yet
+
+            Parameters
+            ----------
+            path : Path
+                path to the sample file
+        """
+
+        with self._index() as index:
+            row = index.execute("SELECT digest FROM files WHERE name = ?", (path.name, )).fetchone()
+
+        previousDigest: Optional[str] = None if row is None else row[0]
+        if previousDigest is not None:
+            previousObjectPath = self.objectsFolder / previousDigest
+
+            # File is already linked to the stored object, no need to hash it again
+            if previousObjectPath.exists() and os.path.samefile(path, previousObjectPath):
+                return
+
+        digest = _fileDigest(path)
+        objectPath = self.objectsFolder / digest
+
+        self.objectsFolder.mkdir(exist_ok = True)
+
+        while True:
+            try:
+                os.link(path, objectPath)
+                break
+            except FileExistsError:
+                pass
+
+            tmpPath = path.with_name(f".{path.name}.{uuid4().hex}.tmp")
+
+            try:
+                if os.path.samefile(path, objectPath):
+                    break
+
+                os.link(objectPath, tmpPath)
+            except FileNotFoundError:
+                # Object was removed by other process in the meantime
+                continue
+
+            os.replace(tmpPath, path)
+            logging.getLogger("coretexpylib").debug(f">> [Coretex] Sample file \"{path.name}\" is linked to existing object \"{digest}\"")
+
+            break
+
+        with self._index() as index:
+            index.execute(
+                "INSERT INTO files (name, digest) VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET digest = excluded.digest",
+                (path.name, digest)
+            )
+
+        # Remove the previous content of the sample file if nothing references it anymore
+        if previousDigest is not None and previousDigest != digest:
+            self.removeUnreferenced(previousDigest)
+
+    def removeFile(self, path: Path) -> None:
+        """
+            Removes the sample file from the index and deletes its stored
+            object if no other sample file is linked to it. Must be called
+            after the sample file was deleted.
+
+            Parameters
+            ----------
+            path : Path
+                path to the deleted sample file
+        """
+
+        with self._index() as index:
+            row = index.execute("SELECT digest FROM files WHERE name = ?", (path.name, )).fetchone()
+            index.execute("DELETE FROM files WHERE name = ?", (path.name, ))
+
+        if row is not None and row[0] is not None:
+            self.removeUnreferenced(row[0])
+
+    def removeUnreferenced(self, digest: str) -> None:
+        """
+            Deletes the stored object if no sample file is linked to it
+
+            Parameters
+            ----------
+            digest : str
+                digest of the stored object
+        """
+
+        objectPath = self.objectsFolder / digest
+
+        try:
+            if objectPath.stat().st_nlink == 1:
+                objectPath.unlink()
+        except FileNotFoundError:
+            pass
+
+
+sampleStore = SampleStore(folder_manager.samplesFolder)
@@ -18,6 +18,6 @@
 from .artifact import Artifact
 from .task_run import TaskRun
 from .status import TaskRunStatus
-from .metrics import Metric, MetricType
+from .metrics import Metric, MetricType, MetricsWriter, MetricAggregation
 from .parameter import BaseParameter, validateParameters, parameter_factory, BaseListParameter, ParameterType
 from .execution_type import ExecutionType
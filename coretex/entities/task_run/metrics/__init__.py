@@ -17,3 +17,4 @@
 
 from .metric import Metric
 from .metric_type import MetricType
+from .metrics_writer import MetricsWriter, MetricAggregation, MetricPoint
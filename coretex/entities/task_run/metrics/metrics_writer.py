@@ -0,0 +1,312 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Callable, Dict, List, Optional, Tuple
+from typing_extensions import Self
+from types import TracebackType
+from enum import Enum
+from threading import Thread, Event, Lock
+
+import math
+import time
+import logging
+
+
+# Metric name, x, y and the time (unix timestamp) at which the value was added
+MetricPoint = Tuple[str, float, float, float]
+SubmitFunction = Callable[[List[MetricPoint]], bool]
+
+# Upper bound of points kept for resubmission after failed flushes
+MAX_FAILED_POINTS = 100_000
+
+
+class MetricAggregation(Enum):
+
+    """
+        Defines how values which fall into the same
+        metric window are reduced to a single point
+    """
+
+    last = "last"
+    mean = "mean"
+    min = "min"
+    max = "max"
+
+
+class _MetricWindow:
+
+    def __init__(self, x: float, y: float, timestamp: float) -> None:
+        self.x = x
+        self.timestamp = timestamp
+        self.count = 1
+        self.sum = y
+        self.min = y
+        self.max = y
+        self.last = y
+        self.updatedAt = time.monotonic()
+
+    def add(self, x: float, y: float, timestamp: float) -> None:
+        self.x = x
+        self.timestamp = timestamp
+        self.count += 1
+        self.sum += y
+        self.min = min(self.min, y)
+        self.max = max(self.max, y)
+        self.last = y
+        self.updatedAt = time.monotonic()
+
+    def value(self, aggregation: MetricAggregation) -> float:
+        if aggregation == MetricAggregation.mean:
+            return self.sum / self.count
+
+        if aggregation == MetricAggregation.min:
+            return self.min
+
+        if aggregation == MetricAggregation.max:
+            return self.max
+
+        return self.last
+
+
+class MetricsWriter:
+
+    """
+        Buffers metric values in memory and submits them to Coretex
+        in batches from a background thread, so metrics can be written
+        at any frequency without waiting for network requests
+
+        Values of a metric are grouped into windows of "windowSize"
+        along the x axis (or by exact x value if "windowSize" is None)
+        and each window is reduced to a single point using "aggregation".
+        A window is submitted once a value from a later window arrives,
+        or once it was not updated for "flushInterval" seconds
+
+        Parameters
+        ----------
+        submitFunction : SubmitFunction
+            function which submits a batch of (metric, x, y, timestamp) points
+        aggregation : MetricAggregation
+            how values in the same window are reduced
+        windowSize : Optional[float]
+            size of the window along the x axis
+        flushInterval : float
+            number of seconds between background flushes
+        maxPendingPoints : int
+            number of completed windows after which a flush is triggered early
+
+        Example
+        -------
+        >>> from coretex import currentTaskRun, MetricAggregation
+        \b
+        >>> with currentTaskRun().metricsWriter(MetricAggregation.mean) as writer:
+                for epoch in range(epochs):
+                    for batch in batches:
+                        writer.write({ "loss": (epoch, train(batch)) })
+    """
+
+    def __init__(
+        self,
+        submitFunction: SubmitFunction,
+        aggregation: MetricAggregation = MetricAggregation.last,
+        windowSize: Optional[float] = None,
+        flushInterval: float = 5.0,
+        maxPendingPoints: int = 1000
+    ) -> None:
+
+        if windowSize is not None and windowSize <= 0:
+            raise ValueError(">> [Coretex] \"windowSize\" must be greater than 0")
+
+        if flushInterval <= 0:
+            raise ValueError(">> [Coretex] \"flushInterval\" must be greater than 0")
+
+        self.aggregation = aggregation
+        self.windowSize = windowSize
+        self.flushInterval = flushInterval
+        self.maxPendingPoints = maxPendingPoints
+
+        self.__submitFunction = submitFunction
+
+        # Guards open windows and completed points, held only while updating them
+        self.__lock = Lock()
+        self.__windows: Dict[str, Tuple[float, _MetricWindow]] = {}
+        self.__completed: List[MetricPoint] = []
+        self.__failed: List[MetricPoint] = []
+
+        # Serializes submission, never acquired by writers
+        self.__flushLock = Lock()
+
+        self.__closed = Event()
+        self.__flushRequested = Event()
+        self.__worker = Thread(target = self.__run, name = "MetricsWriter", daemon = True)
+        self.__worker.start()
+
+    @property
+    def isClosed(self) -> bool:
+        return self.__closed.is_set()
+
+    def __windowKey(self, x: float) -> float:
+        if self.windowSize is None:
+            return x
+
+        return math.floor(x / self.windowSize)
+
+    def add(self, name: str, x: float, y: float) -> None:
+        """
+            Adds a single metric value
+
+            Parameters
+            ----------
+            name : str
+                name of the metric
+            x : float
+                value on the x axis
+            y : float
+                value on the y axis
+
+            Raises
+            ------
+            RuntimeError -> if the writer was closed
+        """
+
+        if self.isClosed:
+            raise RuntimeError(">> [Coretex] MetricsWriter is closed")
+
+        # Values can be submitted long after they were added, so the
+        # time is recorded here instead of when the point is submitted
+        timestamp = time.time()
+        windowKey = self.__windowKey(x)
+
+        with self.__lock:
+            current = self.__windows.get(name)
+
+            if current is not None and current[0] == windowKey:
+                current[1].add(x, y, timestamp)
+                return
+
+            self.__windows[name] = (windowKey, _MetricWindow(x, y, timestamp))
+
+            if current is None:
+                return
+
+            previous = current[1]
+            self.__completed.append((name, previous.x, previous.value(self.aggregation), previous.timestamp))
+            shouldFlush = len(self.__completed) >= self.maxPendingPoints
+
+        if shouldFlush:
+            self.__flushRequested.set()
+
+    def write(self, metricValues: Dict[str, Tuple[float, float]]) -> None:
+        """
+            Adds values for multiple metrics
+
+            Parameters
+            ----------
+            metricValues : Dict[str, Tuple[float, float]]
+                Values of metrics in this format {"name": x, y}
+        """
+
+        for name, (x, y) in metricValues.items():
+            self.add(name, x, y)
+
+    def __takePoints(self, includeOpen: bool) -> List[MetricPoint]:
+        now = time.monotonic()
+
+        with self.__lock:
+            points = self.__failed + self.__completed
+
+            self.__failed = []
+            self.__completed = []
+
+            for name, (_, window) in list(self.__windows.items()):
+                if includeOpen or now - window.updatedAt >= self.flushInterval:
+                    points.append((name, window.x, window.value(self.aggregation), window.timestamp))
+                    del self.__windows[name]
+
+        return points
+
+    def flush(self, includeOpen: bool = True) -> bool:
+        """
+            Submits buffered metric values
+
+            Parameters
+            ----------
+            includeOpen : bool
+                if True windows which can still receive values are submitted as well
+
+            Returns
+            -------
+            bool -> True if all buffered values were submitted, False otherwise
+        """
+
+        with self.__flushLock:
+            points = self.__takePoints(includeOpen)
+            if len(points) == 0:
+                return True
+
+            try:
+                success = self.__submitFunction(points)
+            except BaseException as exception:
+                logging.getLogger("coretexpylib").debug(">> [Coretex] Failed to submit metrics", exc_info = exception)
+                success = False
+
+            if not success:
+                with self.__lock:
+                    # Keep the newest points if the backend is unreachable for a long time
+                    self.__failed = (points + self.__failed)[-MAX_FAILED_POINTS:]
+
+            return success
+
+    def close(self) -> bool:
+        """
+            Stops the background flushing and submits
+            all remaining metric values
+
+            Returns
+            -------
+            bool -> True if all remaining values were submitted, False otherwise
+        """
+
+        if self.isClosed:
+            return True
+
+        self.__closed.set()
+        self.__flushRequested.set()
+        self.__worker.join()
+
+        return self.flush()
+
+    def __run(self) -> None:
+        while True:
+            self.__flushRequested.wait(self.flushInterval)
+            self.__flushRequested.clear()
+
+            if self.isClosed:
+                return
+
+            self.flush(includeOpen = False)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exceptionType: Optional[type],
+        exceptionValue: Optional[BaseException],
+        exceptionTraceback: Optional[TracebackType]
+    ) -> None:
+
+        self.close()
@@ -29,7 +29,7 @@ import json
 from .utils import createSnapshot
 from .artifact import Artifact
 from .status import TaskRunStatus
-from .metrics import Metric, MetricType
+from .metrics import Metric, MetricType, MetricsWriter, MetricAggregation, MetricPoint
 from .parameter import validateParameters, parameter_factory
 from .execution_type import ExecutionType
 from ..dataset import Dataset, LocalDataset, NetworkDataset
@@ -37,7 +37,7 @@ from ..project import ProjectType
 from ..model import Model
 from ..._folder_manager import folder_manager
 from ...codable import KeyDescriptor
-from ...networking import networkManager, NetworkObject, NetworkRequestError, FileData
+from ...networking import networkManager, asyncNetworkManager, NetworkObject, NetworkRequestError, FileData
 
 
 DatasetType = TypeVar("DatasetType", bound = Dataset)
@@ -198,12 +198,8 @@ class TaskRun(NetworkObject, Generic[DatasetType]):
 
         self.__parameters = {parameter.name: parameter.parseValue(self.projectType) for parameter in parameters}
 
-    def _isInterval(self, metricName: str) -> bool:
-        for metric in self.metrics:
-            if metric.name == metricName and metric.xType == MetricType.interval.name:
-                return True
-
-        return False
+    def _metricTypes(self) -> Dict[str, str]:
+        return {metric.name: metric.xType for metric in self.metrics}
 
     def updateStatus(
         self,
@@ -329,21 +325,90 @@ class TaskRun(NetworkObject, Generic[DatasetType]):
             True
         """
 
+        response = networkManager.post(f"{self._endpoint()}/metrics", self._metricsParameters(metricValues))
+        return not response.hasFailed()
+
+    async def submitMetricsAsync(self, metricValues: Dict[str, Tuple[float, float]]) -> bool:
+        """
+            Asynchronous variant of "submitMetrics" which sends
+            the metric values using "asyncNetworkManager"
+
+            Parameters
+            ----------
+            metricValues : Dict[str, Tuple[float, float]]
+                Values of metrics in this format {"name": x, y}
+
+            Returns
+            -------
+            bool -> True if metric values were submitted, False otherwise
+        """
+
+        response = await asyncNetworkManager.post(f"{self._endpoint()}/metrics", self._metricsParameters(metricValues))
+        return not response.hasFailed()
+
+    def metricsWriter(
+        self,
+        aggregation: MetricAggregation = MetricAggregation.last,
+        windowSize: Optional[float] = None,
+        flushInterval: float = 5.0,
+        maxPendingPoints: int = 1000
+    ) -> MetricsWriter:
+
+        """
+            Creates a writer which buffers metric values in memory and
+            submits them in batches from a background thread. Use it instead
+            of "submitMetrics" when metrics are written very frequently
+
+            Parameters
+            ----------
+            aggregation : MetricAggregation
+                how values which fall into the same window are reduced
+            windowSize : Optional[float]
+                size of the window along the x axis, if None values
+                with the same x value are reduced
+            flushInterval : float
+                number of seconds between background submissions
+            maxPendingPoints : int
+                number of buffered points after which submission is triggered early
+
+            Returns
+            -------
+            MetricsWriter -> writer which has to be closed once all values are written
+
+            Example
+            -------
+            >>> from coretex import currentTaskRun, MetricAggregation
+            \b
+            >>> with currentTaskRun().metricsWriter(MetricAggregation.mean) as writer:
+                    for step, loss in enumerate(losses):
+                        writer.add("loss", step, loss)
+        """
+
+        return MetricsWriter(self._submitMetricPoints, aggregation, windowSize, flushInterval, maxPendingPoints)
+
+    def _submitMetricPoints(self, points: List[MetricPoint]) -> bool:
+        response = networkManager.post(f"{self._endpoint()}/metrics", self._metricPointsParameters(points))
+        return not response.hasFailed()
+
+    def _metricsParameters(self, metricValues: Dict[str, Tuple[float, float]]) -> Dict[str, Any]:
+        now = time.time()
+        return self._metricPointsParameters([(key, x, y, now) for key, (x, y) in metricValues.items()])
+
+    def _metricPointsParameters(self, points: List[MetricPoint]) -> Dict[str, Any]:
+        metricTypes = self._metricTypes()
+
         metrics = [{
-            "timestamp": value[0] if self._isInterval(key) else time.time(),
-            "metric": key,
-            "x": value[0],
-            "y": value[1]
-        } for key, value in metricValues.items()]
+            "timestamp": x if metricTypes.get(name) == MetricType.interval.name else timestamp,
+            "metric": name,
+            "x": x,
+            "y": y
+        } for name, x, y, timestamp in points]
 
-        parameters: Dict[str, Any] = {
+        return {
             "experiment_id": self.id,
             "metrics": metrics
         }
 
-        response = networkManager.post(f"{self._endpoint()}/metrics", parameters)
-        return not response.hasFailed()
-
     def submitOutput(self, parameterName: str, value: Any) -> None:
         """
             Submit an output of this task to act as a parameter in tasks
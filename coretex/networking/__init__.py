@@ -17,9 +17,11 @@
 
 from .network_manager_base import NetworkManagerBase, RequestFailedError
 from .network_manager import networkManager
+from .async_network_manager import AsyncNetworkManager, asyncNetworkManager
 from .network_object import NetworkObject, DEFAULT_PAGE_SIZE
 from .network_response import NetworkResponse, NetworkRequestError
 from .request_type import RequestType
-from .chunk_upload_session import ChunkUploadSession, MAX_CHUNK_SIZE, fileChunkUpload
+from .chunk_upload_session import ChunkUploadSession, MAX_CHUNK_SIZE, MAX_UPLOAD_WORKER_COUNT, fileChunkUpload, fileChunkUploadAsync
 from .file_data import FileData
 from .utils import baseUrl
+from .retry_policy import RetryPolicy, RetryBudget, RetryStatistics
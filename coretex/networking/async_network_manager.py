@@ -0,0 +1,645 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Optional, Any, Dict, List, Union, Tuple, AsyncIterator
+from pathlib import Path
+from contextlib import ExitStack
+
+import os
+import json
+import uuid
+import asyncio
+import logging
+
+import httpx
+import requests
+
+from requests.structures import CaseInsensitiveDict
+
+from .utils import RequestBodyType, RequestFormType, logFilesData, logRequestFailure, getTimeoutForRetry
+from .request_type import RequestType
+from .network_response import NetworkResponse, NetworkRequestError
+from .network_manager_base import NetworkManagerBase, RequestFailedError, REQUEST_TIMEOUT, MAX_REQUEST_TIMEOUT, \
+    DOWNLOAD_TIMEOUT, MAX_DOWNLOAD_TIMEOUT, UPLOAD_TIMEOUT, MAX_UPLOAD_TIMEOUT, \
+    REFRESH_ENDPOINT, API_TOKEN_HEADER, API_TOKEN_KEY, DOWNLOAD_CHUNK_SIZE
+from .network_manager import networkManager
+from .multipart_stream import MultipartFormStream
+from .file_data import FileData
+
+
+logger = logging.getLogger("coretexpylib")
+
+# httpx logs every request with INFO level
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+MAX_CONNECTION_COUNT = 100
+STREAM_BLOCK_SIZE    = 256 * 1024  # 256 KiB
+
+
+def _toRequestsResponse(rawResponse: httpx.Response, content: bytes) -> requests.Response:
+    # Converts httpx response to requests response, so it can be
+    # wrapped by NetworkResponse and used the same way as responses
+    # returned by the blocking NetworkManager
+
+    response = requests.Response()
+    response.status_code = rawResponse.status_code
+    response.headers = CaseInsensitiveDict(rawResponse.headers)
+    response.url = str(rawResponse.url)
+    response.reason = rawResponse.reason_phrase
+    response.encoding = rawResponse.encoding
+    response._content = content
+
+    request = requests.PreparedRequest()
+    request.method = rawResponse.request.method
+    request.url = str(rawResponse.request.url)
+    response.request = request
+
+    return response
+
+
+async def _iterStream(stream: MultipartFormStream) -> AsyncIterator[bytes]:
+    stream.seek(0)
+
+    while True:
+        block = stream.read(STREAM_BLOCK_SIZE)
+        if len(block) == 0:
+            break
+
+        yield bytes(block)
+
+
+async def _writeToFile(rawResponse: httpx.Response, destination: Path) -> None:
+    # Response is written to a temporary file which is renamed once the download
+    # finishes, so a failed download never leaves a partial file at the destination.
+    # Blocking file operations are executed outside of the event loop
+    loop = asyncio.get_running_loop()
+    tmpPath = destination.parent / f".{destination.name}.{uuid.uuid4()}.part"
+
+    file = await loop.run_in_executor(None, tmpPath.open, "wb")
+
+    try:
+        try:
+            async for chunk in rawResponse.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                await loop.run_in_executor(None, file.write, chunk)
+        finally:
+            await loop.run_in_executor(None, file.close)
+
+        await loop.run_in_executor(None, os.replace, tmpPath, destination)
+    except BaseException:
+        tmpPath.unlink(missing_ok = True)
+        raise
+
+
+class AsyncNetworkManager:
+
+    """
+        Asynchronous counterpart of NetworkManagerBase. Requests are sent over
+        a single event loop, so a large number of concurrent requests does not
+        require a thread per request.
+
+        Credentials (API and refresh tokens) are shared with the provided
+        blocking network manager, so authenticating using one of them
+        authenticates both. Requests are retried in the same way
+        as the requests sent using the blocking network manager.
+
+        Properties
+        ----------
+        manager : NetworkManagerBase
+            network manager whose credentials are used for sending requests
+        maxConnectionCount : int
+            maximum number of open connections, requests which are sent
+            while all connections are in use wait for a free connection
+
+        Example
+        -------
+        >>> import asyncio
+        >>> from coretex.networking import asyncNetworkManager
+        \b
+        >>> async def main():
+                response = await asyncNetworkManager.get("dataset", { "page_size": 10 })
+                print(response.getJson(list))
+        >>> asyncio.run(main())
+    """
+
+    def __init__(self, manager: NetworkManagerBase, maxConnectionCount: int = MAX_CONNECTION_COUNT) -> None:
+        self.manager = manager
+        self.maxConnectionCount = maxConnectionCount
+
+        self.__client: Optional[httpx.AsyncClient] = None
+        self.__clientLoop: Optional[asyncio.AbstractEventLoop] = None
+        self.__refreshLock: Optional[asyncio.Lock] = None
+        self.__lastRefreshResponse: Optional[NetworkResponse] = None
+
+    @property
+    def serverUrl(self) -> str:
+        return self.manager.serverUrl
+
+    def _headers(self, contentType: str = "application/json") -> Dict[str, str]:
+        return self.manager._headers(contentType)
+
+    def _client(self) -> httpx.AsyncClient:
+        # httpx client and asyncio primitives are bound to the event loop in which
+        # they were created, so they are recreated if this manager is used from
+        # a different event loop (e.g. multiple calls to asyncio.run)
+
+        loop = asyncio.get_running_loop()
+
+        if self.__client is None or self.__clientLoop is not loop:
+            limits = httpx.Limits(
+                max_connections = self.maxConnectionCount,
+                max_keepalive_connections = self.maxConnectionCount
+            )
+
+            self.__client = httpx.AsyncClient(limits = limits)
+            self.__clientLoop = loop
+            self.__refreshLock = asyncio.Lock()
+
+        return self.__client
+
+    async def close(self) -> None:
+        """
+            Closes all connections opened by this manager
+        """
+
+        if self.__client is not None:
+            await self.__client.aclose()
+
+        self.__client = None
+        self.__clientLoop = None
+        self.__refreshLock = None
+
+    async def shouldRetry(self, retryCount: int, response: Optional[NetworkResponse], apiToken: Optional[str] = None) -> bool:
+        """
+            Checks if network request should be repeated based on the number of repetitions
+            as well as the response from previous repetition. Uses "retryPolicy" of the
+            wrapped manager, so the retry budget is shared with blocking requests.
+
+            Parameters
+            ----------
+            retryCount : int
+                number of repeated function calls
+            response : Optional[NetworkResponse]
+                response of the request which is pending for retry
+            apiToken : Optional[str]
+                API token which was used for sending the request
+
+            Returns
+            -------
+            bool -> True if the request should be retried, False if not
+        """
+
+        retryPolicy = self.manager.retryPolicy
+
+        if response is not None:
+            # If we get unauthorized maybe API token is expired
+            # If refresh endpoint failed with unauthorized do not retry
+            if response.isUnauthorized() and response.endpoint != REFRESH_ENDPOINT:
+                if retryCount >= retryPolicy.maxRetryCount:
+                    return False
+
+                refreshTokenResponse = await self.refreshToken(apiToken)
+                return not refreshTokenResponse.hasFailed()
+
+            if not retryPolicy.isRetryableStatus(response.statusCode):
+                retryPolicy.onSuccess()
+                return False
+
+        retryPolicy.onFailure()
+        return retryPolicy.acquire(retryCount)
+
+    async def __send(
+        self,
+        endpoint: str,
+        requestType: RequestType,
+        headers: Optional[Dict[str, str]],
+        query: Optional[Dict[str, Any]],
+        body: Optional[Union[RequestBodyType, MultipartFormStream]],
+        files: Optional[RequestFormType],
+        auth: Optional[Tuple[str, str]],
+        timeout: Tuple[int, int],
+        maxTimeout: Tuple[int, int],
+        destination: Optional[Path]
+    ) -> NetworkResponse:
+
+        if headers is None:
+            headers = self._headers()
+
+        url = self.serverUrl + endpoint
+        client = self._client()
+        retryPolicy = self.manager.retryPolicy
+        retryCount = 0
+        delay = 0.0
+
+        retryPolicy.onRequest()
+
+        while True:
+            logger.debug(f">> [Coretex] Sending async request to \"{url}\"")
+            logger.debug(f"\tType: {requestType}")
+            logger.debug(f"\tQuery: {query}")
+            logger.debug(f"\tBody: {body}")
+            logger.debug(f"\tFiles: {logFilesData(files)}")
+            logger.debug(f"\tTimeout: {timeout}")
+            logger.debug(f"\tRetry count: {retryCount}")
+
+            content: Optional[Union[str, AsyncIterator[bytes]]] = None
+            data: Optional[RequestBodyType] = None
+
+            if isinstance(body, MultipartFormStream):
+                # Stream is recreated for every attempt since it is consumed by the previous one
+                content = _iterStream(body)
+            elif body is not None and headers.get("Content-Type") == "application/json":
+                content = json.dumps(body)
+            else:
+                data = body
+
+            connectTimeout, readTimeout = timeout
+            requestTimeout = httpx.Timeout(connect = connectTimeout, read = readTimeout, write = readTimeout, pool = None)
+
+            apiToken = headers.get(API_TOKEN_HEADER)
+
+            try:
+                rawRequest = client.build_request(
+                    requestType.value,
+                    url,
+                    params = query,
+                    content = content,
+                    data = data,
+                    files = files,
+                    headers = headers,
+                    timeout = requestTimeout
+                )
+
+                rawResponse = await client.send(rawRequest, auth = auth, stream = destination is not None)
+
+                try:
+                    if destination is not None and not rawResponse.is_error:
+                        await _writeToFile(rawResponse, destination)
+                        responseContent = b""
+                    else:
+                        responseContent = await rawResponse.aread()
+                finally:
+                    await rawResponse.aclose()
+
+                response = NetworkResponse(_toRequestsResponse(rawResponse, responseContent), endpoint)
+                if response.hasFailed():
+                    logRequestFailure(endpoint, response)
+
+                if not await self.shouldRetry(retryCount, response, apiToken):
+                    return response
+
+                # Unauthorized requests are retried immediately after the token was refreshed
+                if not response.isUnauthorized():
+                    delay = retryPolicy.getDelay(delay, response)
+                    await retryPolicy.sleepAsync(delay, endpoint)
+            except httpx.TransportError as ex:
+                logger.debug(f">> [Coretex] Request failed. Reason \"{ex}\"", exc_info = ex)
+
+                if not await self.shouldRetry(retryCount, None):
+                    raise RequestFailedError(endpoint, requestType)
+
+                # If an exception happened during the request add a delay before retrying
+                delay = retryPolicy.getDelay(delay, None)
+                await retryPolicy.sleepAsync(delay, endpoint)
+
+                if isinstance(ex, httpx.TimeoutException):
+                    # If request failed due to timeout recalculate (increase) the timeout
+                    timeout = getTimeoutForRetry(retryCount + 1, timeout, maxTimeout)
+
+            if self.manager._apiToken is not None:
+                headers[API_TOKEN_HEADER] = self.manager._apiToken
+
+            retryCount += 1
+
+    async def request(
+        self,
+        endpoint: str,
+        requestType: RequestType,
+        headers: Optional[Dict[str, str]] = None,
+        query: Optional[Dict[str, Any]] = None,
+        body: Optional[Union[RequestBodyType, MultipartFormStream]] = None,
+        files: Optional[RequestFormType] = None,
+        auth: Optional[Tuple[str, str]] = None,
+        timeout: Tuple[int, int] = REQUEST_TIMEOUT,
+        maxTimeout: Tuple[int, int] = MAX_REQUEST_TIMEOUT
+    ) -> NetworkResponse:
+
+        """
+            Sends an HTTP request with provided parameters
+            This method is used as a base for all other AsyncNetworkManager methods
+
+            Parameters
+            ----------
+            endpoint : str
+                endpoint to which the request is sent
+            requestType : RequestType
+                type of the request which is sent (get, post, put, delete, etc...)
+            headers : Optional[Dict[str, Any]]
+                headers which will be sent with request, if None default values will be used
+            query : Optional[Dict[str, Any]]
+                parameters which will be sent as query parameters
+            body : Optional[Union[RequestBodyType, MultipartFormStream]]
+                parameters which will be sent as request body, or a stream
+                from which the request body will be read
+            files : Optional[RequestFormType]
+                files which will be sent as a part of form data request
+            auth : Optional[Tuple[str, str]]
+                credentials which will be send as basic auth header
+            timeout : Tuple[int, int]
+                timeout for the request, default <connection: 5s>, <read: 10s>
+            maxTimeout : Tuple[int, int]
+                timeout for the request, default <connection: 60s>, <read: 180s>
+
+            Returns
+            -------
+            NetworkResponse -> object containing the request response
+
+            Raises
+            ------
+            RequestFailedError -> if request failed due to connection issues
+        """
+
+        return await self.__send(endpoint, requestType, headers, query, body, files, auth, timeout, maxTimeout, None)
+
+    async def head(
+        self,
+        endpoint: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> NetworkResponse:
+
+        """
+            Sends head HTTP request
+
+            Parameters
+            ----------
+            endpoint : str
+                endpoint to which the request is sent
+            params : Optional[RequestBodyType]
+                query parameters of the request
+            headers : Optional[Dict[str, str]]
+                additional headers of the request
+
+            Returns
+            -------
+            NetworkResponse -> object containing the request response
+        """
+
+        if headers is not None:
+            headers = {**self._headers(), **headers}
+
+        return await self.request(endpoint, RequestType.head, headers, query = params)
+
+    async def post(self, endpoint: str, params: Optional[RequestBodyType] = None) -> NetworkResponse:
+        """
+            Sends post HTTP request
+
+            Parameters
+            ----------
+            endpoint : str
+                endpoint to which the request is sent
+            params : Optional[RequestBodyType]
+                body of the request
+
+            Returns
+            -------
+            NetworkResponse -> object containing the request response
+        """
+
+        return await self.request(endpoint, RequestType.post, body = params)
+
+    async def get(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> NetworkResponse:
+        """
+            Sends get HTTP request
+
+            Parameters
+            ----------
+            endpoint : str
+                endpoint to which the request is sent
+            params : Optional[RequestBodyType]
+                query parameters of the request
+
+            Returns
+            -------
+            NetworkResponse -> object containing the request response
+        """
+
+        return await self.request(endpoint, RequestType.get, query = params)
+
+    async def put(self, endpoint: str, params: Optional[RequestBodyType] = None) -> NetworkResponse:
+        """
+            Sends put HTTP request
+
+            Parameters
+            ----------
+            endpoint : str
+                endpoint to which the request is sent
+            params : Optional[RequestBodyType]
+                body of the request
+
+            Returns
+            -------
+            NetworkResponse -> object containing the request response
+        """
+
+        return await self.request(endpoint, RequestType.put, body = params)
+
+    async def delete(self, endpoint: str) -> NetworkResponse:
+        """
+            Sends delete HTTP request
+
+            Parameters
+            ----------
+            endpoint : str
+                endpoint to which the request is sent
+
+            Returns
+            -------
+            NetworkResponse -> object containing the request response
+        """
+
+        return await self.request(endpoint, RequestType.delete)
+
+    async def formData(
+        self,
+        endpoint: str,
+        params: Optional[Dict[str, Any]] = None,
+        files: Optional[List[FileData]] = None
+    ) -> NetworkResponse:
+
+        """
+            Sends multipart/form-data request
+
+            Parameters
+            ----------
+            endpoint : str
+                endpoint to which the request is sent
+            params : Optional[Dict[str, Any]]
+                form data parameters
+            files : Optional[List[FileData]]
+                form data files
+
+            Returns
+            -------
+            NetworkResponse -> object containing the request response
+        """
+
+        if files is None:
+            files = []
+
+        with ExitStack() as stack:
+            headers = self._headers("multipart/form-data")
+            del headers["Content-Type"]
+
+            body: Optional[Union[RequestBodyType, MultipartFormStream]] = params
+            filesData: Optional[RequestFormType] = None
+
+            if any(file.isStreamed for file in files):
+                stream = stack.enter_context(MultipartFormStream(params, files))
+                headers["Content-Type"] = stream.contentType
+                headers["Content-Length"] = str(len(stream))
+                body = stream
+            elif len(files) > 0:
+                filesData = [file.prepareForUpload(stack) for file in files]
+
+            if len(files) > 0:
+                response = await self.request(endpoint, RequestType.options)
+                if response.hasFailed():
+                    raise NetworkRequestError(response, "Could not establish a connection with the server")
+
+                # If files are being uploaded bigger timeout is required
+                timeout = UPLOAD_TIMEOUT
+                maxTimeout = MAX_UPLOAD_TIMEOUT
+            else:
+                # If there are no files there is no need for big timeouts
+                timeout = REQUEST_TIMEOUT
+                maxTimeout = MAX_REQUEST_TIMEOUT
+
+            return await self.request(
+                endpoint,
+                RequestType.post,
+                headers,
+                body = body,
+                files = filesData,
+                timeout = timeout,
+                maxTimeout = maxTimeout
+            )
+
+        # mypy is complaining about missing return statement but this code is unreachable
+        # see: https://github.com/python/mypy/issues/7726
+        raise RuntimeError("Unreachable")
+
+    async def download(
+        self,
+        endpoint: str,
+        destination: Union[Path, str],
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> NetworkResponse:
+
+        """
+            Downloads file to the given destination
+
+            Parameters
+            ----------
+            endpoint : str
+                endpoint to which the request is sent
+            destination : Union[Path, str]
+                path to save file
+            params : Optional[Dict[str, Any]]
+                query parameters of the request
+            headers : Optional[Dict[str, str]]
+                additional headers of the request
+
+            Returns
+            -------
+            NetworkResponse -> object containing the request response
+        """
+
+        if isinstance(destination, str):
+            destination = Path(destination)
+
+        # If the destination exists check if it's corrupted
+        if destination.exists():
+            response = await self.head(endpoint, params, headers)
+            if response.hasFailed():
+                return response
+
+            # If the Content-Length returned by the head request is not equal to destination's
+            # file size force the file to be re-downloaded
+            try:
+                contentLength = int(response.headers["Content-Length"])
+                if destination.stat().st_size == contentLength:
+                    return response
+            except (ValueError, KeyError):
+                pass
+
+        if headers is not None:
+            headers = {**self._headers(), **headers}
+
+        # Timeout for download applies per chunk, not for the full file download
+        return await self.__send(
+            endpoint,
+            RequestType.get,
+            headers,
+            params,
+            None,
+            None,
+            None,
+            DOWNLOAD_TIMEOUT,
+            MAX_DOWNLOAD_TIMEOUT,
+            destination
+        )
+
+    async def refreshToken(self, staleToken: Optional[str] = None) -> NetworkResponse:
+        """
+            Uses refresh token functionality to fetch new API access token.
+            If the API token was already refreshed by another request
+            since the "staleToken" was used it will not be refreshed again.
+
+            Parameters
+            ----------
+            staleToken : Optional[str]
+                API token which was rejected by the server
+
+            Returns
+            -------
+            NetworkResponse -> object containing the request response
+        """
+
+        if self.manager._refreshToken is None:
+            raise ValueError(f">> [Coretex] Cannot send \"{REFRESH_ENDPOINT}\" request, refreshToken is None")
+
+        self._client()
+        if self.__refreshLock is None:
+            raise RuntimeError(">> [Coretex] Refresh lock is not initialized")
+
+        async with self.__refreshLock:
+            if staleToken is not None and self.__lastRefreshResponse is not None and self.manager._apiToken != staleToken:
+                return self.__lastRefreshResponse
+
+            headers = self._headers()
+            headers[API_TOKEN_HEADER] = self.manager._refreshToken
+
+            response = await self.request(REFRESH_ENDPOINT, RequestType.post, headers = headers)
+            if not response.hasFailed():
+                self.manager._apiToken = response.getJson(dict)[API_TOKEN_KEY]
+
+            self.__lastRefreshResponse = response
+            return response
+
+
+asyncNetworkManager = AsyncNetworkManager(networkManager)
@@ -15,23 +15,25 @@
 #     You should have received a copy of the GNU Affero General Public License
 #     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from typing import Union
+from typing import Union, Optional, Set, Tuple, List, Dict, Any
 from pathlib import Path
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_EXCEPTION, wait
 
+import os
+import json
+import asyncio
+import hashlib
 import logging
 
 from .network_manager_base import FileData
 from .network_manager import networkManager
-from .network_response import NetworkRequestError
+from .async_network_manager import asyncNetworkManager
+from .network_response import NetworkResponse, NetworkRequestError
 
 
 MAX_CHUNK_SIZE = 128 * 1024 * 1024  # 128 MiB
-
-
-def _loadChunk(filePath: Path, start: int, chunkSize: int) -> bytes:
-    with filePath.open("rb") as file:
-        file.seek(start)
-        return file.read(chunkSize)
+MAX_UPLOAD_WORKER_COUNT = 8
 
 
 class ChunkUploadSession:
@@ -44,6 +46,14 @@ class ChunkUploadSession:
 
         Maximum chunk size is 128 MiB.
 
+        Chunks can be uploaded concurrently by setting "workerCount" to
+        a value larger than 1. Chunks are streamed directly from the
+        memory-mapped file, so they are never loaded into memory.
+
+        If "resumable" is True, ranges which were confirmed by the server
+        are persisted, so if the upload of the same (unchanged) file is
+        interrupted the next upload continues from the last confirmed chunk.
+
         Properties
         ----------
         chunkSize : int
@@ -53,25 +63,104 @@ class ChunkUploadSession:
             path to the file which will be uploaded
         fileSize : int
             size of the file which will be uploaded
+        workerCount : int
+            number of chunks which are uploaded at the same time
+            maximum value is 8, while the minimum value is 1
+        resumable : bool
+            if True upload progress is persisted and used to resume
+            interrupted uploads
     """
 
-    def __init__(self, chunkSize: int, filePath: Union[Path, str]) -> None:
+    def __init__(
+        self,
+        chunkSize: int,
+        filePath: Union[Path, str],
+        workerCount: int = 1,
+        resumable: bool = True
+    ) -> None:
+
         if chunkSize <= 0 or chunkSize > MAX_CHUNK_SIZE:
             raise ValueError(f">> [Coretex] Invalid \"chunkSize\" value \"{chunkSize}\". Value must be in range 0-{MAX_CHUNK_SIZE}")
 
+        if workerCount <= 0 or workerCount > MAX_UPLOAD_WORKER_COUNT:
+            raise ValueError(f">> [Coretex] Invalid \"workerCount\" value \"{workerCount}\". Value must be in range 1-{MAX_UPLOAD_WORKER_COUNT}")
+
         if isinstance(filePath, str):
             filePath = Path(filePath)
 
         self.chunkSize = chunkSize
         self.filePath = filePath
         self.fileSize = filePath.lstat().st_size
+        self.workerCount = workerCount
+        self.resumable = resumable
 
-    def __start(self) -> str:
-        parameters = {
-            "size": self.fileSize
-        }
+        self.__stateLock = Lock()
 
-        response = networkManager.post("upload/start", parameters)
+    @property
+    def chunkCount(self) -> int:
+        chunkCount = self.fileSize // self.chunkSize
+        if self.fileSize % self.chunkSize != 0:
+            chunkCount += 1
+
+        return chunkCount
+
+    @property
+    def statePath(self) -> Path:
+        """
+            Path to the file which contains the progress of the upload.
+            File is identified by its absolute path, size, modification
+            time and chunk size, so if any of those change the upload
+            will not be resumed.
+        """
+
+        # folder_manager can't be imported at module level since the networking
+        # module is loaded before the storage path is synced with the environment
+        from .._folder_manager import folder_manager
+
+        stat = self.filePath.stat()
+        identifier = f"{self.filePath.absolute()}:{stat.st_size}:{stat.st_mtime_ns}:{self.chunkSize}"
+
+        return folder_manager.uploadsFolder / f"{hashlib.sha256(identifier.encode()).hexdigest()}.json"
+
+    def __loadState(self) -> Optional[Tuple[str, Set[int]]]:
+        if not self.resumable or not self.statePath.exists():
+            return None
+
+        try:
+            with self.statePath.open("r") as file:
+                state = json.load(file)
+
+            uploadId = state["id"]
+            completed = set(state["completed"])
+        except (ValueError, KeyError, TypeError) as ex:
+            logging.getLogger("coretexpylib").debug(f">> [Coretex] Failed to load upload state for \"{self.filePath}\". Reason: {ex}")
+            return None
+
+        if not isinstance(uploadId, str):
+            return None
+
+        return uploadId, completed
+
+    def __saveState(self, uploadId: str, completed: Set[int]) -> None:
+        if not self.resumable:
+            return
+
+        with self.__stateLock:
+            # Write to a temporary file and then rename it so the state file
+            # is never left half-written if the process is killed
+            tmpPath = self.statePath.with_suffix(".tmp")
+            with tmpPath.open("w") as file:
+                json.dump({ "id": uploadId, "completed": sorted(completed) }, file)
+
+            os.replace(tmpPath, self.statePath)
+
+    def __clearState(self) -> None:
+        if not self.resumable:
+            return
+
+        self.statePath.unlink(missing_ok = True)
+
+    def __getUploadId(self, response: NetworkResponse) -> str:
         if response.hasFailed():
             raise NetworkRequestError(response, f"Failed to start chunked upload for \"{self.filePath}\"")
 
@@ -82,24 +171,66 @@ class ChunkUploadSession:
 
         return uploadId
 
-    def __uploadChunk(self, uploadId: str, start: int, end: int) -> None:
+    def __start(self) -> str:
+        parameters = {
+            "size": self.fileSize
+        }
+
+        response = networkManager.post("upload/start", parameters)
+        return self.__getUploadId(response)
+
+    async def __startAsync(self) -> str:
+        parameters = {
+            "size": self.fileSize
+        }
+
+        response = await asyncNetworkManager.post("upload/start", parameters)
+        return self.__getUploadId(response)
+
+    def __chunkRange(self, index: int) -> Tuple[int, int]:
+        start = index * self.chunkSize
+        end = min(start + self.chunkSize, self.fileSize)
+
+        return start, end
+
+    def __chunkRequest(self, uploadId: str, start: int, end: int) -> Tuple[Dict[str, Any], List[FileData]]:
         parameters = {
             "id": uploadId,
             "start": start,
             "end": end - 1  # API expects start/end to be inclusive
         }
 
-        chunk = _loadChunk(self.filePath, start, self.chunkSize)
         files = [
-            FileData.createFromBytes("file", chunk, self.filePath.name)
+            FileData.createFromFileRange("file", self.filePath, start, end - start, self.filePath.name)
         ]
 
-        response = networkManager.formData("upload/chunk", parameters, files)
+        return parameters, files
+
+    def __onChunkUploaded(self, response: NetworkResponse, uploadId: str, index: int, completed: Set[int]) -> None:
+        start, end = self.__chunkRange(index)
+
         if response.hasFailed():
             raise NetworkRequestError(response, f"Failed to upload file chunk with byte range \"{start}-{end}\"")
 
         logging.getLogger("coretexpylib").debug(f">> [Coretex] Uploaded chunk with range \"{start}-{end}\"")
 
+        with self.__stateLock:
+            completed.add(index)
+
+        self.__saveState(uploadId, completed)
+
+    def __uploadChunkAt(self, uploadId: str, index: int, completed: Set[int]) -> None:
+        parameters, files = self.__chunkRequest(uploadId, *self.__chunkRange(index))
+
+        response = networkManager.formData("upload/chunk", parameters, files)
+        self.__onChunkUploaded(response, uploadId, index, completed)
+
+    async def __uploadChunkAtAsync(self, uploadId: str, index: int, completed: Set[int]) -> None:
+        parameters, files = self.__chunkRequest(uploadId, *self.__chunkRange(index))
+
+        response = await asyncNetworkManager.formData("upload/chunk", parameters, files)
+        self.__onChunkUploaded(response, uploadId, index, completed)
+
     def run(self) -> str:
         """
             Uploads the file to Coretex.ai
@@ -118,7 +249,7 @@ class ChunkUploadSession:
             >>> from coretex.networking import ChunkUploadSession, NetworkRequestError
             \b
             >>> chunkSize = 16 * 1024 * 1024  # chunk size: 16 MiB
-            >>> uploadSession = ChunkUploadSession(chunkSize, path/fo/file.ext)
+            >>> uploadSession = ChunkUploadSession(chunkSize, path/fo/file.ext, workerCount = 4)
             \b
             >>> try:
                     uploadId = uploadSession.run()
@@ -126,24 +257,121 @@ class ChunkUploadSession:
                 except NetworkRequestError, ValueError:
                     print("Failed to upload file")
         """
+
+        state = self.__loadState()
+        if state is not None:
+            uploadId, completed = state
+            logging.getLogger("coretexpylib").debug(f">> [Coretex] Resuming upload for \"{self.filePath}\", {len(completed)}/{self.chunkCount} chunks already uploaded")
+
+            try:
+                self.__uploadChunks(uploadId, completed)
+
+                self.__clearState()
+                return uploadId
+            except NetworkRequestError as ex:
+                # Upload session could have expired on the server, start it from scratch
+                logging.getLogger("coretexpylib").debug(f">> [Coretex] Failed to resume upload for \"{self.filePath}\", restarting. Reason: {ex}")
+                self.__clearState()
+
         logging.getLogger("coretexpylib").debug(f">> [Coretex] Starting upload for \"{self.filePath}\"")
 
         uploadId = self.__start()
+        completed = set()
 
-        chunkCount = self.fileSize // self.chunkSize
-        if self.fileSize % self.chunkSize != 0:
-            chunkCount += 1
+        self.__saveState(uploadId, completed)
+        self.__uploadChunks(uploadId, completed)
+
+        self.__clearState()
+        return uploadId
+
+    def __uploadChunks(self, uploadId: str, completed: Set[int]) -> None:
+        pending = [index for index in range(self.chunkCount) if index not in completed]
+
+        if self.workerCount == 1:
+            for index in pending:
+                self.__uploadChunkAt(uploadId, index, completed)
+
+            return
+
+        with ThreadPoolExecutor(max_workers = self.workerCount) as pool:
+            futures: List[Future] = [
+                pool.submit(self.__uploadChunkAt, uploadId, index, completed)
+                for index in pending
+            ]
+
+            done, notDone = wait(futures, return_when = FIRST_EXCEPTION)
+            for future in notDone:
+                future.cancel()
+
+        for future in done:
+            exception = future.exception()
+            if exception is not None:
+                raise exception
+
+    async def runAsync(self) -> str:
+        """
+            Uploads the file to Coretex.ai using "asyncNetworkManager".
+            Up to "workerCount" chunks are uploaded at the same time.
+
+            Returns
+            -------
+            str -> ID of the uploaded file
 
-        for i in range(chunkCount):
-            start = i * self.chunkSize
-            end = min(start + self.chunkSize, self.fileSize)
+            Raises
+            ------
+            NetworkRequestError, ValueError -> if some kind of error happened during
+            the upload of the provided file
+        """
 
-            self.__uploadChunk(uploadId, start, end)
+        state = self.__loadState()
+        if state is not None:
+            uploadId, completed = state
+            logging.getLogger("coretexpylib").debug(f">> [Coretex] Resuming upload for \"{self.filePath}\", {len(completed)}/{self.chunkCount} chunks already uploaded")
 
+            try:
+                await self.__uploadChunksAsync(uploadId, completed)
+
+                self.__clearState()
+                return uploadId
+            except NetworkRequestError as ex:
+                # Upload session could have expired on the server, start it from scratch
+                logging.getLogger("coretexpylib").debug(f">> [Coretex] Failed to resume upload for \"{self.filePath}\", restarting. Reason: {ex}")
+                self.__clearState()
+
+        logging.getLogger("coretexpylib").debug(f">> [Coretex] Starting upload for \"{self.filePath}\"")
+
+        uploadId = await self.__startAsync()
+        completed = set()
+
+        self.__saveState(uploadId, completed)
+        await self.__uploadChunksAsync(uploadId, completed)
+
+        self.__clearState()
         return uploadId
 
+    async def __uploadChunksAsync(self, uploadId: str, completed: Set[int]) -> None:
+        semaphore = asyncio.Semaphore(self.workerCount)
+
+        async def uploadChunk(index: int) -> None:
+            async with semaphore:
+                await self.__uploadChunkAtAsync(uploadId, index, completed)
 
-def fileChunkUpload(path: Path, chunkSize: int = MAX_CHUNK_SIZE) -> str:
+        tasks = [
+            asyncio.ensure_future(uploadChunk(index))
+            for index in range(self.chunkCount)
+            if index not in completed
+        ]
+
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+
+            raise
+
+
+def fileChunkUpload(path: Path, chunkSize: int = MAX_CHUNK_SIZE, workerCount: int = 1) -> str:
     """
         Uploads file in chunks to Coretex.ai server.
         Should be used when uploading large files.
@@ -155,6 +383,9 @@ def fileChunkUpload(path: Path, chunkSize: int = MAX_CHUNK_SIZE) -> str:
         chunkSize : int
             Size of the chunks into which file will be split
             before uploading. Maximum value is 128 MiBs
+        workerCount : int
+            Number of chunks which are uploaded at the same time.
+            Maximum value is 8
 
         Returns
         -------
@@ -167,5 +398,36 @@ def fileChunkUpload(path: Path, chunkSize: int = MAX_CHUNK_SIZE) -> str:
     if chunkSize > MAX_CHUNK_SIZE:
         chunkSize = MAX_CHUNK_SIZE
 
-    uploadSession = ChunkUploadSession(MAX_CHUNK_SIZE, path)
+    uploadSession = ChunkUploadSession(chunkSize, path, workerCount)
     return uploadSession.run()
+
+
+async def fileChunkUploadAsync(path: Path, chunkSize: int = MAX_CHUNK_SIZE, workerCount: int = 1) -> str:
+    """
+        Uploads file in chunks to Coretex.ai server using "asyncNetworkManager".
+        Should be used when uploading large files.
+
+        Parameters
+        ----------
+        path : Path
+            File which will be uploaded in chunks
+        chunkSize : int
+            Size of the chunks into which file will be split
+            before uploading. Maximum value is 128 MiBs
+        workerCount : int
+            Number of chunks which are uploaded at the same time.
+            Maximum value is 8
+
+        Returns
+        -------
+        str -> id of the file which was uploaded
+    """
+
+    if not path.is_file():
+        raise ValueError(f"{path} is not a file")
+
+    if chunkSize > MAX_CHUNK_SIZE:
+        chunkSize = MAX_CHUNK_SIZE
+
+    uploadSession = ChunkUploadSession(chunkSize, path, workerCount)
+    return await uploadSession.runAsync()
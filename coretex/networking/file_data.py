@@ -33,10 +33,12 @@ class FileData:
         "filePath" will upload the file from the specified path, while
         "fileBytes" will upload the file directly from the memory.
         If both parameters have value "fileBytes" will be used.
+        If "fileRange" is set only the specified byte range of the
+        file located at "filePath" will be uploaded.
 
         Objects of this class should not be instantiated directly,
-        use either "FileData.createFromPath" or "FileData.createFromBytes"
-        to instantiate the object.
+        use either "FileData.createFromPath", "FileData.createFromBytes"
+        or "FileData.createFromFileRange" to instantiate the object.
 
         Properties
         ----------
@@ -50,6 +52,8 @@ class FileData:
             Path to the file which will be uploaded
         fileBytes : Optional[bytes]
             Bytes of the file which will be uploaded
+        fileRange : Optional[Tuple[int, int]]
+            Offset and length of the part of the file which will be uploaded
     """
 
     def __init__(
@@ -58,7 +62,8 @@ class FileData:
         fileName: str,
         mimeType: str,
         filePath: Optional[Path] = None,
-        fileBytes: Optional[bytes] = None
+        fileBytes: Optional[bytes] = None,
+        fileRange: Optional[Tuple[int, int]] = None
     ) -> None:
 
         if filePath is None and fileBytes is None:
@@ -69,6 +74,17 @@ class FileData:
         self.mimeType = mimeType
         self.filePath = filePath
         self.fileBytes = fileBytes
+        self.fileRange = fileRange
+
+    @property
+    def isStreamed(self) -> bool:
+        """
+            True if the file contents should be streamed from disk
+            while the request is being sent instead of being loaded
+            into memory before sending the request
+        """
+
+        return self.fileBytes is None and self.fileRange is not None
 
     @classmethod
     def createFromPath(
@@ -156,10 +172,78 @@ class FileData:
 
         return cls(parameterName, fileName, mimeType, fileBytes = fileBytes)
 
+    @classmethod
+    def createFromFileRange(
+        cls,
+        parameterName: str,
+        filePath: Union[Path, str],
+        offset: int,
+        length: int,
+        fileName: Optional[str] = None,
+        mimeType: Optional[str] = None
+    ) -> Self:
+
+        """
+            Creates "FileData" object which describes a byte range of the
+            specified file. Contents of the range are streamed directly from
+            the memory-mapped file when uploaded using "NetworkManager.formData",
+            so they are never loaded into memory as a whole.
+
+            Parameters
+            ----------
+            parameterName : str
+                Name of the form-data parameter
+            filePath : Union[Path, str]
+                Path to the file which contains the range which will be uploaded
+            offset : int
+                Offset of the first byte of the range
+            length : int
+                Number of bytes which will be uploaded, clamped to the end of the file
+            fileName : Optional[str]
+                Name of the file which will be uploaded, if None it will
+                be extracted from the "filePath" parameter
+            mimeType : Optional[str]
+                Mime type of the file which will be uploaded, if None it will
+                be set to "application/octet-stream".
+
+            Returns
+            -------
+            Self -> on object which describes how a file range should be uploaded
+
+            Raises
+            ------
+            ValueError -> if "filePath" is not a valid file or the range is invalid
+        """
+
+        if isinstance(filePath, str):
+            filePath = Path(filePath)
+
+        if not filePath.is_file():
+            raise ValueError(">> [Coretex] \"filePath\" is not a valid file")
+
+        fileSize = filePath.stat().st_size
+        if offset < 0 or length < 0 or offset > fileSize:
+            raise ValueError(f">> [Coretex] Invalid file range \"{offset}-{offset + length}\" for file of size \"{fileSize}\"")
+
+        if fileName is None:
+            fileName = filePath.stem
+
+        if mimeType is None:
+            mimeType = "application/octet-stream"
+
+        return cls(parameterName, fileName, mimeType, filePath = filePath, fileRange = (offset, min(length, fileSize - offset)))
+
     def __getFileData(self, exitStack: ExitStack) -> Union[bytes, BinaryIO]:
         if self.fileBytes is not None:
             return self.fileBytes
 
+        if self.filePath is not None and self.fileRange is not None:
+            offset, length = self.fileRange
+
+            with self.filePath.open("rb") as file:
+                file.seek(offset)
+                return file.read(length)
+
         if self.filePath is not None:
             return exitStack.enter_context(self.filePath.open("rb"))
 
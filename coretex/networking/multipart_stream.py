@@ -0,0 +1,232 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Optional, Any, Dict, List, Union, Tuple
+from typing_extensions import Self
+from types import TracebackType
+from pathlib import Path
+
+import io
+import mmap
+import logging
+
+from urllib3.fields import RequestField
+from urllib3.filepost import choose_boundary
+
+from .file_data import FileData
+
+
+logger = logging.getLogger("coretexpylib")
+
+# (path, offset, length) of the file region which is streamed
+FileSegment = Tuple[Path, int, int]
+Segment = Union[bytes, FileSegment]
+
+
+def _encodeField(value: Any) -> bytes:
+    if isinstance(value, bytes):
+        return value
+
+    return str(value).encode("utf-8")
+
+
+class MultipartFormStream(io.RawIOBase):
+
+    """
+        Read-only stream which produces a multipart/form-data request body.
+        File contents are not loaded into memory, instead they are served
+        directly from a memory-mapped view of the file while the body is
+        being sent, so memory usage does not depend on the size of the files.
+
+        Produces the same body as the requests library would for the
+        same parameters and files.
+
+        Objects of this class should be passed as the body of the request,
+        together with the header returned by "contentType".
+
+        Properties
+        ----------
+        boundary : str
+            multipart boundary which separates the form-data fields
+    """
+
+    def __init__(self, params: Optional[Dict[str, Any]], files: List[FileData]) -> None:
+        super().__init__()
+
+        self.boundary = choose_boundary()
+
+        self.__segments: List[Segment] = []
+        self.__maps: Dict[int, mmap.mmap] = {}
+        self.__index = 0
+        self.__segmentPosition = 0
+        self.__position = 0
+
+        if params is not None:
+            for name, values in params.items():
+                if isinstance(values, (str, bytes)) or not hasattr(values, "__iter__"):
+                    values = [values]
+
+                for value in values:
+                    if value is None:
+                        continue
+
+                    field = RequestField(name, b"")
+                    field.make_multipart()
+
+                    self.__addField(field, _encodeField(value))
+
+        for file in files:
+            field = RequestField(file.parameterName, b"", file.fileName)
+            field.make_multipart(content_type = file.mimeType)
+
+            if file.fileBytes is not None:
+                self.__addField(field, file.fileBytes)
+            elif file.filePath is not None:
+                offset, length = file.fileRange if file.fileRange is not None else (0, file.filePath.stat().st_size)
+                self.__addField(field, (file.filePath, offset, length))
+            else:
+                raise ValueError(">> [Coretex] Either \"filePath\" or \"fileData\" have to provided for file upload. \"fileData\" will be used if both are provided")
+
+        self.__segments.append(f"--{self.boundary}--\r\n".encode("latin-1"))
+        self.__length = sum(self.__segmentLength(segment) for segment in self.__segments)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exceptionType: Optional[type],
+        exceptionValue: Optional[BaseException],
+        exceptionTraceback: Optional[TracebackType]
+    ) -> None:
+
+        self.close()
+
+    def __len__(self) -> int:
+        return self.__length
+
+    @property
+    def contentType(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __addField(self, field: RequestField, data: Segment) -> None:
+        self.__segments.append(f"--{self.boundary}\r\n".encode("latin-1") + field.render_headers().encode("latin-1"))
+        self.__segments.append(data)
+        self.__segments.append(b"\r\n")
+
+    def __segmentLength(self, segment: Segment) -> int:
+        if isinstance(segment, bytes):
+            return len(segment)
+
+        return segment[2]
+
+    def __fileView(self, index: int, segment: FileSegment) -> memoryview:
+        path, offset, length = segment
+
+        fileMap = self.__maps.get(index)
+        if fileMap is None:
+            # mmap offset must be a multiple of the allocation granularity
+            alignedOffset = offset - (offset % mmap.ALLOCATIONGRANULARITY)
+
+            with path.open("rb") as file:
+                fileMap = mmap.mmap(file.fileno(), length + offset - alignedOffset, offset = alignedOffset, access = mmap.ACCESS_READ)
+
+            if hasattr(fileMap, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                fileMap.madvise(mmap.MADV_SEQUENTIAL)
+
+            self.__maps[index] = fileMap
+
+        start = offset % mmap.ALLOCATIONGRANULARITY
+        return memoryview(fileMap)[start:start + length]
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.__position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.__position
+        elif whence == io.SEEK_END:
+            offset += self.__length
+
+        if offset < 0:
+            raise ValueError(f">> [Coretex] Invalid seek position \"{offset}\"")
+
+        self.__position = min(offset, self.__length)
+
+        # Find the segment which contains the new position
+        self.__index = 0
+        self.__segmentPosition = self.__position
+
+        while self.__index < len(self.__segments):
+            segmentLength = self.__segmentLength(self.__segments[self.__index])
+            if self.__segmentPosition < segmentLength:
+                break
+
+            self.__segmentPosition -= segmentLength
+            self.__index += 1
+
+        return self.__position
+
+    def read(self, size: Optional[int] = -1) -> Union[bytes, memoryview]:
+        """
+            Reads at most "size" bytes from the body. Data is returned from at
+            most one segment, so the returned value can be shorter than "size"
+            even if the end of the body was not reached. File contents are returned
+            as a view into the mapped file and are not copied.
+        """
+
+        while self.__index < len(self.__segments):
+            segment = self.__segments[self.__index]
+            segmentLength = self.__segmentLength(segment)
+
+            if self.__segmentPosition >= segmentLength:
+                self.__index += 1
+                self.__segmentPosition = 0
+                continue
+
+            end = segmentLength if size is None or size < 0 else min(segmentLength, self.__segmentPosition + size)
+
+            data: Union[bytes, memoryview]
+            if isinstance(segment, bytes):
+                data = segment[self.__segmentPosition:end]
+            else:
+                data = self.__fileView(self.__index, segment)[self.__segmentPosition:end]
+
+            self.__position += end - self.__segmentPosition
+            self.__segmentPosition = end
+
+            return data
+
+        return b""
+
+    def close(self) -> None:
+        for fileMap in self.__maps.values():
+            try:
+                fileMap.close()
+            except BufferError:
+                # View into the mapped file is still referenced, the map
+                # will be closed once that reference is garbage collected
+                logger.debug(">> [Coretex] Failed to close memory-mapped file, it is still in use")
+
+        self.__maps.clear()
+        super().close()
@@ -15,14 +15,17 @@
 #     You should have received a copy of the GNU Affero General Public License
 #     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from typing import Optional, Any, Dict, List, Union, Tuple
+from typing import Optional, Any, Dict, List, Union, Tuple, BinaryIO
 from pathlib import Path
 from abc import ABC, abstractmethod
 from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_EXCEPTION, wait
 from http import HTTPStatus
 from importlib.metadata import version as getLibraryVersion
 
+import io
 import os
+import gzip
 import json
 import logging
 import platform
@@ -30,10 +33,13 @@ import platform
 import requests
 import requests.adapters
 
-from .utils import RequestBodyType, RequestFormType, logFilesData, logRequestFailure, sleepBeforeRetry, getTimeoutForRetry
+from .utils import RequestBodyType, RequestFormType, logFilesData, logRequestFailure, getTimeoutForRetry
 from .request_type import RequestType
 from .network_response import NetworkResponse, NetworkRequestError
 from .file_data import FileData
+from .multipart_stream import MultipartFormStream
+from .partial_download import PartialDownload
+from .retry_policy import RetryPolicy, defaultRetryPolicy
 
 
 logger = logging.getLogger("coretexpylib")
@@ -45,23 +51,18 @@ MAX_DOWNLOAD_TIMEOUT = (60, 180)   # Connection = 1 minute, Read = 3 minutes
 UPLOAD_TIMEOUT       = (5, 60)     # Connection = 5 seconds, Read = 1 minute
 MAX_UPLOAD_TIMEOUT   = (60, 1800)  # Connection = 1 minute, Read = 30 minutes
 
-MAX_RETRY_COUNT        = 5        # Request will be retried 5 times before raising an error
-MAX_DELAY_BEFORE_RETRY = 180      # 3 minute
-
 LOGIN_ENDPOINT    = "user/login"
 REFRESH_ENDPOINT  = "user/refresh"
 API_TOKEN_HEADER  = "api-token"
 API_TOKEN_KEY     = "token"
 REFRESH_TOKEN_KEY = "refresh_token"
 
-RETRY_STATUS_CODES = [
-    HTTPStatus.TOO_MANY_REQUESTS,
-    HTTPStatus.INTERNAL_SERVER_ERROR,
-    HTTPStatus.SERVICE_UNAVAILABLE
-]
-
 DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # 8 MB
 
+RANGED_DOWNLOAD_THRESHOLD = 64 * 1024 * 1024  # Files larger than 64 MiB are downloaded in parts
+RANGED_DOWNLOAD_PART_SIZE = 32 * 1024 * 1024  # 32 MiB
+DOWNLOAD_CONNECTION_COUNT = 4
+
 
 class RequestFailedError(Exception):
 
@@ -69,11 +70,53 @@ class RequestFailedError(Exception):
         super().__init__(f">> [Coretex] \"{type_.name}\" request failed for endpoint \"{endpoint}\"")
 
 
+class _RangeNotSupportedError(Exception):
+
+    """
+        Raised if the server ignored the requested byte range, either because
+        it does not support ranged requests or because the file has changed
+    """
+
+
+def _getContentLength(response: NetworkResponse) -> Optional[int]:
+    try:
+        return int(response.headers["Content-Length"])
+    except (ValueError, KeyError):
+        # KeyError - Content-Length is not present in headers
+        # ValueError - Content-Length cannot be converted to int
+        return None
+
+
+def _writeResponse(response: NetworkResponse, file: BinaryIO, position: int, end: int) -> int:
+    # Writes response body to the file starting at "position" until "end" is reached
+    # or the connection is dropped. Returns the position after the last written byte.
+
+    file.seek(position)
+
+    try:
+        for chunk in response.stream(chunkSize = DOWNLOAD_CHUNK_SIZE):
+            chunk = chunk[:end - position]
+
+            file.write(chunk)
+            position += len(chunk)
+
+            if position >= end:
+                break
+    except requests.exceptions.RequestException as ex:
+        logger.debug(f">> [Coretex] Download interrupted at byte {position}. Reason: \"{ex}\"", exc_info = ex)
+
+    return position
+
+
 class NetworkManagerBase(ABC):
 
     def __init__(self) -> None:
         self._session = requests.Session()
 
+        # Policy is shared by all managers by default so the retry
+        # budget and the circuit breaker apply to the whole process
+        self.retryPolicy: RetryPolicy = defaultRetryPolicy
+
         cpuCount = os.cpu_count()
         if cpuCount is None:
             cpuCount = 1
@@ -139,7 +182,8 @@ class NetworkManagerBase(ABC):
     def shouldRetry(self, retryCount: int, response: Optional[NetworkResponse]) -> bool:
         """
             Checks if network request should be repeated based on the number of repetitions
-            as well as the response from previous repetition
+            as well as the response from previous repetition. Retries are also limited
+            by the process-wide retry budget of the "retryPolicy".
 
             Parameters
             ----------
@@ -153,20 +197,22 @@ class NetworkManagerBase(ABC):
             bool -> True if the request should be retried, False if not
         """
 
-        # Limit retry count to 3 times
-        if retryCount >= MAX_RETRY_COUNT:
-            return False
-
         if response is not None:
             # If we get unauthorized maybe API token is expired
             # If refresh endpoint failed with unauthorized do not retry
             if response.isUnauthorized() and response.endpoint != REFRESH_ENDPOINT:
+                if retryCount >= self.retryPolicy.maxRetryCount:
+                    return False
+
                 refreshTokenResponse = self.refreshToken()
                 return not refreshTokenResponse.hasFailed()
 
-            return response.statusCode in RETRY_STATUS_CODES
+            if not self.retryPolicy.isRetryableStatus(response.statusCode):
+                self.retryPolicy.onSuccess()
+                return False
 
-        return True
+        self.retryPolicy.onFailure()
+        return self.retryPolicy.acquire(retryCount)
 
     def request(
         self,
@@ -174,7 +220,7 @@ class NetworkManagerBase(ABC):
         requestType: RequestType,
         headers: Optional[Dict[str, str]] = None,
         query: Optional[Dict[str, Any]] = None,
-        body: Optional[RequestBodyType] = None,
+        body: Optional[Union[RequestBodyType, MultipartFormStream]] = None,
         files: Optional[RequestFormType] = None,
         auth: Optional[Tuple[str, str]] = None,
         timeout: Tuple[int, int] = REQUEST_TIMEOUT,
@@ -187,6 +233,8 @@ class NetworkManagerBase(ABC):
             Sends an HTTP request with provided parameters
             This method is used as a base for all other networkManager methods
 
+            Failed requests are retried as defined by "retryPolicy"
+
             Parameters
             ----------
             endpoint : str
@@ -197,8 +245,9 @@ class NetworkManagerBase(ABC):
                 headers which will be sent with request, if None default values will be used
             query : Optional[Dict[str, Any]]
                 parameters which will be sent as query parameters
-            body : Optional[RequestBodyType]
-                parameters which will be sent as request body
+            body : Optional[Union[RequestBodyType, MultipartFormStream]]
+                parameters which will be sent as request body, or a stream
+                from which the request body will be read
             files : Optional[RequestFormType]
                 files which will be sent as a part of form data request
             auth : Optional[Tuple[str, str]]
@@ -210,7 +259,7 @@ class NetworkManagerBase(ABC):
             maxTimeout : Tuple[int, int]
                 timeout for the request, default <connection: 60s>, <read: 180s>
             retryCount : int
-                retry number of request - only for internal use
+                number of retries which were already made - only for internal use
 
             Returns
             -------
@@ -226,57 +275,57 @@ class NetworkManagerBase(ABC):
 
         url = self.serverUrl + endpoint
 
-        # Log request debug data
-        logger.debug(f">> [Coretex] Sending request to \"{url}\"")
-        logger.debug(f"\tType: {requestType}")
-        logger.debug(f"\tHeaders: {headers}")
-        logger.debug(f"\tQuery: {query}")
-        logger.debug(f"\tBody: {body}")
-        logger.debug(f"\tFiles: {logFilesData(files)}")
-        logger.debug(f"\tAuth: {auth}")
-        logger.debug(f"\tStream: {stream}")
-        logger.debug(f"\tTimeout: {timeout}")
-        logger.debug(f"\tMax timeout: {maxTimeout}")
-        logger.debug(f"\tRetry count: {retryCount}")
-
         # If Content-Type is application/json make sure that body is converted to json
         data: Optional[Any] = body
         if headers.get("Content-Type") == "application/json" and data is not None:
             data = json.dumps(body)
 
-        try:
-            rawResponse = self._session.request(
-                requestType.value,
-                url,
-                params = query,
-                data = data,
-                auth = auth,
-                timeout = timeout,
-                files = files,
-                headers = headers
-            )
-
-            response = NetworkResponse(rawResponse, endpoint)
-            if response.hasFailed():
-                logRequestFailure(endpoint, response)
-
-            if self.shouldRetry(retryCount, response):
-                if self._apiToken is not None:
-                    headers[API_TOKEN_HEADER] = self._apiToken
-
-                if response.statusCode == HTTPStatus.TOO_MANY_REQUESTS:
-                    # If the rate limiter is hit sleep before retrying the request
-                    sleepBeforeRetry(retryCount, endpoint)
+            # If Content-Encoding is gzip make sure that serialized body is compressed
+            if headers.get("Content-Encoding") == "gzip":
+                data = gzip.compress(data.encode("utf-8"))
+
+        self.retryPolicy.onRequest()
+        delay = 0.0
+
+        while True:
+            # Log request debug data
+            logger.debug(f">> [Coretex] Sending request to \"{url}\"")
+            logger.debug(f"\tType: {requestType}")
+            logger.debug(f"\tHeaders: {headers}")
+            logger.debug(f"\tQuery: {query}")
+            logger.debug(f"\tBody: {body}")
+            logger.debug(f"\tFiles: {logFilesData(files)}")
+            logger.debug(f"\tAuth: {auth}")
+            logger.debug(f"\tStream: {stream}")
+            logger.debug(f"\tTimeout: {timeout}")
+            logger.debug(f"\tMax timeout: {maxTimeout}")
+            logger.debug(f"\tRetry count: {retryCount}")
+
+            if isinstance(data, io.IOBase) and data.seekable():
+                # Stream could have been consumed by the previous attempt of this request
+                data.seek(0)
 
-                return self.request(endpoint, requestType, headers, query, body, files, auth, timeout, maxTimeout, stream, retryCount + 1)
+            try:
+                rawResponse = self._session.request(
+                    requestType.value,
+                    url,
+                    params = query,
+                    data = data,
+                    auth = auth,
+                    timeout = timeout,
+                    files = files,
+                    headers = headers,
+                    stream = stream
+                )
+            except requests.exceptions.RequestException as ex:
+                logger.debug(f">> [Coretex] Request failed. Reason \"{ex}\"", exc_info = ex)
 
-            return response
-        except requests.exceptions.RequestException as ex:
-            logger.debug(f">> [Coretex] Request failed. Reason \"{ex}\"", exc_info = ex)
+                if not self.shouldRetry(retryCount, None):
+                    raise RequestFailedError(endpoint, requestType)
 
-            if self.shouldRetry(retryCount, None):
                 # If an exception happened during the request add a delay before retrying
-                sleepBeforeRetry(retryCount, endpoint)
+                delay = self.retryPolicy.getDelay(delay, None)
+                self.retryPolicy.sleep(delay, endpoint)
 
                 if isinstance(ex, requests.exceptions.ConnectionError) and "timeout" in str(ex):
                     # If request failed due to timeout recalculate (increase) the timeout
@@ -284,13 +333,26 @@ class NetworkManagerBase(ABC):
                     timeout = getTimeoutForRetry(retryCount + 1, timeout, maxTimeout)
 
                     logger.debug(f">> [Coretex] \"{endpoint}\" failed failed due to timeout. Increasing the timeout from {oldTimeout} to {timeout}")
+            else:
+                response = NetworkResponse(rawResponse, endpoint)
+                if response.hasFailed():
+                    logRequestFailure(endpoint, response)
 
-                if self._apiToken is not None:
-                    headers[API_TOKEN_HEADER] = self._apiToken
+                if not self.shouldRetry(retryCount, response):
+                    return response
 
-                return self.request(endpoint, requestType, headers, query, body, files, auth, timeout, maxTimeout, stream, retryCount + 1)
+                # Release the connection of the response which will be discarded
+                response.close()
 
-            raise RequestFailedError(endpoint, requestType)
+                # Unauthorized requests are retried immediately after the token was refreshed
+                if not response.isUnauthorized():
+                    delay = self.retryPolicy.getDelay(delay, response)
+                    self.retryPolicy.sleep(delay, endpoint)
+
+            if self._apiToken is not None:
+                headers[API_TOKEN_HEADER] = self._apiToken
+
+            retryCount += 1
 
     def head(
         self,
@@ -452,11 +514,21 @@ class NetworkManagerBase(ABC):
             files = []
 
         with ExitStack() as stack:
-            filesData = [file.prepareForUpload(stack) for file in files]
-
             headers = self._headers("multipart/form-data")
             del headers["Content-Type"]
 
+            body: Optional[Union[RequestBodyType, MultipartFormStream]] = params
+            filesData: Optional[RequestFormType] = None
+
+            if any(file.isStreamed for file in files):
+                # requests library loads all files into memory while encoding the body,
+                # so the body is encoded manually and file contents are streamed from disk
+                stream = stack.enter_context(MultipartFormStream(params, files))
+                headers["Content-Type"] = stream.contentType
+                body = stream
+            else:
+                filesData = [file.prepareForUpload(stack) for file in files]
+
             if len(files) > 0:
                 response = self.request(endpoint, RequestType.options)
                 if response.hasFailed():
@@ -474,7 +546,7 @@ class NetworkManagerBase(ABC):
                 endpoint,
                 RequestType.post,
                 headers,
-                body = params,
+                body = body,
                 files = filesData,
                 timeout = timeout,
                 maxTimeout = maxTimeout
@@ -552,17 +624,173 @@ class NetworkManagerBase(ABC):
         self._refreshToken = token
         return self.refreshToken()
 
+    def __downloadPart(
+        self,
+        endpoint: str,
+        partialDownload: PartialDownload,
+        index: int,
+        params: Optional[Dict[str, Any]],
+        headers: Optional[Dict[str, str]]
+    ) -> NetworkResponse:
+
+        start, end = partialDownload.partRange(index)
+        position = start
+        retryCount = 0
+        delay = 0.0
+
+        while True:
+            partHeaders = self._headers()
+            if headers is not None:
+                partHeaders.update(headers)
+
+            partHeaders["Range"] = f"bytes={position}-{end - 1}"
+            if partialDownload.validator is not None:
+                # Server will return the full file instead of the range if the file has changed
+                partHeaders["If-Range"] = partialDownload.validator
+
+            response = self.request(
+                endpoint,
+                RequestType.get,
+                partHeaders,
+                query = params,
+                stream = True,
+                timeout = DOWNLOAD_TIMEOUT,
+                maxTimeout = MAX_DOWNLOAD_TIMEOUT
+            )
+
+            if response.statusCode == HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE:
+                raise _RangeNotSupportedError
+
+            if response.hasFailed():
+                return response
+
+            if response.statusCode != HTTPStatus.PARTIAL_CONTENT:
+                response.close()
+                raise _RangeNotSupportedError
+
+            with partialDownload.dataPath.open("r+b") as file:
+                position = _writeResponse(response, file, position, end)
+
+            response.close()
+
+            if position >= end:
+                partialDownload.markCompleted(index)
+                return response
+
+            # Connection was dropped, continue from the last written byte
+            self.retryPolicy.onFailure()
+            if not self.retryPolicy.acquire(retryCount):
+                raise RequestFailedError(endpoint, RequestType.get)
+
+            delay = self.retryPolicy.getDelay(delay, None)
+            self.retryPolicy.sleep(delay, endpoint)
+
+            retryCount += 1
+
+    def __rangedDownload(
+        self,
+        endpoint: str,
+        partialDownload: PartialDownload,
+        params: Optional[Dict[str, Any]],
+        headers: Optional[Dict[str, str]],
+        connectionCount: int
+    ) -> Optional[NetworkResponse]:
+
+        # Returns first failed response, or None if all parts were downloaded
+        missingParts = partialDownload.missingParts()
+        logger.debug(f">> [Coretex] Downloading {len(missingParts)}/{partialDownload.partCount} parts of \"{partialDownload.destination}\" using {connectionCount} connections")
+
+        with ThreadPoolExecutor(max_workers = connectionCount) as pool:
+            futures: List[Future] = [
+                pool.submit(self.__downloadPart, endpoint, partialDownload, index, params, headers)
+                for index in missingParts
+            ]
+
+            done, notDone = wait(futures, return_when = FIRST_EXCEPTION)
+            for future in notDone:
+                future.cancel()
+
+        for future in done:
+            exception = future.exception()
+            if exception is not None:
+                raise exception
+
+        for future in done:
+            response: NetworkResponse = future.result()
+            if response.hasFailed():
+                return response
+
+        partialDownload.finish()
+        return None
+
+    def streamDownload(
+        self,
+        endpoint: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> NetworkResponse:
+
+        """
+            Sends a GET request whose response body is not downloaded
+            until it is read using "NetworkResponse.stream". Used for
+            processing files while they are being downloaded, without
+            storing them first.
+
+            Parameters
+            ----------
+            endpoint : str
+                endpoint to which the request is sent
+            params : Optional[Dict[str, Any]]
+                query parameters of the request
+            headers : Optional[Dict[str, str]]
+                additional headers of the request
+
+            Returns
+            -------
+            NetworkResponse -> object containing the request response,
+            it must be closed if its body is not read to the end
+
+            Example
+            -------
+            >>> from coretex import networkManager
+            \b
+            >>> response = networkManager.streamDownload("dummyObject/download")
+            >>> if not response.hasFailed():
+                    for chunk in response.stream(chunkSize = 1024 * 1024):
+                        print(len(chunk))
+        """
+
+        if headers is not None:
+            headers = {**self._headers(), **headers}
+
+        # Timeout for download applies per chunk, not for the full file download
+        return self.request(
+            endpoint,
+            RequestType.get,
+            headers,
+            query = params,
+            stream = True,
+            timeout = DOWNLOAD_TIMEOUT,
+            maxTimeout = MAX_DOWNLOAD_TIMEOUT
+        )
+
     def download(
         self,
         endpoint: str,
         destination: Union[Path, str],
         params: Optional[Dict[str, Any]] = None,
-        headers: Optional[Dict[str, str]] = None
+        headers: Optional[Dict[str, str]] = None,
+        connectionCount: int = DOWNLOAD_CONNECTION_COUNT
     ) -> NetworkResponse:
 
         """
             Downloads file to the given destination
 
+            Files larger than 64 MiB are downloaded in parts over "connectionCount"
+            parallel connections if the server supports ranged requests. Progress
+            of such downloads is stored next to the destination, so if the download
+            is interrupted calling this function again resumes it.
+
             Parameters
             ----------
             endpoint : str
@@ -573,6 +801,9 @@ class NetworkManagerBase(ABC):
                 query parameters of the request
             headers : Optional[Dict[str, str]]
                 additional headers of the request
+            connectionCount : int
+                maximum number of parallel connections used for downloading
+                a single file, if 1 file will be downloaded over a single connection
 
             Returns
             -------
@@ -601,15 +832,27 @@ class NetworkManagerBase(ABC):
 
             # If the Content-Length returned by the head request is not equal to destination's
             # file size force the file to be re-downloaded
-            try:
-                contentLength = int(response.headers["Content-Length"])
-                if destination.stat().st_size == contentLength:
-                    return response
-            except (ValueError, KeyError):
-                # KeyError - Content-Length is not present in headers
-                # ValueError - Content-Length cannot be converted to int
-                pass
+            if destination.stat().st_size == _getContentLength(response):
+                return response
+
+        if connectionCount > 1:
+            partialDownload = PartialDownload.load(destination)
+
+            if partialDownload is not None:
+                logger.debug(f">> [Coretex] Resuming download of \"{destination}\"")
+
+                try:
+                    failedResponse = self.__rangedDownload(endpoint, partialDownload, params, headers, connectionCount)
+                    if failedResponse is not None:
+                        return failedResponse
 
+                    # All parts are downloaded, request is sent so a valid response can be returned
+                    return self.head(endpoint, params, headers)
+                except _RangeNotSupportedError:
+                    logger.debug(f">> [Coretex] File \"{destination}\" has changed since the download started, restarting the download")
+                    partialDownload.discard()
+
+        extraHeaders = headers
         if headers is not None:
             headers = {**self._headers(), **headers}
 
@@ -627,6 +870,35 @@ class NetworkManagerBase(ABC):
         if response.hasFailed():
             return response
 
+        contentLength = _getContentLength(response)
+        supportsRanges = response.headers.get("Accept-Ranges") == "bytes"
+
+        if connectionCount > 1 and supportsRanges and contentLength is not None and contentLength >= RANGED_DOWNLOAD_THRESHOLD:
+            validator = response.headers.get("ETag", response.headers.get("Last-Modified"))
+            partialDownload = PartialDownload.create(destination, contentLength, RANGED_DOWNLOAD_PART_SIZE, validator)
+
+            # First part is read from the already opened connection, while
+            # the rest of the parts are requested over separate connections
+            with partialDownload.dataPath.open("r+b") as file:
+                position = _writeResponse(response, file, 0, partialDownload.partSize)
+
+            response.close()
+
+            if position >= partialDownload.partSize:
+                partialDownload.markCompleted(0)
+
+            try:
+                failedResponse = self.__rangedDownload(endpoint, partialDownload, params, extraHeaders, connectionCount)
+                if failedResponse is not None:
+                    return failedResponse
+            except _RangeNotSupportedError:
+                logger.debug(f">> [Coretex] Ranged download of \"{destination}\" failed, downloading over a single connection")
+                partialDownload.discard()
+
+                return self.download(endpoint, destination, params, extraHeaders, connectionCount = 1)
+
+            return response
+
         with destination.open("wb") as file:
             for chunk in response.stream(chunkSize = DOWNLOAD_CHUNK_SIZE):
                 file.write(chunk)
@@ -15,13 +15,17 @@
 #     You should have received a copy of the GNU Affero General Public License
 #     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from typing import Optional, Any, Dict, List
+from typing import Optional, Any, Dict, List, Iterator
 from typing_extensions import Self
+from concurrent.futures import ThreadPoolExecutor, Future
+
+import logging
 
 import inflection
 
 from .network_manager import networkManager
-from .network_response import NetworkRequestError
+from .async_network_manager import asyncNetworkManager
+from .network_response import NetworkResponse, NetworkRequestError
 from ..codable import Codable
 
 
@@ -136,6 +140,26 @@ class NetworkObject(Codable):
 
         return True
 
+    async def refreshAsync(self) -> bool:
+        """
+            Asynchronous variant of "refresh" which fetches the object
+            using "asyncNetworkManager" and updates the values
+
+            Returns
+            -------
+            bool -> True if the update was successful, False otherwise
+        """
+
+        try:
+            obj = await self.__class__.fetchByIdAsync(self.id)
+        except NetworkRequestError:
+            return False
+
+        for key, value in obj.__dict__.items():
+            self.__dict__[key] = value
+
+        return True
+
     def update(self, **kwargs: Any) -> bool:
         """
             Sends a PUT request to Coretex backend
@@ -220,6 +244,111 @@ class NetworkObject(Codable):
             kwargs["page_size"] = DEFAULT_PAGE_SIZE
 
         response = networkManager.get(cls._endpoint(), kwargs)
+        return cls._decodeFetchAllResponse(response, kwargs)
+
+    @classmethod
+    def iterAll(cls, pageSize: int = DEFAULT_PAGE_SIZE, prefetch: bool = True, **kwargs: Any) -> Iterator[Self]:
+        """
+            Lazily fetches all entities from Coretex backend which match
+            the given predicate, one page at a time. Only a single page
+            of entities is held in memory at a time.
+
+            Parameters
+            ----------
+            pageSize : int
+                number of entities fetched with a single request
+            prefetch : bool
+                if True next page is fetched in the background while
+                the entities of the current page are being processed
+            **kwargs : Optional[Dict[str, Any]]
+                query parameters (predicate) which will be appended to URL
+
+            Returns
+            -------
+            Iterator[Self] -> iterator over all fetched entities
+
+            Raises
+            ------
+            NetworkRequestError -> If the request for fetching failed
+
+            Example
+            -------
+            >>> from coretex import NetworkDataset
+            \b
+            >>> for dataset in NetworkDataset.iterAll(pageSize = 500, project_id = 123):
+                    print(dataset.name)
+        """
+
+        if pageSize < 1:
+            raise ValueError(">> [Coretex] \"pageSize\" must be greater than 0")
+
+        def fetchPage(page: int) -> List[Self]:
+            return cls.fetchAll(**{ **kwargs, "page": page, "page_size": pageSize })
+
+        executor = ThreadPoolExecutor(max_workers = 1) if prefetch else None
+        nextPage: Optional[Future] = None
+
+        try:
+            page = 0
+            objects: List[Self] = fetchPage(page)
+            previousFirst: Optional[Self] = None
+
+            while len(objects) > 0:
+                # Guard against endless iteration if the same page is returned again
+                if previousFirst is not None and objects[0] == previousFirst:
+                    logging.getLogger("coretexpylib").warning(f">> [Coretex] Page {page} of \"{cls.__name__}\" is equal to the previous page, stopping the iteration")
+                    return
+
+                hasNextPage = len(objects) >= pageSize
+                if hasNextPage and executor is not None:
+                    nextPage = executor.submit(fetchPage, page + 1)
+
+                yield from objects
+
+                if not hasNextPage:
+                    return
+
+                previousFirst = objects[0]
+                page += 1
+
+                if nextPage is not None:
+                    objects = nextPage.result()
+                    nextPage = None
+                else:
+                    objects = fetchPage(page)
+        finally:
+            if executor is not None:
+                # Do not wait for the prefetched page if the iteration was stopped early
+                executor.shutdown(wait = False)
+
+    @classmethod
+    async def fetchAllAsync(cls, **kwargs: Any) -> List[Self]:
+        """
+            Asynchronous variant of "fetchAll" which sends the
+            request using "asyncNetworkManager"
+
+            Parameters
+            ----------
+            **kwargs : Optional[Dict[str, Any]]
+                query parameters (predicate) which will be appended to URL
+
+            Returns
+            -------
+            List[Self] -> list of all fetched entities
+
+            Raises
+            ------
+            NetworkRequestError -> If the request for fetching failed
+        """
+
+        if "page_size" not in kwargs:
+            kwargs["page_size"] = DEFAULT_PAGE_SIZE
+
+        response = await asyncNetworkManager.get(cls._endpoint(), kwargs)
+        return cls._decodeFetchAllResponse(response, kwargs)
+
+    @classmethod
+    def _decodeFetchAllResponse(cls, response: NetworkResponse, kwargs: Dict[str, Any]) -> List[Self]:
         if response.hasFailed():
             raise NetworkRequestError(response, f"Failed to fetch \"{cls.__name__}\" with parameters \"{kwargs}\"")
 
@@ -289,3 +418,35 @@ class NetworkObject(Codable):
             raise NetworkRequestError(response, f"Failed to fetch \"{cls.__name__}\" with ID \"{objectId}\"")
 
         return cls.decode(response.getJson(dict))
+
+    @classmethod
+    async def fetchByIdAsync(cls, objectId: int, **kwargs: Any) -> Self:
+        """
+            Asynchronous variant of "fetchById" which sends the
+            request using "asyncNetworkManager"
+
+            Parameters
+            ----------
+            objectId : int
+                id of the object which is fetched
+            **kwargs : Optional[Dict[str, Any]]
+                query parameters (predicate) which will be appended to URL
+
+            Returns
+            -------
+            Self -> fetched object
+
+            Raises
+            ------
+            NetworkRequestError -> If the request for fetching failed
+        """
+
+        if "page_size" not in kwargs:
+            kwargs["page_size"] = DEFAULT_PAGE_SIZE
+
+        response = await asyncNetworkManager.get(f"{cls._endpoint()}/{objectId}", kwargs)
+
+        if response.hasFailed():
+            raise NetworkRequestError(response, f"Failed to fetch \"{cls.__name__}\" with ID \"{objectId}\"")
+
+        return cls.decode(response.getJson(dict))
@@ -148,6 +148,14 @@ class NetworkResponse:
 
         return self._raw.iter_content(chunkSize, decodeUnicode)
 
+    def close(self) -> None:
+        """
+            Releases the connection of a streamed response back to the pool
+            without reading the rest of the response body
+        """
+
+        self._raw.close()
+
 
 class NetworkRequestError(Exception):
 
@@ -0,0 +1,229 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Optional, Set, List, Tuple
+from typing_extensions import Self
+from pathlib import Path
+from threading import Lock
+
+import os
+import json
+import logging
+
+
+logger = logging.getLogger("coretexpylib")
+
+
+class PartialDownload:
+
+    """
+        Tracks the progress of a file which is downloaded in parts
+        (byte ranges). Data is written into a preallocated "<name>.partial"
+        file, while the list of downloaded parts is stored inside of the
+        "<name>.partial.json" sidecar. Once all parts are downloaded
+        the ".partial" file is renamed to the destination, so the
+        destination never contains an incomplete file.
+
+        Properties
+        ----------
+        destination : Path
+            path to which the file is downloaded
+        size : int
+            size of the file in bytes
+        partSize : int
+            size of a single part in bytes
+        validator : Optional[str]
+            ETag or Last-Modified value of the file, used to detect
+            if the file has changed since the download started
+        completed : Set[int]
+            indices of the parts which were downloaded
+    """
+
+    def __init__(
+        self,
+        destination: Path,
+        size: int,
+        partSize: int,
+        validator: Optional[str] = None,
+        completed: Optional[Set[int]] = None
+    ) -> None:
+
+        if partSize <= 0:
+            raise ValueError(f">> [Coretex] Invalid \"partSize\" value \"{partSize}\"")
+
+        self.destination = destination
+        self.size = size
+        self.partSize = partSize
+        self.validator = validator
+        self.completed = completed if completed is not None else set()
+
+        self.__lock = Lock()
+
+    @staticmethod
+    def dataPathFor(destination: Path) -> Path:
+        return destination.with_name(f"{destination.name}.partial")
+
+    @staticmethod
+    def statePathFor(destination: Path) -> Path:
+        return destination.with_name(f"{destination.name}.partial.json")
+
+    @property
+    def dataPath(self) -> Path:
+        return PartialDownload.dataPathFor(self.destination)
+
+    @property
+    def statePath(self) -> Path:
+        return PartialDownload.statePathFor(self.destination)
+
+    @property
+    def partCount(self) -> int:
+        partCount = self.size // self.partSize
+        if self.size % self.partSize != 0:
+            partCount += 1
+
+        return partCount
+
+    @classmethod
+    def create(cls, destination: Path, size: int, partSize: int, validator: Optional[str] = None) -> Self:
+        """
+            Preallocates the ".partial" file and stores the initial state
+
+            Parameters
+            ----------
+            destination : Path
+                path to which the file is downloaded
+            size : int
+                size of the file in bytes
+            partSize : int
+                size of a single part in bytes
+            validator : Optional[str]
+                ETag or Last-Modified value of the file
+
+            Returns
+            -------
+            Self -> object which tracks the download progress
+        """
+
+        partialDownload = cls(destination, size, partSize, validator)
+
+        with partialDownload.dataPath.open("wb") as file:
+            if hasattr(os, "posix_fallocate"):
+                try:
+                    os.posix_fallocate(file.fileno(), 0, size)
+                except OSError:
+                    # Some filesystems do not support fallocate
+                    file.truncate(size)
+            else:
+                file.truncate(size)
+
+        partialDownload.__saveState()
+        return partialDownload
+
+    @classmethod
+    def load(cls, destination: Path) -> Optional[Self]:
+        """
+            Loads the state of an interrupted download
+
+            Parameters
+            ----------
+            destination : Path
+                path to which the file is downloaded
+
+            Returns
+            -------
+            Optional[Self] -> object which tracks the download progress, None if there is
+            no interrupted download or if its state is invalid
+        """
+
+        dataPath = cls.dataPathFor(destination)
+        statePath = cls.statePathFor(destination)
+
+        if not dataPath.exists() or not statePath.exists():
+            return None
+
+        try:
+            with statePath.open("r") as file:
+                state = json.load(file)
+
+            partialDownload = cls(
+                destination,
+                int(state["size"]),
+                int(state["partSize"]),
+                state.get("validator"),
+                set(state["completed"])
+            )
+        except (ValueError, KeyError, TypeError) as ex:
+            logger.debug(f">> [Coretex] Failed to load partial download state for \"{destination}\". Reason: {ex}")
+            return None
+
+        if dataPath.stat().st_size != partialDownload.size:
+            return None
+
+        return partialDownload
+
+    def __saveState(self) -> None:
+        state = {
+            "size": self.size,
+            "partSize": self.partSize,
+            "validator": self.validator,
+            "completed": sorted(self.completed)
+        }
+
+        # Write to a temporary file and then rename it so the state file
+        # is never left half-written if the process is killed
+        tmpPath = self.statePath.with_suffix(".tmp")
+        with tmpPath.open("w") as file:
+            json.dump(state, file)
+
+        os.replace(tmpPath, self.statePath)
+
+    def partRange(self, index: int) -> Tuple[int, int]:
+        """
+            Returns
+            -------
+            Tuple[int, int] -> start (inclusive) and end (exclusive) byte of the part
+        """
+
+        start = index * self.partSize
+        return start, min(start + self.partSize, self.size)
+
+    def missingParts(self) -> List[int]:
+        """
+            Returns
+            -------
+            List[int] -> indices of the parts which have not been downloaded
+        """
+
+        with self.__lock:
+            return [index for index in range(self.partCount) if index not in self.completed]
+
+    def markCompleted(self, index: int) -> None:
+        with self.__lock:
+            self.completed.add(index)
+            self.__saveState()
+
+    def finish(self) -> None:
+        """
+            Moves the downloaded file to its destination and removes the sidecar
+        """
+
+        os.replace(self.dataPath, self.destination)
+        self.statePath.unlink(missing_ok = True)
+
+    def discard(self) -> None:
+        self.dataPath.unlink(missing_ok = True)
+        self.statePath.unlink(missing_ok = True)
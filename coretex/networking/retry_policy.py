@@ -0,0 +1,329 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Optional, List
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from http import HTTPStatus
+from threading import Lock
+
+import time
+import random
+import asyncio
+import logging
+
+from .network_response import NetworkResponse
+
+
+logger = logging.getLogger("coretexpylib")
+
+MAX_RETRY_COUNT        = 5        # Request will be retried 5 times before raising an error
+MAX_DELAY_BEFORE_RETRY = 180      # 3 minute
+BASE_DELAY_BEFORE_RETRY = 1       # 1 second
+
+RETRY_STATUS_CODES = [
+    HTTPStatus.TOO_MANY_REQUESTS,
+    HTTPStatus.INTERNAL_SERVER_ERROR,
+    HTTPStatus.SERVICE_UNAVAILABLE
+]
+
+# Status codes for which the "Retry-After" header is respected
+RETRY_AFTER_STATUS_CODES = [
+    HTTPStatus.TOO_MANY_REQUESTS,
+    HTTPStatus.SERVICE_UNAVAILABLE
+]
+
+
+def _parseRetryAfter(value: str) -> Optional[float]:
+    # "Retry-After" can either be a number of seconds or an HTTP date
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+
+    if date.tzinfo is None:
+        date = date.replace(tzinfo = timezone.utc)
+
+    return max(0.0, (date - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryStatistics:
+
+    """
+        Thread-safe counters which describe how requests were retried
+
+        Properties
+        ----------
+        retryCount : int
+            number of times requests were retried
+        giveUpCount : int
+            number of times a request was not retried because the maximum
+            number of retries was reached or the retry budget was exhausted
+        sleepTime : float
+            total time in seconds spent waiting before retrying requests
+    """
+
+    def __init__(self) -> None:
+        self.retryCount = 0
+        self.giveUpCount = 0
+        self.sleepTime = 0.0
+
+        self.__lock = Lock()
+
+    def recordRetry(self) -> None:
+        with self.__lock:
+            self.retryCount += 1
+
+    def recordGiveUp(self) -> None:
+        with self.__lock:
+            self.giveUpCount += 1
+
+    def recordSleep(self, seconds: float) -> None:
+        with self.__lock:
+            self.sleepTime += seconds
+
+    def reset(self) -> None:
+        with self.__lock:
+            self.retryCount = 0
+            self.giveUpCount = 0
+            self.sleepTime = 0.0
+
+
+class RetryBudget:
+
+    """
+        Token bucket which limits the number of retries across all
+        threads of the process. Every request deposits "ratio" tokens
+        and every retry withdraws a single token. Tokens are also refilled
+        at "minRetriesPerSecond" rate so requests can be retried even if
+        there was no recent traffic.
+
+        Properties
+        ----------
+        ratio : float
+            tokens deposited for every request, defines which portion
+            of requests can be retried
+        minRetriesPerSecond : float
+            rate at which tokens are refilled over time
+        capacity : float
+            maximum number of stored tokens
+    """
+
+    def __init__(self, ratio: float = 0.2, minRetriesPerSecond: float = 1, capacity: float = 100) -> None:
+        self.ratio = ratio
+        self.minRetriesPerSecond = minRetriesPerSecond
+        self.capacity = capacity
+
+        self.__tokens = capacity
+        self.__lastRefill = time.monotonic()
+        self.__lock = Lock()
+
+    def __refill(self) -> None:
+        now = time.monotonic()
+
+        self.__tokens = min(self.capacity, self.__tokens + (now - self.__lastRefill) * self.minRetriesPerSecond)
+        self.__lastRefill = now
+
+    def deposit(self) -> None:
+        with self.__lock:
+            self.__refill()
+            self.__tokens = min(self.capacity, self.__tokens + self.ratio)
+
+    def tryWithdraw(self) -> bool:
+        with self.__lock:
+            self.__refill()
+
+            if self.__tokens < 1:
+                return False
+
+            self.__tokens -= 1
+            return True
+
+
+class RetryPolicy:
+
+    """
+        Decides if and when a failed request should be retried.
+        A single policy is shared by all network managers of the
+        process, so the retry budget and the circuit breaker
+        apply to all threads.
+
+        Delays between retries use decorrelated jitter, so requests which
+        failed at the same time are not retried at the same time. If the
+        server returns "Retry-After" header for 429 or 503 responses
+        its value is used as the delay.
+
+        If "failureThreshold" consecutive requests fail the circuit
+        opens and requests are not retried for "resetTimeout" seconds.
+
+        Properties
+        ----------
+        maxRetryCount : int
+            maximum number of times a single request is retried
+        baseDelay : float
+            minimum delay in seconds before retrying a request
+        maxDelay : float
+            maximum delay in seconds before retrying a request
+        retryStatusCodes : List[int]
+            status codes for which the request is retried
+        budget : RetryBudget
+            process-wide limit for the number of retries
+        failureThreshold : int
+            number of consecutive failures after which the circuit opens
+        resetTimeout : float
+            number of seconds for which the circuit stays open
+        statistics : RetryStatistics
+            counters which describe how requests were retried
+    """
+
+    def __init__(
+        self,
+        maxRetryCount: int = MAX_RETRY_COUNT,
+        baseDelay: float = BASE_DELAY_BEFORE_RETRY,
+        maxDelay: float = MAX_DELAY_BEFORE_RETRY,
+        retryStatusCodes: Optional[List[int]] = None,
+        budget: Optional[RetryBudget] = None,
+        failureThreshold: int = 50,
+        resetTimeout: float = 30
+    ) -> None:
+
+        if retryStatusCodes is None:
+            retryStatusCodes = list(RETRY_STATUS_CODES)
+
+        if budget is None:
+            budget = RetryBudget()
+
+        self.maxRetryCount = maxRetryCount
+        self.baseDelay = baseDelay
+        self.maxDelay = maxDelay
+        self.retryStatusCodes = retryStatusCodes
+        self.budget = budget
+        self.failureThreshold = failureThreshold
+        self.resetTimeout = resetTimeout
+        self.statistics = RetryStatistics()
+
+        self.__consecutiveFailures = 0
+        self.__openUntil = 0.0
+        self.__lock = Lock()
+
+    @property
+    def isOpen(self) -> bool:
+        """
+            True if the circuit breaker is open and requests are not retried
+        """
+
+        return time.monotonic() < self.__openUntil
+
+    def isRetryableStatus(self, statusCode: int) -> bool:
+        return statusCode in self.retryStatusCodes
+
+    def onRequest(self) -> None:
+        """
+            Called once for every request before it is sent
+        """
+
+        self.budget.deposit()
+
+    def onSuccess(self) -> None:
+        """
+            Called when a request received a response which should not be retried
+        """
+
+        with self.__lock:
+            self.__consecutiveFailures = 0
+
+    def onFailure(self) -> None:
+        """
+            Called when a request failed with an error which can be retried
+        """
+
+        with self.__lock:
+            self.__consecutiveFailures += 1
+
+            if self.__consecutiveFailures >= self.failureThreshold and not self.isOpen:
+                logger.debug(f">> [Coretex] {self.__consecutiveFailures} consecutive requests failed, not retrying requests for {self.resetTimeout} seconds")
+                self.__openUntil = time.monotonic() + self.resetTimeout
+
+    def acquire(self, retryCount: int) -> bool:
+        """
+            Checks if a failed request can be retried
+
+            Parameters
+            ----------
+            retryCount : int
+                number of times the request was already retried
+
+            Returns
+            -------
+            bool -> True if the request can be retried, False if
+            the request should fail
+        """
+
+        if retryCount >= self.maxRetryCount or self.isOpen or not self.budget.tryWithdraw():
+            self.statistics.recordGiveUp()
+            return False
+
+        self.statistics.recordRetry()
+        return True
+
+    def getDelay(self, previousDelay: float, response: Optional[NetworkResponse]) -> float:
+        """
+            Calculates the delay before the next retry
+
+            Parameters
+            ----------
+            previousDelay : float
+                delay which was used before the previous retry, 0 if
+                the request was not retried yet
+            response : Optional[NetworkResponse]
+                response of the request which is pending for retry
+
+            Returns
+            -------
+            float -> delay in seconds
+        """
+
+        if response is not None and response.statusCode in RETRY_AFTER_STATUS_CODES:
+            retryAfter = response.headers.get("Retry-After")
+            if retryAfter is not None:
+                delay = _parseRetryAfter(retryAfter)
+                if delay is not None:
+                    return min(self.maxDelay, delay)
+
+        # Decorrelated jitter: https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/
+        previousDelay = max(previousDelay, self.baseDelay)
+        return min(self.maxDelay, random.uniform(self.baseDelay, previousDelay * 3))
+
+    def sleep(self, delay: float, endpoint: str) -> None:
+        logger.debug(f">> [Coretex] Waiting for {delay:.2f} seconds before retrying failed \"{endpoint}\" request")
+
+        self.statistics.recordSleep(delay)
+        time.sleep(delay)
+
+    async def sleepAsync(self, delay: float, endpoint: str) -> None:
+        logger.debug(f">> [Coretex] Waiting for {delay:.2f} seconds before retrying failed \"{endpoint}\" request")
+
+        self.statistics.recordSleep(delay)
+        await asyncio.sleep(delay)
+
+
+defaultRetryPolicy = RetryPolicy()
@@ -18,8 +18,6 @@
 from typing import Optional, Any, Dict, List, Union, Tuple, BinaryIO
 
 import io
-import time
-import random
 import logging
 
 from urllib.parse import urlsplit, urlunsplit, SplitResult
@@ -82,23 +80,6 @@ def baseUrl(url: str) -> str:
     return urlunsplit(parsed)
 
 
-def getDelayBeforeRetry(retry: int) -> int:
-    # retry starts from 0 so we add +1/+2 to start/end
-    # to make it have proper delay
-
-    start = (retry + 1) ** 2
-    end   = (retry + 2) ** 2
-
-    return random.randint(start, end)
-
-
-def sleepBeforeRetry(retry: int, endpoint: str) -> None:
-    delay = getDelayBeforeRetry(retry)
-    logger.debug(f">> [Coretex] Waiting for {delay} seconds before retrying failed \"{endpoint}\" request")
-
-    time.sleep(delay)
-
-
 def getTimeoutForRetry(retry: int, timeout: Tuple[int, int], maxTimeout: Tuple[int, int]) -> Tuple[int, int]:
     connectTimeout, readTimeout = timeout
     maxConnectTimeout, maxReadTimeout = maxTimeout
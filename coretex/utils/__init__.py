@@ -20,7 +20,8 @@ from .file import guessMimeType, InvalidFileExtension
 from .date import DATE_FORMAT, TIME_ZONE, decodeDate
 from .hash import hashCacheName
 from .image import resizeWithPadding, cropToWidth
-from .process import logProcessOutput, command, CommandException
+from .process import logProcessOutput, command, CommandException, captureProcessOutput, drainStreams, OutputBuffer
 from .logs import createFileHandler
 from .misc import isCliRuntime
 from .error_handling import Throws
+from .file_lock import FileLock
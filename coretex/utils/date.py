@@ -15,7 +15,9 @@
 #     You should have received a copy of the GNU Affero General Public License
 #     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
+
+import re
 
 
 # Time zone used for dates on Coretex backend
@@ -31,6 +33,39 @@ CORETEX_DATE_FORMATS = [
 ]
 
 
+# Matches dates in CORETEX_DATE_FORMATS, used for parsing dates without strptime which is slow
+_DATE_PATTERN = re.compile(
+    r"(\d{4})-(\d{2})-(\d{2})(?:T(\d{2}):(\d{2}):(\d{2})\.(\d{1,6})| (\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,6}))?)"
+    r"(?:(Z)|([+-])(\d{2})(?::?([0-5]\d))?)"
+)
+
+
+def _decodeDateFast(value: str) -> datetime:
+    match = _DATE_PATTERN.fullmatch(value)
+    if match is None:
+        raise ValueError(f"Failed to match \"{value}\"")
+
+    (
+        year, month, day,
+        hourT, minuteT, secondT, fractionT,
+        hour, minute, second, fraction,
+        utc, sign, offsetHours, offsetMinutes
+    ) = match.groups()
+
+    if hourT is not None:
+        hour, minute, second, fraction = hourT, minuteT, secondT, fractionT
+
+    microsecond = 0 if fraction is None else int(fraction.ljust(6, "0"))
+
+    if utc is not None:
+        tz = timezone.utc
+    else:
+        offset = timedelta(hours = int(offsetHours), minutes = int(offsetMinutes or 0))
+        tz = timezone(-offset if sign == "-" else offset)
+
+    return datetime(int(year), int(month), int(day), int(hour), int(minute), int(second), microsecond, tz)
+
+
 def decodeDate(value: str) -> datetime:
     """
         Converts the date to a format used by Coretex
@@ -40,6 +75,11 @@ def decodeDate(value: str) -> datetime:
         datetime -> object whose datetime is represented using the Coretex datetime format
     """
 
+    try:
+        return _decodeDateFast(value)
+    except ValueError:
+        pass
+
     for format in CORETEX_DATE_FORMATS:
         try:
             return datetime.strptime(value, format)
@@ -15,16 +15,30 @@
 #     You should have received a copy of the GNU Affero General Public License
 #     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from typing import Generator, Optional, Union
-from pathlib import Path
-from zipfile import ZipFile
+from typing import Generator, Optional, Union, List, Callable, Set, Dict, IO
+from pathlib import Path, PurePosixPath
+from zipfile import ZipFile, ZipInfo
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from threading import Lock, get_ident
 
+import os
 import mimetypes
 import zipfile
 import tarfile
 import gzip
 import shutil
 import logging
+import zlib
+
+
+COPY_BUFFER_SIZE = 1024 * 1024  # 1 MB
+
+# Files are compressed into temporary files before they are added to the
+# archive, this limits the number of those files which exist at the same time
+ARCHIVE_PENDING_FILES_PER_WORKER = 2
+
+# Task of the extraction engine, returns the tasks which should be executed after it
+_ExtractionTask = Callable[[], List["_ExtractionTask"]]
 
 
 class InvalidFileExtension(Exception):
@@ -128,10 +142,129 @@ def gzipDecompress(source: Path, destination: Path) -> None:
         raise ValueError(">> [Coretex] Not a .gz file")
 
     with gzip.open(source, "r") as gzipFile, open(destination, "wb") as destinationFile:
-        shutil.copyfileobj(gzipFile, destinationFile)
+        shutil.copyfileobj(gzipFile, destinationFile, COPY_BUFFER_SIZE)
+
+
+def sanitizeMemberName(name: str) -> Optional[PurePosixPath]:
+    """
+        Converts the name of an archive member into a path which is
+        safe to extract to. Same rules as "ZipFile.extract" uses are
+        applied: drive, absolute and parent directory components are
+        removed from the name.
+
+        Parameters
+        ----------
+        name : str
+            name of the archive member
+
+        Returns
+        -------
+        Optional[PurePosixPath] -> relative path of the member, None if
+        nothing remains after the name is sanitized
+
+        Example
+        -------
+        >>> from coretex.utils.file import sanitizeMemberName
+        \b
+        >>> print(sanitizeMemberName("../../etc/passwd"))
+        etc/passwd
+    """
+
+    parts = [
+        part for part in name.replace("\\", "/").split("/")
+        if part not in ("", ".", "..") and not part.endswith(":")
+    ]
+
+    if len(parts) == 0:
+        return None
+
+    return PurePosixPath(*parts)
+
+
+def _defaultWorkerCount(workerCount: Optional[int]) -> int:
+    if workerCount is None:
+        return os.cpu_count() or 1
+
+    if workerCount < 1:
+        raise ValueError(">> [Coretex] \"workerCount\" must be greater than 0")
+
+    return workerCount
+
+
+def writeRawZipMember(zipFile: ZipFile, info: ZipInfo, data: IO[bytes]) -> None:
+    """
+        Adds an already compressed member to the zip archive. CRC, compression
+        type and both sizes of the member must be set on the provided ZipInfo.
+
+        Parameters
+        ----------
+        zipFile : ZipFile
+            archive opened for writing
+        info : ZipInfo
+            information about the member
+        data : IO[bytes]
+            file positioned at the start of the compressed member data,
+            exactly "info.compress_size" bytes are read from it
+
+        Raises
+        ------
+        ValueError -> if the archive is closed or data ends too soon
+    """
+
+    if zipFile.fp is None:
+        raise ValueError(">> [Coretex] Zip archive is closed")
+
+    # Sizes are known, so they are stored in the header instead of the data descriptor
+    info.flag_bits &= ~0x08
+
+    zipFile.fp.seek(zipFile.start_dir)
+    info.header_offset = zipFile.fp.tell()
+    zipFile.fp.write(info.FileHeader())
+
+    remaining = info.compress_size
+    while remaining > 0:
+        chunk = data.read(min(COPY_BUFFER_SIZE, remaining))
+        if not chunk:
+            raise ValueError(f">> [Coretex] Unexpected end of data for zip archive member \"{info.filename}\"")
+
+        zipFile.fp.write(chunk)
+        remaining -= len(chunk)
+
+    zipFile.filelist.append(info)
+    zipFile.NameToInfo[info.filename] = info
+    zipFile.start_dir = zipFile.fp.tell()
+
+
+def _deflateFile(source: Path, destination: Path, compressionLevel: int) -> ZipInfo:
+    # Compresses the file into a raw deflate stream, as it is stored in zip archives
+    compressor = zlib.compressobj(compressionLevel, zlib.DEFLATED, -zlib.MAX_WBITS)
+
+    info = ZipInfo.from_file(source)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.CRC = 0
+    info.compress_size = 0
+
+    with source.open("rb") as sourceFile, destination.open("wb") as destinationFile:
+        while True:
+            chunk = sourceFile.read(COPY_BUFFER_SIZE)
+            if not chunk:
+                break
+
+            info.CRC = zlib.crc32(chunk, info.CRC)
+            info.compress_size += destinationFile.write(compressor.compress(chunk))
+
+        info.compress_size += destinationFile.write(compressor.flush())
 
+    return info
+
+
+def archive(
+    source: Path,
+    destination: Path,
+    compressionLevel: Optional[int] = None,
+    workerCount: Optional[int] = None
+) -> None:
 
-def archive(source: Path, destination: Path) -> None:
     """
         Archives and compresses the provided file or directory
         using ZipFile module
@@ -142,17 +275,64 @@ def archive(source: Path, destination: Path) -> None:
             file to be archived and compressed
         destination : Path
             location to which the zip file will be stored
+        compressionLevel : Optional[int]
+            deflate compression level (0 - 9), if None default level is used
+        workerCount : Optional[int]
+            number of files which are compressed at the same time, if None
+            number of CPU cores is used
     """
 
-    with ZipFile(destination, "w", zipfile.ZIP_DEFLATED) as destinationFile:
-        if source.is_file():
-            destinationFile.write(source, source.name)
-        else:
-            for path in source.rglob("*"):
-                if not path.is_file():
-                    continue
+    if source.is_file():
+        paths = [(source, source.name)]
+    else:
+        paths = [(path, path.relative_to(source).as_posix()) for path in source.rglob("*") if path.is_file()]
+
+    workerCount = _defaultWorkerCount(workerCount)
+
+    with ZipFile(destination, "w", zipfile.ZIP_DEFLATED, compresslevel = compressionLevel) as destinationFile:
+        if workerCount == 1 or len(paths) < 2:
+            for path, name in paths:
+                destinationFile.write(path, name)
+
+            return
+
+        level = zlib.Z_DEFAULT_COMPRESSION if compressionLevel is None else compressionLevel
+
+        def compress(index: int) -> ZipInfo:
+            path, name = paths[index]
+
+            info = _deflateFile(path, destination.with_name(f".{destination.name}.{index}.part"), level)
+            info.filename = name
+
+            return info
+
+        # Files are compressed in parallel (zlib releases the GIL) and
+        # added to the archive in their original order
+        with ThreadPoolExecutor(workerCount) as executor:
+            futures: Dict[int, Future] = {}
+            nextIndex = 0
+
+            try:
+                for index in range(len(paths)):
+                    while nextIndex < len(paths) and nextIndex < index + workerCount * ARCHIVE_PENDING_FILES_PER_WORKER:
+                        futures[nextIndex] = executor.submit(compress, nextIndex)
+                        nextIndex += 1
+
+                    info = futures.pop(index).result()
+                    partPath = destination.with_name(f".{destination.name}.{index}.part")
+
+                    with partPath.open("rb") as partFile:
+                        writeRawZipMember(destinationFile, info, partFile)
+
+                    partPath.unlink()
+            finally:
+                for future in futures.values():
+                    future.cancel()
 
-                destinationFile.write(path, path.relative_to(source))
+                executor.shutdown(wait = True)
+
+                for index in futures:
+                    destination.with_name(f".{destination.name}.{index}.part").unlink(missing_ok = True)
 
 
 def walk(path: Path) -> Generator[Path, None, None]:
@@ -177,9 +357,177 @@ def walk(path: Path) -> Generator[Path, None, None]:
             yield from walk(p)
 
 
-def recursiveUnzip(entryPoint: Path, destination: Optional[Path] = None, remove: bool = False) -> None:
+class _ExtractionEngine:
+
+    # Extracts archives and their members using a pool of threads. Every
+    # member of a zip archive and every nested archive is a separate task,
+    # so members of all archives are extracted at the same time.
+
+    def __init__(self, workerCount: int) -> None:
+        self.workerCount = workerCount
+
+        # ZipFile objects are not shared between threads, every thread
+        # opens each archive once and keeps it open until all of its
+        # members are extracted
+        self._openedFiles: Dict[Path, Dict[int, ZipFile]] = {}
+        self._remainingMembers: Dict[Path, int] = {}
+        self._removedArchives: Set[Path] = set()
+        self._lock = Lock()
+
+    def run(self, task: _ExtractionTask) -> None:
+        with ThreadPoolExecutor(self.workerCount) as executor:
+            pending: Set[Future] = { executor.submit(task) }
+
+            try:
+                while len(pending) > 0:
+                    done, pending = wait(pending, return_when = FIRST_COMPLETED)
+
+                    for future in done:
+                        for nextTask in future.result():
+                            pending.add(executor.submit(nextTask))
+            finally:
+                for future in pending:
+                    future.cancel()
+
+                executor.shutdown(wait = True)
+
+                # Archives whose extraction failed are closed, but never deleted
+                for zipFiles in self._openedFiles.values():
+                    for zipFile in zipFiles.values():
+                        zipFile.close()
+
+                self._openedFiles.clear()
+
+    def _zipFile(self, path: Path) -> ZipFile:
+        threadId = get_ident()
+
+        with self._lock:
+            zipFiles = self._openedFiles.setdefault(path, {})
+            zipFile = zipFiles.get(threadId)
+
+        if zipFile is None:
+            zipFile = ZipFile(path)
+
+            with self._lock:
+                zipFiles[threadId] = zipFile
+
+        return zipFile
+
+    def _finishArchive(self, path: Path) -> None:
+        # Called once all members of the zip archive are extracted, nested
+        # archives are deleted right away so they don't occupy disk space
+        # until the whole extraction ends
+        with self._lock:
+            zipFiles = self._openedFiles.pop(path, {})
+            remove = path in self._removedArchives
+
+        for zipFile in zipFiles.values():
+            zipFile.close()
+
+        if remove:
+            path.unlink()
+
+    def _nestedTasks(self, paths: List[Path]) -> List[_ExtractionTask]:
+        return [
+            self.unpackTask(path, path.parent / path.stem, True)
+            for path in paths
+            if path.is_file() and (isGzip(path) or isArchive(path))
+        ]
+
+    def unpackTask(self, entryPoint: Path, destination: Path, remove: bool) -> _ExtractionTask:
+        return lambda: self._unpack(entryPoint, destination, remove)
+
+    def _unpack(self, entryPoint: Path, destination: Path, remove: bool) -> List[_ExtractionTask]:
+        logging.getLogger("coretexpylib").debug(f">> [Coretex] recursiveUnzip: source = {str(entryPoint)}, destination = {str(destination)}")
+
+        # Decompress with gzip if is gzip
+        if isGzip(entryPoint):
+            gzipDecompress(entryPoint, destination)
+
+            if remove:
+                entryPoint.unlink()
+
+            if not isArchive(destination):
+                return []
+
+            # gzip nameing convention is .original_file_ext.gz, so by calling .stem we remove .gz
+            # for destination
+            return [self.unpackTask(destination, destination.parent / destination.stem, True)]
+
+        if not isArchive(entryPoint):
+            raise ValueError(">> [Coretex] Not an archive")
+
+        tasks: List[_ExtractionTask] = []
+
+        if tarfile.is_tarfile(entryPoint):
+            # Members of compressed tar archives can only be read sequentially
+            with tarfile.open(entryPoint, "r") as tarFile:
+                tarFile.extractall(destination)
+                names = tarFile.getnames()
+
+            tasks.extend(self._nestedTasks([destination / name for name in names]))
+
+        if not zipfile.is_zipfile(entryPoint):
+            if remove:
+                entryPoint.unlink()
+
+            return tasks
+
+        memberTasks: List[_ExtractionTask] = []
+
+        for info in self._zipFile(entryPoint).infolist():
+            memberName = sanitizeMemberName(info.filename)
+            if memberName is None:
+                continue
+
+            memberPath = destination / memberName
+
+            # Directories are created before the members are extracted, otherwise
+            # multiple threads could try to create the same directory at the same time
+            if info.is_dir():
+                memberPath.mkdir(parents = True, exist_ok = True)
+            else:
+                memberPath.parent.mkdir(parents = True, exist_ok = True)
+                memberTasks.append(self._extractMemberTask(entryPoint, info, memberPath))
+
+        with self._lock:
+            self._remainingMembers[entryPoint] = len(memberTasks)
+
+            if remove:
+                self._removedArchives.add(entryPoint)
+
+        if len(memberTasks) == 0:
+            self._finishArchive(entryPoint)
+
+        return tasks + memberTasks
+
+    def _extractMemberTask(self, entryPoint: Path, info: ZipInfo, memberPath: Path) -> _ExtractionTask:
+        def extractMember() -> List[_ExtractionTask]:
+            with self._zipFile(entryPoint).open(info) as source, memberPath.open("wb") as destination:
+                shutil.copyfileobj(source, destination, COPY_BUFFER_SIZE)
+
+            with self._lock:
+                self._remainingMembers[entryPoint] -= 1
+                finished = self._remainingMembers[entryPoint] == 0
+
+            if finished:
+                self._finishArchive(entryPoint)
+
+            return self._nestedTasks([memberPath])
+
+        return extractMember
+
+
+def recursiveUnzip(
+    entryPoint: Path,
+    destination: Optional[Path] = None,
+    remove: bool = False,
+    workerCount: Optional[int] = None
+) -> None:
+
     """
-        Recursively unarchives the file
+        Recursively unarchives the file. Archive members and nested archives
+        are extracted in parallel using a pool of threads.
 
         Parameters
         ----------
@@ -189,46 +537,17 @@ def recursiveUnzip(entryPoint: Path, destination: Optional[Path] = None, remove:
             destination of unarchived files
         remove : bool
             delete archive after unarchive is done
+        workerCount : Optional[int]
+            number of threads used for extraction, if None
+            number of CPU cores is used
 
         Raises
         ------
         ValueError -> if the path is not an archive
     """
 
-    logging.getLogger("coretexpylib").debug(f">> [Coretex] recursiveUnzip: source = {str(entryPoint)}, destination = {str(destination)}")
-
     if destination is None:
         destination = entryPoint.parent / entryPoint.stem
 
-    # Decompress with gzip if is gzip
-    if isGzip(entryPoint):
-        gzipDecompress(entryPoint, destination)
-
-        if remove:
-            entryPoint.unlink()
-
-        if not isArchive(destination):
-            return
-
-        # gzip nameing convention is .original_file_ext.gz, so by calling .stem we remove .gz
-        # for destination
-        recursiveUnzip(destination, destination.parent / destination.stem, remove = True)
-        return
-
-    if not isArchive(entryPoint):
-        raise ValueError(">> [Coretex] Not an archive")
-
-    if zipfile.is_zipfile(entryPoint):
-        with ZipFile(entryPoint, "r") as zipFile:
-            zipFile.extractall(destination)
-
-    if tarfile.is_tarfile(entryPoint):
-        with tarfile.open(entryPoint, "r") as tarFile:
-            tarFile.extractall(destination)
-
-    if remove:
-        entryPoint.unlink()
-
-    for path in walk(destination):
-        if isArchive(path) or isGzip(path):
-            recursiveUnzip(path, remove = True)
+    engine = _ExtractionEngine(_defaultWorkerCount(workerCount))
+    engine.run(engine.unpackTask(entryPoint, destination, remove))
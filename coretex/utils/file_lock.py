@@ -0,0 +1,205 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Optional, Union, Type
+from typing_extensions import Self
+from types import TracebackType
+from pathlib import Path
+
+import os
+import sys
+import time
+
+
+if sys.platform == "win32":
+    import msvcrt
+
+    def _lock(fd: int, blocking: bool) -> bool:
+        mode = msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK
+
+        while True:
+            try:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, mode, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    return False
+
+                # LK_LOCK gives up after 10 seconds, keep waiting until the lock is acquired
+
+    def _unlock(fd: int) -> None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock(fd: int, blocking: bool) -> bool:
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+
+        try:
+            fcntl.flock(fd, flags)
+            return True
+        except BlockingIOError:
+            return False
+
+    def _unlock(fd: int) -> None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+class FileLock:
+
+    """
+        Exclusive lock backed by a file, used for synchronizing
+        multiple processes which are accessing the same files.
+        Lock is released by the OS if the process which holds it dies.
+        It is not reentrant and should not be shared between threads.
+
+        Parameters
+        ----------
+        path : Union[Path, str]
+            path to the lock file, created if it does not exist
+        timeout : Optional[float]
+            maximum number of seconds to wait for the lock, waits
+            indefinitely if None
+
+        Example
+        -------
+        >>> from coretex.utils import FileLock
+        \b
+        >>> with FileLock("path/to/file.lock"):
+                # Only a single process can execute this block at a time
+                pass
+    """
+
+    def __init__(self, path: Union[Path, str], timeout: Optional[float] = None) -> None:
+        if isinstance(path, str):
+            path = Path(path)
+
+        self.path = path
+        self.timeout = timeout
+
+        self.__fd: Optional[int] = None
+
+    @property
+    def isLocked(self) -> bool:
+        return self.__fd is not None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """
+            Acquires the lock
+
+            Parameters
+            ----------
+            blocking : bool
+                if True waits until the lock is available, otherwise
+                returns immediately if the lock is held by someone else
+
+            Returns
+            -------
+            bool -> True if the lock was acquired, False otherwise
+
+            Raises
+            ------
+            TimeoutError -> if the lock was not acquired within "timeout" seconds
+        """
+
+        if self.__fd is not None:
+            raise RuntimeError(f">> [Coretex] Lock \"{self.path}\" is already acquired")
+
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+
+            try:
+                if not blocking:
+                    acquired = _lock(fd, False)
+                elif deadline is None:
+                    acquired = _lock(fd, True)
+                else:
+                    while not _lock(fd, False):
+                        if time.monotonic() >= deadline:
+                            raise TimeoutError(f">> [Coretex] Failed to acquire lock \"{self.path}\" within {self.timeout} seconds")
+
+                        time.sleep(0.05)
+
+                    acquired = True
+            except BaseException:
+                os.close(fd)
+                raise
+
+            if not acquired:
+                os.close(fd)
+                return False
+
+            # Lock file could have been removed by the previous holder while this
+            # process was waiting, in that case the lock has to be acquired again
+            if self.__isCurrent(fd):
+                self.__fd = fd
+                return True
+
+            _unlock(fd)
+            os.close(fd)
+
+    def __isCurrent(self, fd: int) -> bool:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+
+        fdStat = os.fstat(fd)
+        return stat.st_ino == fdStat.st_ino and stat.st_dev == fdStat.st_dev
+
+    def release(self, remove: bool = False) -> None:
+        """
+            Releases the lock, does nothing if the lock is not acquired
+
+            Parameters
+            ----------
+            remove : bool
+                if True the lock file is deleted before the lock is released
+        """
+
+        if self.__fd is None:
+            return
+
+        if remove:
+            try:
+                self.path.unlink(missing_ok = True)
+            except OSError:
+                # Open files can't be deleted on Windows
+                pass
+
+        try:
+            _unlock(self.__fd)
+        finally:
+            os.close(self.__fd)
+            self.__fd = None
+
+    def __enter__(self) -> Self:
+        self.acquire()
+        return self
+
+    def __exit__(
+        self,
+        exceptionType: Optional[Type[BaseException]],
+        exceptionValue: Optional[BaseException],
+        exceptionTraceback: Optional[TracebackType]
+    ) -> None:
+
+        self.release()
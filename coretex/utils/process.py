@@ -15,15 +15,31 @@
 #     You should have received a copy of the GNU Affero General Public License
 #     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from typing import List, Optional, Tuple
+from typing import Callable, Deque, Dict, IO, List, Optional, Tuple, Union
 from pathlib import Path
+from collections import deque
+from threading import Thread
 
+import os
+import codecs
 import logging
+import selectors
 import subprocess
 
 
-def logProcessOutput(output: bytes, level: int) -> None:
-    decoded = output.decode("UTF-8")
+LineCallback = Callable[[str], None]
+
+READ_CHUNK_SIZE = 64 * 1024
+
+# Lines longer than this are split to keep memory bounded
+MAX_LINE_LENGTH = 1024 * 1024
+
+# Maximum amount of output "command" keeps per stream, older output is discarded
+MAX_CAPTURED_OUTPUT_BYTES = 64 * 1024 * 1024
+
+
+def logProcessOutput(output: Union[bytes, str], level: int) -> None:
+    decoded = output.decode("UTF-8", errors = "replace") if isinstance(output, bytes) else output
 
     for line in decoded.split("\n"):
         # skip empty lines
@@ -38,6 +54,187 @@ class CommandException(Exception):
     pass
 
 
+class OutputBuffer:
+
+    """
+        Keeps the most recent lines of process output
+        up to "maxBytes" characters
+
+        Parameters
+        ----------
+        maxBytes : Optional[int]
+            maximum size of the kept output, unbounded if None
+    """
+
+    def __init__(self, maxBytes: Optional[int] = MAX_CAPTURED_OUTPUT_BYTES) -> None:
+        self.maxBytes = maxBytes
+        self.truncated = False
+
+        self.__lines: Deque[str] = deque()
+        self.__size = 0
+
+    def append(self, line: str) -> None:
+        self.__lines.append(line)
+        self.__size += len(line)
+
+        if self.maxBytes is None:
+            return
+
+        while self.__size > self.maxBytes and len(self.__lines) > 0:
+            self.__size -= len(self.__lines.popleft())
+            self.truncated = True
+
+    def lines(self) -> List[str]:
+        return list(self.__lines)
+
+    def text(self) -> str:
+        return "".join(self.__lines)
+
+
+class _LineSplitter:
+
+    def __init__(self, callback: Optional[LineCallback]) -> None:
+        self.callback = callback
+
+        self.__decoder = codecs.getincrementaldecoder("utf-8")(errors = "replace")
+        self.__buffer = bytearray()
+
+    def __emit(self, data: Union[bytes, bytearray], final: bool = False) -> None:
+        line = self.__decoder.decode(bytes(data), final)
+
+        if self.callback is not None and len(line) > 0:
+            self.callback(line)
+
+    def feed(self, chunk: bytes) -> None:
+        if self.callback is None:
+            return
+
+        self.__buffer += chunk
+
+        start = 0
+        while (end := self.__buffer.find(b"\n", start)) != -1:
+            self.__emit(self.__buffer[start:end + 1])
+            start = end + 1
+
+        del self.__buffer[:start]
+
+        if len(self.__buffer) >= MAX_LINE_LENGTH:
+            self.__emit(self.__buffer)
+            self.__buffer.clear()
+
+    def close(self) -> None:
+        if self.callback is None:
+            return
+
+        self.__emit(self.__buffer, final = True)
+        self.__buffer.clear()
+
+
+def _drainWithSelector(splitters: Dict[IO[bytes], _LineSplitter]) -> None:
+    with selectors.DefaultSelector() as selector:
+        for stream, splitter in splitters.items():
+            selector.register(stream, selectors.EVENT_READ, splitter)
+
+        while len(selector.get_map()) > 0:
+            for key, _ in selector.select():
+                splitter = key.data
+                chunk = os.read(key.fd, READ_CHUNK_SIZE)
+
+                if len(chunk) == 0:
+                    selector.unregister(key.fileobj)
+                    splitter.close()
+                else:
+                    splitter.feed(chunk)
+
+
+def _drainWithThreads(splitters: Dict[IO[bytes], _LineSplitter]) -> None:
+    # Pipes do not support select on Windows, every stream is read by its own thread
+    def drain(stream: IO[bytes], splitter: _LineSplitter) -> None:
+        while len(chunk := os.read(stream.fileno(), READ_CHUNK_SIZE)) > 0:
+            splitter.feed(chunk)
+
+        splitter.close()
+
+    threads = [
+        Thread(target = drain, args = (stream, splitter), name = "Process output reader", daemon = True)
+        for stream, splitter in splitters.items()
+    ]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+
+def drainStreams(streams: Dict[IO[bytes], Optional[LineCallback]]) -> None:
+    """
+        Reads all provided streams concurrently until all of them are
+        closed, without polling. Every decoded line (including the line
+        terminator) is passed to the callback of its stream, output of
+        streams without a callback is discarded
+
+        Parameters
+        ----------
+        streams : Dict[IO[bytes], Optional[LineCallback]]
+            streams mapped to the callback which receives their lines
+    """
+
+    splitters = {stream: _LineSplitter(callback) for stream, callback in streams.items()}
+    if len(splitters) == 0:
+        return
+
+    if os.name == "nt":
+        _drainWithThreads(splitters)
+    else:
+        _drainWithSelector(splitters)
+
+
+def captureProcessOutput(
+    process: subprocess.Popen,
+    onStdout: Optional[LineCallback] = None,
+    onStderr: Optional[LineCallback] = None
+) -> int:
+
+    """
+        Drains stdout and stderr of the process concurrently until both
+        are closed and waits for the process to exit. Both pipes are always
+        drained, so the process can never block on a full pipe
+
+        Parameters
+        ----------
+        process : subprocess.Popen
+            process whose output is captured
+        onStdout : Optional[LineCallback]
+            called with every line written to stdout
+        onStderr : Optional[LineCallback]
+            called with every line written to stderr
+
+        Returns
+        -------
+        int -> exit code of the process
+
+        Example
+        -------
+        >>> import subprocess
+        >>> from coretex.utils import captureProcessOutput
+        \b
+        >>> process = subprocess.Popen(["ls", "-l"], stdout = subprocess.PIPE, stderr = subprocess.PIPE)
+        >>> returnCode = captureProcessOutput(process, onStdout = print)
+    """
+
+    streams: Dict[IO[bytes], Optional[LineCallback]] = {}
+
+    if process.stdout is not None:
+        streams[process.stdout] = onStdout
+
+    if process.stderr is not None:
+        streams[process.stderr] = onStderr
+
+    drainStreams(streams)
+    return process.wait()
+
+
 def command(
     args: List[str],
     ignoreStdout: bool = False,
@@ -54,37 +251,22 @@ def command(
         stderr = subprocess.PIPE
     )
 
-    stdOutStr = ""
-    stdErrStr = ""
+    stdout = OutputBuffer()
+    stderr = OutputBuffer()
 
-    returnCode: Optional[int] = None
+    def onStdout(line: str) -> None:
+        stdout.append(line)
 
-    stdout = process.stdout
-    stderr = process.stderr
+        if not ignoreStdout:
+            logProcessOutput(line, logging.INFO)
 
-    if stdout is None and not ignoreStdout:
-        commandArgs = " ".join(args)
-        raise ValueError(f">> [Coretex] Something went wrong while trying to execute \"{commandArgs}\"")
-
-    while (returnCode := process.poll()) is None:
-        if stdout is not None:
-            line = stdout.readline()
-            stdOutStr = "\n".join([stdOutStr, line.decode("utf-8")])
-            if not ignoreStdout:
-                logProcessOutput(line, logging.INFO)
-
-    if stderr is None and not ignoreStderr:
-        commandArgs = " ".join(args)
-        raise ValueError(f">> [Coretex] Something went wrong while trying to execute \"{commandArgs}\"")
+    returnCode = captureProcessOutput(process, onStdout, stderr.append)
 
-    if stderr is not None:
-        lines = stderr.readlines()
-        stdErrStr = b"".join(lines).decode("utf-8")
-        if not ignoreStderr:
-            logProcessOutput(b"".join(lines), logging.WARNING if returnCode == 0 else logging.FATAL)
+    if not ignoreStderr:
+        logProcessOutput(stderr.text(), logging.WARNING if returnCode == 0 else logging.FATAL)
 
     if returnCode != 0 and check:
         commandArgs = " ".join(args)
         raise CommandException(f">> [Coretex] Failed to execute command \"{commandArgs}\". Exit code \"{returnCode}\"")
 
-    return returnCode, stdOutStr, stdErrStr
+    return returnCode, stdout.text(), stderr.text()
@@ -0,0 +1,347 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Optional, BinaryIO, List
+from pathlib import Path
+
+import struct
+import zlib
+
+from .file import sanitizeMemberName
+
+
+_LOCAL_FILE_HEADER_SIGNATURE = 0x04034b50
+_DATA_DESCRIPTOR_SIGNATURE   = 0x08074b50
+
+# Once any of these records is reached all archive members were already read
+_CENTRAL_DIRECTORY_SIGNATURES = {
+    0x02014b50,  # Central directory file header
+    0x06054b50,  # End of central directory record
+    0x06064b50,  # ZIP64 end of central directory record
+    0x05054b50   # Digital signature
+}
+
+_LOCAL_FILE_HEADER = struct.Struct("<IHHHHHIIIHH")
+_ZIP64_EXTRA_ID    = 0x0001
+_ZIP64_SIZE_LIMIT  = 0xFFFFFFFF
+
+_FLAG_ENCRYPTED       = 0x01
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8            = 0x800
+
+_STORED   = 0
+_DEFLATED = 8
+
+_STATE_HEADER     = 0
+_STATE_DATA       = 1
+_STATE_DESCRIPTOR = 2
+_STATE_DONE       = 3
+
+
+class ZipStreamError(Exception):
+
+    """
+        Exception raised if the zip stream is not valid or it
+        contains members which cannot be extracted while streaming
+    """
+
+    pass
+
+
+def _parseZip64Sizes(extra: bytes, compressedSize: int, uncompressedSize: int) -> Optional[int]:
+    # Returns the compressed size stored in ZIP64 extra field, if it is present
+    position = 0
+
+    while position + 4 <= len(extra):
+        headerId, size = struct.unpack_from("<HH", extra, position)
+        position += 4
+
+        if headerId == _ZIP64_EXTRA_ID:
+            values = extra[position:position + size]
+            offset = 0
+
+            # Values are present only if the matching header field is set to 0xFFFFFFFF
+            if uncompressedSize == _ZIP64_SIZE_LIMIT:
+                offset += 8
+
+            if compressedSize == _ZIP64_SIZE_LIMIT and offset + 8 <= len(values):
+                return int.from_bytes(values[offset:offset + 8], "little")
+
+            return compressedSize
+
+        position += size
+
+    return None
+
+
+class ZipStreamExtractor:
+
+    """
+        Extracts members of a zip archive while the archive is being
+        read, without storing it or seeking through it. Archive members
+        are read using their local file headers, central directory
+        at the end of the archive is ignored.
+
+        Only stored and deflated members are supported. Stored members
+        must have their size stored in the local file header.
+
+        Parameters
+        ----------
+        destination : Path
+            directory to which the archive members are extracted
+
+        Example
+        -------
+        >>> from coretex.utils.zip_stream import ZipStreamExtractor
+        \b
+        >>> extractor = ZipStreamExtractor(Path("path/to/destination"))
+        >>> with open("archive.zip", "rb") as file:
+                for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                    extractor.feed(chunk)
+        >>> extractor.close()
+    """
+
+    def __init__(self, destination: Path) -> None:
+        self.destination = destination
+        self.extracted: List[Path] = []
+
+        self._buffer = bytearray()
+        self._state = _STATE_HEADER
+
+        self._file: Optional[BinaryIO] = None
+        self._name = ""
+        self._method = _STORED
+        self._crc = 0
+        self._expectedCrc = 0
+        self._remaining = 0
+        self._hasDescriptor = False
+        self._isZip64 = False
+        self._decompressor: Optional["zlib._Decompress"] = None
+
+    @property
+    def isFinished(self) -> bool:
+        """
+            Returns
+            -------
+            bool -> True if all archive members were extracted
+        """
+
+        return self._state == _STATE_DONE
+
+    def feed(self, data: bytes) -> None:
+        """
+            Extracts archive members contained in the provided
+            part of the archive
+
+            Parameters
+            ----------
+            data : bytes
+                next part of the archive
+
+            Raises
+            ------
+            ZipStreamError -> if the archive is not valid or one of its
+            members cannot be extracted while streaming
+        """
+
+        if self._state == _STATE_DONE:
+            return
+
+        self._buffer.extend(data)
+
+        while True:
+            if self._state == _STATE_HEADER:
+                consumed = self._readHeader()
+            elif self._state == _STATE_DATA:
+                try:
+                    consumed = self._readData()
+                except zlib.error as ex:
+                    raise ZipStreamError(f">> [Coretex] Failed to decompress zip archive member \"{self._name}\"") from ex
+            elif self._state == _STATE_DESCRIPTOR:
+                consumed = self._readDescriptor()
+            else:
+                # Central directory and anything after it is not needed
+                self._buffer.clear()
+                return
+
+            if not consumed:
+                return
+
+    def close(self) -> None:
+        """
+            Closes the extractor
+
+            Raises
+            ------
+            ZipStreamError -> if the archive ended before all of its
+            members were extracted
+        """
+
+        isComplete = self._state == _STATE_DONE
+        self.abort()
+
+        if not isComplete:
+            raise ZipStreamError(">> [Coretex] Unexpected end of zip archive")
+
+    def abort(self) -> None:
+        """
+            Closes the member which is being extracted without
+            validating the archive. Already extracted files are kept.
+        """
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        self._buffer.clear()
+
+    def _readHeader(self) -> bool:
+        if len(self._buffer) < 4:
+            return False
+
+        signature = int.from_bytes(self._buffer[:4], "little")
+        if signature in _CENTRAL_DIRECTORY_SIGNATURES:
+            self._state = _STATE_DONE
+            return True
+
+        if signature != _LOCAL_FILE_HEADER_SIGNATURE:
+            raise ZipStreamError(">> [Coretex] Invalid zip archive, local file header expected")
+
+        if len(self._buffer) < _LOCAL_FILE_HEADER.size:
+            return False
+
+        (
+            _, _, flags, method, _, _, crc,
+            compressedSize, uncompressedSize, nameLength, extraLength
+        ) = _LOCAL_FILE_HEADER.unpack_from(self._buffer)
+
+        headerSize = _LOCAL_FILE_HEADER.size + nameLength + extraLength
+        if len(self._buffer) < headerSize:
+            return False
+
+        rawName = bytes(self._buffer[_LOCAL_FILE_HEADER.size:_LOCAL_FILE_HEADER.size + nameLength])
+        extra = bytes(self._buffer[_LOCAL_FILE_HEADER.size + nameLength:headerSize])
+        del self._buffer[:headerSize]
+
+        self._name = rawName.decode("utf-8" if flags & _FLAG_UTF8 else "cp437")
+
+        if flags & _FLAG_ENCRYPTED:
+            raise ZipStreamError(f">> [Coretex] Zip archive member \"{self._name}\" is encrypted")
+
+        if method not in (_STORED, _DEFLATED):
+            raise ZipStreamError(f">> [Coretex] Zip archive member \"{self._name}\" uses unsupported compression method {method}")
+
+        self._hasDescriptor = bool(flags & _FLAG_DATA_DESCRIPTOR)
+        if self._hasDescriptor and method == _STORED:
+            # Size of a stored member is known only from the central directory
+            raise ZipStreamError(f">> [Coretex] Size of zip archive member \"{self._name}\" is not known")
+
+        zip64CompressedSize = _parseZip64Sizes(extra, compressedSize, uncompressedSize)
+        self._isZip64 = zip64CompressedSize is not None
+        if zip64CompressedSize is not None:
+            compressedSize = zip64CompressedSize
+
+        self._method = method
+        self._expectedCrc = crc
+        self._crc = 0
+        self._remaining = compressedSize
+        self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS) if method == _DEFLATED else None
+
+        memberName = sanitizeMemberName(self._name)
+        memberPath = None if memberName is None else self.destination / memberName
+
+        if memberPath is not None and self._name.endswith("/"):
+            memberPath.mkdir(parents = True, exist_ok = True)
+        elif memberPath is not None:
+            memberPath.parent.mkdir(parents = True, exist_ok = True)
+            self._file = memberPath.open("wb")
+            self.extracted.append(memberPath)
+
+        self._state = _STATE_DATA
+        return True
+
+    def _write(self, data: bytes) -> None:
+        self._crc = zlib.crc32(data, self._crc)
+
+        if self._file is not None:
+            self._file.write(data)
+
+    def _readData(self) -> bool:
+        if len(self._buffer) == 0 and (self._remaining > 0 or self._hasDescriptor):
+            return False
+
+        if self._decompressor is None:
+            count = min(self._remaining, len(self._buffer))
+            self._write(bytes(self._buffer[:count]))
+
+            del self._buffer[:count]
+            self._remaining -= count
+
+            isMemberRead = self._remaining == 0
+        elif self._hasDescriptor:
+            # Compressed size is not known, so the end of the
+            # member is the end of the deflate stream
+            self._write(self._decompressor.decompress(self._buffer))
+            self._buffer = bytearray(self._decompressor.unused_data)
+
+            isMemberRead = self._decompressor.eof
+        else:
+            count = min(self._remaining, len(self._buffer))
+            self._write(self._decompressor.decompress(self._buffer[:count]))
+
+            del self._buffer[:count]
+            self._remaining -= count
+
+            isMemberRead = self._remaining == 0
+            if isMemberRead:
+                self._write(self._decompressor.flush())
+
+        if not isMemberRead:
+            return False
+
+        if self._hasDescriptor:
+            self._state = _STATE_DESCRIPTOR
+            return True
+
+        self._finishMember()
+        return True
+
+    def _readDescriptor(self) -> bool:
+        sizesLength = 16 if self._isZip64 else 8
+
+        if len(self._buffer) < 4:
+            return False
+
+        offset = 4 if int.from_bytes(self._buffer[:4], "little") == _DATA_DESCRIPTOR_SIGNATURE else 0
+        if len(self._buffer) < offset + 4 + sizesLength:
+            return False
+
+        self._expectedCrc = int.from_bytes(self._buffer[offset:offset + 4], "little")
+        del self._buffer[:offset + 4 + sizesLength]
+
+        self._finishMember()
+        return True
+
+    def _finishMember(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        if self._crc != self._expectedCrc:
+            raise ZipStreamError(f">> [Coretex] CRC check failed for zip archive member \"{self._name}\"")
+
+        self._state = _STATE_HEADER
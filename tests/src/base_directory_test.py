@@ -0,0 +1,68 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Dict
+from pathlib import Path
+from zipfile import ZipFile, ZIP_DEFLATED
+
+import tempfile
+import unittest
+
+
+class BaseDirectoryTest:
+
+    class Base(unittest.TestCase):
+
+        path: Path
+
+        def setUp(self) -> None:
+            super().setUp()
+
+            # Every test works inside of its own empty directory
+            self.__directory = tempfile.TemporaryDirectory()
+            self.path = Path(self.__directory.name)
+
+        def tearDown(self) -> None:
+            super().tearDown()
+            self.__directory.cleanup()
+
+        def createFiles(self, root: Path, files: Dict[str, bytes]) -> None:
+            for name, content in files.items():
+                path = root / name
+                path.parent.mkdir(parents = True, exist_ok = True)
+                path.write_bytes(content)
+
+        def createZip(self, path: Path, members: Dict[str, bytes], compression: int = ZIP_DEFLATED) -> Path:
+            with ZipFile(path, "w", compression) as zipFile:
+                for name, content in members.items():
+                    zipFile.writestr(name, content)
+
+            return path
+
+        def assertFiles(self, root: Path, files: Dict[str, bytes]) -> None:
+            content = {
+                path.relative_to(root).as_posix(): path.read_bytes()
+                for path in root.rglob("*")
+                if path.is_file()
+            }
+
+            self.assertEqual(content, files)
+
+        def assertZipContent(self, path: Path, members: Dict[str, bytes]) -> None:
+            with ZipFile(path) as zipFile:
+                self.assertIsNone(zipFile.testzip())
+                self.assertEqual({ name: zipFile.read(name) for name in zipFile.namelist() if not name.endswith("/") }, members)
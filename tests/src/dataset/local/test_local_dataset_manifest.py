@@ -0,0 +1,132 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Any, Dict, List
+from pathlib import Path
+from unittest import mock
+
+import os
+import sys
+import json
+import zipfile
+import unittest
+
+from coretex import LocalDataset, LocalCustomSample, LocalImageSample
+
+from ...base_directory_test import BaseDirectoryTest
+
+
+localDatasetModule = sys.modules["coretex.entities.dataset.local_dataset"]
+MANIFEST_FILE_NAME = localDatasetModule.MANIFEST_FILE_NAME
+
+
+class TestLocalDatasetManifest(BaseDirectoryTest.Base):
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        for name in ["1.zip", "2.zip"]:
+            self.createZip(self.path / name, { "file.txt": name.encode() })
+
+        (self.path / "classes.json").write_text("[]")
+
+    def loadSampleNames(self) -> List[str]:
+        dataset = LocalDataset(self.path, LocalCustomSample)
+        return sorted(sample.name for sample in dataset.samples)
+
+    def readManifest(self) -> Dict[str, Any]:
+        with (self.path / MANIFEST_FILE_NAME).open("r") as file:
+            return json.load(file)  # type: ignore[no-any-return]
+
+    def checkedFiles(self) -> List[str]:
+        # Returns names of the files which were checked for being a zip archive
+        with mock.patch.object(localDatasetModule.zipfile, "is_zipfile", wraps = zipfile.is_zipfile) as isZipFile:
+            self.assertEqual(self.loadSampleNames(), ["1", "2"])
+
+        return sorted(Path(call.args[0]).name for call in isZipFile.call_args_list)
+
+    def test_manifestCreated(self) -> None:
+        self.assertEqual(self.checkedFiles(), ["1.zip", "2.zip", "classes.json"])
+
+        manifest = self.readManifest()
+        self.assertEqual(manifest["version"], localDatasetModule.MANIFEST_VERSION)
+        self.assertEqual(sorted(manifest["files"]), ["1.zip", "2.zip", "classes.json"])
+        self.assertTrue(manifest["files"]["1.zip"]["isZip"])
+        self.assertFalse(manifest["files"]["classes.json"]["isZip"])
+
+        # Temporary files are not left in the dataset folder
+        self.assertEqual(sorted(path.name for path in self.path.iterdir()), [MANIFEST_FILE_NAME, "1.zip", "2.zip", "classes.json"])
+
+    def test_unchangedFilesNotChecked(self) -> None:
+        self.checkedFiles()
+        modifiedTime = (self.path / MANIFEST_FILE_NAME).stat().st_mtime_ns
+
+        self.assertEqual(self.checkedFiles(), [])
+
+        # Manifest is not rewritten if nothing changed
+        self.assertEqual((self.path / MANIFEST_FILE_NAME).stat().st_mtime_ns, modifiedTime)
+
+    def test_revalidatedByModificationTime(self) -> None:
+        self.checkedFiles()
+
+        # Content of the same size replaces the archive, only the modification time differs
+        stat = (self.path / "2.zip").stat()
+        (self.path / "2.zip").write_bytes(b"x" * stat.st_size)
+        os.utime(self.path / "2.zip", ns = (stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        with mock.patch.object(localDatasetModule.zipfile, "is_zipfile", wraps = zipfile.is_zipfile) as isZipFile:
+            self.assertEqual(self.loadSampleNames(), ["1"])
+
+        self.assertEqual([Path(call.args[0]).name for call in isZipFile.call_args_list], ["2.zip"])
+        self.assertFalse(self.readManifest()["files"]["2.zip"]["isZip"])
+
+    def test_addedAndRemovedFiles(self) -> None:
+        self.checkedFiles()
+
+        (self.path / "1.zip").unlink()
+        self.createZip(self.path / "3.zip", { "file.txt": b"3" })
+
+        dataset = LocalDataset(self.path, LocalCustomSample)
+
+        self.assertEqual(sorted(sample.name for sample in dataset.samples), ["2", "3"])
+        self.assertEqual(sorted(self.readManifest()["files"]), ["2.zip", "3.zip", "classes.json"])
+
+    def test_invalidManifest(self) -> None:
+        (self.path / MANIFEST_FILE_NAME).write_text("not a manifest")
+
+        self.assertEqual(self.checkedFiles(), ["1.zip", "2.zip", "classes.json"])
+        self.assertEqual(sorted(self.readManifest()["files"]), ["1.zip", "2.zip", "classes.json"])
+
+    def test_sampleTypeChanged(self) -> None:
+        self.checkedFiles()
+        self.assertIn("LocalCustomSample", self.readManifest()["sampleType"])
+
+        dataset = LocalDataset(self.path, LocalImageSample)
+
+        self.assertEqual(sorted(sample.name for sample in dataset.samples), ["1", "2"])
+        self.assertIn("LocalImageSample", self.readManifest()["sampleType"])
+
+    def test_readOnlyFolder(self) -> None:
+        with mock.patch.object(localDatasetModule.os, "replace", side_effect = PermissionError("Read-only file system")):
+            self.assertEqual(self.loadSampleNames(), ["1", "2"])
+
+        self.assertFalse((self.path / MANIFEST_FILE_NAME).exists())
+        self.assertEqual(sorted(path.name for path in self.path.iterdir()), ["1.zip", "2.zip", "classes.json"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,181 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Dict, List, Set
+from pathlib import Path
+from threading import Lock
+
+import unittest
+
+from coretex import DatasetDownloader, DatasetDownloadError
+
+from ..base_directory_test import BaseDirectoryTest
+
+
+class _FakeSample:
+
+    # Implements the part of NetworkSample used by the downloader, "failures"
+    # is the number of times each of the steps fails before it succeeds
+
+    def __init__(self, root: Path, id_: int) -> None:
+        self.id = id_
+        self.name = f"sample-{id_}"
+        self.isEncrypted = False
+        self.downloadPath = root / f"{id_}.zip"
+
+        self.downloadFailures = 0
+        self.linkFailures = 0
+        self.downloadCalls: List[bool] = []
+        self.isUnzipped = False
+
+    def _download(self, ignoreCache: bool) -> bool:
+        self.downloadCalls.append(ignoreCache)
+
+        if self.downloadFailures > 0:
+            self.downloadFailures -= 1
+            raise ConnectionError(f"Failed to download \"{self.name}\"")
+
+        self.downloadPath.write_bytes(b"x" * 100)
+        return True
+
+    def _finalizeDownload(self, decrypt: bool, ignoreCache: bool) -> None:
+        pass
+
+    def unzip(self, ignoreCache: bool) -> None:
+        self.isUnzipped = True
+
+
+class TestDatasetDownloader(BaseDirectoryTest.Base):
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.samples = [_FakeSample(self.path, id_) for id_ in range(10)]
+        self.linked: Set[int] = set()
+        self.downloaded: Set[int] = set()
+
+        self.__lock = Lock()
+
+    def linkSample(self, sample: _FakeSample) -> None:
+        if sample.linkFailures > 0:
+            sample.linkFailures -= 1
+            raise OSError(f"Failed to link \"{sample.name}\"")
+
+        with self.__lock:
+            self.linked.add(sample.id)
+
+    def onSampleDownloaded(self, sample: _FakeSample) -> None:
+        with self.__lock:
+            self.downloaded.add(sample.id)
+
+    def createDownloader(self, **kwargs: object) -> DatasetDownloader:
+        return DatasetDownloader(
+            self.samples,  # type: ignore[arg-type]
+            networkWorkerCount = 4,
+            decryptWorkerCount = 2,
+            unzipWorkerCount = 2,
+            linkSample = self.linkSample,
+            onSampleDownloaded = self.onSampleDownloaded,
+            **kwargs  # type: ignore[arg-type]
+        )
+
+    def assertFailures(self, downloader: DatasetDownloader, failedIds: Set[int]) -> Dict[int, BaseException]:
+        if len(failedIds) == 0:
+            downloader.run()
+            return {}
+
+        with self.assertLogs("coretexpylib", "ERROR"):
+            with self.assertRaises(DatasetDownloadError) as context:
+                downloader.run()
+
+        self.assertEqual(set(context.exception.failures), failedIds)
+        return context.exception.failures
+
+    def test_download(self) -> None:
+        downloader = self.createDownloader(unzip = True)
+        self.assertFailures(downloader, set())
+
+        allIds = { sample.id for sample in self.samples }
+
+        self.assertEqual(self.linked, allIds)
+        self.assertEqual(self.downloaded, allIds)
+        self.assertTrue(all(sample.isUnzipped for sample in self.samples))
+
+        progress = downloader.progress
+
+        self.assertEqual(progress.completedCount, 10)
+        self.assertEqual(progress.failedCount, 0)
+        self.assertEqual(progress.downloadedBytes, 1000)
+
+    def test_downloadRetried(self) -> None:
+        self.samples[3].downloadFailures = 1
+
+        with self.assertLogs("coretexpylib", "WARNING"):
+            self.assertFailures(self.createDownloader(retryCount = 1), set())
+
+        # Cached files are ignored when a failed sample is downloaded again
+        self.assertEqual(self.samples[3].downloadCalls, [False, True])
+        self.assertIn(3, self.linked)
+
+    def test_downloadFailed(self) -> None:
+        self.samples[3].downloadFailures = 10
+
+        failures = self.assertFailures(self.createDownloader(retryCount = 2), { 3 })
+
+        self.assertIsInstance(failures[3], ConnectionError)
+        self.assertEqual(len(self.samples[3].downloadCalls), 3)
+        self.assertNotIn(3, self.linked)
+        self.assertNotIn(3, self.downloaded)
+        self.assertEqual(len(self.linked), 9)
+
+    def test_linkRetried(self) -> None:
+        self.samples[5].linkFailures = 1
+
+        with self.assertLogs("coretexpylib", "WARNING"):
+            self.assertFailures(self.createDownloader(retryCount = 1), set())
+
+        self.assertEqual(self.samples[5].downloadCalls, [False, True])
+        self.assertIn(5, self.linked)
+        self.assertIn(5, self.downloaded)
+
+    def test_linkFailed(self) -> None:
+        self.samples[5].linkFailures = 10
+
+        failures = self.assertFailures(self.createDownloader(retryCount = 1, unzip = True), { 5 })
+
+        # Sample which is not linked to the dataset is not reported as downloaded
+        self.assertIsInstance(failures[5], OSError)
+        self.assertNotIn(5, self.downloaded)
+        self.assertFalse(self.samples[5].isUnzipped)
+
+    def test_callbackFailureIgnored(self) -> None:
+        def onSampleDownloaded(sample: _FakeSample) -> None:
+            raise ValueError("Callback failed")
+
+        downloader = self.createDownloader(retryCount = 1)
+        downloader.onSampleDownloaded = onSampleDownloaded  # type: ignore[assignment]
+
+        with self.assertLogs("coretexpylib", "WARNING"):
+            self.assertFailures(downloader, set())
+
+        # Errors raised by user callbacks do not cause samples to be downloaded again
+        self.assertTrue(all(sample.downloadCalls == [False] for sample in self.samples))
+        self.assertEqual(len(self.linked), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
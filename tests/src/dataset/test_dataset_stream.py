@@ -0,0 +1,147 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Any, Dict, List, Optional
+from pathlib import Path
+from unittest import mock
+
+import os
+import sys
+import unittest
+
+from coretex import CustomDataset, CustomSample, folder_manager
+from coretex.networking import NetworkResponse, RetryPolicy
+from coretex.entities.sample.sample_store import SampleStore
+
+from ..base_directory_test import BaseDirectoryTest
+from ..utils import createCustomSample, createResponse, createStreamResponse
+
+
+networkSampleModule = sys.modules["coretex.entities.sample.network_sample"]
+
+MEMBERS = {
+    "data.txt": b"Coretex" * 1024,
+    "nested/metadata.json": b"{\"value\": 1}"
+}
+
+
+class _FakeNetworkManager:
+
+    def __init__(self, content: bytes) -> None:
+        self.content = content
+        self.streamCount = 0
+        self.retryPolicy = RetryPolicy(baseDelay = 0, maxDelay = 0)
+
+    def download(self, endpoint: str, destination: Path, params: Optional[Dict[str, Any]] = None) -> NetworkResponse:
+        destination.write_bytes(self.content)
+        return createResponse(200)
+
+    def streamDownload(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> NetworkResponse:
+        self.streamCount += 1
+        return createStreamResponse(self.content)
+
+
+class TestDatasetStream(BaseDirectoryTest.Base):
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.samplesFolder = self.path / "samples"
+        self.samplesFolder.mkdir()
+
+        archivePath = self.createZip(self.path / "archive.zip", MEMBERS)
+
+        self.store = SampleStore(self.samplesFolder)
+        self.networkManager = _FakeNetworkManager(archivePath.read_bytes())
+
+        self.dataset = CustomDataset()
+        self.dataset.samples = [createCustomSample(id_) for id_ in range(5)]
+
+        self.patches = [
+            mock.patch.object(folder_manager, "samplesFolder", self.samplesFolder),
+            mock.patch.object(networkSampleModule, "sampleStore", self.store),
+            mock.patch.object(networkSampleModule, "networkManager", self.networkManager)
+        ]
+
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self) -> None:
+        for patch in self.patches:
+            patch.stop()
+
+        super().tearDown()
+
+    def stream(self, removeConsumed: bool) -> List[CustomSample]:
+        consumed: List[CustomSample] = []
+
+        for sample, _ in self.dataset.stream(prefetch = 2, workers = 2, removeConsumed = removeConsumed):
+            self.assertFiles(sample.path, MEMBERS)
+            consumed.append(sample)
+
+        return consumed
+
+    def test_stream(self) -> None:
+        consumed = self.stream(removeConsumed = False)
+
+        self.assertEqual(consumed, self.dataset.samples)
+        self.assertTrue(all(sample.path.exists() and sample.zipPath.exists() for sample in consumed))
+
+    def test_removeConsumed(self) -> None:
+        self.stream(removeConsumed = True)
+
+        for sample in self.dataset.samples:
+            self.assertFalse(sample.path.exists())
+            self.assertFalse(sample.zipPath.exists())
+            self.assertIsNone(self.store.downloadTime(sample.path))
+
+        self.assertEqual(self.networkManager.streamCount, 5)
+
+    def test_cachedFilesKept(self) -> None:
+        # First sample was downloaded and linked to another dataset before the iteration
+        downloaded = self.dataset.samples[0]
+        downloaded.download()
+
+        datasetPath = self.path / "dataset"
+        datasetPath.mkdir()
+
+        linkPath = datasetPath / downloaded.zipPath.name
+        os.link(downloaded.zipPath, linkPath)
+
+        # Second sample was unzipped before the iteration
+        unzipped = self.dataset.samples[1]
+        unzipped.downloadAndUnzip()
+
+        self.stream(removeConsumed = True)
+
+        self.assertTrue(downloaded.zipPath.exists())
+        self.assertTrue(os.path.samefile(downloaded.zipPath, linkPath))
+        self.assertIsNotNone(self.store.downloadTime(downloaded.zipPath))
+
+        # Only the unzipped folder was created by the iteration
+        self.assertFalse(downloaded.path.exists())
+
+        self.assertFiles(unzipped.path, MEMBERS)
+        self.assertTrue(unzipped.zipPath.exists())
+
+        for sample in self.dataset.samples[2:]:
+            self.assertFalse(sample.path.exists())
+            self.assertFalse(sample.zipPath.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,227 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import AsyncIterator, List, Optional
+from pathlib import Path
+from unittest import mock
+
+import json
+import asyncio
+import unittest
+
+import httpx
+
+from coretex.networking import AsyncNetworkManager, NetworkManagerBase, RequestFailedError, RetryPolicy
+from coretex.networking.network_manager_base import API_TOKEN_HEADER, REFRESH_ENDPOINT
+
+from ..base_directory_test import BaseDirectoryTest
+
+
+CONTENT = bytes(range(256)) * 64
+
+
+class _NetworkManager(NetworkManagerBase):
+
+    def __init__(self) -> None:
+        super().__init__()
+
+        self.retryPolicy = RetryPolicy(maxRetryCount = 3, baseDelay = 0, maxDelay = 0)
+
+        self.__apiToken: Optional[str] = "token-0"
+        self.__refreshToken: Optional[str] = "refresh"
+
+    @property
+    def serverUrl(self) -> str:
+        return "https://test/api/v1/"
+
+    @property
+    def _apiToken(self) -> Optional[str]:
+        return self.__apiToken
+
+    @_apiToken.setter
+    def _apiToken(self, value: Optional[str]) -> None:
+        self.__apiToken = value
+
+    @property
+    def _refreshToken(self) -> Optional[str]:
+        return self.__refreshToken
+
+    @_refreshToken.setter
+    def _refreshToken(self, value: Optional[str]) -> None:
+        self.__refreshToken = value
+
+
+class _FakeServer:
+
+    # Handles the requests sent by the mocked httpx client, "failures" is the
+    # number of initial requests which fail, either with "failureStatus" or
+    # with a connection which drops while the response body is being read
+
+    def __init__(self) -> None:
+        self.validToken = "token-0"
+        self.failures = 0
+        self.failureStatus: Optional[int] = 503
+        self.paths: List[str] = []
+        self.refreshCount = 0
+
+    async def __dropConnection(self) -> AsyncIterator[bytes]:
+        yield CONTENT[:1024]
+        raise httpx.ReadError("Connection dropped")
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.paths.append(request.url.path)
+
+        if request.url.path.endswith(REFRESH_ENDPOINT):
+            self.refreshCount += 1
+            self.validToken = f"token-{self.refreshCount}"
+
+            # Yield so the concurrent requests are rejected before the token is refreshed
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, json = { "token": self.validToken })
+
+        if request.headers.get(API_TOKEN_HEADER) != self.validToken:
+            await asyncio.sleep(0.01)
+            return httpx.Response(401, json = {})
+
+        if self.failures > 0:
+            self.failures -= 1
+
+            if self.failureStatus is None:
+                return httpx.Response(200, content = self.__dropConnection())
+
+            return httpx.Response(self.failureStatus, json = {})
+
+        if request.url.path.endswith("download"):
+            return httpx.Response(200, content = CONTENT)
+
+        return httpx.Response(200, json = { "body": json.loads(request.content) if request.content else None })
+
+
+class TestAsyncNetworkManager(BaseDirectoryTest.Base):
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.server = _FakeServer()
+        self.networkManager = _NetworkManager()
+        self.asyncNetworkManager = AsyncNetworkManager(self.networkManager)
+
+        transport = httpx.MockTransport(self.server.handle)
+        asyncClient = httpx.AsyncClient
+
+        self.patch = mock.patch.object(httpx, "AsyncClient", lambda **kwargs: asyncClient(transport = transport, **kwargs))
+        self.patch.start()
+
+    def tearDown(self) -> None:
+        self.patch.stop()
+        super().tearDown()
+
+    def test_request(self) -> None:
+        async def send() -> None:
+            response = await self.asyncNetworkManager.post("model", { "name": "test" })
+
+            self.assertFalse(response.hasFailed())
+            self.assertEqual(response.getJson(dict), { "body": { "name": "test" } })
+
+            await self.asyncNetworkManager.close()
+
+        asyncio.run(send())
+
+    def test_retry(self) -> None:
+        self.server.failures = 2
+
+        async def send() -> None:
+            response = await self.asyncNetworkManager.get("model")
+            self.assertFalse(response.hasFailed())
+
+            await self.asyncNetworkManager.close()
+
+        asyncio.run(send())
+        self.assertEqual(len(self.server.paths), 3)
+
+    def test_retryLimit(self) -> None:
+        self.server.failures = 10
+
+        async def send() -> None:
+            response = await self.asyncNetworkManager.get("model")
+            self.assertEqual(response.statusCode, 503)
+
+            await self.asyncNetworkManager.close()
+
+        asyncio.run(send())
+        self.assertEqual(len(self.server.paths), 4)
+
+    def test_concurrentRefresh(self) -> None:
+        self.networkManager._apiToken = "expired"
+
+        async def send() -> None:
+            responses = await asyncio.gather(*[self.asyncNetworkManager.get("model") for _ in range(10)])
+            for response in responses:
+                self.assertFalse(response.hasFailed())
+
+            await self.asyncNetworkManager.close()
+
+        asyncio.run(send())
+
+        # Requests rejected with the same stale token refresh it only once
+        self.assertEqual(self.server.refreshCount, 1)
+        self.assertEqual(self.networkManager._apiToken, "token-1")
+
+    def download(self, destination: Path) -> None:
+        async def download() -> None:
+            try:
+                response = await self.asyncNetworkManager.download("file/download", destination)
+                self.assertFalse(response.hasFailed())
+            finally:
+                await self.asyncNetworkManager.close()
+
+        asyncio.run(download())
+
+    def test_download(self) -> None:
+        destination = self.path / "file.bin"
+        self.download(destination)
+
+        self.assertEqual(destination.read_bytes(), CONTENT)
+        self.assertEqual(list(self.path.iterdir()), [destination])
+
+    def test_downloadRetried(self) -> None:
+        destination = self.path / "file.bin"
+
+        self.server.failureStatus = None
+        self.server.failures = 2
+
+        self.download(destination)
+
+        self.assertEqual(len(self.server.paths), 3)
+        self.assertEqual(destination.read_bytes(), CONTENT)
+        self.assertEqual(list(self.path.iterdir()), [destination])
+
+    def test_downloadFailed(self) -> None:
+        destination = self.path / "file.bin"
+
+        self.server.failureStatus = None
+        self.server.failures = 10
+
+        with self.assertRaises(RequestFailedError):
+            self.download(destination)
+
+        # Partially downloaded file is never left in the destination folder
+        self.assertEqual(list(self.path.iterdir()), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,208 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Any, Callable, Dict, List
+from unittest import mock
+from threading import Lock
+
+import sys
+import asyncio
+import unittest
+
+from coretex import folder_manager
+from coretex.networking import ChunkUploadSession, NetworkRequestError, NetworkResponse, FileData
+
+from ..base_directory_test import BaseDirectoryTest
+from ..utils import createResponse
+
+
+chunkUploadSessionModule = sys.modules["coretex.networking.chunk_upload_session"]
+
+CHUNK_SIZE = 1024
+CONTENT = bytes(range(256)) * 18  # 4.5 chunks
+
+
+class _FakeServer:
+
+    # Stores uploaded chunks by upload id, "shouldFail" decides
+    # which chunk requests fail before they are stored
+
+    def __init__(self) -> None:
+        self.uploads: Dict[str, Dict[int, bytes]] = {}
+        self.requests: List[int] = []
+        self.shouldFail: Callable[[str, int], bool] = lambda uploadId, start: False
+
+        self.__lock = Lock()
+
+    def post(self, endpoint: str, parameters: Dict[str, Any]) -> NetworkResponse:
+        with self.__lock:
+            uploadId = f"upload-{len(self.uploads)}"
+            self.uploads[uploadId] = {}
+
+        return createResponse(200, body = { "id": uploadId })
+
+    def formData(self, endpoint: str, parameters: Dict[str, Any], files: List[FileData]) -> NetworkResponse:
+        uploadId = parameters["id"]
+        start = parameters["start"]
+
+        with self.__lock:
+            self.requests.append(start)
+
+        if uploadId not in self.uploads or self.shouldFail(uploadId, start):
+            return createResponse(400, body = { "message": "Upload failed" })
+
+        fileData = files[0]
+        if fileData.filePath is None or fileData.fileRange is None:
+            raise ValueError("Chunk is not streamed from the file")
+
+        offset, length = fileData.fileRange
+        if offset != start or offset + length - 1 != parameters["end"]:
+            raise ValueError("Chunk range does not match request parameters")
+
+        with fileData.filePath.open("rb") as file:
+            file.seek(offset)
+            chunk = file.read(length)
+
+        with self.__lock:
+            self.uploads[uploadId][start] = chunk
+
+        return createResponse(200)
+
+    async def postAsync(self, endpoint: str, parameters: Dict[str, Any]) -> NetworkResponse:
+        return self.post(endpoint, parameters)
+
+    async def formDataAsync(self, endpoint: str, parameters: Dict[str, Any], files: List[FileData]) -> NetworkResponse:
+        return self.formData(endpoint, parameters, files)
+
+    def content(self, uploadId: str) -> bytes:
+        chunks = self.uploads[uploadId]
+        return b"".join(chunks[start] for start in sorted(chunks))
+
+
+class TestChunkUploadSession(BaseDirectoryTest.Base):
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.filePath = self.path / "file.bin"
+        self.filePath.write_bytes(CONTENT)
+
+        (self.path / "uploads").mkdir()
+
+        self.server = _FakeServer()
+        self.patches = [
+            mock.patch.object(folder_manager, "uploadsFolder", self.path / "uploads"),
+            mock.patch.object(chunkUploadSessionModule.networkManager, "post", self.server.post),
+            mock.patch.object(chunkUploadSessionModule.networkManager, "formData", self.server.formData),
+            mock.patch.object(chunkUploadSessionModule.asyncNetworkManager, "post", self.server.postAsync),
+            mock.patch.object(chunkUploadSessionModule.asyncNetworkManager, "formData", self.server.formDataAsync)
+        ]
+
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self) -> None:
+        for patch in self.patches:
+            patch.stop()
+
+        super().tearDown()
+
+    def createSession(self, workerCount: int = 1, resumable: bool = True) -> ChunkUploadSession:
+        return ChunkUploadSession(CHUNK_SIZE, self.filePath, workerCount, resumable)
+
+    def assertUploaded(self, uploadId: str, session: ChunkUploadSession) -> None:
+        self.assertEqual(self.server.content(uploadId), CONTENT)
+        self.assertFalse(session.statePath.exists())
+
+    def test_upload(self) -> None:
+        for workerCount in [1, 4]:
+            with self.subTest(workerCount = workerCount):
+                session = self.createSession(workerCount)
+
+                uploadId = session.run()
+
+                self.assertEqual(session.chunkCount, 5)
+                self.assertUploaded(uploadId, session)
+
+    def test_uploadAsync(self) -> None:
+        session = self.createSession(workerCount = 4)
+
+        uploadId = asyncio.run(session.runAsync())
+        self.assertUploaded(uploadId, session)
+
+    def test_resume(self) -> None:
+        session = self.createSession()
+        self.server.shouldFail = lambda uploadId, start: start == 2 * CHUNK_SIZE
+
+        with self.assertRaises(NetworkRequestError):
+            session.run()
+
+        # Confirmed chunks are persisted and only the remaining ones are uploaded
+        self.assertTrue(session.statePath.exists())
+
+        self.server.shouldFail = lambda uploadId, start: False
+        self.server.requests.clear()
+
+        uploadId = self.createSession().run()
+
+        self.assertEqual(uploadId, "upload-0")
+        self.assertEqual(sorted(self.server.requests), [2 * CHUNK_SIZE, 3 * CHUNK_SIZE, 4 * CHUNK_SIZE])
+        self.assertUploaded(uploadId, session)
+
+    def test_restartExpiredSession(self) -> None:
+        session = self.createSession()
+        self.server.shouldFail = lambda uploadId, start: start == 2 * CHUNK_SIZE
+
+        with self.assertRaises(NetworkRequestError):
+            session.run()
+
+        # Session expired on the server, so resuming it fails
+        self.server.shouldFail = lambda uploadId, start: uploadId == "upload-0"
+
+        uploadId = self.createSession().run()
+
+        self.assertEqual(uploadId, "upload-1")
+        self.assertUploaded(uploadId, session)
+
+    def test_notResumable(self) -> None:
+        session = self.createSession(resumable = False)
+        self.server.shouldFail = lambda uploadId, start: start == 2 * CHUNK_SIZE
+
+        with self.assertRaises(NetworkRequestError):
+            session.run()
+
+        self.assertFalse(session.statePath.exists())
+
+    def test_fileChanged(self) -> None:
+        session = self.createSession()
+        self.server.shouldFail = lambda uploadId, start: start == 2 * CHUNK_SIZE
+
+        with self.assertRaises(NetworkRequestError):
+            session.run()
+
+        # Changed file gets a new state path, so its upload is not resumed
+        self.filePath.write_bytes(CONTENT[::-1])
+        self.server.shouldFail = lambda uploadId, start: False
+
+        uploadId = self.createSession().run()
+
+        self.assertEqual(uploadId, "upload-1")
+        self.assertEqual(self.server.content(uploadId), CONTENT[::-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
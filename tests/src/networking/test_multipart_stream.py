@@ -0,0 +1,121 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Any, Dict, List
+from unittest import mock
+
+import io
+import mmap
+import unittest
+
+from requests.models import RequestEncodingMixin
+
+from coretex.networking import FileData
+from coretex.networking.multipart_stream import MultipartFormStream
+
+from ..base_directory_test import BaseDirectoryTest
+
+
+def readAll(stream: MultipartFormStream, size: int) -> bytes:
+    chunks: List[bytes] = []
+
+    while True:
+        chunk = stream.read(size)
+        if len(chunk) == 0:
+            return b"".join(chunks)
+
+        chunks.append(bytes(chunk))
+
+
+class TestMultipartStream(BaseDirectoryTest.Base):
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        # Range starts past the allocation granularity and is not aligned to it
+        self.content = bytes(range(256)) * (mmap.ALLOCATIONGRANULARITY // 128)
+        self.offset = mmap.ALLOCATIONGRANULARITY + 123
+        self.length = 1000
+
+        self.filePath = self.path / "file.bin"
+        self.filePath.write_bytes(self.content)
+
+        self.params: Dict[str, Any] = { "id": 15, "name": "chunk", "tags": ["a", "b"], "missing": None }
+        self.files = [
+            FileData.createFromBytes("bytes", b"in memory content", "memory.txt", "text/plain"),
+            FileData.createFromFileRange("range", self.filePath, self.offset, self.length, "range.bin"),
+            FileData.createFromPath("file", self.filePath, "file.bin", "application/octet-stream")
+        ]
+
+    def expectedBody(self, boundary: str) -> bytes:
+        # Body which the requests library creates for the same parameters and files
+        files = [
+            ("bytes", ("memory.txt", b"in memory content", "text/plain")),
+            ("range", ("range.bin", self.content[self.offset:self.offset + self.length], "application/octet-stream")),
+            ("file", ("file.bin", self.content, "application/octet-stream"))
+        ]
+
+        with mock.patch("urllib3.filepost.choose_boundary", return_value = boundary):
+            body, contentType = RequestEncodingMixin._encode_files(files, self.params)
+
+        self.assertEqual(contentType, f"multipart/form-data; boundary={boundary}")
+        return body  # type: ignore[no-any-return]
+
+    def test_body(self) -> None:
+        with MultipartFormStream(self.params, self.files) as stream:
+            expected = self.expectedBody(stream.boundary)
+
+            self.assertEqual(len(stream), len(expected))
+            self.assertEqual(stream.contentType, f"multipart/form-data; boundary={stream.boundary}")
+
+            for size in [-1, 1, 7, 4096]:
+                with self.subTest(size = size):
+                    stream.seek(0)
+                    self.assertEqual(readAll(stream, size), expected)
+                    self.assertEqual(stream.tell(), len(expected))
+
+    def test_seek(self) -> None:
+        with MultipartFormStream(self.params, self.files) as stream:
+            expected = self.expectedBody(stream.boundary)
+
+            for position in [0, 1, 150, len(expected) // 2, len(expected) - 1, len(expected)]:
+                with self.subTest(position = position):
+                    self.assertEqual(stream.seek(position), position)
+                    self.assertEqual(readAll(stream, 333), expected[position:])
+
+            self.assertEqual(stream.seek(-10, io.SEEK_END), len(expected) - 10)
+            self.assertEqual(stream.seek(5, io.SEEK_CUR), len(expected) - 5)
+            self.assertEqual(readAll(stream, 100), expected[-5:])
+
+            with self.assertRaises(ValueError):
+                stream.seek(-1)
+
+    def test_fileContentNotCopied(self) -> None:
+        with MultipartFormStream(None, [self.files[1]]) as stream:
+            data = stream.read()
+            while isinstance(data, bytes):
+                data = stream.read()
+
+            # File content is a view into the mapped file
+            self.assertIsInstance(data, memoryview)
+            self.assertEqual(bytes(data), self.content[self.offset:self.offset + self.length])
+
+            data.release()
+
+
+if __name__ == "__main__":
+    unittest.main()
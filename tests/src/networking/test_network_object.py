@@ -0,0 +1,142 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Any, Dict, List, Optional
+from collections import defaultdict
+from threading import Event, Lock
+from unittest import mock
+
+import sys
+import unittest
+
+from coretex.networking import NetworkObject, NetworkResponse, NetworkRequestError
+
+from ..utils import createResponse
+
+
+networkObjectModule = sys.modules["coretex.networking.network_object"]
+
+
+class _Entity(NetworkObject):
+
+    name: str
+
+
+class _FakeServer:
+
+    # Returns pages of "count" entities, if "ignorePage" is True
+    # the first page is returned for every request
+
+    def __init__(self, count: int) -> None:
+        self.count = count
+        self.ignorePage = False
+        self.failedPage: Optional[int] = None
+        self.pages: List[int] = []
+        self.requested: Dict[int, Event] = defaultdict(Event)
+
+        self.__lock = Lock()
+
+    def get(self, endpoint: str, params: Dict[str, Any]) -> NetworkResponse:
+        page = 0 if self.ignorePage else params["page"]
+        pageSize = params["page_size"]
+
+        with self.__lock:
+            self.pages.append(params["page"])
+            self.requested[params["page"]].set()
+
+        if page == self.failedPage:
+            return createResponse(500)
+
+        ids = range(page * pageSize, min((page + 1) * pageSize, self.count))
+        return createResponse(200, body = [{ "id": id_, "name": f"entity-{id_}" } for id_ in ids])
+
+
+class TestNetworkObject(unittest.TestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.server = _FakeServer(250)
+
+        self.patch = mock.patch.object(networkObjectModule, "networkManager", self.server)
+        self.patch.start()
+
+    def tearDown(self) -> None:
+        self.patch.stop()
+        super().tearDown()
+
+    def test_iterAll(self) -> None:
+        for prefetch in [True, False]:
+            with self.subTest(prefetch = prefetch):
+                self.server.pages.clear()
+
+                entities = list(_Entity.iterAll(pageSize = 100, prefetch = prefetch))
+
+                self.assertEqual([entity.id for entity in entities], list(range(250)))
+                self.assertEqual(entities[0].name, "entity-0")
+                self.assertEqual(self.server.pages, [0, 1, 2])
+
+    def test_lastPageFull(self) -> None:
+        self.server.count = 200
+
+        entities = list(_Entity.iterAll(pageSize = 100))
+
+        self.assertEqual(len(entities), 200)
+        self.assertEqual(self.server.pages, [0, 1, 2])
+
+    def test_prefetch(self) -> None:
+        iterator = _Entity.iterAll(pageSize = 100)
+        next(iterator)
+
+        # Next page is requested while the current page is being processed
+        self.assertTrue(self.server.requested[1].wait(timeout = 5))
+
+        iterator.close()
+
+    def test_stoppedEarly(self) -> None:
+        for entity in _Entity.iterAll(pageSize = 100, prefetch = False):
+            if entity.id == 10:
+                break
+
+        self.assertEqual(self.server.pages, [0])
+
+    def test_repeatedPage(self) -> None:
+        self.server.ignorePage = True
+
+        with self.assertLogs("coretexpylib", "WARNING"):
+            entities = list(_Entity.iterAll(pageSize = 100))
+
+        self.assertEqual([entity.id for entity in entities], list(range(100)))
+
+    def test_failedPage(self) -> None:
+        self.server.failedPage = 1
+
+        entities: List[_Entity] = []
+
+        with self.assertRaises(NetworkRequestError):
+            for entity in _Entity.iterAll(pageSize = 100):
+                entities.append(entity)
+
+        self.assertEqual(len(entities), 100)
+
+    def test_invalidPageSize(self) -> None:
+        with self.assertRaises(ValueError):
+            next(_Entity.iterAll(pageSize = 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
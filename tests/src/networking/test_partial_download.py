@@ -0,0 +1,248 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Any, Dict, List, Optional, Tuple
+from unittest import mock
+from threading import Lock
+
+import sys
+import unittest
+
+import requests
+
+from coretex.networking import NetworkManagerBase, RetryPolicy
+from coretex.networking.partial_download import PartialDownload
+
+from ..base_directory_test import BaseDirectoryTest
+from ..utils import StreamBody
+
+
+networkManagerBaseModule = sys.modules["coretex.networking.network_manager_base"]
+
+PART_SIZE = 1024
+CONTENT = bytes(range(256)) * 41  # 10.25 parts
+
+
+class _FakeSession:
+
+    # Serves "content" and records the byte ranges which were requested
+
+    def __init__(self, content: bytes, etag: str = "\"v1\"", supportsRanges: bool = True) -> None:
+        self.content = content
+        self.etag = etag
+        self.supportsRanges = supportsRanges
+        self.dropAfter: Optional[int] = None
+        self.ranges: List[Tuple[int, int]] = []
+        self.getCount = 0
+
+        self.__dropped: List[int] = []
+        self.__lock = Lock()
+
+    def request(self, method: str, url: str, headers: Dict[str, str], **kwargs: Any) -> requests.Response:
+        response = requests.Response()
+        response.status_code = 200
+        response.headers["ETag"] = self.etag
+
+        if self.supportsRanges:
+            response.headers["Accept-Ranges"] = "bytes"
+
+        if method == "HEAD":
+            response.headers["Content-Length"] = str(len(self.content))
+            response.raw = StreamBody(b"", None)
+
+            return response
+
+        with self.__lock:
+            self.getCount += 1
+
+        body = self.content
+        dropAfter: Optional[int] = None
+
+        rangeHeader = headers.get("Range")
+        if rangeHeader is not None and self.supportsRanges and headers.get("If-Range", self.etag) == self.etag:
+            start, end = (int(value) for value in rangeHeader[len("bytes="):].split("-"))
+            body = self.content[start:end + 1]
+
+            with self.__lock:
+                self.ranges.append((start, end + 1))
+
+                # Every part drops once, its retry has to continue from the last written byte
+                if self.dropAfter is not None and start // PART_SIZE not in self.__dropped:
+                    self.__dropped.append(start // PART_SIZE)
+                    dropAfter = self.dropAfter
+
+            response.status_code = 206
+
+        response.headers["Content-Length"] = str(len(body))
+        response.raw = StreamBody(body, dropAfter)
+
+        return response
+
+
+class _NetworkManager(NetworkManagerBase):
+
+    def __init__(self, session: _FakeSession) -> None:
+        super().__init__()
+
+        self._session = session  # type: ignore[assignment]
+        self.retryPolicy = RetryPolicy(baseDelay = 0, maxDelay = 0)
+
+    @property
+    def serverUrl(self) -> str:
+        return "https://test/api/v1/"
+
+    @property
+    def _apiToken(self) -> Optional[str]:
+        return None
+
+    @_apiToken.setter
+    def _apiToken(self, value: Optional[str]) -> None:
+        pass
+
+    @property
+    def _refreshToken(self) -> Optional[str]:
+        return None
+
+    @_refreshToken.setter
+    def _refreshToken(self, value: Optional[str]) -> None:
+        pass
+
+
+class TestPartialDownload(BaseDirectoryTest.Base):
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.destination = self.path / "file.bin"
+        self.session = _FakeSession(CONTENT)
+        self.networkManager = _NetworkManager(self.session)
+
+        self.patches = [
+            mock.patch.object(networkManagerBaseModule, "RANGED_DOWNLOAD_THRESHOLD", 4 * PART_SIZE),
+            mock.patch.object(networkManagerBaseModule, "RANGED_DOWNLOAD_PART_SIZE", PART_SIZE)
+        ]
+
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self) -> None:
+        for patch in self.patches:
+            patch.stop()
+
+        super().tearDown()
+
+    def download(self, connectionCount: int = 4) -> None:
+        response = self.networkManager.download("file/download", self.destination, connectionCount = connectionCount)
+        self.assertFalse(response.hasFailed())
+
+    def assertDownloaded(self) -> None:
+        self.assertEqual(self.destination.read_bytes(), CONTENT)
+
+        self.assertFalse(PartialDownload.dataPathFor(self.destination).exists())
+        self.assertFalse(PartialDownload.statePathFor(self.destination).exists())
+
+    def test_partRanges(self) -> None:
+        partialDownload = PartialDownload(self.destination, len(CONTENT), PART_SIZE)
+
+        self.assertEqual(partialDownload.partCount, 11)
+        self.assertEqual(partialDownload.partRange(0), (0, PART_SIZE))
+        self.assertEqual(partialDownload.partRange(10), (10 * PART_SIZE, len(CONTENT)))
+
+    def test_loadState(self) -> None:
+        self.assertIsNone(PartialDownload.load(self.destination))
+
+        partialDownload = PartialDownload.create(self.destination, len(CONTENT), PART_SIZE, "\"v1\"")
+        partialDownload.markCompleted(3)
+        partialDownload.markCompleted(5)
+
+        loaded = PartialDownload.load(self.destination)
+        self.assertIsNotNone(loaded)
+        assert loaded is not None
+
+        self.assertEqual(loaded.validator, "\"v1\"")
+        self.assertEqual(loaded.missingParts(), [index for index in range(11) if index not in (3, 5)])
+
+        # State which does not match the ".partial" file is ignored
+        with partialDownload.dataPath.open("r+b") as file:
+            file.truncate(PART_SIZE)
+
+        self.assertIsNone(PartialDownload.load(self.destination))
+
+    def test_rangedDownload(self) -> None:
+        self.download()
+        self.assertDownloaded()
+
+        # First part is read from the initial request
+        self.assertEqual(
+            sorted(self.session.ranges),
+            [PartialDownload(self.destination, len(CONTENT), PART_SIZE).partRange(index) for index in range(1, 11)]
+        )
+
+    def test_singleConnection(self) -> None:
+        self.download(connectionCount = 1)
+        self.assertDownloaded()
+
+        self.assertEqual(self.session.getCount, 1)
+        self.assertEqual(self.session.ranges, [])
+
+    def test_rangesNotSupported(self) -> None:
+        self.session.supportsRanges = False
+
+        self.download()
+        self.assertDownloaded()
+
+        self.assertEqual(self.session.getCount, 1)
+
+    def test_resume(self) -> None:
+        partialDownload = PartialDownload.create(self.destination, len(CONTENT), PART_SIZE, self.session.etag)
+
+        with partialDownload.dataPath.open("r+b") as file:
+            for index in range(6):
+                start, end = partialDownload.partRange(index)
+
+                file.seek(start)
+                file.write(CONTENT[start:end])
+
+        for index in range(6):
+            partialDownload.markCompleted(index)
+
+        self.download()
+        self.assertDownloaded()
+
+        self.assertEqual(sorted(self.session.ranges), [partialDownload.partRange(index) for index in range(6, 11)])
+
+    def test_resumeFileChanged(self) -> None:
+        partialDownload = PartialDownload.create(self.destination, len(CONTENT), PART_SIZE, "\"v0\"")
+        partialDownload.markCompleted(0)
+
+        self.download()
+        self.assertDownloaded()
+
+    def test_droppedConnection(self) -> None:
+        self.session.dropAfter = 100
+
+        self.download()
+        self.assertDownloaded()
+
+        # Each part is continued from the byte at which its connection dropped
+        for index in range(1, 11):
+            start = index * PART_SIZE
+            self.assertIn(start + 100, [rangeStart for rangeStart, _ in self.session.ranges])
+
+
+if __name__ == "__main__":
+    unittest.main()
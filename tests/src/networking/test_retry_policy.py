@@ -0,0 +1,121 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import time
+import unittest
+
+from coretex.networking.retry_policy import RetryPolicy, RetryBudget, _parseRetryAfter
+
+from ..utils import createResponse
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def test_jitterBounds(self) -> None:
+        policy = RetryPolicy(baseDelay = 1, maxDelay = 10)
+
+        delay = 0.0
+        for _ in range(1000):
+            newDelay = policy.getDelay(delay, None)
+
+            self.assertGreaterEqual(newDelay, 1)
+            self.assertLessEqual(newDelay, min(10, max(delay, 1) * 3))
+
+            delay = newDelay
+
+    def test_retryAfterSeconds(self) -> None:
+        policy = RetryPolicy(maxDelay = 60)
+
+        self.assertEqual(policy.getDelay(0, createResponse(429, { "Retry-After": "7" })), 7)
+        self.assertEqual(policy.getDelay(0, createResponse(503, { "Retry-After": "600" })), 60)
+
+    def test_retryAfterDate(self) -> None:
+        date = datetime.now(timezone.utc) + timedelta(seconds = 30)
+        delay = _parseRetryAfter(format_datetime(date, usegmt = True))
+
+        self.assertIsNotNone(delay)
+        assert delay is not None
+
+        self.assertGreater(delay, 25)
+        self.assertLessEqual(delay, 30)
+
+        self.assertEqual(_parseRetryAfter(format_datetime(datetime(2000, 1, 1, tzinfo = timezone.utc), usegmt = True)), 0)
+        self.assertIsNone(_parseRetryAfter("invalid"))
+
+    def test_retryAfterIgnoredForOtherStatusCodes(self) -> None:
+        policy = RetryPolicy(baseDelay = 1, maxDelay = 2)
+        self.assertLessEqual(policy.getDelay(0, createResponse(500, { "Retry-After": "100" })), 2)
+
+    def test_maxRetryCount(self) -> None:
+        policy = RetryPolicy(maxRetryCount = 2)
+
+        self.assertTrue(policy.acquire(0))
+        self.assertTrue(policy.acquire(1))
+        self.assertFalse(policy.acquire(2))
+
+        self.assertEqual(policy.statistics.retryCount, 2)
+        self.assertEqual(policy.statistics.giveUpCount, 1)
+
+    def test_retryBudget(self) -> None:
+        budget = RetryBudget(ratio = 0.5, minRetriesPerSecond = 0, capacity = 2)
+        policy = RetryPolicy(budget = budget)
+
+        self.assertTrue(policy.acquire(0))
+        self.assertTrue(policy.acquire(0))
+        self.assertFalse(policy.acquire(0))
+
+        # Every request deposits "ratio" tokens
+        policy.onRequest()
+        self.assertFalse(policy.acquire(0))
+
+        policy.onRequest()
+        self.assertTrue(policy.acquire(0))
+
+    def test_retryBudgetRefill(self) -> None:
+        budget = RetryBudget(ratio = 0, minRetriesPerSecond = 100, capacity = 1)
+
+        self.assertTrue(budget.tryWithdraw())
+        time.sleep(0.05)
+        self.assertTrue(budget.tryWithdraw())
+
+    def test_circuitBreaker(self) -> None:
+        policy = RetryPolicy(failureThreshold = 3, resetTimeout = 0.1)
+
+        policy.onFailure()
+        policy.onFailure()
+        self.assertFalse(policy.isOpen)
+
+        # Success resets the consecutive failure counter
+        policy.onSuccess()
+        policy.onFailure()
+        policy.onFailure()
+        self.assertFalse(policy.isOpen)
+
+        policy.onFailure()
+        self.assertTrue(policy.isOpen)
+        self.assertFalse(policy.acquire(0))
+
+        time.sleep(0.15)
+        self.assertFalse(policy.isOpen)
+        self.assertTrue(policy.acquire(0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Any, Dict, Optional
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import mock
+
+import sys
+import unittest
+
+import requests
+
+from coretex import folder_manager
+from coretex.networking import NetworkResponse, RetryPolicy
+from coretex.entities.sample.sample_store import SampleStore
+from coretex.utils import TIME_ZONE
+
+from ..base_directory_test import BaseDirectoryTest
+from ..utils import createCustomSample, createResponse, createStreamResponse
+
+
+networkSampleModule = sys.modules["coretex.entities.sample.network_sample"]
+
+MEMBERS = {
+    "data.txt": b"Coretex" * 4096,
+    "nested/metadata.json": b"{\"value\": 1}"
+}
+
+
+class _FakeNetworkManager:
+
+    # Serves the sample archive, streamed responses of the first
+    # "failures" requests drop after "dropAfter" bytes
+
+    def __init__(self, content: bytes) -> None:
+        self.content = content
+        self.failures = 0
+        self.dropAfter = 100
+        self.downloadCount = 0
+        self.streamCount = 0
+        self.retryPolicy = RetryPolicy(maxRetryCount = 3, baseDelay = 0, maxDelay = 0)
+
+    def download(self, endpoint: str, destination: Path, params: Optional[Dict[str, Any]] = None) -> NetworkResponse:
+        self.downloadCount += 1
+        destination.write_bytes(self.content)
+
+        return createResponse(200)
+
+    def streamDownload(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> NetworkResponse:
+        self.streamCount += 1
+
+        if self.failures > 0:
+            self.failures -= 1
+            return createStreamResponse(self.content, self.dropAfter)
+
+        return createStreamResponse(self.content)
+
+
+class TestDownloadAndUnzip(BaseDirectoryTest.Base):
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.samplesFolder = self.path / "samples"
+        self.samplesFolder.mkdir()
+
+        archivePath = self.createZip(self.path / "archive.zip", MEMBERS)
+
+        self.networkManager = _FakeNetworkManager(archivePath.read_bytes())
+        self.sample = createCustomSample(1)
+
+        self.patches = [
+            mock.patch.object(folder_manager, "samplesFolder", self.samplesFolder),
+            mock.patch.object(networkSampleModule, "sampleStore", SampleStore(self.samplesFolder)),
+            mock.patch.object(networkSampleModule, "networkManager", self.networkManager)
+        ]
+
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self) -> None:
+        for patch in self.patches:
+            patch.stop()
+
+        super().tearDown()
+
+    def test_downloadAndUnzip(self) -> None:
+        self.sample.downloadAndUnzip(keepArchive = False)
+
+        self.assertFiles(self.sample.path, MEMBERS)
+        self.assertFalse(self.sample.zipPath.exists())
+        self.assertEqual(self.networkManager.streamCount, 1)
+
+        # Unzipped sample is reused
+        self.sample.downloadAndUnzip(keepArchive = False)
+        self.assertEqual(self.networkManager.streamCount, 1)
+
+    def test_reusesDownloadedArchive(self) -> None:
+        self.sample.download()
+        self.sample.downloadAndUnzip(keepArchive = False)
+
+        self.assertFiles(self.sample.path, MEMBERS)
+        self.assertTrue(self.sample.zipPath.exists())
+        self.assertEqual(self.networkManager.downloadCount, 1)
+        self.assertEqual(self.networkManager.streamCount, 0)
+
+    def test_modifiedArchiveDownloaded(self) -> None:
+        self.sample.download()
+        self.sample.lastModified = datetime.now(TIME_ZONE) + timedelta(days = 1)
+
+        self.sample.downloadAndUnzip(keepArchive = False)
+
+        self.assertFiles(self.sample.path, MEMBERS)
+        self.assertFalse(self.sample.zipPath.exists())
+        self.assertEqual(self.networkManager.streamCount, 1)
+
+    def test_streamRetried(self) -> None:
+        self.networkManager.failures = 2
+
+        self.sample.downloadAndUnzip()
+
+        self.assertFiles(self.sample.path, MEMBERS)
+        self.assertEqual(self.sample.zipPath.read_bytes(), self.networkManager.content)
+        self.assertEqual(self.networkManager.streamCount, 3)
+
+    def test_streamFailed(self) -> None:
+        self.networkManager.failures = 10
+
+        with self.assertRaises(requests.exceptions.RequestException):
+            self.sample.downloadAndUnzip()
+
+        # Partially extracted sample is not left behind
+        self.assertFalse(self.sample.path.exists())
+        self.assertFalse(self.sample.zipPath.exists())
+        self.assertEqual(self.networkManager.streamCount, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from pathlib import Path
+from unittest import mock
+from zipfile import ZipFile
+
+import io
+import os
+import sys
+import json
+import unittest
+
+from PIL import Image
+
+from coretex import LocalImageSample
+from coretex.entities.sample.image_sample.image_manifest import MANIFEST_FILE_NAME, ImageSampleManifest, \
+    getManifest, buildManifest
+
+from ..base_directory_test import BaseDirectoryTest
+
+
+imageManifestModule = sys.modules["coretex.entities.sample.image_sample.image_manifest"]
+
+
+def _image(format: str, size: int = 8) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (size, size), (255, 0, 0)).save(buffer, format)
+
+    return buffer.getvalue()
+
+
+class TestImageManifest(BaseDirectoryTest.Base):
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.samplePath = self.path / "sample"
+        self.createFiles(self.samplePath, {
+            "thumbnail.jpeg": _image("JPEG", 4),
+            "image.png": _image("PNG"),
+            "image.jpeg": _image("JPEG"),
+            "annotations.json": b"{}",
+            "metadata.json": b"{}"
+        })
+
+    def test_build(self) -> None:
+        manifest = ImageSampleManifest.build(self.samplePath)
+
+        # Formats are checked in the order of their definition, thumbnails are skipped
+        self.assertEqual(manifest.imagePath, self.samplePath / "image.jpeg")
+        self.assertEqual(manifest.annotationPath, self.samplePath / "annotations.json")
+        self.assertEqual(manifest.metadataPath, self.samplePath / "metadata.json")
+
+        (self.samplePath / "annotations.json").unlink()
+        (self.samplePath / "image.jpeg").unlink()
+
+        manifest = ImageSampleManifest.build(self.samplePath)
+
+        self.assertEqual(manifest.imagePath, self.samplePath / "image.png")
+        self.assertIsNone(manifest.annotationPath)
+
+    def test_storedManifestReused(self) -> None:
+        manifest = getManifest(self.samplePath)
+        self.assertTrue((self.samplePath / MANIFEST_FILE_NAME).exists())
+
+        with mock.patch.object(os, "scandir", side_effect = os.scandir) as scandir:
+            self.assertIs(getManifest(self.samplePath), manifest)
+
+            # Manifest stored by other process is read instead of scanning the folder
+            with imageManifestModule._manifestsLock:
+                imageManifestModule._manifests.clear()
+
+            self.assertEqual(getManifest(self.samplePath).imagePath, manifest.imagePath)
+
+        scandir.assert_not_called()
+
+    def test_invalidManifestRebuilt(self) -> None:
+        manifestPath = self.samplePath / MANIFEST_FILE_NAME
+
+        for content in ["{", json.dumps({ "version": 0, "image": "image.png", "annotation": None, "metadata": None })]:
+            with self.subTest(content = content):
+                manifestPath.write_text(content)
+
+                self.assertEqual(getManifest(self.samplePath).imagePath, self.samplePath / "image.jpeg")
+                self.assertEqual(json.loads(manifestPath.read_text())["image"], "image.jpeg")
+
+    def test_readOnlyFolder(self) -> None:
+        with mock.patch.object(Path, "open", side_effect = PermissionError):
+            manifest = buildManifest(self.samplePath)
+
+        self.assertEqual(manifest.imagePath, self.samplePath / "image.jpeg")
+        self.assertEqual([path.name for path in self.samplePath.iterdir() if path.name.startswith(MANIFEST_FILE_NAME)], [])
+
+    def test_localImageSample(self) -> None:
+        zipPath = self.path / "archive.zip"
+
+        with ZipFile(zipPath, "w") as zipFile:
+            for path in self.samplePath.iterdir():
+                zipFile.write(path, path.name)
+
+        sample = LocalImageSample(zipPath)
+        sample.unzip()
+
+        self.assertTrue((sample.path / MANIFEST_FILE_NAME).exists())
+        self.assertEqual(sample.imagePath, sample.path / "image.jpeg")
+        self.assertEqual(sample.load().image.shape, (8, 8, 3))
+
+        # Outdated manifest is rebuilt once the image it points to is missing
+        (sample.path / "image.jpeg").unlink()
+        self.assertEqual(sample.imagePath, sample.path / "image.png")
+
+        # Manifest is never stored in the sample archive
+        sample.saveMetadata({ "value": 1 })
+
+        with ZipFile(sample.zipPath) as zipFile:
+            self.assertNotIn(MANIFEST_FILE_NAME, zipFile.namelist())
+
+        self.assertFalse((sample.path / MANIFEST_FILE_NAME).exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
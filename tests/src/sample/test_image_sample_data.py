@@ -0,0 +1,133 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from pathlib import Path
+from unittest import mock
+from zipfile import ZipFile
+
+import io
+import os
+import sys
+import unittest
+
+from PIL import Image
+
+import numpy as np
+
+from coretex import LocalImageSample
+from coretex.entities.sample.image_sample.image_sample_data import AnnotatedImageSampleData, imageCachePath
+
+from ..base_directory_test import BaseDirectoryTest
+
+
+imageSampleDataModule = sys.modules["coretex.entities.sample.image_sample.image_sample_data"]
+
+
+def _image(mode: str, color: object) -> bytes:
+    buffer = io.BytesIO()
+    Image.new(mode, (6, 4), color).save(buffer, "PNG")  # type: ignore[arg-type]
+
+    return buffer.getvalue()
+
+
+class TestImageSampleData(BaseDirectoryTest.Base):
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.samplePath = self.path / "sample"
+        self.createFiles(self.samplePath, { "image.png": _image("RGB", (10, 20, 30)) })
+
+        self.imagePath = self.samplePath / "image.png"
+
+    def test_imageData(self) -> None:
+        for mode, color in [("RGB", (10, 20, 30)), ("RGBA", (10, 20, 30, 40)), ("L", 10)]:
+            with self.subTest(mode = mode):
+                self.imagePath.write_bytes(_image(mode, color))
+
+                image = AnnotatedImageSampleData(self.samplePath).image
+
+                self.assertEqual(image.shape, (4, 6, 3))
+                self.assertEqual(image.dtype, np.uint8)
+                self.assertTrue(image.flags.writeable)
+
+                expected = Image.new(mode, (6, 4), color).convert("RGB").getpixel((0, 0))  # type: ignore[arg-type]
+                self.assertEqual(tuple(image[0, 0]), expected)
+
+    def test_cacheImage(self) -> None:
+        first = AnnotatedImageSampleData(self.samplePath, cacheImage = True).image
+        self.assertTrue(imageCachePath(self.imagePath).exists())
+
+        with mock.patch.object(imageSampleDataModule, "_readImageData", side_effect = AssertionError) as readImageData:
+            second = AnnotatedImageSampleData(self.samplePath, cacheImage = True).image
+
+        readImageData.assert_not_called()
+        np.testing.assert_array_equal(first, second)
+
+        # Cached image is mapped copy-on-write, changes never reach the cache file
+        self.assertTrue(second.flags.writeable)
+        second[0, 0] = 0
+
+        third = AnnotatedImageSampleData(self.samplePath, cacheImage = True).image
+        np.testing.assert_array_equal(first, third)
+
+    def test_outdatedCache(self) -> None:
+        AnnotatedImageSampleData(self.samplePath, cacheImage = True)
+        cachePath = imageCachePath(self.imagePath)
+
+        self.imagePath.write_bytes(_image("RGB", (50, 60, 70)))
+        stat = cachePath.stat()
+        os.utime(self.imagePath, ns = (stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        image = AnnotatedImageSampleData(self.samplePath, cacheImage = True).image
+        self.assertEqual(tuple(image[0, 0]), (50, 60, 70))
+
+        # Corrupted cache is decoded again and overwritten
+        cachePath.write_bytes(b"corrupted")
+        os.utime(cachePath, ns = (stat.st_atime_ns, stat.st_mtime_ns + 2_000_000))
+
+        image = AnnotatedImageSampleData(self.samplePath, cacheImage = True).image
+        self.assertEqual(tuple(image[0, 0]), (50, 60, 70))
+        self.assertEqual(tuple(np.load(cachePath)[0, 0]), (50, 60, 70))
+
+    def test_readOnlyFolder(self) -> None:
+        with mock.patch.object(Path, "open", side_effect = PermissionError):
+            image = AnnotatedImageSampleData(self.samplePath, cacheImage = True).image
+
+        self.assertEqual(tuple(image[0, 0]), (10, 20, 30))
+        self.assertEqual(sorted(path.name for path in self.samplePath.iterdir() if path.name.startswith(".image")), [])
+
+    def test_cacheNotArchived(self) -> None:
+        zipPath = self.path / "archive.zip"
+
+        with ZipFile(zipPath, "w") as zipFile:
+            zipFile.write(self.imagePath, self.imagePath.name)
+
+        sample = LocalImageSample(zipPath)
+        sample.unzip()
+        sample.load(cacheImage = True)
+
+        self.assertTrue(imageCachePath(sample.path / "image.png").exists())
+
+        sample.saveMetadata({ "value": 1 })
+
+        with ZipFile(sample.zipPath) as zipFile:
+            self.assertEqual(sorted(zipFile.namelist()), ["image.png", "metadata.json"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,189 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Any, Dict, Optional
+from pathlib import Path
+from unittest import mock
+
+import os
+import sys
+import unittest
+
+from coretex import folder_manager
+from coretex.networking import NetworkResponse
+from coretex.entities.sample.sample_store import SampleStore
+
+from ..base_directory_test import BaseDirectoryTest
+from ..utils import createCustomSample, createResponse
+
+
+networkSampleModule = sys.modules["coretex.entities.sample.network_sample"]
+
+
+class _FakeNetworkManager:
+
+    # Serves sample archives, "content" is the archive which is downloaded
+
+    def __init__(self) -> None:
+        self.content = b"archive"
+        self.downloadCount = 0
+
+    def download(self, endpoint: str, destination: Path, params: Optional[Dict[str, Any]] = None) -> NetworkResponse:
+        self.downloadCount += 1
+        destination.write_bytes(self.content)
+
+        return createResponse(200)
+
+
+class TestSampleStore(BaseDirectoryTest.Base):
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.samplesFolder = self.path / "samples"
+        self.samplesFolder.mkdir()
+
+        self.datasetsFolder = self.path / "datasets"
+        self.datasetsFolder.mkdir()
+
+        self.store = SampleStore(self.samplesFolder)
+        self.networkManager = _FakeNetworkManager()
+
+        self.patches = [
+            mock.patch.object(folder_manager, "samplesFolder", self.samplesFolder),
+            mock.patch.object(folder_manager, "datasetsFolder", self.datasetsFolder),
+            mock.patch.object(networkSampleModule, "sampleStore", self.store),
+            mock.patch.object(networkSampleModule, "networkManager", self.networkManager)
+        ]
+
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self) -> None:
+        for patch in self.patches:
+            patch.stop()
+
+        super().tearDown()
+
+    def linkToDataset(self, path: Path, datasetName: str) -> Path:
+        datasetPath = self.datasetsFolder / datasetName
+        datasetPath.mkdir(exist_ok = True)
+
+        linkPath = datasetPath / path.name
+        os.link(path, linkPath)
+
+        return linkPath
+
+    def test_deduplicate(self) -> None:
+        self.createFiles(self.samplesFolder, {
+            "1.zip": b"content",
+            "2.zip": b"content",
+            "3.zip": b"other content"
+        })
+
+        for name in ["1.zip", "2.zip", "3.zip"]:
+            self.store.deduplicate(self.samplesFolder / name)
+
+        self.assertTrue(os.path.samefile(self.samplesFolder / "1.zip", self.samplesFolder / "2.zip"))
+        self.assertFalse(os.path.samefile(self.samplesFolder / "1.zip", self.samplesFolder / "3.zip"))
+        self.assertEqual(len(list(self.store.objectsFolder.iterdir())), 2)
+
+    def test_deduplicateChangedFile(self) -> None:
+        path = self.samplesFolder / "1.zip"
+        path.write_bytes(b"content")
+
+        self.store.deduplicate(path)
+
+        # Files are replaced instead of overwritten since their inode is shared
+        path.unlink()
+        path.write_bytes(b"changed content")
+
+        self.store.deduplicate(path)
+
+        # Previous object is not referenced by any sample anymore
+        objects = list(self.store.objectsFolder.iterdir())
+
+        self.assertEqual(len(objects), 1)
+        self.assertTrue(os.path.samefile(path, objects[0]))
+
+    def test_relink(self) -> None:
+        path = self.samplesFolder / "1.zip"
+        path.write_bytes(b"content")
+
+        linkPath = self.linkToDataset(path, "10")
+        self.store.addLink(1, linkPath.parent)
+
+        path.unlink()
+        path.write_bytes(b"changed content")
+
+        networkSampleModule._relinkSample(1, path)
+
+        self.assertTrue(os.path.samefile(path, linkPath))
+        self.assertEqual(linkPath.read_bytes(), b"changed content")
+
+    def test_legacyLinksMigratedOnce(self) -> None:
+        path = self.samplesFolder / "1.zip"
+        path.write_bytes(b"content")
+
+        # Dataset was downloaded before the index existed
+        self.linkToDataset(path, "10")
+
+        self.assertEqual(self.store.linkedDatasets(1), [self.datasetsFolder / "10"])
+
+        # Datasets folder is scanned only once per storage path
+        self.linkToDataset(path, "11")
+
+        store = SampleStore(self.samplesFolder)
+        self.assertEqual(store.linkedDatasets(1), [self.datasetsFolder / "10"])
+
+    def test_firstDownload(self) -> None:
+        sample = createCustomSample(1)
+
+        # Opens the index so the migration is not counted as a part of the download
+        self.store.linkedDatasets(sample.id)
+
+        with mock.patch.object(Path, "iterdir", autospec = True, side_effect = Path.iterdir) as iterdir:
+            sample.download()
+
+        self.assertNotIn(self.datasetsFolder, [call.args[0] for call in iterdir.call_args_list])
+
+        self.assertEqual(sample.zipPath.read_bytes(), self.networkManager.content)
+        self.assertIsNotNone(self.store.downloadTime(sample.zipPath))
+        self.assertEqual(self.store.linkedDatasets(sample.id), [])
+
+        objects = list(self.store.objectsFolder.iterdir())
+
+        self.assertEqual(len(objects), 1)
+        self.assertTrue(os.path.samefile(sample.zipPath, objects[0]))
+
+    def test_downloadRelinksDatasets(self) -> None:
+        sample = createCustomSample(1)
+        sample.download()
+
+        linkPath = self.linkToDataset(sample.zipPath, "10")
+        self.store.addLink(sample.id, linkPath.parent)
+
+        self.networkManager.content = b"changed archive"
+        sample.download(ignoreCache = True)
+
+        self.assertEqual(self.networkManager.downloadCount, 2)
+        self.assertTrue(os.path.samefile(sample.zipPath, linkPath))
+        self.assertEqual(linkPath.read_bytes(), b"changed archive")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Dict
+from unittest import mock
+from zipfile import ZipFile, ZIP_DEFLATED, ZIP_STORED
+
+import sys
+import unittest
+
+from coretex import LocalCustomSample
+
+from ..base_directory_test import BaseDirectoryTest
+
+
+sampleModule = sys.modules["coretex.entities.sample.sample"]
+
+MEMBERS = {
+    "data.txt": b"Coretex" * 4096,
+    "nested/metadata.json": b"{\"value\": 1}",
+    "nested/deeper/image.bin": bytes(range(256)) * 16
+}
+
+
+class TestUpdateArchive(BaseDirectoryTest.Base):
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        zipPath = self.path / "sample.zip"
+
+        with ZipFile(zipPath, "w", ZIP_DEFLATED) as zipFile:
+            for name, content in MEMBERS.items():
+                # Stored member checks that compression of unchanged members is kept
+                compressType = ZIP_STORED if name.endswith(".bin") else ZIP_DEFLATED
+                zipFile.writestr(name, content, compressType)
+
+        self.sample = LocalCustomSample(zipPath)
+        self.sample.unzip()
+
+    def updateArchive(self, **kwargs: object) -> Dict[str, int]:
+        # Returns how many times each member was copied or written
+        with mock.patch.object(sampleModule, "_copyRawMember", wraps = sampleModule._copyRawMember) as copyRawMember, \
+             mock.patch.object(ZipFile, "write", autospec = True, side_effect = ZipFile.write) as write:
+
+            self.sample._updateArchive(**kwargs)  # type: ignore[arg-type]
+
+        copied = { call.args[2].filename: "copied" for call in copyRawMember.call_args_list }
+        written = { str(call.args[2]): "written" for call in write.call_args_list }
+
+        return { **copied, **written }
+
+    def assertArchiveContent(self, expected: Dict[str, bytes]) -> None:
+        self.assertZipContent(self.sample.zipPath, expected)
+
+        with ZipFile(self.sample.zipPath) as zipFile:
+            self.assertEqual(zipFile.getinfo("nested/deeper/image.bin").compress_type, ZIP_STORED)
+
+    def test_unchanged(self) -> None:
+        operations = self.updateArchive()
+
+        self.assertEqual(operations, { name: "copied" for name in MEMBERS })
+        self.assertArchiveContent(MEMBERS)
+
+    def test_changedDetected(self) -> None:
+        # Same size, so the change is detected only by the checksum
+        changed = b"x" * len(MEMBERS["nested/metadata.json"])
+        self.sample.joinPath("nested/metadata.json").write_bytes(changed)
+
+        operations = self.updateArchive()
+
+        self.assertEqual(operations["nested/metadata.json"], "written")
+        self.assertEqual(operations["data.txt"], "copied")
+        self.assertEqual(operations["nested/deeper/image.bin"], "copied")
+
+        self.assertArchiveContent({ **MEMBERS, "nested/metadata.json": changed })
+
+    def test_changedPaths(self) -> None:
+        changed = b"Changed content"
+        self.sample.joinPath("data.txt").write_bytes(changed)
+
+        operations = self.updateArchive(changedPaths = [self.sample.joinPath("data.txt")])
+
+        self.assertEqual(operations["data.txt"], "written")
+        self.assertEqual(operations["nested/metadata.json"], "copied")
+        self.assertEqual(operations["nested/deeper/image.bin"], "copied")
+
+        self.assertArchiveContent({ **MEMBERS, "data.txt": changed })
+
+    def test_addedAndRemoved(self) -> None:
+        self.sample.joinPath("nested/metadata.json").unlink()
+        self.sample.joinPath("added.txt").write_bytes(b"Added content")
+
+        operations = self.updateArchive()
+
+        self.assertEqual(operations["added.txt"], "written")
+        self.assertNotIn("nested/metadata.json", operations)
+
+        expected = { name: content for name, content in MEMBERS.items() if name != "nested/metadata.json" }
+        self.assertArchiveContent({ **expected, "added.txt": b"Added content" })
+
+    def test_roundTrip(self) -> None:
+        self.sample.joinPath("data.txt").write_bytes(b"Changed content")
+        self.updateArchive()
+
+        # Archive created by the update is updated again without changes
+        operations = self.updateArchive()
+
+        self.assertEqual(set(operations.values()), { "copied" })
+        self.assertArchiveContent({ **MEMBERS, "data.txt": b"Changed content" })
+
+        # Archive is unzipped into the same content
+        self.sample.unzip(ignoreCache = True)
+
+        for name, content in { **MEMBERS, "data.txt": b"Changed content" }.items():
+            self.assertEqual(self.sample.joinPath(name).read_bytes(), content)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,264 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Callable, List, Optional, Tuple
+from pathlib import Path
+from unittest import mock
+from threading import Lock
+
+import sys
+import time
+import unittest
+
+from watchdog.events import FileCreatedEvent, FileModifiedEvent, FileClosedEvent, FileMovedEvent, FileDeletedEvent
+
+from ..base_directory_test import BaseDirectoryTest
+
+import coretex._task.worker  # noqa: F401
+
+
+artifactsModule = sys.modules["coretex._task.worker.artifacts"]
+
+
+class _Clock:
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+class _TaskRun:
+
+    def __init__(self) -> None:
+        self.lock = Lock()
+        self.uploads: List[Tuple[str, bytes]] = []
+        self.attempts = 0
+        self.available = True
+
+    def createArtifact(self, path: Path, name: str) -> Optional[object]:
+        with self.lock:
+            self.attempts += 1
+
+            if not self.available:
+                return None
+
+            self.uploads.append((name, path.read_bytes()))
+            return object()
+
+
+def _waitFor(condition: Callable[[], bool], timeout: float = 10) -> bool:
+    deadline = time.monotonic() + timeout
+
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+
+        time.sleep(0.01)
+
+    return True
+
+
+class TestFileEventHandler(BaseDirectoryTest.Base):
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.clock = _Clock()
+
+        patcher = mock.patch.object(artifactsModule, "time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.handler = artifactsModule.FileEventHandler()
+        self.filePath = self.path / "model.bin"
+
+    def test_debounce(self) -> None:
+        self.handler.on_created(FileCreatedEvent(str(self.filePath)))
+
+        self.clock.now = 1.5
+        self.assertEqual(self.handler.takeReady(set()), [])
+
+        # Every write postpones the upload
+        self.handler.on_modified(FileModifiedEvent(str(self.filePath)))
+
+        self.clock.now = 3.0
+        self.assertEqual(self.handler.takeReady(set()), [])
+
+        self.clock.now = 1.5 + artifactsModule.DEBOUNCE_TIME
+        self.assertEqual(self.handler.takeReady(set()), [self.filePath])
+        self.assertFalse(self.handler.hasPending)
+
+        # File is ready sooner once it was closed
+        self.handler.on_closed(FileClosedEvent(str(self.filePath)))
+        self.assertEqual(self.handler.takeReady(set()), [])
+
+        self.clock.now += artifactsModule.CLOSE_DEBOUNCE_TIME
+        self.assertEqual(self.handler.takeReady(set()), [self.filePath])
+
+    def test_takeReady(self) -> None:
+        otherPath = self.path / "metrics.csv"
+
+        self.handler.on_created(FileCreatedEvent(str(self.filePath)))
+        self.handler.on_created(FileCreatedEvent(str(otherPath)))
+
+        # Excluded files are left pending, forced files ignore the debounce time
+        self.assertEqual(self.handler.takeReady({ otherPath }, force = True), [self.filePath])
+        self.assertTrue(self.handler.hasPending)
+        self.assertEqual(self.handler.takeReady(set(), force = True), [otherPath])
+
+    def test_untrackedFiles(self) -> None:
+        ignoredDirectory = self.path / "ignored"
+        self.createFiles(ignoredDirectory, { ".coretexignore": b"" })
+
+        self.handler.on_created(FileCreatedEvent(str(self.path / "_coretex.py")))
+        self.handler.on_created(FileCreatedEvent(str(ignoredDirectory / "file.txt")))
+
+        # Only files created during the run are uploaded
+        self.handler.on_modified(FileModifiedEvent(str(self.path / "existing.txt")))
+
+        self.assertFalse(self.handler.hasPending)
+
+    def test_movedAndDeleted(self) -> None:
+        movedPath = self.path / "final.bin"
+
+        self.handler.on_created(FileCreatedEvent(str(self.filePath)))
+        self.handler.on_moved(FileMovedEvent(str(self.filePath), str(movedPath)))
+
+        self.assertEqual(self.handler.takeReady(set(), force = True), [movedPath])
+
+        self.handler.on_modified(FileModifiedEvent(str(movedPath)))
+        self.handler.on_deleted(FileDeletedEvent(str(movedPath)))
+
+        self.assertFalse(self.handler.hasPending)
+
+        # Deleted file is not tracked anymore
+        self.handler.on_modified(FileModifiedEvent(str(movedPath)))
+        self.assertFalse(self.handler.hasPending)
+
+    def test_version(self) -> None:
+        self.handler.on_created(FileCreatedEvent(str(self.filePath)))
+        self.handler.on_modified(FileModifiedEvent(str(self.filePath)))
+
+        version = self.handler.version(self.filePath)
+
+        # Rescheduled upload is not a change of the file
+        self.handler.reschedule(self.filePath, 1)
+        self.assertEqual(self.handler.version(self.filePath), version)
+
+        self.handler.on_closed(FileClosedEvent(str(self.filePath)))
+        self.assertEqual(self.handler.version(self.filePath), version + 1)
+
+
+class TestArtifactUploader(BaseDirectoryTest.Base):
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        patcher = mock.patch.multiple(
+            artifactsModule,
+            DEBOUNCE_TIME = 0.02,
+            CLOSE_DEBOUNCE_TIME = 0.01,
+            MIN_REUPLOAD_INTERVAL = 0
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.taskRun = _TaskRun()
+        self.handler = artifactsModule.FileEventHandler()
+        self.uploader = artifactsModule.ArtifactUploader(self.taskRun, self.path, self.handler)
+        self.uploader.start()
+
+        self.filePath = self.path / "model.bin"
+
+    def writeFile(self, content: bytes, created: bool = False) -> None:
+        self.filePath.write_bytes(content)
+
+        if created:
+            self.handler.on_created(FileCreatedEvent(str(self.filePath)))
+        else:
+            self.handler.on_modified(FileModifiedEvent(str(self.filePath)))
+
+    def waitForAttempts(self, count: int) -> None:
+        self.assertTrue(_waitFor(lambda: self.taskRun.attempts >= count and not self.handler.hasPending))
+
+    def test_upload(self) -> None:
+        self.writeFile(b"first", created = True)
+        self.assertTrue(_waitFor(lambda: len(self.taskRun.uploads) == 1))
+
+        self.writeFile(b"second")
+        self.assertTrue(_waitFor(lambda: len(self.taskRun.uploads) == 2))
+
+        self.uploader.finish()
+        self.assertEqual(self.taskRun.uploads, [("model.bin", b"first"), ("model.bin", b"second")])
+
+    def test_unchangedFileSkipped(self) -> None:
+        self.writeFile(b"content", created = True)
+        self.assertTrue(_waitFor(lambda: len(self.taskRun.uploads) == 1))
+
+        # Event without a change of the content does not upload the file again
+        self.writeFile(b"content")
+        self.assertTrue(_waitFor(lambda: not self.handler.hasPending))
+
+        self.uploader.finish()
+        self.assertEqual(self.taskRun.uploads, [("model.bin", b"content")])
+
+    def test_retryAfterChange(self) -> None:
+        maxAttempts = artifactsModule.MAX_UPLOAD_ATTEMPTS
+        self.taskRun.available = False
+
+        self.writeFile(b"first", created = True)
+        self.waitForAttempts(maxAttempts)
+
+        # Upload is not retried once all attempts failed
+        time.sleep(0.2)
+        self.assertEqual(self.taskRun.attempts, maxAttempts)
+
+        # Changed file gets all of the attempts again
+        self.writeFile(b"second")
+        self.waitForAttempts(maxAttempts * 2)
+
+        time.sleep(0.2)
+        self.assertEqual(self.taskRun.attempts, maxAttempts * 2)
+
+        self.taskRun.available = True
+
+        self.writeFile(b"third")
+        self.assertTrue(_waitFor(lambda: len(self.taskRun.uploads) == 1))
+
+        self.uploader.finish()
+        self.assertEqual(self.taskRun.uploads, [("model.bin", b"third")])
+
+    def test_finalFlush(self) -> None:
+        with mock.patch.object(artifactsModule, "MIN_REUPLOAD_INTERVAL", 60):
+            self.writeFile(b"first", created = True)
+            self.assertTrue(_waitFor(lambda: len(self.taskRun.uploads) == 1))
+
+            # File is uploaded at most once per interval while the task runs
+            self.writeFile(b"second")
+            time.sleep(0.2)
+            self.assertEqual(len(self.taskRun.uploads), 1)
+
+            # Remaining changes are uploaded once the task finishes
+            self.uploader.finish()
+
+        self.assertEqual(self.taskRun.uploads, [("model.bin", b"first"), ("model.bin", b"second")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,205 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import List
+from unittest import mock
+from threading import Event
+
+import sys
+import unittest
+
+from coretex import MetricsWriter, MetricAggregation
+from coretex.entities.task_run.metrics import MetricPoint
+
+
+metricsWriterModule = sys.modules["coretex.entities.task_run.metrics.metrics_writer"]
+
+
+class _Backend:
+
+    def __init__(self) -> None:
+        self.batches: List[List[MetricPoint]] = []
+        self.available = True
+        self.submitted = Event()
+
+    def submit(self, points: List[MetricPoint]) -> bool:
+        if not self.available:
+            return False
+
+        self.batches.append(points)
+        self.submitted.set()
+
+        return True
+
+    @property
+    def values(self) -> List[tuple]:
+        # Timestamps are checked separately
+        return [(name, x, y) for batch in self.batches for name, x, y, _ in batch]
+
+
+class TestMetricsWriter(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.backend = _Backend()
+
+    def createWriter(self, **kwargs) -> MetricsWriter:  # type: ignore[no-untyped-def]
+        kwargs.setdefault("flushInterval", 60)
+
+        writer = MetricsWriter(self.backend.submit, **kwargs)
+        self.addCleanup(writer.close)
+
+        return writer
+
+    def test_exactWindows(self) -> None:
+        writer = self.createWriter(aggregation = MetricAggregation.mean)
+
+        writer.write({ "loss": (1, 1.0), "accuracy": (1, 0.5) })
+        writer.write({ "loss": (1, 3.0) })
+        writer.write({ "loss": (2, 5.0) })
+
+        # Only windows which can not receive values anymore are submitted
+        self.assertTrue(writer.flush(includeOpen = False))
+        self.assertEqual(self.backend.values, [("loss", 1, 2.0)])
+
+        self.assertTrue(writer.flush())
+        self.assertEqual(self.backend.values[0], ("loss", 1, 2.0))
+        self.assertCountEqual(self.backend.values[1:], [("accuracy", 1, 0.5), ("loss", 2, 5.0)])
+
+        # Nothing is submitted if there are no values
+        self.assertTrue(writer.flush())
+        self.assertEqual(len(self.backend.batches), 2)
+
+    def test_aggregation(self) -> None:
+        expected = {
+            MetricAggregation.last: 2.0,
+            MetricAggregation.mean: 3.0,
+            MetricAggregation.min: 1.0,
+            MetricAggregation.max: 6.0
+        }
+
+        for aggregation, value in expected.items():
+            with self.subTest(aggregation = aggregation):
+                self.backend.batches.clear()
+                writer = self.createWriter(aggregation = aggregation, windowSize = 10)
+
+                for x, y in [(0, 3.0), (4, 1.0), (7, 6.0), (9.5, 2.0)]:
+                    writer.add("loss", x, y)
+
+                writer.add("loss", 10, 100.0)
+                self.assertTrue(writer.close())
+
+                # Point of the window is placed at the last x value added to it
+                self.assertEqual(self.backend.values, [("loss", 9.5, value), ("loss", 10, 100.0)])
+
+    def test_timestamps(self) -> None:
+        writer = self.createWriter()
+
+        with mock.patch.object(metricsWriterModule.time, "time", side_effect = [100.0, 200.0]):
+            writer.add("loss", 1, 1.0)
+            writer.add("loss", 1, 2.0)
+
+        writer.flush()
+
+        # Time at which the last value of the window was added, not the submission time
+        self.assertEqual(self.backend.batches, [[("loss", 1, 2.0, 200.0)]])
+
+    def test_failedSubmission(self) -> None:
+        writer = self.createWriter()
+        writer.add("loss", 1, 1.0)
+
+        self.backend.available = False
+        self.assertFalse(writer.flush())
+
+        writer.add("loss", 2, 2.0)
+
+        self.backend.available = True
+        self.assertTrue(writer.flush())
+
+        # Points which failed to submit are resubmitted before the newer ones
+        self.assertEqual(self.backend.values, [("loss", 1, 1.0), ("loss", 2, 2.0)])
+
+    def test_submitException(self) -> None:
+        submit = mock.Mock(side_effect = [ConnectionError(), True])
+
+        writer = MetricsWriter(submit, flushInterval = 60)
+        self.addCleanup(writer.close)
+
+        writer.add("loss", 1, 1.0)
+
+        self.assertFalse(writer.flush())
+        self.assertTrue(writer.flush())
+        self.assertEqual(submit.call_args_list[0], submit.call_args_list[1])
+
+    def test_failedPointsLimit(self) -> None:
+        writer = self.createWriter()
+        self.backend.available = False
+
+        with mock.patch.object(metricsWriterModule, "MAX_FAILED_POINTS", 3):
+            for x in range(5):
+                writer.add("loss", x, float(x))
+                writer.flush()
+
+        self.backend.available = True
+        writer.flush()
+
+        # Newest points are kept
+        self.assertEqual(self.backend.values, [("loss", 2, 2.0), ("loss", 3, 3.0), ("loss", 4, 4.0)])
+
+    def test_maxPendingPoints(self) -> None:
+        writer = self.createWriter(maxPendingPoints = 2)
+
+        writer.add("loss", 1, 1.0)
+        writer.add("loss", 2, 2.0)
+        self.assertFalse(self.backend.submitted.wait(0.2))
+
+        # Flush is triggered once enough windows are completed
+        writer.add("loss", 3, 3.0)
+
+        self.assertTrue(self.backend.submitted.wait(5))
+        self.assertEqual(self.backend.values, [("loss", 1, 1.0), ("loss", 2, 2.0)])
+
+    def test_idleWindowFlushed(self) -> None:
+        writer = self.createWriter(flushInterval = 0.1)
+
+        writer.add("loss", 1, 1.0)
+
+        # Window which is not updated for "flushInterval" is submitted by the background thread
+        self.assertTrue(self.backend.submitted.wait(5))
+        self.assertEqual(self.backend.values, [("loss", 1, 1.0)])
+
+    def test_close(self) -> None:
+        with self.createWriter() as writer:
+            writer.add("loss", 1, 1.0)
+
+        self.assertTrue(writer.isClosed)
+        self.assertEqual(self.backend.values, [("loss", 1, 1.0)])
+
+        with self.assertRaises(RuntimeError):
+            writer.add("loss", 2, 2.0)
+
+        self.assertTrue(writer.close())
+
+    def test_invalidParameters(self) -> None:
+        with self.assertRaises(ValueError):
+            MetricsWriter(self.backend.submit, windowSize = 0)
+
+        with self.assertRaises(ValueError):
+            MetricsWriter(self.backend.submit, flushInterval = 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
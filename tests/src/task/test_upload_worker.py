@@ -0,0 +1,235 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Any, Dict, List, Optional
+from pathlib import Path
+from unittest import mock
+
+import sys
+import json
+import time
+import unittest
+
+from coretex.logging import Log, LogSeverity
+from coretex._task.run_logger.upload_worker import LoggerUploadWorker, LogOverflowPolicy
+
+from ..base_directory_test import BaseDirectoryTest
+
+
+uploadWorkerModule = sys.modules["coretex._task.run_logger.upload_worker"]
+
+
+def _logs(count: int, start: int = 0) -> List[Log]:
+    return [Log(LogSeverity.info, f"Log {index}") for index in range(start, start + count)]
+
+
+class _Backend:
+
+    def __init__(self) -> None:
+        self.batches: List[List[Dict[str, Any]]] = []
+        self.available = True
+        self.failAfter: int = -1
+        self.exception: Optional[BaseException] = None
+
+    def upload(self, batch: List[Dict[str, Any]]) -> bool:
+        if self.exception is not None:
+            raise self.exception
+
+        if not self.available or self.failAfter == 0:
+            return False
+
+        self.failAfter -= 1
+        self.batches.append(batch)
+
+        return True
+
+    @property
+    def messages(self) -> List[str]:
+        return [log["content"] for batch in self.batches for log in batch]
+
+
+class TestLoggerUploadWorker(BaseDirectoryTest.Base):
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.backend = _Backend()
+        self.spillPath = self.path / "pending_logs.jsonl"
+
+        patcher = mock.patch.multiple(uploadWorkerModule, MAX_PENDING_LOG_COUNT = 5, MAX_BATCH_COUNT = 3)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def createWorker(self, overflowPolicy: LogOverflowPolicy = LogOverflowPolicy.spill) -> LoggerUploadWorker:
+        spillPath = self.spillPath if overflowPolicy == LogOverflowPolicy.spill else None
+        return LoggerUploadWorker(self.backend.upload, overflowPolicy, spillPath)
+
+    def spilledMessages(self, path: Path) -> List[str]:
+        with path.open("r", encoding = "utf-8") as file:
+            return [json.loads(line)["content"] for line in file]
+
+    def test_batching(self) -> None:
+        worker = self.createWorker()
+
+        logs = _logs(4)
+        for log in logs:
+            worker.add(log)
+
+        self.assertTrue(worker.uploadLogs())
+        self.assertEqual([len(batch) for batch in self.backend.batches], [3, 1])
+        self.assertEqual(self.backend.messages, [log.message for log in logs])
+
+        # Batch is limited by the size of its logs as well
+        self.backend.batches.clear()
+
+        with mock.patch.object(uploadWorkerModule, "MAX_BATCH_BYTES", 2 * uploadWorkerModule._logSize(logs[0])):
+            for log in logs:
+                worker.add(log)
+
+            self.assertTrue(worker.uploadLogs())
+
+        self.assertEqual([len(batch) for batch in self.backend.batches], [2, 2])
+
+    def test_requeue(self) -> None:
+        worker = self.createWorker()
+
+        logs = _logs(5)
+        for log in logs:
+            worker.add(log)
+
+        self.backend.failAfter = 1
+        self.assertFalse(worker.uploadLogs())
+        self.assertEqual(self.backend.messages, [log.message for log in logs[:3]])
+
+        # Logs which were not uploaded are sent before the new ones
+        newLogs = _logs(1, 5)
+        worker.add(newLogs[0])
+
+        self.backend.failAfter = -1
+        self.assertTrue(worker.uploadLogs())
+        self.assertEqual(self.backend.messages, [log.message for log in logs + newLogs])
+
+    def test_requeueAfterException(self) -> None:
+        worker = self.createWorker()
+
+        logs = _logs(2)
+        for log in logs:
+            worker.add(log)
+
+        self.backend.exception = ConnectionError()
+
+        with self.assertRaises(ConnectionError):
+            worker.uploadLogs()
+
+        self.backend.exception = None
+
+        self.assertTrue(worker.uploadLogs())
+        self.assertEqual(self.backend.messages, [log.message for log in logs])
+
+    def test_dropOverflow(self) -> None:
+        worker = self.createWorker(LogOverflowPolicy.drop)
+
+        logs = _logs(8)
+        for log in logs:
+            worker.add(log)
+
+        self.assertTrue(worker.uploadLogs())
+
+        messages = self.backend.messages
+        self.assertIn("3 log(s) were dropped", messages[0])
+        self.assertEqual(messages[1:], [log.message for log in logs[3:]])
+
+    def test_spillOverflow(self) -> None:
+        worker = self.createWorker()
+
+        logs = _logs(8)
+        with mock.patch.object(Path, "open", side_effect = AssertionError("Producer wrote to disk")):
+            for log in logs:
+                worker.add(log)
+
+        # Overflow is handed over to the uploader, producers never write to the spill file
+        self.assertFalse(self.spillPath.exists())
+
+        self.backend.available = False
+        self.assertFalse(worker.uploadLogs())
+        self.assertEqual(self.spilledMessages(self.spillPath), [log.message for log in logs[:6]])
+
+        self.backend.available = True
+        self.assertTrue(worker.uploadLogs())
+
+        # Spilled logs are uploaded first and the spill file is removed
+        self.assertEqual(self.backend.messages, [log.message for log in logs])
+        self.assertFalse(self.spillPath.exists())
+
+    def test_spillPending(self) -> None:
+        worker = self.createWorker()
+
+        # Buffer overflows again before the uploader writes the previous overflow
+        logs = _logs(14)
+        for log in logs:
+            worker.add(log)
+
+        self.assertTrue(worker.uploadLogs())
+
+        messages = self.backend.messages
+        self.assertEqual(messages[:6], [log.message for log in logs[:6]])
+        self.assertIn("3 log(s) were dropped", messages[6])
+        self.assertEqual(messages[7:], [log.message for log in logs[9:]])
+
+    def test_spillWhileUploadPostponed(self) -> None:
+        with mock.patch.object(uploadWorkerModule, "MAX_WAIT_TIME_BEFORE_UPDATE", 30):
+            worker = self.createWorker()
+            worker.start()
+
+            try:
+                # Uploader thread spills the overflow without waiting for the next upload
+                logs = _logs(6)
+                for log in logs:
+                    worker.add(log)
+
+                for _ in range(100):
+                    if self.spillPath.exists():
+                        break
+
+                    time.sleep(0.05)
+
+                self.assertEqual(self.spilledMessages(self.spillPath), [log.message for log in logs])
+                self.assertEqual(self.backend.batches, [])
+            finally:
+                worker.stop()
+                worker.join()
+
+    def test_stopSpillsOverflow(self) -> None:
+        worker = self.createWorker()
+
+        logs = _logs(6)
+        for log in logs:
+            worker.add(log)
+
+        worker.stop()
+        worker.run()
+
+        self.assertEqual(self.spilledMessages(self.spillPath), [log.message for log in logs])
+        self.assertEqual(self.backend.batches, [])
+
+    def test_spillPathRequired(self) -> None:
+        with self.assertRaises(ValueError):
+            LoggerUploadWorker(self.backend.upload, LogOverflowPolicy.spill)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,201 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Any, List, Optional
+from unittest import mock
+
+import sys
+import time
+import unittest
+
+from coretex.networking import RequestFailedError, RequestType
+from coretex.entities.task_run.metrics import MetricPoint
+
+import coretex._task.worker  # noqa: F401
+
+
+metricsModule = sys.modules["coretex._task.worker.metrics"]
+workerModule = sys.modules["coretex._task.worker.worker"]
+
+
+class _Metric:
+
+    def __init__(self, name: str, value: Optional[float] = None) -> None:
+        self.name = name
+        self.value = value
+        self.extractCount = 0
+
+    def extract(self) -> Optional[float]:
+        self.extractCount += 1
+
+        if self.value is None:
+            return None
+
+        return self.value + self.extractCount
+
+
+class _TaskRun:
+
+    def __init__(self, metrics: List[_Metric]) -> None:
+        self.metrics = metrics
+        self.submitted: List[List[MetricPoint]] = []
+        self.statusUpdated = 0
+        self.submitSucceeds = True
+        self.updateError: Optional[Exception] = None
+
+    def updateStatus(self) -> bool:
+        if self.updateError is not None:
+            raise self.updateError
+
+        self.statusUpdated += 1
+        return True
+
+    def _submitMetricPoints(self, points: List[MetricPoint]) -> bool:
+        if not self.submitSucceeds:
+            return False
+
+        self.submitted.append(points)
+        return True
+
+
+def _point(name: str, value: float) -> MetricPoint:
+    return (name, value, value, value)
+
+
+class TestMetricSampler(unittest.TestCase):
+
+    def createSampler(self, taskRun: Any, capacity: int = 100) -> Any:
+        return metricsModule.MetricSampler(taskRun, 0.01, capacity)
+
+    def test_sample(self) -> None:
+        taskRun = _TaskRun([_Metric("cpu_usage", 10), _Metric("gpu_usage"), _Metric("ram_usage", 20)])
+
+        with mock.patch.object(metricsModule.time, "time", return_value = 123.0):
+            points = metricsModule.sample(taskRun)
+
+        # Metrics without a value are skipped, all points share the sampling time
+        self.assertEqual(points, [("cpu_usage", 123.0, 11, 123.0), ("ram_usage", 123.0, 21, 123.0)])
+
+    def test_ringBuffer(self) -> None:
+        metric = _Metric("cpu_usage", 0)
+        sampler = self.createSampler(_TaskRun([metric]), capacity = 3)
+
+        sampler.start()
+
+        try:
+            deadline = time.monotonic() + 10
+            while metric.extractCount < 6 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            sampler.stop()
+
+        # Only the newest samples are kept once the buffer is full
+        values = [y for _, _, y, _ in sampler.drain()]
+
+        self.assertEqual(values, list(range(metric.extractCount - 2, metric.extractCount + 1)))
+        self.assertEqual(sampler.drain(), [])
+
+    def test_sampleFailed(self) -> None:
+        metric = _Metric("cpu_usage", 0)
+        sampler = self.createSampler(_TaskRun([metric]))
+
+        with mock.patch.object(metric, "extract", side_effect = [RuntimeError()] + [1.0] * 1000) as extract:
+            sampler.start()
+
+            try:
+                deadline = time.monotonic() + 10
+                while len(sampler.drain()) == 0 and time.monotonic() < deadline:
+                    time.sleep(0.01)
+            finally:
+                sampler.stop()
+
+        # Sampling continues after a failure
+        self.assertGreaterEqual(extract.call_count, 2)
+
+    def test_requeue(self) -> None:
+        taskRun = _TaskRun([_Metric("cpu_usage", 0)])
+        sampler = self.createSampler(taskRun, capacity = 3)
+
+        sampler.requeue([_point("cpu_usage", 1), _point("cpu_usage", 2)])
+        sampler.requeue([_point("cpu_usage", 0)])
+
+        # Requeued points are placed before the buffered ones
+        self.assertEqual(sampler.drain(), [_point("cpu_usage", 0), _point("cpu_usage", 1), _point("cpu_usage", 2)])
+
+        sampler.requeue([_point("cpu_usage", 1), _point("cpu_usage", 2)])
+        sampler.requeue([_point("cpu_usage", -1), _point("cpu_usage", 0)])
+
+        # Oldest points are discarded if the buffer is full
+        self.assertEqual(sampler.drain(), [_point("cpu_usage", 0), _point("cpu_usage", 1), _point("cpu_usage", 2)])
+
+
+class TestHeartbeat(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.taskRun = _TaskRun([_Metric("cpu_usage", 0)])
+        self.sampler = metricsModule.MetricSampler(self.taskRun, 1, 100)
+
+    def test_update(self) -> None:
+        self.assertTrue(workerModule._update(self.taskRun, self.sampler))
+
+        # Metrics are not submitted if nothing was sampled
+        self.assertEqual(self.taskRun.statusUpdated, 1)
+        self.assertEqual(self.taskRun.submitted, [])
+
+        points = [_point("cpu_usage", 1), _point("cpu_usage", 2)]
+        self.sampler.requeue(points)
+
+        self.assertTrue(workerModule._update(self.taskRun, self.sampler))
+        self.assertEqual(self.taskRun.submitted, [points])
+        self.assertEqual(self.sampler.drain(), [])
+
+    def test_submitFailed(self) -> None:
+        points = [_point("cpu_usage", 1)]
+        self.sampler.requeue(points)
+
+        self.taskRun.submitSucceeds = False
+        self.assertFalse(workerModule._update(self.taskRun, self.sampler))
+
+        # Points are shipped with the next heartbeat
+        self.assertEqual(self.sampler.drain(), points)
+
+    def test_heartbeatFailed(self) -> None:
+        points = [_point("cpu_usage", 1)]
+        self.sampler.requeue(points)
+
+        self.taskRun.updateError = RequestFailedError("model-queue/job-update", RequestType.post)
+        self.assertFalse(workerModule._update(self.taskRun, self.sampler))
+
+        self.assertEqual(self.taskRun.submitted, [])
+        self.assertEqual(self.sampler.drain(), points)
+
+    def test_nextUpdateInterval(self) -> None:
+        updateInterval = workerModule.UPDATE_INTERVAL
+        maxUpdateInterval = workerModule.MAX_UPDATE_INTERVAL
+
+        # Interval is doubled if the update failed or was slow
+        self.assertEqual(workerModule._nextUpdateInterval(updateInterval, 0, False), updateInterval * 2)
+        self.assertEqual(workerModule._nextUpdateInterval(updateInterval, updateInterval, True), updateInterval * 2)
+        self.assertEqual(workerModule._nextUpdateInterval(maxUpdateInterval, 0, False), maxUpdateInterval)
+
+        # And halved once updates are fast again
+        self.assertEqual(workerModule._nextUpdateInterval(updateInterval * 4, 0, True), updateInterval * 2)
+        self.assertEqual(workerModule._nextUpdateInterval(updateInterval, 0, True), updateInterval)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from pathlib import Path
+from unittest import mock
+
+import os
+import sys
+import unittest
+
+from coretex.cryptography import aes
+from coretex.cryptography.aes.constants import IV_SIZE
+from coretex.cryptography.aes.utils import DataBuffer
+
+from .base_directory_test import BaseDirectoryTest
+
+
+decryptorModule = sys.modules["coretex.cryptography.aes.decryptor"]
+
+KEY = bytes(range(32))
+
+
+def _streamDecrypt(key: bytes, path: Path) -> bytes:
+    # Reference implementation which decrypts the whole file in memory
+    data = path.read_bytes()
+
+    decryptor = aes.StreamDecryptor(key, data[:IV_SIZE], chunkSize = 64)
+    decrypted = b"".join(decryptor.feed(data[IV_SIZE:]))
+
+    return decrypted + decryptor.flush()
+
+
+class TestAes(BaseDirectoryTest.Base):
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        # Small parts and buffers so the files are split and decrypted in multiple passes
+        self.patches = [
+            mock.patch.object(decryptorModule, "PARALLEL_DECRYPTION_MIN_PART_SIZE", 64),
+            mock.patch.object(decryptorModule, "DECRYPTION_BUFFER_SIZE", 48)
+        ]
+
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self) -> None:
+        for patch in self.patches:
+            patch.stop()
+
+        super().tearDown()
+
+    def encrypt(self, content: bytes) -> Path:
+        sourcePath = self.path / "source.bin"
+        sourcePath.write_bytes(content)
+
+        encryptedPath = self.path / "encrypted.bin"
+        aes.encryptFile(KEY, sourcePath, encryptedPath)
+
+        return encryptedPath
+
+    def test_decryptFile(self) -> None:
+        for size in [0, 1, 15, 16, 17, 100, 1000, 4096]:
+            content = os.urandom(size)
+            encryptedPath = self.encrypt(content)
+
+            for workerCount in [1, 3, 8]:
+                with self.subTest(size = size, workerCount = workerCount):
+                    decryptedPath = self.path / "decrypted.bin"
+                    aes.decryptFile(KEY, encryptedPath, decryptedPath, workerCount)
+
+                    self.assertEqual(decryptedPath.read_bytes(), content)
+
+    def test_partsCoverCiphertext(self) -> None:
+        encryptedPath = self.encrypt(os.urandom(1000))
+        ciphertextSize = encryptedPath.stat().st_size - IV_SIZE
+
+        parts = decryptorModule._splitCiphertext(encryptedPath, ciphertextSize, 3)
+        self.assertEqual(len(parts), 3)
+
+        data = encryptedPath.read_bytes()
+        position = IV_SIZE
+
+        for iv, start, end in parts:
+            # IV of every part is the ciphertext block which precedes it
+            self.assertEqual(start, position)
+            self.assertEqual(iv, data[start - IV_SIZE:start])
+
+            position = end
+
+        self.assertEqual(position, len(data))
+
+    def test_wrongKey(self) -> None:
+        encryptedPath = self.encrypt(os.urandom(1000))
+        wrongKey = bytes(reversed(KEY))
+
+        # Wrong key produces the same output as the stream decryptor instead of failing
+        for workerCount in [1, 4]:
+            with self.subTest(workerCount = workerCount):
+                decryptedPath = self.path / "decrypted.bin"
+                aes.decryptFile(wrongKey, encryptedPath, decryptedPath, workerCount)
+
+                self.assertEqual(decryptedPath.read_bytes(), _streamDecrypt(wrongKey, encryptedPath))
+
+    def test_invalidInput(self) -> None:
+        sourcePath = self.path / "source.bin"
+        destinationPath = self.path / "destination.bin"
+
+        with self.assertRaises(ValueError):
+            aes.decryptFile(KEY[:16], sourcePath, destinationPath)
+
+        sourcePath.write_bytes(os.urandom(IV_SIZE - 1))
+        with self.assertRaises(ValueError):
+            aes.decryptFile(KEY, sourcePath, destinationPath)
+
+        sourcePath.write_bytes(os.urandom(IV_SIZE + 17))
+        with self.assertRaises(ValueError):
+            aes.decryptFile(KEY, sourcePath, destinationPath)
+
+    def test_dataBufferCompacted(self) -> None:
+        buffer = DataBuffer()
+
+        for _ in range(100):
+            buffer.append(bytes(range(64)))
+            self.assertEqual(buffer.getBytes(64), bytes(range(64)))
+
+        # Consumed bytes are dropped so the buffer does not grow
+        self.assertEqual(buffer.remaining, 0)
+        self.assertLessEqual(len(buffer.data), 64)
+
+        with self.assertRaises(OverflowError):
+            buffer.getBytes(1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from pathlib import Path
+from unittest import mock
+
+import time
+import hashlib
+import threading
+import unittest
+
+from coretex import cache, folder_manager
+from coretex.utils import FileLock
+
+from .base_directory_test import BaseDirectoryTest
+
+
+class TestCache(BaseDirectoryTest.Base):
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        self.downloadCount = 0
+        self.content = b"cached content"
+
+        self.patches = [
+            mock.patch.object(folder_manager, "cache", self.path),
+            mock.patch.object(cache, "_downloadFile", self.__downloadFile),
+            mock.patch.object(cache, "_pendingAccesses", {}),
+            mock.patch.object(cache, "_lastAccessFlush", 0.0)
+        ]
+
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self) -> None:
+        # Limit is reset while the cache is still patched, so the real cache is not touched
+        cache.setSizeLimit(None)
+
+        for patch in self.patches:
+            patch.stop()
+
+        super().tearDown()
+
+    def __downloadFile(self, source: str, destination: Path) -> str:
+        self.downloadCount += 1
+
+        # Simulates a slow download so concurrent calls overlap
+        time.sleep(0.2)
+        destination.write_bytes(self.content)
+
+        return hashlib.sha256(self.content).hexdigest()
+
+    def test_concurrentStoreUrl(self) -> None:
+        errors = []
+
+        def store() -> None:
+            try:
+                cache.storeUrl("file", "https://example.com/file")
+            except Exception as ex:
+                errors.append(ex)
+
+        threads = [threading.Thread(target = store) for _ in range(4)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(self.downloadCount, 1)
+        self.assertEqual(cache.getPath("file").read_bytes(), self.content)
+
+        # Lock file is removed once the download finishes
+        self.assertEqual(list(folder_manager.cache.glob(".*.lock")), [folder_manager.cache / ".index.lock"])
+
+    def test_checksumSkipsDownload(self) -> None:
+        checksum = hashlib.sha256(self.content).hexdigest()
+
+        cache.storeUrl("file", "https://example.com/file", checksum = checksum)
+        cache.storeUrl("file", "https://example.com/file", checksum = checksum)
+
+        self.assertEqual(self.downloadCount, 1)
+
+    def test_checksumComputedOutsideIndexLock(self) -> None:
+        checksum = hashlib.sha256(self.content).hexdigest()
+
+        source = self.path / "source.bin"
+        source.write_bytes(self.content)
+
+        cache.storeFile("file", source)
+
+        def fileChecksum(path: Path) -> str:
+            # Other processes can update the index while the file is being hashed
+            lock = FileLock(folder_manager.cache / cache.INDEX_LOCK_FILE_NAME)
+            self.assertTrue(lock.acquire(blocking = False))
+            lock.release()
+
+            return hashlib.sha256(path.read_bytes()).hexdigest()
+
+        with mock.patch.object(cache, "_fileChecksum", side_effect = fileChecksum) as fileChecksumMock:
+            cache.storeUrl("file", "https://example.com/file", checksum = checksum)
+            cache.storeUrl("file", "https://example.com/file", checksum = checksum)
+
+        # Checksum is stored in the index after the first validation
+        self.assertEqual(fileChecksumMock.call_count, 1)
+        self.assertEqual(self.downloadCount, 0)
+
+    def test_checksumMismatch(self) -> None:
+        with self.assertRaises(cache.ChecksumMismatchError):
+            cache.storeUrl("file", "https://example.com/file", checksum = "0" * 64)
+
+        self.assertEqual(self.downloadCount, 1)
+        self.assertFalse(cache.exists("file"))
+        self.assertEqual([path for path in folder_manager.cache.iterdir() if path.suffix == ".tmp"], [])
+
+    def test_eviction(self) -> None:
+        for index in range(3):
+            cache.storeObject(f"object{index}", b"x" * 1024)
+            time.sleep(0.01)
+
+        # Access makes "object0" the most recently used entry
+        cache.loadObject("object0")
+
+        cache.setSizeLimit(cache.getPath("object0").stat().st_size * 2)
+
+        self.assertTrue(cache.exists("object0"))
+        self.assertFalse(cache.exists("object1"))
+        self.assertTrue(cache.exists("object2"))
+        self.assertLessEqual(cache.getSize(), cache.getSizeLimit())
+
+    def test_accessesBatched(self) -> None:
+        cache.storeObject("object", b"x" * 1024)
+
+        with mock.patch.object(cache, "_saveIndex", wraps = cache._saveIndex) as saveIndex:
+            for _ in range(100):
+                cache.getPath("object")
+
+            # Only the first access is written to the index right away
+            self.assertEqual(saveIndex.call_count, 1)
+
+        cache._flushAccesses()
+
+        entry = cache._loadIndex()[cache._hashCacheKey("object")]
+        self.assertEqual(entry["hitCount"], 100)
+
+    def test_clearRemovesLocks(self) -> None:
+        cache.storeObject("object", {"value": 1})
+
+        staleLock = folder_manager.cache / ".stale.lock"
+        staleLock.touch()
+
+        cache.clear()
+
+        self.assertFalse(cache.exists("object"))
+        self.assertFalse(staleLock.exists())
+        self.assertEqual(cache.getSize(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,186 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Any, Dict, List
+from datetime import datetime, timezone, timedelta
+from enum import IntEnum
+from unittest import mock
+from uuid import UUID, uuid4
+
+import sys
+import unittest
+
+from coretex.codable import Codable, KeyDescriptor
+from coretex.utils import decodeDate
+
+
+dateModule = sys.modules["coretex.utils.date"]
+
+
+class _Color(IntEnum):
+
+    red  = 1
+    blue = 2
+
+
+class _Child(Codable):
+
+    childValue: int
+
+
+class _Parent(Codable):
+
+    id: int
+    createdAt: datetime
+    color: _Color
+    uuid: UUID
+    children: List[_Child]
+    tags: List[str]
+    secret: str
+    readOnly: str
+
+    @classmethod
+    def _keyDescriptors(cls) -> Dict[str, KeyDescriptor]:
+        descriptors = super()._keyDescriptors()
+
+        descriptors["createdAt"] = KeyDescriptor("created_on", datetime)
+        descriptors["color"] = KeyDescriptor("color", _Color)
+        descriptors["uuid"] = KeyDescriptor("uuid", UUID)
+        descriptors["children"] = KeyDescriptor("children", _Child, list)
+        descriptors["secret"] = KeyDescriptor(isEncodable = False)
+        descriptors["readOnly"] = KeyDescriptor("read_only", isDecodable = False)
+
+        return descriptors
+
+
+class _RenamedParent(_Parent):
+
+    @classmethod
+    def _keyDescriptors(cls) -> Dict[str, KeyDescriptor]:
+        descriptors = super()._keyDescriptors()
+        descriptors["id"] = KeyDescriptor("parent_id")
+
+        return descriptors
+
+
+class _HookedParent(_Parent):
+
+    encodedKeys: List[str] = []
+    decodedKeys: List[str] = []
+
+    def _encodeValue(self, key: str, value: Any) -> Any:
+        self.encodedKeys.append(key)
+        return super()._encodeValue(key, value)
+
+    @classmethod
+    def _decodeValue(cls, key: str, value: Any) -> Any:
+        cls.decodedKeys.append(key)
+        return super()._decodeValue(key, value)
+
+
+def _parentJson() -> Dict[str, Any]:
+    return {
+        "id": 1,
+        "created_on": "2024-01-01 12:00:00.123456+0000",
+        "color": 2,
+        "uuid": str(uuid4()),
+        "children": [{ "child_value": 1 }, { "child_value": 2 }],
+        "tags": ["first", "second"],
+        "secret": "secret",
+        "read_only": "value"
+    }
+
+
+class TestCodable(unittest.TestCase):
+
+    def test_decode(self) -> None:
+        json = _parentJson()
+        parent = _Parent.decode(json)
+
+        self.assertEqual(parent.id, 1)
+        self.assertEqual(parent.createdAt, datetime(2024, 1, 1, 12, 0, 0, 123456, timezone.utc))
+        self.assertEqual(parent.color, _Color.blue)
+        self.assertEqual(parent.uuid, UUID(json["uuid"]))
+        self.assertEqual([child.childValue for child in parent.children], [1, 2])
+        self.assertEqual(parent.tags, ["first", "second"])
+        self.assertEqual(parent.secret, "secret")
+        self.assertFalse(hasattr(parent, "readOnly"))
+
+    def test_encode(self) -> None:
+        json = _parentJson()
+
+        parent = _Parent.decode(json)
+        parent.readOnly = "value"
+
+        del json["secret"]
+        self.assertEqual(parent.encode(), json)
+
+    def test_codecNotInherited(self) -> None:
+        json = _parentJson()
+        json["parent_id"] = json.pop("id")
+
+        self.assertEqual(_Parent.decode(_parentJson()).id, 1)
+        self.assertEqual(_RenamedParent.decode(json).id, 1)
+        self.assertIn("parent_id", _RenamedParent.decode(json).encode())
+        self.assertIn("id", _Parent.decode(_parentJson()).encode())
+
+    def test_customHooks(self) -> None:
+        json = _parentJson()
+
+        parent = _HookedParent.decode(json)
+        self.assertEqual(_HookedParent.decodedKeys, [key for key in json if key != "read_only"])
+        self.assertEqual(parent.color, _Color.blue)
+
+        parent.encode()
+        self.assertEqual(_HookedParent.encodedKeys, [key for key in parent.__dict__ if key != "secret"])
+
+
+class TestDecodeDate(unittest.TestCase):
+
+    def test_matchesStrptime(self) -> None:
+        values = [
+            "2024-01-01 12:00:00.123456+00:00",
+            "2024-01-01 12:00:00.123456+0000",
+            "2024-01-01T12:00:00.000000Z",
+            "2024-01-01T12:00:00.5+02:00",
+            "2024-01-01 12:00:00+02",
+            "2024-01-01 12:00:00.123-05:30",
+            "2024-02-29 23:59:59.999999+01"
+        ]
+
+        for value in values:
+            with self.subTest(value = value):
+                with mock.patch.object(dateModule, "_decodeDateFast", side_effect = ValueError):
+                    expected = decodeDate(value)
+
+                actual = decodeDate(value)
+
+                self.assertEqual(actual, expected)
+                self.assertEqual(actual.utcoffset(), expected.utcoffset())
+
+    def test_offset(self) -> None:
+        self.assertEqual(decodeDate("2024-01-01 12:00:00-05:30").utcoffset(), -timedelta(hours = 5, minutes = 30))
+
+    def test_invalid(self) -> None:
+        for value in ["", "2024-01-01", "2024-13-01 12:00:00+00", "not a date"]:
+            with self.subTest(value = value):
+                with self.assertRaises(ValueError):
+                    decodeDate(value)
+
+
+if __name__ == "__main__":
+    unittest.main()
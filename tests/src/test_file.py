@@ -0,0 +1,244 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Dict, List
+from pathlib import PurePosixPath
+from unittest import mock
+from zipfile import ZipFile, ZipInfo, ZIP_DEFLATED, ZIP_STORED
+
+import io
+import sys
+import gzip
+import zlib
+import unittest
+
+from coretex.utils.file import recursiveUnzip, archive, writeRawZipMember, sanitizeMemberName
+
+from .base_directory_test import BaseDirectoryTest
+
+
+fileModule = sys.modules["coretex.utils.file"]
+
+
+def nestedFiles() -> Dict[str, bytes]:
+    files: Dict[str, bytes] = {}
+
+    # Many files share the same directories, so parallel
+    # extraction creates the same directories at the same time
+    for directory in range(32):
+        for index in range(8):
+            name = f"directory{directory}/nested/deeper/file{index}.txt"
+            files[name] = f"Coretex {directory} {index}".encode() * 64
+
+    files["root.txt"] = b"Root file"
+    return files
+
+
+class TestFile(BaseDirectoryTest.Base):
+
+    def test_archive(self) -> None:
+        files = nestedFiles()
+        self.createFiles(self.path / "source", files)
+
+        for workerCount in [1, 4]:
+            with self.subTest(workerCount = workerCount):
+                zipPath = self.path / f"archive{workerCount}.zip"
+                archive(self.path / "source", zipPath, workerCount = workerCount)
+
+                self.assertZipContent(zipPath, files)
+
+                # Temporary files of compressed members are removed
+                self.assertEqual(list(self.path.glob(".*.part")), [])
+
+    def test_invalidWorkerCount(self) -> None:
+        self.createFiles(self.path / "source", { "file.txt": b"Coretex" })
+
+        with self.assertRaises(ValueError):
+            archive(self.path / "source", self.path / "archive.zip", workerCount = 0)
+
+        with self.assertRaises(ValueError):
+            recursiveUnzip(self.createZip(self.path / "archive.zip", { "file.txt": b"Coretex" }), workerCount = 0)
+
+    def test_sanitizeMemberName(self) -> None:
+        self.assertEqual(sanitizeMemberName("directory/file.txt"), PurePosixPath("directory/file.txt"))
+        self.assertEqual(sanitizeMemberName("../../directory/./file.txt"), PurePosixPath("directory/file.txt"))
+        self.assertEqual(sanitizeMemberName("/absolute/file.txt"), PurePosixPath("absolute/file.txt"))
+        self.assertEqual(sanitizeMemberName("C:\\directory\\file.txt"), PurePosixPath("directory/file.txt"))
+        self.assertIsNone(sanitizeMemberName("../"))
+
+    def test_recursiveUnzip(self) -> None:
+        files = nestedFiles()
+
+        for workerCount in [1, 8]:
+            with self.subTest(workerCount = workerCount):
+                zipPath = self.path / "archive.zip"
+
+                with ZipFile(zipPath, "w", ZIP_DEFLATED) as zipFile:
+                    # Explicit directory members are extracted together with the files in them
+                    zipFile.writestr("directory0/", b"")
+                    zipFile.writestr("directory0/nested/", b"")
+
+                    for name, content in files.items():
+                        zipFile.writestr(name, content)
+
+                destination = self.path / f"destination{workerCount}"
+                recursiveUnzip(zipPath, destination, remove = True, workerCount = workerCount)
+
+                self.assertFalse(zipPath.exists())
+                self.assertFiles(destination, files)
+
+    def test_recursiveUnzipNested(self) -> None:
+        innerBuffer = io.BytesIO()
+        with ZipFile(innerBuffer, "w", ZIP_DEFLATED) as innerZipFile:
+            innerZipFile.writestr("inner/file.txt", b"Inner file")
+
+        zipPath = self.path / "archive.zip"
+        with ZipFile(zipPath, "w", ZIP_DEFLATED) as zipFile:
+            zipFile.writestr("outer/file.txt", b"Outer file")
+            zipFile.writestr("outer/inner.zip", innerBuffer.getvalue())
+            zipFile.writestr("outer/compressed.txt.gz", gzip.compress(b"Compressed file"))
+
+        destination = self.path / "destination"
+        recursiveUnzip(zipPath, destination, workerCount = 4)
+
+        self.assertTrue(zipPath.exists())
+        self.assertFiles(destination, {
+            "outer/file.txt": b"Outer file",
+            "outer/inner/inner/file.txt": b"Inner file",
+            "outer/compressed.txt": b"Compressed file"
+        })
+
+    def test_nestedArchivesRemovedEarly(self) -> None:
+        innerBuffer = io.BytesIO()
+        with ZipFile(innerBuffer, "w", ZIP_DEFLATED) as innerZipFile:
+            innerZipFile.writestr("file.txt", b"Inner file")
+
+        zipPath = self.path / "archive.zip"
+        with ZipFile(zipPath, "w", ZIP_DEFLATED) as zipFile:
+            zipFile.writestr("first.zip", innerBuffer.getvalue())
+            zipFile.writestr("second.zip", innerBuffer.getvalue())
+
+        destination = self.path / "destination"
+
+        openedFiles: List[ZipFile] = []
+        finishedArchives: List[str] = []
+
+        class RecordingZipFile(ZipFile):
+
+            def __init__(self, *args, **kwargs) -> None:  # type: ignore[no-untyped-def]
+                super().__init__(*args, **kwargs)
+                openedFiles.append(self)
+
+        finishArchive = fileModule._ExtractionEngine._finishArchive
+
+        def recordFinishedArchive(engine, path) -> None:  # type: ignore[no-untyped-def]
+            finishArchive(engine, path)
+
+            # Every handle is closed before the archive is deleted
+            self.assertTrue(all(zipFile.fp is None for zipFile in openedFiles if zipFile.filename == str(path)))
+            self.assertFalse(path.exists())
+
+            if path.name == "first.zip":
+                # Extraction of the other nested archive is still in progress
+                self.assertFalse((destination / "second" / "file.txt").exists())
+
+            finishedArchives.append(path.name)
+
+        with mock.patch.object(fileModule, "ZipFile", RecordingZipFile), \
+             mock.patch.object(fileModule._ExtractionEngine, "_finishArchive", recordFinishedArchive):
+
+            recursiveUnzip(zipPath, destination, remove = True, workerCount = 1)
+
+        self.assertEqual(finishedArchives, ["archive.zip", "first.zip", "second.zip"])
+        self.assertTrue(all(zipFile.fp is None for zipFile in openedFiles))
+        self.assertFiles(destination, {
+            "first/file.txt": b"Inner file",
+            "second/file.txt": b"Inner file"
+        })
+
+    def test_recursiveUnzipFailed(self) -> None:
+        zipPath = self.createZip(self.path / "archive.zip", { f"file{index}.txt": b"Coretex" for index in range(8) })
+
+        openedFiles: List[ZipFile] = []
+
+        class RecordingZipFile(ZipFile):
+
+            def __init__(self, *args, **kwargs) -> None:  # type: ignore[no-untyped-def]
+                super().__init__(*args, **kwargs)
+                openedFiles.append(self)
+
+        with mock.patch.object(fileModule, "ZipFile", RecordingZipFile), \
+             mock.patch.object(fileModule.shutil, "copyfileobj", side_effect = OSError("No space left on device")):
+
+            with self.assertRaises(OSError):
+                recursiveUnzip(zipPath, remove = True, workerCount = 4)
+
+        # Archive which was not fully extracted is kept, but no handles to it are left open
+        self.assertTrue(zipPath.exists())
+        self.assertGreater(len(openedFiles), 0)
+        self.assertTrue(all(zipFile.fp is None for zipFile in openedFiles))
+
+    def test_writeRawZipMember(self) -> None:
+        content = b"Coretex raw member" * 256
+
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS)
+        compressed = compressor.compress(content) + compressor.flush()
+
+        deflatedInfo = ZipInfo("deflated.txt")
+        deflatedInfo.compress_type = ZIP_DEFLATED
+        deflatedInfo.CRC = zlib.crc32(content)
+        deflatedInfo.file_size = len(content)
+        deflatedInfo.compress_size = len(compressed)
+
+        storedInfo = ZipInfo("stored.txt")
+        storedInfo.compress_type = ZIP_STORED
+        storedInfo.CRC = zlib.crc32(content)
+        storedInfo.file_size = len(content)
+        storedInfo.compress_size = len(content)
+
+        zipPath = self.path / "archive.zip"
+        with ZipFile(zipPath, "w") as zipFile:
+            zipFile.writestr("regular.txt", b"Regular member")
+
+            # Data is followed by other bytes which must not be copied
+            writeRawZipMember(zipFile, deflatedInfo, io.BytesIO(compressed + b"trailing"))
+            writeRawZipMember(zipFile, storedInfo, io.BytesIO(content))
+
+            zipFile.writestr("last.txt", b"Last member")
+
+        with ZipFile(zipPath) as zipFile:
+            self.assertIsNone(zipFile.testzip())
+            self.assertEqual(zipFile.namelist(), ["regular.txt", "deflated.txt", "stored.txt", "last.txt"])
+            self.assertEqual(zipFile.read("deflated.txt"), content)
+            self.assertEqual(zipFile.read("stored.txt"), content)
+            self.assertEqual(zipFile.getinfo("deflated.txt").compress_type, ZIP_DEFLATED)
+            self.assertEqual(zipFile.read("last.txt"), b"Last member")
+
+    def test_writeRawZipMemberTruncated(self) -> None:
+        info = ZipInfo("truncated.txt")
+        info.compress_type = ZIP_STORED
+        info.CRC = 0
+        info.file_size = 16
+        info.compress_size = 16
+
+        with ZipFile(self.path / "archive.zip", "w") as zipFile:
+            with self.assertRaises(ValueError):
+                writeRawZipMember(zipFile, info, io.BytesIO(b"short"))
+
+
+if __name__ == "__main__":
+    unittest.main()
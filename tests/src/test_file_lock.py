@@ -0,0 +1,125 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from pathlib import Path
+
+import time
+import threading
+import unittest
+import multiprocessing
+
+from coretex.utils import FileLock
+
+from .base_directory_test import BaseDirectoryTest
+
+
+def _incrementCounter(lockPath: str, counterPath: str, count: int) -> None:
+    for _ in range(count):
+        with FileLock(lockPath):
+            value = int(Path(counterPath).read_text())
+            Path(counterPath).write_text(str(value + 1))
+
+
+class TestFileLock(BaseDirectoryTest.Base):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.lockPath = self.path / "test.lock"
+
+    def test_nonBlocking(self) -> None:
+        first = FileLock(self.lockPath)
+        second = FileLock(self.lockPath)
+
+        self.assertTrue(first.acquire(blocking = False))
+        self.assertFalse(second.acquire(blocking = False))
+        self.assertFalse(second.isLocked)
+
+        first.release()
+
+        self.assertTrue(second.acquire(blocking = False))
+        second.release()
+
+    def test_timeout(self) -> None:
+        with FileLock(self.lockPath):
+            start = time.monotonic()
+
+            with self.assertRaises(TimeoutError):
+                FileLock(self.lockPath, timeout = 0.2).acquire()
+
+            self.assertGreaterEqual(time.monotonic() - start, 0.2)
+
+    def test_notReentrant(self) -> None:
+        with FileLock(self.lockPath) as lock:
+            with self.assertRaises(RuntimeError):
+                lock.acquire()
+
+    def test_releaseRemove(self) -> None:
+        lock = FileLock(self.lockPath)
+        lock.acquire()
+        lock.release(remove = True)
+
+        self.assertFalse(self.lockPath.exists())
+        self.assertFalse(lock.isLocked)
+
+    def test_waiterReacquiresRemovedLock(self) -> None:
+        holder = FileLock(self.lockPath)
+        holder.acquire()
+
+        acquired = threading.Event()
+        release = threading.Event()
+
+        def wait() -> None:
+            with FileLock(self.lockPath):
+                acquired.set()
+                release.wait()
+
+        thread = threading.Thread(target = wait)
+        thread.start()
+
+        time.sleep(0.1)
+        holder.release(remove = True)
+
+        self.assertTrue(acquired.wait(5))
+
+        # Waiter must hold the lock on the file which is currently at the lock path
+        self.assertFalse(FileLock(self.lockPath).acquire(blocking = False))
+
+        release.set()
+        thread.join()
+
+    def test_multipleProcesses(self) -> None:
+        counterPath = self.path / "counter.txt"
+        counterPath.write_text("0")
+
+        context = multiprocessing.get_context("spawn")
+        processes = [
+            context.Process(target = _incrementCounter, args = (str(self.lockPath), str(counterPath), 50))
+            for _ in range(4)
+        ]
+
+        for process in processes:
+            process.start()
+
+        for process in processes:
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+
+        self.assertEqual(int(counterPath.read_text()), 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import List
+from unittest import mock
+from threading import Thread
+
+import os
+import sys
+import subprocess
+import unittest
+
+from coretex.utils import captureProcessOutput, command, CommandException, drainStreams, OutputBuffer
+
+
+processModule = sys.modules["coretex.utils.process"]
+
+# Writes more than the pipe buffer can hold to both streams, interleaved
+NOISY_SCRIPT = """
+import sys
+
+for index in range(20000):
+    sys.stdout.write(f"out {index}\\n")
+    sys.stderr.write(f"err {index}\\n")
+
+sys.stdout.write("no newline")
+sys.exit(3)
+"""
+
+
+def _python(script: str) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-c", script], stdout = subprocess.PIPE, stderr = subprocess.PIPE)
+
+
+class TestProcessOutput(unittest.TestCase):
+
+    def test_captureProcessOutput(self) -> None:
+        stdout: List[str] = []
+        stderr: List[str] = []
+
+        returnCode = captureProcessOutput(_python(NOISY_SCRIPT), stdout.append, stderr.append)
+
+        self.assertEqual(returnCode, 3)
+        self.assertEqual(stdout, [f"out {index}\n" for index in range(20000)] + ["no newline"])
+        self.assertEqual(stderr, [f"err {index}\n" for index in range(20000)])
+
+    def test_discardedStream(self) -> None:
+        stdout: List[str] = []
+
+        # Stream without a callback is still drained, so the process never blocks
+        returnCode = captureProcessOutput(_python(NOISY_SCRIPT), stdout.append)
+
+        self.assertEqual(returnCode, 3)
+        self.assertEqual(len(stdout), 20001)
+
+    def test_splitChunks(self) -> None:
+        for drain in [processModule._drainWithSelector, processModule._drainWithThreads]:
+            with self.subTest(drain = drain.__name__):
+                readFd, writeFd = os.pipe()
+                lines: List[str] = []
+
+                # Multi-byte characters and lines are split between writes
+                data = "first line\nčćž 😀 second\n".encode("utf-8") + b"\xff\n"
+                chunks = [data[:3], data[3:14], data[14:15], data[15:23], data[23:]]
+
+                def write() -> None:
+                    with os.fdopen(writeFd, "wb", buffering = 0) as writer:
+                        for chunk in chunks:
+                            writer.write(chunk)
+
+                writer = Thread(target = write)
+                writer.start()
+
+                with os.fdopen(readFd, "rb") as reader, \
+                     mock.patch.object(processModule.os, "name", "nt" if drain == processModule._drainWithThreads else "posix"):
+
+                    drainStreams({ reader: lines.append })
+
+                writer.join()
+
+                # Invalid bytes are replaced instead of failing the capture
+                self.assertEqual(lines, ["first line\n", "čćž 😀 second\n", "�\n"])
+
+    def test_longLine(self) -> None:
+        lines: List[str] = []
+
+        with mock.patch.object(processModule, "MAX_LINE_LENGTH", 1000):
+            captureProcessOutput(_python("print('a' * 2500)"), lines.append)
+
+        # Lines longer than the limit are split after the chunk which exceeded it, nothing is lost
+        self.assertTrue(all(len(line) <= 1000 + processModule.READ_CHUNK_SIZE for line in lines))
+        self.assertGreater(len(lines), 1)
+        self.assertEqual("".join(lines).strip(), "a" * 2500)
+
+    def test_outputBuffer(self) -> None:
+        buffer = OutputBuffer(10)
+
+        for line in ["abc\n", "def\n", "ghi\n"]:
+            buffer.append(line)
+
+        # Oldest lines are discarded once the limit is exceeded
+        self.assertTrue(buffer.truncated)
+        self.assertEqual(buffer.lines(), ["def\n", "ghi\n"])
+        self.assertEqual(buffer.text(), "def\nghi\n")
+
+        unbounded = OutputBuffer(None)
+        unbounded.append("a" * 100)
+
+        self.assertFalse(unbounded.truncated)
+
+    def test_command(self) -> None:
+        script = "import sys; print('output'); print('warning', file = sys.stderr)"
+
+        with self.assertLogs("coretexpylib", "INFO") as logs:
+            returnCode, stdout, stderr = command([sys.executable, "-c", script])
+
+        self.assertEqual((returnCode, stdout, stderr), (0, "output\n", "warning\n"))
+        self.assertEqual([record.getMessage() for record in logs.records], ["output", "warning"])
+
+        with self.assertRaises(CommandException):
+            command([sys.executable, "-c", "import sys; sys.exit(2)"])
+
+        returnCode, _, _ = command([sys.executable, "-c", "import sys; sys.exit(2)"], check = False)
+        self.assertEqual(returnCode, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import List
+from unittest import mock
+from uuid import uuid4
+
+import random
+import unittest
+
+from PIL import Image, ImageDraw
+
+import numpy as np
+
+from coretex import CoretexImageAnnotation, CoretexSegmentationInstance, ImageDatasetClass, ImageDatasetClasses, \
+    BBox, extractSegmentationMasks
+from coretex.entities.annotation.image.coretex_format import toPoly
+
+
+def _referenceMask(annotation: CoretexImageAnnotation, classes: ImageDatasetClasses) -> np.ndarray:
+    # Mask generated the same way before the polygons were drawn with a label table
+    image = Image.new("L", (annotation.width, annotation.height))
+
+    for instance in annotation.instances:
+        labelId = classes.labelIdForClassId(instance.classId)
+        if labelId is None:
+            continue
+
+        for segmentation in instance.segmentations:
+            draw = ImageDraw.Draw(image)
+            draw.polygon(toPoly(segmentation), fill = labelId + 1)
+
+    return np.array(image)
+
+
+def _randomSegmentation(generator: random.Random, width: int, height: int) -> List[int]:
+    # Odd number of values, float coordinates and points outside of the image
+    # are present in the existing annotations
+    segmentation: List = []
+
+    for index in range(generator.randint(4, 15)):
+        limit = width if index % 2 == 0 else height
+
+        if generator.random() < 0.3:
+            segmentation.append(generator.uniform(-5, limit + 5))
+        else:
+            segmentation.append(generator.randint(-5, limit + 5))
+
+    return segmentation
+
+
+class TestSegmentationMask(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.random = random.Random(42)
+
+        self.classes = ImageDatasetClasses([ImageDatasetClass(label) for label in ["dog", "cat", "bird"]])
+
+        # Class with multiple IDs
+        self.classes[1].classIds.append(uuid4())
+
+        self.classIds = [classId for clazz in self.classes for classId in clazz.classIds]
+        self.annotations = [self.randomAnnotation(index) for index in range(50)]
+
+    def randomAnnotation(self, index: int) -> CoretexImageAnnotation:
+        width = self.random.randint(1, 64)
+        height = self.random.randint(1, 64)
+
+        instances: List[CoretexSegmentationInstance] = []
+
+        for _ in range(self.random.randint(0, 6)):
+            # Instances of unknown classes are skipped
+            classId = self.random.choice(self.classIds + [uuid4()])
+            segmentations = [_randomSegmentation(self.random, width, height) for _ in range(self.random.randint(1, 3))]
+
+            instances.append(CoretexSegmentationInstance.create(classId, BBox(), segmentations))
+
+        return CoretexImageAnnotation.create(f"{index}.png", width, height, instances)
+
+    def test_labelIdTable(self) -> None:
+        table = self.classes.labelIdTable()
+
+        self.assertEqual(len(table), len(self.classIds))
+
+        for classId in self.classIds:
+            self.assertEqual(table[classId], self.classes.labelIdForClassId(classId))
+
+    def test_extractSegmentationMask(self) -> None:
+        labelIds = self.classes.labelIdTable()
+
+        for annotation in self.annotations:
+            with self.subTest(name = annotation.name):
+                expected = _referenceMask(annotation, self.classes)
+
+                np.testing.assert_array_equal(annotation.extractSegmentationMask(self.classes), expected)
+                np.testing.assert_array_equal(annotation.extractSegmentationMask(self.classes, labelIds), expected)
+
+    def test_labelIdTableReused(self) -> None:
+        labelIds = self.classes.labelIdTable()
+
+        with mock.patch.object(ImageDatasetClasses, "labelIdTable", side_effect = AssertionError) as labelIdTable:
+            for annotation in self.annotations:
+                annotation.extractSegmentationMask(self.classes, labelIds)
+
+        labelIdTable.assert_not_called()
+
+    def test_extractSegmentationMasks(self) -> None:
+        expected = [_referenceMask(annotation, self.classes) for annotation in self.annotations]
+
+        for processCount in [1, 2]:
+            with self.subTest(processCount = processCount):
+                masks = extractSegmentationMasks(self.annotations, self.classes, processCount)
+
+                self.assertEqual(len(masks), len(expected))
+
+                for mask, expectedMask in zip(masks, expected):
+                    np.testing.assert_array_equal(mask, expectedMask)
+
+    def test_invalidSegmentation(self) -> None:
+        instance = CoretexSegmentationInstance.create(self.classIds[0], BBox(), [[1, 2, 3]])
+        annotation = CoretexImageAnnotation.create("invalid.png", 8, 8, [instance])
+
+        with self.assertRaises(ValueError):
+            annotation.extractSegmentationMask(self.classes)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+#     Copyright (C) 2023  Coretex LLC
+
+#     This file is part of Coretex.ai
+
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU Affero General Public License as
+#     published by the Free Software Foundation, either version 3 of the
+#     License, or (at your option) any later version.
+
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+
+#     You should have received a copy of the GNU Affero General Public License
+#     along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from typing import Dict, List
+from zipfile import ZipFile, ZIP_DEFLATED, ZIP_STORED
+
+import io
+import unittest
+
+from coretex.utils.zip_stream import ZipStreamExtractor, ZipStreamError
+
+from .base_directory_test import BaseDirectoryTest
+
+
+class _UnseekableStream:
+
+    # Zip files written to unseekable streams store member sizes
+    # and CRCs in the data descriptors which follow the member data
+
+    def __init__(self) -> None:
+        self.buffer = io.BytesIO()
+
+    def write(self, data: bytes) -> int:
+        return self.buffer.write(data)
+
+    def flush(self) -> None:
+        pass
+
+
+MEMBERS = {
+    "file.txt": b"Coretex" * 1024,
+    "directory/nested/file.bin": bytes(range(256)) * 64,
+    "empty.txt": b""
+}
+
+
+def createArchive(members: Dict[str, bytes], compression: int) -> bytes:
+    buffer = io.BytesIO()
+
+    with ZipFile(buffer, "w", compression) as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+
+    return buffer.getvalue()
+
+
+def createStreamedArchive(members: Dict[str, bytes]) -> bytes:
+    stream = _UnseekableStream()
+
+    with ZipFile(stream, "w", ZIP_DEFLATED) as archive:  # type: ignore[arg-type]
+        for name, content in members.items():
+            with archive.open(name, "w") as member:
+                member.write(content)
+
+    return stream.buffer.getvalue()
+
+
+def chunks(data: bytes, size: int) -> List[bytes]:
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestZipStream(BaseDirectoryTest.Base):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.destination = self.path / "destination"
+
+    def extract(self, data: bytes, chunkSize: int) -> ZipStreamExtractor:
+        extractor = ZipStreamExtractor(self.destination)
+
+        for chunk in chunks(data, chunkSize):
+            extractor.feed(chunk)
+
+        extractor.close()
+        return extractor
+
+    def assertExtracted(self, extractor: ZipStreamExtractor) -> None:
+        self.assertTrue(extractor.isFinished)
+        self.assertEqual(len(extractor.extracted), len(MEMBERS))
+        self.assertFiles(self.destination, MEMBERS)
+
+    def test_deflated(self) -> None:
+        for chunkSize in [1, 7, 4096, 1024 * 1024]:
+            with self.subTest(chunkSize = chunkSize):
+                self.assertExtracted(self.extract(createArchive(MEMBERS, ZIP_DEFLATED), chunkSize))
+
+    def test_stored(self) -> None:
+        for chunkSize in [1, 7, 4096, 1024 * 1024]:
+            with self.subTest(chunkSize = chunkSize):
+                self.assertExtracted(self.extract(createArchive(MEMBERS, ZIP_STORED), chunkSize))
+
+    def test_dataDescriptor(self) -> None:
+        data = createStreamedArchive(MEMBERS)
+
+        # Sanity check that the members really use data descriptors
+        self.assertTrue(int.from_bytes(data[6:8], "little") & 0x08)
+
+        for chunkSize in [1, 7, 4096, 1024 * 1024]:
+            with self.subTest(chunkSize = chunkSize):
+                self.assertExtracted(self.extract(data, chunkSize))
+
+    def test_directoryMember(self) -> None:
+        buffer = io.BytesIO()
+
+        with ZipFile(buffer, "w") as archive:
+            archive.writestr("directory/", b"")
+            archive.writestr("directory/file.txt", b"content")
+
+        self.extract(buffer.getvalue(), 4096)
+
+        self.assertTrue((self.destination / "directory").is_dir())
+        self.assertEqual((self.destination / "directory" / "file.txt").read_bytes(), b"content")
+
+    def test_unsafeMemberName(self) -> None:
+        self.extract(createArchive({"../../outside.txt": b"content"}, ZIP_STORED), 4096)
+
+        self.assertFalse((self.destination.parent / "outside.txt").exists())
+        self.assertEqual((self.destination / "outside.txt").read_bytes(), b"content")
+
+    def test_crcMismatch(self) -> None:
+        content = b"Coretex stream content"
+        data = bytearray(createArchive({"file.txt": content}, ZIP_STORED))
+
+        position = data.find(content)
+        data[position] ^= 0xFF
+
+        with self.assertRaises(ZipStreamError):
+            self.extract(bytes(data), 4096)
+
+    def test_truncated(self) -> None:
+        data = createArchive(MEMBERS, ZIP_DEFLATED)
+
+        for length in [2, 20, len(data) // 2]:
+            with self.subTest(length = length):
+                extractor = ZipStreamExtractor(self.destination)
+                extractor.feed(data[:length])
+
+                self.assertFalse(extractor.isFinished)
+
+                with self.assertRaises(ZipStreamError):
+                    extractor.close()
+
+    def test_invalidArchive(self) -> None:
+        extractor = ZipStreamExtractor(self.destination)
+
+        with self.assertRaises(ZipStreamError):
+            extractor.feed(b"not a zip archive")
+
+        extractor.abort()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,5 @@
-from typing import Tuple, TypeVar, Type
+from typing import Any, Dict, Optional, Tuple, TypeVar, Type
+from datetime import datetime, timedelta
 from pathlib import Path
 from zipfile import ZipFile
 
@@ -7,14 +8,90 @@ import json
 import shutil
 import zipfile
 
+import requests
+
 from coretex import NetworkDataset, LocalDataset, ProjectType, NetworkSample, Project, \
-    ImageDataset, ImageDatasetClasses, ImageDatasetClass, createDataset
+    ImageDataset, ImageDatasetClasses, ImageDatasetClass, CustomSample, createDataset
+from coretex.networking import NetworkResponse
+from coretex.utils import TIME_ZONE
 
 
 RemoteDatasetType = TypeVar("RemoteDatasetType", bound = NetworkDataset)
 LocalDatasetType = TypeVar("LocalDatasetType", bound = LocalDataset)
 
 
+class StreamBody:
+
+    # Raw body of a streamed response whose connection drops after "dropAfter" bytes were read
+
+    def __init__(self, content: bytes, dropAfter: Optional[int] = None) -> None:
+        self.content = content
+        self.dropAfter = dropAfter
+        self.position = 0
+
+    def read(self, size: int = -1, **kwargs: Any) -> bytes:
+        end = len(self.content) if size < 0 else self.position + size
+
+        if self.dropAfter is not None:
+            if self.position >= self.dropAfter:
+                raise requests.exceptions.ConnectionError("Connection dropped")
+
+            end = min(end, self.dropAfter)
+
+        chunk = self.content[self.position:end]
+        self.position += len(chunk)
+
+        return chunk
+
+    def close(self) -> None:
+        pass
+
+
+def createResponse(statusCode: int, headers: Optional[Dict[str, str]] = None, body: Any = None) -> NetworkResponse:
+    # Response which is returned by the mocked network managers
+    response = requests.Response()
+    response.status_code = statusCode
+    response.headers["Content-Type"] = "application/json"
+    response.headers.update(headers or {})
+    response._content = json.dumps({} if body is None else body).encode()
+
+    response.request = requests.PreparedRequest()
+    response.request.method = "GET"
+
+    return NetworkResponse(response, "test")
+
+
+def createCustomSample(sampleId: int, lastModified: Optional[datetime] = None) -> CustomSample:
+    # Sample which is not fetched from Coretex.ai, used with the mocked network managers
+    if lastModified is None:
+        lastModified = datetime.now(TIME_ZONE) - timedelta(days = 1)
+
+    sample = CustomSample()
+    sample.id = sampleId
+    sample.name = f"sample-{sampleId}"
+    sample.projectId = 1
+    sample.projectType = ProjectType.other
+    sample.isEncrypted = False
+    sample.isLocked = False
+    sample.isDeleted = False
+    sample.lastModified = lastModified
+
+    return sample
+
+
+def createStreamResponse(content: bytes, dropAfter: Optional[int] = None) -> NetworkResponse:
+    # Streamed response which is returned by the mocked network managers
+    response = requests.Response()
+    response.status_code = 200
+    response.headers["Content-Length"] = str(len(content))
+    response.raw = StreamBody(content, dropAfter)
+
+    response.request = requests.PreparedRequest()
+    response.request.method = "GET"
+
+    return NetworkResponse(response, "test")
+
+
 def generateUniqueName() -> str:
     return f"python-unit-test-{int(time.time())}"
 